@@ -1,4 +1,18 @@
-import numpy as np, matplotlib.pyplot as plt, os, pandas as pd, scipy.optimize as spy, lmfit
+import numpy as np, matplotlib.pyplot as plt, os, lmfit
+import json, time
+import leitura
+import lorentz_lote
+import renderizacao
+import histerese
+import deteccao_picos
+import espessura as kiessig
+import cache_ajustes
+import metricas as metricas_ajuste
+import modelo_fmr
+import incerteza
+import ajuste_global
+import anisotropia
+from ajuste_paralelo import MotorAjusteParalelo
 
 ###############################################################
 ###############################################################
@@ -7,96 +21,238 @@ import numpy as np, matplotlib.pyplot as plt, os, pandas as pd, scipy.optimize a
 gamma = 0.0028 #Variavel global
 
 class AjustadorMultiplosAngulos:
-    def __init__(self, caminho_arquivo):
+    def __init__(self, caminho_arquivo, tolerancia_angulo=1e-3, jacobiano='analitico'):
         self.caminho_arquivo = caminho_arquivo
-        self.dados_completos = None
+        self.tolerancia_angulo = tolerancia_angulo  # graus
+        self.jacobiano = jacobiano  # 'analitico' ou 'numerico'
+        self._dados_completos = None
+        self._angulo = None
         self.angulos_disponiveis = None
+        self.campo = None
+        self.sinal = None
+        self.limites_angulo = None
         self.resultados = {}
+        # Resultados em layout fixo (ângulos x parâmetros), montados no primeiro registro
+        self.modelo_picos = None
+        self.nomes_parametros = None
+        self.tabela = None
+        self.erros = None
+        self.qui2_reduzido = None
         self.carregar_dados()
-        
+
     def carregar_dados(self):
         """Carrega e organiza os dados por ângulo"""
         try:
-            with open(self.caminho_arquivo, 'r') as f:
-                linhas = f.readlines()
-            
-            dados = []
-            for linha in linhas:
-                if not linha.strip() or linha.strip().startswith(('Filename:', '#')):
-                    continue
-                
-                valores = linha.split()
-                if len(valores) >= 3:
-                    try:
-                        linha_float = [float(v.replace(',', '.')) for v in valores[:3]]
-                        dados.append(linha_float)
-                    except ValueError:
-                        continue
-            
-            if not dados:
+            # Colunas: campo, ângulo e sinal (vírgula decimal aceita); o auxiliar
+            # guarda as linhas já ordenadas por ângulo, ver _organizar
+            campo, angulo, sinal = leitura.carregar_colunas(self.caminho_arquivo, n_colunas=3, ordenar_por=1)
+
+            if len(campo) == 0:
                 raise ValueError("Nenhum dado numérico válido encontrado")
-            
-            self.dados_completos = np.array(dados)
-            self.angulos_disponiveis = np.unique(self.dados_completos[:, 1])
+
+            self._organizar(campo, angulo, sinal)
             print(f"Ângulos encontrados: {self.angulos_disponiveis}")
-                
+
         except Exception as e:
             print(f"Erro ao carregar dados: {str(e)}")
             raise
 
+    def _organizar(self, campo, angulo, sinal):
+        """
+        Monta o índice por ângulo a partir das três colunas.
+
+        Colunas que já chegam ordenadas por ângulo (o auxiliar de leitura é
+        gravado assim) são usadas como estão, sem argsort nem cópias.
+
+        Returns:
+            np.ndarray ou None: Ordem aplicada às linhas (para reordenar outras
+            colunas), None se elas já estavam ordenadas
+        """
+        if np.all(angulo[1:] >= angulo[:-1]):
+            ordem = None
+        else:
+            # Ordena uma única vez por ângulo (estável: preserva a ordem do campo)
+            ordem = np.argsort(angulo, kind='stable')
+            campo, angulo, sinal = campo[ordem], angulo[ordem], sinal[ordem]
+        self.campo = campo
+        self.sinal = sinal
+        self._angulo = angulo
+        self._dados_completos = None
+
+        # Ângulos que diferem menos que a tolerância formam um único grupo
+        inicios = np.flatnonzero(np.diff(angulo) > self.tolerancia_angulo) + 1
+        inicios = np.concatenate(([0], inicios))
+        contagens = np.diff(np.append(inicios, len(angulo)))
+        self.limites_angulo = np.column_stack((inicios, inicios + contagens))
+        self.angulos_disponiveis = angulo[inicios]
+        return ordem
+
+    @property
+    def dados_completos(self):
+        """Matriz (campo, ângulo, sinal) ordenada por ângulo, montada só quando pedida"""
+        if self._dados_completos is None and self.campo is not None:
+            self._dados_completos = np.column_stack((self.campo, self._angulo, self.sinal))
+        return self._dados_completos
+
+    @dados_completos.setter
+    def dados_completos(self, dados):
+        self._dados_completos = dados
+
+    def indice_angulo(self, angulo):
+        """Posição do ângulo em `angulos_disponiveis`, comparando dentro da tolerância"""
+        i = np.searchsorted(self.angulos_disponiveis, angulo)
+        candidatos = [j for j in (i - 1, i) if 0 <= j < len(self.angulos_disponiveis)]
+        if candidatos:
+            j = min(candidatos, key=lambda k: abs(self.angulos_disponiveis[k] - angulo))
+            if abs(self.angulos_disponiveis[j] - angulo) <= self.tolerancia_angulo:
+                return j
+        raise ValueError(f"Nenhum dado encontrado para o ângulo {angulo}")
+
+    def angulo_canonico(self, angulo):
+        """Valor de `angulos_disponiveis` correspondente ao ângulo pedido"""
+        return self.angulos_disponiveis[self.indice_angulo(angulo)]
+
+    def dados_angulo(self, angulo):
+        """Retorna (x, y) do ângulo como visões contíguas, sem cópia"""
+        inicio, fim = self.limites_angulo[self.indice_angulo(angulo)]
+        return self.campo[inicio:fim], self.sinal[inicio:fim]
+
     @staticmethod
     def modelo(params, x, y=None):
-        """Função modelo para o ajuste"""
-        a = params['a']
-        b = params['b']
-        c = params['c']
-        Hr1 = params['Hr1']
-        dH1 = params['dH1']
-        modelo = a + b * x + c * (x - Hr1) / ((x - Hr1)**2 + (dH1/2)**2)**2
-        if y is None:
-            return modelo
-        return modelo - y
+        """Função modelo para o ajuste (picos conforme os parâmetros, ver modelo_fmr.ModeloPicos)"""
+        return modelo_fmr.ModeloPicos.de_parametros(params).residuo(params, x, y)
+
+    @staticmethod
+    def jacobiano(params, x, y=None):
+        """Jacobiano analítico de `modelo` (linhas: pontos, colunas: parâmetros variáveis)"""
+        return modelo_fmr.ModeloPicos.de_parametros(params).jacobiano(params, x, y)
+
+    @staticmethod
+    def funcoes_modelo(params):
+        """(modelo, jacobiano) adequados aos parâmetros: um pico para cada Hrk, Dowson se houver assimk"""
+        modelo = modelo_fmr.ModeloPicos.de_parametros(params)
+        return modelo.residuo, modelo.jacobiano
+
+    @staticmethod
+    def avaliar(params, x):
+        """Avalia o modelo (N picos) com os parâmetros dados (dicionário ou lmfit.Parameters)"""
+        return modelo_fmr.ModeloPicos.de_parametros(params).avaliar(params, x)
+
+    @staticmethod
+    def estimar_parametros(x, y):
+        """
+        Estimativa de a, b, c, Hr1 e dH1 tirada direto do espectro, sem ajuste.
+
+        Para c·u/(u² + w²)² os extremos ficam em u = ±w/√3: Hr1 é o ponto médio
+        entre máximo e mínimo, dH1 = √3 × (distância entre eles) e c sai da
+        amplitude pico a pico.
+        """
+        return modelo_fmr.ModeloPicos(1).estimar(x, y)
+
+    @classmethod
+    def ajustar_espectro(cls, x, y, parametros_iniciais, jacobiano='analitico'):
+        """
+        Ajusta o modelo a um único espectro (x, y); não depende do estado do objeto
+
+        O número de picos e a forma saem dos nomes em parametros_iniciais (ver
+        modelo_fmr.ModeloPicos.de_parametros).
+
+        Args:
+            jacobiano (str): 'analitico' passa o jacobiano exato ao MINPACK (Dfun);
+                'numerico' deixa o MINPACK estimá-lo por diferenças finitas
+        """
+        if jacobiano not in ('analitico', 'numerico'):
+            raise ValueError(f"jacobiano deve ser 'analitico' ou 'numerico', não {jacobiano!r}")
+
+        modelo = modelo_fmr.ModeloPicos.de_parametros(parametros_iniciais)
+        params = modelo.parametros(modelo.completar(parametros_iniciais))
+            
+        params['Hr1'].set(min=900, max=950)
+        params['dH1'].set(min=0, max=100)
+        # Demais picos presos perto da janela medida: sem limites, um pico que
+        # não existe nos dados vira linha de base com dH → ∞
+        faixa = float(np.max(x) - np.min(x)) or 1.0
+        for k in range(2, modelo.n_picos + 1):
+            params[f'Hr{k}'].set(min=float(np.min(x)) - faixa, max=float(np.max(x)) + faixa)
+            params[f'dH{k}'].set(min=0, max=4 * faixa)
+        
+        # Cria o minimizador corretamente
+        minimizer = lmfit.Minimizer(modelo.residuo, params, fcn_args=(x, y))
+        
+        # Executa o ajuste
+        if jacobiano == 'analitico':
+            resultado = minimizer.minimize(method='leastsq', Dfun=modelo.jacobiano)
+        else:
+            resultado = minimizer.minimize(method='leastsq')
+        
+        if not resultado.success:
+            raise RuntimeError("O ajuste não convergiu")
+        
+        return resultado
+
+    def registrar_resultado(self, angulo, resultado):
+        """
+        Armazena o resultado de um ajuste feito para o ângulo (local ou em outro processo).
+
+        Valores e erros vão para a linha do ângulo em `tabela` e `erros`
+        (layout fixo, colunas em `nomes_parametros`); se o modelo mudar (outro
+        número de picos ou outra forma), as tabelas são refeitas no novo layout.
+        """
+        angulo = self.angulo_canonico(angulo)
+        i = self.indice_angulo(angulo)
+        x, y = self.dados_angulo(angulo)
+        modelo = modelo_fmr.ModeloPicos.de_parametros(resultado.params)
+        if modelo != self.modelo_picos:
+            self._montar_tabelas(modelo)
+        valores = modelo.vetor(resultado.params)
+        self.tabela[i] = valores
+        self.erros[i] = [np.nan if resultado.params[nome].stderr is None else resultado.params[nome].stderr
+                         for nome in modelo.nomes]
+        self.qui2_reduzido[i] = getattr(resultado, 'redchi', np.nan)
+        self.resultados[angulo] = {
+            'x': x,
+            'y': y,
+            'resultado': resultado,
+            'parametros': dict(zip(modelo.nomes, valores.tolist()))
+        }
+        return self.resultados[angulo]
+
+    def _montar_tabelas(self, modelo):
+        """Tabelas (ângulos x parâmetros) no layout do modelo, com os resultados já registrados"""
+        n = len(self.angulos_disponiveis)
+        self.modelo_picos = modelo
+        self.nomes_parametros = modelo.nomes
+        self.tabela = np.full((n, len(modelo.nomes)), np.nan)
+        self.erros = np.full((n, len(modelo.nomes)), np.nan)
+        self.qui2_reduzido = np.full(n, np.nan)
+        for angulo, registro in self.resultados.items():
+            i = self.indice_angulo(angulo)
+            for j, nome in enumerate(modelo.nomes):
+                p = registro['resultado'].params.get(nome)
+                if p is not None:
+                    self.tabela[i, j] = p.value
+                    self.erros[i, j] = np.nan if p.stderr is None else p.stderr
+            self.qui2_reduzido[i] = getattr(registro['resultado'], 'redchi', np.nan)
+
+    def coluna(self, nome, erros=False):
+        """Valores (ou erros) do parâmetro em todos os ângulos, NaN nos não ajustados"""
+        if self.tabela is None:
+            raise ValueError("Nenhum ajuste registrado")
+        if nome not in self.modelo_picos.indice:
+            raise ValueError(f"Parâmetro {nome} não existe em {self.modelo_picos!r}")
+        return (self.erros if erros else self.tabela)[:, self.modelo_picos.indice[nome]]
 
     def ajustar_angulo(self, angulo, parametros_iniciais):
         """Realiza o ajuste para um ângulo específico"""
         try:
-            # Filtra dados para o ângulo especificado
-            mascara = self.dados_completos[:, 1] == angulo
-            x = self.dados_completos[mascara, 0]
-            y = self.dados_completos[mascara, 2]
-            
-            if len(x) == 0:
-                raise ValueError(f"Nenhum dado encontrado para o ângulo {angulo}")
-            
-            params = lmfit.Parameters()
-            for nome, valor in parametros_iniciais.items():
-                params.add(nome, value=valor)
-                
-            params['Hr1'].set(min=900, max=950)
-            params['dH1'].set(min=0, max=100)
-            
-            # Cria o minimizador corretamente
-            minimizer = lmfit.Minimizer(self.modelo, params, fcn_args=(x, y))
-            
-            # Executa o ajuste
-            resultado = minimizer.minimize(method='leastsq')
-            
-            if not resultado.success:
-                raise RuntimeError("O ajuste não convergiu")
+            # Fatia do ângulo no índice montado em carregar_dados
+            angulo = self.angulo_canonico(angulo)
+            x, y = self.dados_angulo(angulo)
+
+            resultado = self.ajustar_espectro(x, y, parametros_iniciais, self.jacobiano)
             
             # Armazena resultados
-            self.resultados[angulo] = {
-                'x': x,
-                'y': y,
-                'resultado': resultado,
-                'parametros': {
-                    'a': resultado.params['a'].value,
-                    'b': resultado.params['b'].value,
-                    'c': resultado.params['c'].value,
-                    'Hr1': resultado.params['Hr1'].value,
-                    'dH1': resultado.params['dH1'].value
-                }
-            }
+            self.registrar_resultado(angulo, resultado)
             
             return resultado
         
@@ -104,98 +260,126 @@ class AjustadorMultiplosAngulos:
             print(f"Erro no ajuste para ângulo {angulo}: {str(e)}")
             raise
 
-    def plotar_angulo(self, angulo):
-        """Plota os dados e o ajuste para um ângulo específico"""
+    def grafico_angulo(self, angulo, caminho=None):
+        """Especificação (renderizacao.Grafico) do gráfico de dados e ajuste de um ângulo"""
+        angulo = self.angulo_canonico(angulo)
         if angulo not in self.resultados:
             raise ValueError(f"Nenhum resultado encontrado para o ângulo {angulo}")
             
-        dados = self.resultados[angulo]
-        x = dados['x']
-        y = dados['y']
-        resultado = dados['resultado']
+        x, y = self.dados_angulo(angulo)
+        ajuste = self.avaliar(self.resultados[angulo]['resultado'].params, x)
         
-        plt.figure(figsize=(10, 6))
-        plt.plot(x, y, 'bo', label=f'Dados (ângulo={angulo})')
-        plt.plot(x, self.modelo(resultado.params, x), 
-                'r-', lw=2, label='Curva Ajustada')
-        plt.plot(x, y - self.modelo(resultado.params, x),
-                'g--', alpha=0.5, label='Resíduos')
+        g = renderizacao.Grafico(caminho, figsize=(10, 6), modelo='fmr_angulo')
+        g.plot(x, y, 'bo', label=f'Dados (ângulo={angulo})')
+        g.plot(x, ajuste, 'r-', lw=2, label='Curva Ajustada')
+        g.plot(x, y - ajuste, 'g--', alpha=0.5, label='Resíduos')
                 
-        plt.xlabel("Campo (Oe)", fontsize=12)
-        plt.ylabel("Sinal (u.a.)", fontsize=12)
-        plt.title(f"Análise para Ângulo {angulo}", fontsize=14)
-        plt.legend()
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-        plt.show()
+        g.xlabel("Campo (Oe)", fontsize=12)
+        g.ylabel("Sinal (u.a.)", fontsize=12)
+        g.title(f"Análise para Ângulo {angulo}", fontsize=14)
+        g.legend()
+        g.grid(True, alpha=0.3)
+        g.tight_layout()
+        return g
+
+    def grafico_variacao(self, caminho=None):
+        """
+        Especificação do gráfico dos parâmetros de cada pico (posição, largura,
+        amplitude) contra o ângulo, lidos da tabela de resultados; o quarto
+        painel mostra a assimetria (Dowson) ou o qui-quadrado reduzido.
+        """
+        if self.tabela is None:
+            raise ValueError("Nenhum resultado disponível para plotar")
 
-    def plotar_comparacao(self):
-        """Plota todos os ângulos juntos para comparação"""
+        modelo = self.modelo_picos
+        ajustados = ~np.isnan(self.qui2_reduzido)
+        angulos = self.angulos_disponiveis[ajustados]
+        cores = plt.rcParams['axes.prop_cycle'].by_key()['color']
+
+        g = renderizacao.Grafico(caminho, figsize=(15, 10))
+        paineis = [('Hr', 'Campo de ressonância (Oe)', 'Posições dos picos'),
+                   ('dH', 'Largura do pico (Oe)', 'Larguras dos picos'),
+                   (None, 'Amplitude do pico', 'Amplitudes dos picos')]
+        if modelo.forma == 'dowson':
+            paineis.append(('assim', 'Assimetria', 'Assimetria dos picos'))
+        for n, (prefixo, rotulo, titulo) in enumerate(paineis, start=1):
+            g.subplot(2, 2, n)
+            for k in range(1, modelo.n_picos + 1):
+                nome = f'{prefixo}{k}' if prefixo else modelo_fmr.nome_amplitude(k)
+                legenda = f'Pico {k}' if prefixo else f'Pico {k} ({nome})'
+                g.plot(angulos, self.coluna(nome)[ajustados], 'o-', color=cores[(k - 1) % len(cores)],
+                       label=legenda)
+            g.xlabel('Ângulo (graus)')
+            g.ylabel(rotulo)
+            g.title(titulo)
+            g.legend()
+            g.grid(True)
+        if modelo.forma != 'dowson':
+            g.subplot(2, 2, 4)
+            g.plot(angulos, self.qui2_reduzido[ajustados], 'ko-')
+            g.xlabel('Ângulo (graus)')
+            g.ylabel('Qui-quadrado reduzido')
+            g.title('Qualidade dos ajustes')
+            g.grid(True)
+        g.tight_layout()
+        return g
+
+    def grafico_comparacao(self, caminho=None):
+        """Especificação do gráfico com todos os ângulos juntos"""
         if not self.resultados:
             raise ValueError("Nenhum resultado disponível para plotar")
             
-        plt.figure(figsize=(12, 8))
+        g = renderizacao.Grafico(caminho, figsize=(12, 8))
         
         for angulo in sorted(self.resultados.keys()):
-            dados = self.resultados[angulo]
-            plt.plot(dados['x'], dados['y'], 'o', label=f'Ângulo {angulo} (dados)')
-            plt.plot(dados['x'], self.modelo(dados['resultado'].params, dados['x']), 
+            x, y = self.dados_angulo(angulo)
+            g.plot(x, y, 'o', label=f'Ângulo {angulo} (dados)')
+            g.plot(x, self.avaliar(self.resultados[angulo]['resultado'].params, x), 
                     '-', label=f'Ângulo {angulo} (ajuste)')
         
-        plt.xlabel("Campo (Oe)", fontsize=12)
-        plt.ylabel("Sinal (u.a.)", fontsize=12)
-        plt.title("Comparação entre Ângulos", fontsize=14)
-        plt.legend()
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-        plt.show()
-
-def obter_parametros_iniciais(angulo, parametros_anteriores=None):
-    """Obtém parâmetros iniciais do usuário"""
-    padroes = {'a': 1, 'b': 1, 'c': 1, 'Hr1': 925, 'dH1': 60}
-    
-    if parametros_anteriores:
-        print(f"\nParâmetros do ajuste anterior disponíveis para ângulo {angulo}:")
-        for param, valor in parametros_anteriores.items():
-            print(f"{param}: {valor:.4f}")
-        
-        usar_anteriores = input("Usar esses parâmetros como iniciais? (s/n): ").lower() == 's'
-        if usar_anteriores:
-            return parametros_anteriores
-    
-    print(f"\nDigite os parâmetros iniciais para o ângulo {angulo} (Enter para padrão):")
-    parametros = {}
-    for param in padroes:
-        while True:
-            try:
-                entrada = input(f"{param} (padrão={padroes[param]}): ").strip()
-                parametros[param] = float(entrada) if entrada else padroes[param]
-                break
-            except ValueError:
-                print("Por favor digite um número válido")
-    return parametros
+        g.xlabel("Campo (Oe)", fontsize=12)
+        g.ylabel("Sinal (u.a.)", fontsize=12)
+        g.title("Comparação entre Ângulos", fontsize=14)
+        g.legend()
+        g.grid(True, alpha=0.3)
+        g.tight_layout()
+        return g
+
+    def plotar_angulo(self, angulo, mostrar=True):
+        """Plota os dados e o ajuste para um ângulo específico e devolve a figura"""
+        figura = renderizacao.desenhar(self.grafico_angulo(angulo))
+        if mostrar:
+            plt.show()
+        return figura
+
+    def plotar_comparacao(self, mostrar=True):
+        """Plota todos os ângulos juntos para comparação e devolve a figura"""
+        figura = renderizacao.desenhar(self.grafico_comparacao())
+        if mostrar:
+            plt.show()
+        return figura
 
 def trocar_virgula_por_ponto(lista):
     return [item.replace(",", ".") for item in lista]
 
-def plotar_todos_juntos(lista_colA_colB_nome, output_dir=None):
-    plt.figure(figsize=(10, 6))
+def plotar_todos_juntos(lista_colA_colB_nome, output_dir=None, renderizador=None):
+    output_path = os.path.join(output_dir, "todos_os_graficos.png") if output_dir else None
+    g = renderizacao.Grafico(output_path, figsize=(10, 6), dpi=300, bbox_inches='tight')
     for colA, colB, nome_do_arquivo in lista_colA_colB_nome:
         if len(colA) == len(colB):
-            plt.plot(colA, colB, label=nome_do_arquivo)
+            g.plot(colA, colB, label=nome_do_arquivo)
         else:
             print(f"Dados inconsistentes em {nome_do_arquivo}")
 
-    plt.xlabel("H(Oe)")
-    plt.ylabel("V(mV)")
-    plt.legend(loc='best', fontsize=8)
-    plt.grid(True)
-    plt.tight_layout()
+    g.xlabel("H(Oe)")
+    g.ylabel("V(mV)")
+    g.legend(loc='best', fontsize=8)
+    g.grid(True)
+    g.tight_layout()
     
     if output_dir:
-        output_path = os.path.join(output_dir, "todos_os_graficos.png")
-        plt.savefig(output_path, dpi=300, bbox_inches='tight')
-        print(f"Gráfico combinado salvo em: {output_path}")
+        (renderizador or renderizacao.padrao()).enviar(g)
+    return g
 
 def linear_func(x, a, b):
         return a * x + b
@@ -234,65 +418,34 @@ def encontrar_posicao_mais_proxima_de_zero(vetor, tolerancia=1e-6):
     Retorna:
         int: Índice do valor mais próximo de 0.
     """
-    if not vetor:
+    vetor = np.asarray(vetor, dtype=float)
+    if vetor.size == 0:
         raise ValueError("O vetor está vazio.")
 
-    # Inicializa o índice do valor mais próximo e a menor distância
-    indice_mais_proximo = 0
-    menor_distancia = abs(vetor[0])
-
-    # Percorre o vetor
-    for i, valor in enumerate(vetor):
-        distancia = abs(valor)
-        
-        # Verifica se o valor atual é mais próximo de 0
-        if distancia < menor_distancia - tolerancia:
-            indice_mais_proximo = i
-            menor_distancia = distancia
-        # Se a distância for igual (dentro da tolerância), escolhe o positivo
-        elif abs(distancia - menor_distancia) <= tolerancia and valor > 0:
-            indice_mais_proximo = i
-            menor_distancia = distancia
-
-    return indice_mais_proximo
+    # Valores empatados com o mínimo (dentro da tolerância): fica o último positivo, como antes
+    distancia = np.abs(vetor)
+    empatados = distancia <= distancia.min() + tolerancia
+    positivos = np.flatnonzero(empatados & (vetor > 0))
+    if len(positivos):
+        return int(positivos[-1])
+    return int(np.argmax(empatados))
 
 def remanencia(x,y):
-    #valor em y quando x for minimo
-    primeira_metade = x[:len(x)//2]
-    segunda_metade = x[len(x)//2:]
-
-    posiçãominimo1 = encontrar_posicao_mais_proxima_de_zero(primeira_metade)
-    posiçãominimo2 = encontrar_posicao_mais_proxima_de_zero(segunda_metade)
-    valor_de_remanencia = (abs(y[posiçãominimo1]) + abs(y[posiçãominimo2])) /2
-
-    return valor_de_remanencia
+    #valor em y quando x for zero, interpolado nos dois ramos do ciclo
+    return histerese.analisar_ciclo(x, y)['Mr']
 
 def coercitividade(x,y):
-    #valor em x quando y for 0
-    primeira_metade = y[:len(y)//2]
-    segunda_metade = y[len(y)//2:]
-
-    posiçãominimo1 = encontrar_posicao_mais_proxima_de_zero(primeira_metade)
-    posiçãominimo2 = encontrar_posicao_mais_proxima_de_zero(segunda_metade)
+    #valor em x quando y for zero, interpolado nos dois ramos do ciclo
+    return histerese.analisar_ciclo(x, y)['Hc']
 
-    valor_de_coercitividade = (abs(x[posiçãominimo1]) + abs(x[posiçãominimo2])) /2
-
-    return valor_de_coercitividade
-
-def obter_parametros_iniciais(angulo):
-    """Solicita ao usuário os parâmetros iniciais para o ajuste"""
+def obter_parametros_iniciais(angulo, n_picos=2, forma='lorentz'):
+    """Solicita ao usuário os parâmetros iniciais para o ajuste (N picos, ver modelo_fmr.ModeloPicos)"""
     print(f"\nForneça os parâmetros iniciais para o ângulo {angulo}:")
     
-    parametros = {
-        'a': float(input("a (offset): ") or 1),
-        'b': float(input("b (inclinação): ") or 1),
-        'c': float(input("c (amplitude pico 1): ") or 1),
-        'd': float(input("d (amplitude pico 2): ") or 1),
-        'Hr1': float(input("Hr1 (posição pico 1 em Oe): ") or 1000),
-        'dH1': float(input("dH1 (largura pico 1 em Oe): ") or 50),
-        'Hr2': float(input("Hr2 (posição pico 2 em Oe): ") or 1200),
-        'dH2': float(input("dH2 (largura pico 2 em Oe): ") or 50)
-    }
+    modelo = modelo_fmr.ModeloPicos(n_picos, forma)
+    padroes = modelo.completar({'a': 1, 'b': 1, 'c': 1, 'd': 1, 'Hr1': 1000, 'dH1': 50, 'Hr2': 1200, 'dH2': 50})
+    parametros = {nome: float(input(f"{nome} ({descricao}): ") or padroes[nome])
+                  for nome, descricao in modelo.descricoes().items()}
     
     return parametros
 
@@ -300,382 +453,663 @@ def obter_parametros_iniciais(angulo):
 ###############################################################
 ###############################################################
 
-def impedancia(diretorio_origem, diretorio_destino):
+def _ler_espectros_impedancia(diretorio_origem):
+    """
+    Primeira etapa do pipeline de impedancia: lê os arquivos um a um, em
+    ordem de nome (a posição de cada arquivo define a sua frequência).
+
+    As vírgulas viram separadores de campo no próprio buffer lido (sem
+    arquivo temporário) e só as colunas de campo (0) e impedância (4) são
+    mantidas.
+
+    Retorna:
+        gerador de (nome, x, y)
+    """
+    with os.scandir(diretorio_origem) as entradas:
+        entradas = sorted(entradas, key=lambda entrada: entrada.name)
+    for entrada in entradas:
+        if not entrada.is_file():
+            print(f"AVISO: {entrada.path} não é um arquivo válido. Pulando...")
+            continue
+        espectro = _ler_espectro_impedancia(entrada.path)
+        if espectro is not None:
+            yield espectro
+
+
+def _ler_espectro_impedancia(caminho):
+    """Campo e impedância de um arquivo: (nome, x, y), ou None se não der para ler"""
+    nome_arquivo = os.path.basename(caminho)
+    try:
+        colunas = leitura.carregar_colunas(caminho, n_colunas=5, virgula=' ')
+    except Exception as e:
+        print(f"ERRO ao processar {nome_arquivo}: {str(e)}")
+        return None
+    if len(colunas[0]) == 0:
+        print(f"AVISO: Arquivo {nome_arquivo} não tem colunas suficientes. Pulando...")
+        return None
+    return os.path.splitext(nome_arquivo)[0], colunas[0], colunas[4]
+
+
+def _plotar_brutos_impedancia(espectros, diretorio_destino, renderizador):
+    """Segunda etapa: envia o gráfico dos dados brutos e repassa só a metade a ajustar"""
+    for nome, x, y in espectros:
+        # Plot dos dados brutos
+        caminho_saida = os.path.join(diretorio_destino, f"{nome}_bruto.png")
+        g = renderizacao.Grafico(caminho_saida, figsize=(10, 6), dpi=300, bbox_inches='tight',
+                                 modelo='impedancia_bruto')
+        g.plot(x, y, 'b-', linewidth=1)
+        g.xlabel("Campo (Oe)", fontsize=12)
+        g.ylabel("Impedância (Ω)", fontsize=12)
+        g.title(f"Impedância - {nome}", fontsize=14)
+        g.grid(True, alpha=0.3)
+        renderizador.enviar(g)
+
+        # Ajuste do modelo - APENAS NA SEGUNDA METADE DOS DADOS
+        metade = len(x) // 2 + 1
+        yield nome, x[metade:], y[metade:]
+
+
+def _ajustar_lotes_impedancia(espectros, metodo_ajuste, tamanho_lote, cache=None, metricas=None):
+    """
+    Terceira etapa: acumula até `tamanho_lote` espectros, ajusta os de mesma
+    grade de campo juntos e repassa os resultados na ordem de chegada. A
+    memória fica limitada a um lote, qualquer que seja o número de arquivos.
+
+    Com `cache` (cache_ajustes.CacheAjustes), cada espectro é procurado pelo
+    conteúdo (dados, método e código do modelo) antes do ajuste; os acertos
+    não são reajustados. Cada linha do ajuste em lote é independente das
+    outras, então guardar e reaproveitar linha a linha dá o mesmo resultado.
+
+    Com `metricas` (metricas.RegistroMetricas), cada espectro deixa um
+    registro; o tempo de um ajuste em lote é dividido igualmente entre os
+    espectros do lote.
+
+    Retorna:
+        gerador de (nome, x_fit, y_fit, resultado, k), com `resultado` um
+        lorentz_lote.ResultadoLote e `k` a linha do espectro nele
+    """
+    if cache is not None:
+        modelo = cache_ajustes.identidade(lorentz_lote, lorentz)
+
+    def registrar(nome, resultado, k, tempo, lote, do_cache):
+        if metricas is None:
+            return
+        valores = resultado.valores[k]
+        no_limite = [n for n, v, minimo in zip(lorentz_lote.NOMES, valores, lorentz_lote.MINIMOS)
+                     if np.isfinite(minimo) and abs(v - minimo) <= 1e-6 * max(1.0, abs(minimo))]
+        metricas.registrar({'rotina': 'impedancia', 'item': nome, 'metodo': resultado.metodo[k],
+                            'tempo': tempo, 'nfev': 0 if do_cache else resultado.nfev[k], 'tentativas': 1,
+                            'sucesso': bool(resultado.sucesso[k]) and bool(np.all(np.isfinite(valores))),
+                            'redchi': resultado.redchi[k], 'chisqr': resultado.chisqr[k],
+                            'ndata': resultado.ndata, 'nvarys': len(lorentz_lote.NOMES),
+                            'no_limite': no_limite, 'cache': do_cache, 'lote': lote})
+
+    def ajustar(pendentes):
+        ajustes = [None] * len(pendentes)
+        chaves = [None] * len(pendentes)
+        grupos = {}
+        for i, (_, x_fit, y_fit) in enumerate(pendentes):
+            if cache is not None:
+                chaves[i] = cache_ajustes.chave(modelo, metodo_ajuste, x_fit, y_fit)
+                guardado = cache.obter(chaves[i])
+                if guardado is not None:
+                    ajustes[i] = (lorentz_lote.ResultadoLote.importar(x_fit, [guardado]), 0)
+                    registrar(pendentes[i][0], ajustes[i][0], 0, None, 1, True)
+                    continue
+            grupos.setdefault(x_fit.tobytes(), []).append(i)
+
+        for indices in grupos.values():
+            x_fit = pendentes[indices[0]][1]
+            Y = np.array([pendentes[i][2] for i in indices])
+            inicio = time.perf_counter()
+            try:
+                if metodo_ajuste == 'lote':
+                    resultado = lorentz_lote.ajustar_lorentz_lote(x_fit, Y)
+                else:
+                    resultado = lorentz_lote.ajustar_lorentz_individual(x_fit, Y)
+            except Exception as e:
+                print(f"ERRO no ajuste de {len(indices)} espectro(s): {str(e)}")
+                continue
+            tempo = (time.perf_counter() - inicio) / len(indices)
+            for k, i in enumerate(indices):
+                ajustes[i] = (resultado, k)
+                if cache is not None and np.all(np.isfinite(resultado.valores[k])):
+                    cache.guardar(chaves[i], resultado.exportar(k))
+                registrar(pendentes[i][0], resultado, k, tempo, len(indices), False)
+
+        for (nome, x_fit, y_fit), ajuste in zip(pendentes, ajustes):
+            if ajuste is not None:
+                yield (nome, x_fit, y_fit) + ajuste
+
+    pendentes = []
+    for espectro in espectros:
+        pendentes.append(espectro)
+        if len(pendentes) >= tamanho_lote:
+            yield from ajustar(pendentes)
+            pendentes = []
+    if pendentes:
+        yield from ajustar(pendentes)
+
+
+def _relatar_ajuste_impedancia(nome, x_fit, y_fit, resultado, k, diretorio_destino, renderizador):
+    """
+    Quarta etapa, para um espectro ajustado: gráfico do ajuste e relatório
+    <nome>_parametros.txt.
+
+    Retorna:
+        tuple ou None: (Hr, dH), ou None se o ajuste não serve
+    """
+    if not np.all(np.isfinite(resultado.valores[k])):
+        print(f"ERRO ao ajustar {nome}: o ajuste não convergiu")
+        return None
+    try:
+        parametros = resultado.parametros(k)
+
+        # Plot do ajuste completo (mostra todos os dados)
+        caminho_saida = os.path.join(diretorio_destino, f"{nome}_ajuste.png")
+        g = renderizacao.Grafico(caminho_saida, figsize=(10, 6), dpi=300, bbox_inches='tight',
+                                 modelo='impedancia_ajuste')
+        g.plot(x_fit, y_fit, 'b.', label="Dados experimentais")
+        g.plot(x_fit, resultado.melhor_ajuste(k), 'r-', linewidth=2, 
+                label="Ajuste Lorentziano (2ª metade)")
+        g.xlabel("Campo (Oe)", fontsize=12)
+        g.ylabel("Impedância (Ω)", fontsize=12)
+        g.title(f"Ajuste - {nome}", fontsize=14)
+        g.grid(True, alpha=0.3)
+        g.legend()
+
+        # Adicionar parâmetros do ajuste ao gráfico
+        texto_ajuste = (
+            f"Hr = {parametros['Hr'][0]:.2f} ± {parametros['Hr'][1]:.2f} Oe\n"
+            f"dH = {parametros['dH'][0]:.2f} ± {parametros['dH'][1]:.2f} Oe"
+        )
+        g.text(0.02, 0.98, texto_ajuste, transform=renderizacao.EIXOS,
+                verticalalignment='top', bbox=dict(facecolor='white', alpha=0.8))
+
+        # Gráfico ajustado vai para a fila de renderização
+        renderizador.enviar(g)
+
+        # Salvar parâmetros do ajuste em arquivo
+        nome_relatorio = f"{nome}_parametros.txt"
+        caminho_relatorio = os.path.join(diretorio_destino, nome_relatorio)
+        with open(caminho_relatorio, 'w') as f:
+            f.write(resultado.relatorio(k))
+        print(f"Relatório de ajuste salvo: {caminho_relatorio}")
+        return parametros['Hr'][0], parametros['dH'][0]
+
+    except Exception as e:
+        print(f"ERRO ao processar {nome}: {str(e)}")
+        return None
+
+
+def _ajustes_finais_impedancia(lista_Hr, lista_dH, diretorio_destino, renderizador, metricas=None, arquivo=None,
+                               n_bootstrap=0, n_processos=None):
+    """
+    Última etapa: ajustes de Kittel (Hr contra frequência) e da largura de
+    linha (dH contra frequência), com gráficos e relatórios. A frequência de
+    cada espectro sai da sua posição na lista (1001 MHz + 10 MHz por espectro).
+
+    Com n_bootstrap > 0, as incertezas de Hk, Meff, ΔH0 e α também são
+    estimadas por bootstrap (incerteza.incerteza_impedancia) e gravadas em
+    incerteza_impedancia.json; nos gráficos, o erro do bootstrap substitui o
+    do lmfit quando este não está disponível.
+    """
+    def registrar_ajuste_final(item, resultado, inicio):
+        if metricas is not None:
+            metricas.registrar(metricas_ajuste.metricas_ajuste(
+                resultado, time.perf_counter() - inicio, rotina='impedancia', arquivo=arquivo,
+                item=item, metodo='lmfit', tentativas=1))
+
+    # Criar array de frequências correspondente ao número de amostras
+    num_amostras = len(lista_Hr)
+    frequencias = np.linspace(1001, 1001 + (num_amostras-1)*10, num_amostras)
+    frequencias_ghz = np.array(frequencias) / 1000
+
+    print(f"\nNúmero de amostras: {num_amostras}")
+    print(f"Faixa de frequências ajustada: {frequencias[0]} a {frequencias[-1]} MHz")
+
+    bootstrap = None
+    if n_bootstrap:
+        try:
+            bootstrap = incerteza.incerteza_impedancia(lista_Hr, lista_dH, frequencias_ghz, gamma,
+                                                       n_amostras=n_bootstrap, n_processos=n_processos)
+            with open(os.path.join(diretorio_destino, 'incerteza_impedancia.json'), 'w') as f:
+                json.dump(bootstrap, f, indent=2)
+            print(incerteza.resumo(bootstrap))
+        except (ValueError, RuntimeError) as e:
+            print(f"ERRO na estimativa de incertezas por bootstrap: {str(e)}")
+
+    def com_erro(rotulo, parametro, nome, formato, unidade=''):
+        """'rotulo = valor ± erro', com o erro do lmfit ou, sem ele, o do bootstrap"""
+        if parametro.stderr is not None:
+            return f"{rotulo} = {parametro.value:{formato}} ± {parametro.stderr:{formato}}{unidade}"
+        if bootstrap is not None:
+            return f"{rotulo} = {parametro.value:{formato}} ± {bootstrap['erro'][nome]:{formato}}{unidade} (bootstrap)"
+        return f"{rotulo} = {parametro.value:{formato}}{unidade} (erro não disponível)"
+
+    # --- AJUSTE PARA FREQUÊNCIA DE RESSONÂNCIA ---
+    modelo_freq = lmfit.Model(frequencia_de_ressonancia)
+    params_freq = modelo_freq.make_params(Hk=100, Meff=1000)
+    params_freq['Hk'].min = 0
+    params_freq['Meff'].min = 0
+
+    try:
+        # Ajuste invertido (Hr vs frequência)
+        inicio = time.perf_counter()
+        resultado_freq = modelo_freq.fit(frequencias_ghz, params_freq, x=np.array(lista_Hr))
+        registrar_ajuste_final('frequencia_ressonancia', resultado_freq, inicio)
+
+        # Gráfico para Hr vs Frequência com ajuste
+        caminho_saida_freq = os.path.join(diretorio_destino, 'frequencia_ressonancia_ajuste.png')
+        g = renderizacao.Grafico(caminho_saida_freq, figsize=(12, 6), dpi=300, bbox_inches='tight')
+        g.plot(lista_Hr, frequencias_ghz, 'bo', markersize=6, label='Dados experimentais')
+
+        # Curva ajustada
+        x_fit = np.linspace(min(lista_Hr), max(lista_Hr), 100)
+        g.plot(x_fit, modelo_freq.eval(resultado_freq.params, x=x_fit), 
+                'r-', label='Ajuste teórico')
+
+        g.xlabel('Campo de Ressonância (Oe)', fontsize=12)
+        g.ylabel('Frequência (GHz)', fontsize=12)
+        g.title('Frequência de Ressonância vs Campo', fontsize=14)
+
+        # Adicionar parâmetros do ajuste
+        texto_ajuste = (
+            com_erro("Hk", resultado_freq.params['Hk'], 'Hk', '.2f', ' Oe') + "\n"
+            + com_erro("Meff", resultado_freq.params['Meff'], 'Meff', '.2f', ' Oe')
+        )
+        g.text(0.02, 0.98, texto_ajuste, transform=renderizacao.EIXOS,
+                verticalalignment='top', bbox=dict(facecolor='white', alpha=0.8))
+
+        g.grid(True, alpha=0.3)
+        g.legend()
+        g.tight_layout()
+        renderizador.enviar(g)
+
+        # Salvar parâmetros do ajuste
+        with open(os.path.join(diretorio_destino, 'parametros_frequencia.txt'), 'w') as f:
+            f.write(resultado_freq.fit_report())
+
+    except Exception as e:
+        print(f"ERRO no ajuste da frequência de ressonância: {str(e)}")
+
+    # --- AJUSTE PARA LARGURA DE LINHA ---
+    def largura_linha_model(x, dho, alfa):
+        return dho + (alfa * x)  # x já está em GHz, então alfa = α/γ
+
+    modelo_largura = lmfit.Model(largura_linha_model)
+    params_largura = modelo_largura.make_params(
+        dho=np.mean(lista_dH)/2,  # Valor inicial mais seguro
+        alfa=0.1
+    )
+    params_largura['dho'].min = 0
+    params_largura['alfa'].min = 0
+
+    try:
+        inicio = time.perf_counter()
+        resultado_largura = modelo_largura.fit(lista_dH, params_largura, x=frequencias_ghz)
+        registrar_ajuste_final('largura_linha', resultado_largura, inicio)
+
+        # Verifica se o ajuste foi bem-sucedido
+        if resultado_largura is not None:
+            # Gráfico para dH vs Frequência com ajuste
+            caminho_saida_largura = os.path.join(diretorio_destino, 'largura_linha_ajuste.png')
+            g = renderizacao.Grafico(caminho_saida_largura, figsize=(12, 6), dpi=300, bbox_inches='tight')
+            g.plot(frequencias_ghz, lista_dH, 'ro', markersize=6, label='Dados experimentais')
+
+            # Curva ajustada
+            x_fit = np.linspace(min(frequencias_ghz), max(frequencias_ghz), 100)
+            y_fit = modelo_largura.eval(resultado_largura.params, x=x_fit)
+            g.plot(x_fit, y_fit, 'b-', 
+                    label=f'Ajuste: ΔH = {resultado_largura.params["dho"].value:.2f} + {resultado_largura.params["alfa"].value:.4f}·f')
+
+            g.xlabel('Frequência (GHz)', fontsize=12)
+            g.ylabel('Largura de Linha (Oe)', fontsize=12)
+            g.title('Largura de Linha vs Frequência', fontsize=14)
+
+            # Adicionar parâmetros do ajuste (com verificação de erros)
+            texto_ajuste = [
+                com_erro("ΔH₀", resultado_largura.params['dho'], 'dho', '.2f', ' Oe'),
+                com_erro("α/γ", resultado_largura.params['alfa'], 'alfa_gamma', '.4f'),
+            ]
+
+            texto_ajuste.append(f"α = {resultado_largura.params['alfa'].value * gamma:.4f} (α = (α/γ)×γ)")
+
+            g.text(0.02, 0.98, "\n".join(texto_ajuste), transform=renderizacao.EIXOS,
+                    verticalalignment='top', bbox=dict(facecolor='white', alpha=0.8))
+
+            g.grid(True, alpha=0.3)
+            g.legend()
+            g.tight_layout()
+            renderizador.enviar(g)
+
+            # Salvar parâmetros do ajuste
+            with open(os.path.join(diretorio_destino, 'parametros_largura.txt'), 'w') as f:
+                f.write(resultado_largura.fit_report())
+        else:
+            print("AVISO: O ajuste da largura de linha retornou None")
+
+    except Exception as e:
+        print(f"ERRO no ajuste da largura de linha: {str(e)}")
+        # Plot dos dados sem ajuste
+        caminho_saida_largura = os.path.join(diretorio_destino, 'largura_linha_sem_ajuste.png')
+        g = renderizacao.Grafico(caminho_saida_largura, figsize=(12, 6), dpi=300, bbox_inches='tight')
+        g.plot(frequencias_ghz, lista_dH, 'ro', markersize=6, label='Dados experimentais')
+        g.xlabel('Frequência (GHz)', fontsize=12)
+        g.ylabel('Largura de Linha (Oe)', fontsize=12)
+        g.title('Largura de Linha vs Frequência (ajuste falhou)', fontsize=14)
+        g.grid(True, alpha=0.3)
+        g.legend()
+        g.tight_layout()
+        renderizador.enviar(g)
+
+        # Salvar parâmetros do ajuste
+        with open(os.path.join(diretorio_destino, 'parametros_largura.txt'), 'w') as f:
+            f.write(resultado_largura.fit_report())
+
+    except Exception as e:
+        print(f"ERRO no ajuste da largura de linha: {str(e)}")
+
+
+def _ajuste_global_impedancia(espectros, diretorio_destino, renderizador, metricas=None, arquivo=None):
+    """
+    Alternativa às etapas de ajuste: todos os espectros num só ajuste
+    (ajuste_global.ajustar_impedancia_global), com Hr e dH de cada um dados
+    por Hk, Meff, ΔH0 e α/γ. Precisa de todos os espectros em memória.
+
+    Grava o gráfico <nome>_ajuste_global.png de cada espectro, o gráfico
+    ajuste_global.png (Kittel e largura de linha) e ajuste_global.txt e
+    ajuste_global.json com os parâmetros.
+
+    Retorna:
+        ajuste_global.ResultadoGlobal ou None se o ajuste falhar
+    """
+    nomes, xs, ys = [], [], []
+    for nome, x_fit, y_fit in espectros:
+        nomes.append(nome)
+        xs.append(x_fit)
+        ys.append(y_fit)
+
+    # Mesmas frequências dos ajustes finais: 1001 MHz + 10 MHz por espectro
+    frequencias_ghz = (1001 + 10 * np.arange(len(nomes))) / 1000
+    print(f"\nAjuste global de {len(nomes)} espectros")
+
+    inicio = time.perf_counter()
+    try:
+        resultado = ajuste_global.ajustar_impedancia_global(xs, ys, frequencias_ghz, gamma)
+    except (ValueError, np.linalg.LinAlgError) as e:
+        print(f"ERRO no ajuste global: {str(e)}")
+        return None
+    tempo = time.perf_counter() - inicio
+
+    if metricas is not None:
+        no_limite = [nome for nome, v in zip(ajuste_global.GLOBAIS, resultado.globais) if v <= 1e-6]
+        metricas.registrar({'rotina': 'impedancia', 'arquivo': arquivo, 'item': 'ajuste_global',
+                            'metodo': 'global', 'tempo': tempo, 'nfev': resultado.nfev, 'tentativas': 1,
+                            'sucesso': resultado.sucesso, 'redchi': resultado.redchi,
+                            'chisqr': resultado.chisqr, 'ndata': resultado.ndata,
+                            'nvarys': resultado.nvarys, 'no_limite': no_limite, 'cache': False,
+                            'lote': len(nomes)})
+
+    parametros = resultado.parametros()
+
+    def com_erro(rotulo, nome, formato, unidade=''):
+        valor, erro = parametros[nome]
+        if np.isfinite(erro):
+            return f"{rotulo} = {valor:{formato}} ± {erro:{formato}}{unidade}"
+        return f"{rotulo} = {valor:{formato}}{unidade} (erro não disponível)"
+
+    # Cada espectro com a curva dada pelos parâmetros globais
+    for i, nome in enumerate(nomes):
+        caminho_saida = os.path.join(diretorio_destino, f"{nome}_ajuste_global.png")
+        g = renderizacao.Grafico(caminho_saida, figsize=(10, 6), dpi=300, bbox_inches='tight',
+                                 modelo='impedancia_ajuste')
+        g.plot(xs[i], ys[i], 'b.', label="Dados experimentais")
+        g.plot(xs[i], resultado.melhor_ajuste(i), 'r-', linewidth=2, label="Ajuste global (2ª metade)")
+        g.xlabel("Campo (Oe)", fontsize=12)
+        g.ylabel("Impedância (Ω)", fontsize=12)
+        g.title(f"Ajuste global - {nome} ({frequencias_ghz[i]:.3f} GHz)", fontsize=14)
+        g.grid(True, alpha=0.3)
+        g.legend()
+        texto_ajuste = (
+            f"Hr = {resultado.Hr[i]:.2f} ± {resultado.erros_Hr[i]:.2f} Oe\n"
+            f"dH = {resultado.dH[i]:.2f} ± {resultado.erros_dH[i]:.2f} Oe"
+        )
+        g.text(0.02, 0.98, texto_ajuste, transform=renderizacao.EIXOS,
+                verticalalignment='top', bbox=dict(facecolor='white', alpha=0.8))
+        renderizador.enviar(g)
+
+    # Kittel e largura de linha implícitos no ajuste
+    caminho_saida = os.path.join(diretorio_destino, 'ajuste_global.png')
+    g = renderizacao.Grafico(caminho_saida, figsize=(14, 6), dpi=300, bbox_inches='tight')
+    g.subplot(1, 2, 1)
+    g.plot(resultado.Hr, frequencias_ghz, 'bo', markersize=4, label='Hr de cada espectro')
+    H = np.linspace(resultado.Hr.min(), resultado.Hr.max(), 100)
+    g.plot(H, frequencia_de_ressonancia(H, parametros['Hk'][0], parametros['Meff'][0]), 'r-',
+           label='Kittel')
+    g.xlabel('Campo de Ressonância (Oe)', fontsize=12)
+    g.ylabel('Frequência (GHz)', fontsize=12)
+    g.title('Frequência de Ressonância vs Campo', fontsize=14)
+    g.text(0.02, 0.98, com_erro("Hk", 'Hk', '.2f', ' Oe') + "\n" + com_erro("Meff", 'Meff', '.2f', ' Oe'),
+           transform=renderizacao.EIXOS, verticalalignment='top', bbox=dict(facecolor='white', alpha=0.8))
+    g.grid(True, alpha=0.3)
+    g.legend(loc='lower right')
+    g.subplot(1, 2, 2)
+    g.plot(frequencias_ghz, resultado.dH, 'ro', markersize=4, label='dH de cada espectro')
+    g.plot(frequencias_ghz, parametros['dho'][0] + parametros['alfa_gamma'][0] * frequencias_ghz, 'b-',
+           label='ΔH₀ + (α/γ)·f')
+    g.xlabel('Frequência (GHz)', fontsize=12)
+    g.ylabel('Largura de Linha (Oe)', fontsize=12)
+    g.title('Largura de Linha vs Frequência', fontsize=14)
+    texto_ajuste = [com_erro("ΔH₀", 'dho', '.2f', ' Oe'), com_erro("α/γ", 'alfa_gamma', '.4f'),
+                    com_erro("α", 'alfa', '.4f')]
+    g.text(0.02, 0.98, "\n".join(texto_ajuste), transform=renderizacao.EIXOS,
+           verticalalignment='top', bbox=dict(facecolor='white', alpha=0.8))
+    g.grid(True, alpha=0.3)
+    g.legend(loc='lower right')
+    g.tight_layout()
+    renderizador.enviar(g)
+
+    with open(os.path.join(diretorio_destino, 'ajuste_global.txt'), 'w') as f:
+        f.write(resultado.relatorio())
+    with open(os.path.join(diretorio_destino, 'ajuste_global.json'), 'w') as f:
+        json.dump(resultado.exportar(nomes), f, indent=2)
+    print(resultado.relatorio())
+    if not resultado.sucesso:
+        print("AVISO: o ajuste global não convergiu")
+    return resultado
+
+
+def impedancia(diretorio_origem, diretorio_destino, metodo_ajuste='lote', tamanho_lote=64, renderizador=None,
+               cache=None, metricas=None, n_bootstrap=0, n_processos=None):
     """
     Processa arquivos de dados, plota gráficos e ajusta curvas Lorentzianas
     
+    Os arquivos passam por um pipeline de geradores (leitura -> gráfico bruto
+    -> ajuste -> relatório), então só um lote de espectros fica em memória;
+    dos arquivos já processados guardam-se apenas Hr e dH para os ajustes finais.
+
     Args:
         diretorio_origem (str): Caminho para os arquivos de dados originais
         diretorio_destino (str): Caminho para salvar os gráficos e resultados
+        metodo_ajuste (str): 'lote' ajusta juntos os espectros de mesma grade de campo
+            (lorentz_lote); 'lmfit' faz um ajuste lmfit por arquivo; 'global' ajusta
+            todos os espectros num só problema, com Hr e dH presos a Hk, Meff, ΔH0 e α
+            (ajuste_global; todos os espectros ficam em memória e não há cache,
+            bootstrap nem ajustes finais separados)
+        tamanho_lote (int): Número máximo de espectros ajustados de uma vez
+        renderizador (renderizacao.Renderizador, opcional): Para onde vão os gráficos
+            (padrão: renderizacao.padrao()); a função retorna sem esperar por eles
+        cache (cache_ajustes.CacheAjustes, opcional): Reaproveita ajustes de
+            espectros idênticos já ajustados (ex.: cache_ajustes.padrao())
+        metricas (metricas.RegistroMetricas, opcional): Recebe as métricas do
+            ajuste de cada espectro e dos ajustes finais (frequência e largura)
+        n_bootstrap (int): Réplicas do bootstrap das incertezas de Hk, Meff, ΔH0
+            e α (0 desliga; ver incerteza.incerteza_impedancia)
+        n_processos (int, opcional): Processos do bootstrap
     """
+    if metodo_ajuste not in ('lote', 'lmfit', 'global'):
+        raise ValueError(f"Método de ajuste desconhecido: {metodo_ajuste} (use 'lote', 'lmfit' ou 'global')")
+    if tamanho_lote < 1:
+        raise ValueError("tamanho_lote deve ser pelo menos 1")
+
     # Verificação de diretórios
     if not os.path.exists(diretorio_origem):
         raise FileNotFoundError(f"Diretório de origem não encontrado: {diretorio_origem}")
     
     os.makedirs(diretorio_destino, exist_ok=True)
+    renderizador = renderizador or renderizacao.padrao()
     
     # Listas para armazenar os parâmetros
     lista_Hr = []
     lista_dH = []
     nomes_arquivos = []
 
-    # Processamento dos arquivos
-    for nome_arquivo in os.listdir(diretorio_origem):
-        caminho_origem = os.path.join(diretorio_origem, nome_arquivo)
-        
-        if not os.path.isfile(caminho_origem):
-            print(f"AVISO: {caminho_origem} não é um arquivo válido. Pulando...")
-            continue
-        
-        # Criação de arquivo temporário
-        temp_path = os.path.join(diretorio_destino, f"temp_{nome_arquivo}")
-        try:
-            temp_path = substituir_virgula_por_espaco(caminho_origem, temp_path)
-            
-            # Carregamento dos dados
-            dados = np.loadtxt(temp_path)
-            
-            if dados.shape[1] < 5:
-                print(f"AVISO: Arquivo {nome_arquivo} não tem colunas suficientes. Pulando...")
-                continue
-            
-            x = dados[:, 0]
-            y = dados[:, 4]
-            
-            # Plot dos dados brutos
-            plt.figure(figsize=(10, 6))
-            plt.plot(x, y, 'b-', linewidth=1)
-            plt.xlabel("Campo (Oe)", fontsize=12)
-            plt.ylabel("Impedância (Ω)", fontsize=12)
-            plt.title(f"Impedância - {os.path.splitext(nome_arquivo)[0]}", fontsize=14)
-            plt.grid(True, alpha=0.3)
-            
-            # Salvar gráfico bruto
-            nome_saida = f"{os.path.splitext(nome_arquivo)[0]}_bruto.png"
-            caminho_saida = os.path.join(diretorio_destino, nome_saida)
-            plt.savefig(caminho_saida, dpi=300, bbox_inches='tight')
-            plt.close()
-            print(f"Gráfico bruto salvo: {caminho_saida}")
-            
-            # Ajuste do modelo - APENAS NA SEGUNDA METADE DOS DADOS
-            metade = len(x) // 2 + 1
-            x_fit = x[metade:]
-            y_fit = y[metade:]
-            
-            # Estimativas iniciais inteligentes usando apenas a segunda metade
-            Hr_guess = x_fit[np.argmax(y_fit)]
-            dH_guess = (max(x_fit) - min(x_fit))/10
-            m_guess = max(y_fit)
-            
-            modelo = lmfit.Model(lorentz)
-            params = modelo.make_params(
-                m=m_guess,
-                n=0.0,
-                Hr=Hr_guess,
-                dH=dH_guess
-            )
-            
-            # Restrições para parâmetros físicos
-            params['dH'].min = 0
-            params['m'].min = 0
-            
-            # Faz o fitting apenas com a segunda metade
-            resultado = modelo.fit(y_fit, params, x=x_fit)
-
-            # Armazena os valores e nome do arquivo
-            lista_Hr.append(resultado.params['Hr'].value)
-            lista_dH.append(resultado.params['dH'].value)
-            nomes_arquivos.append(os.path.splitext(nome_arquivo)[0])
-            
-            # Plot do ajuste completo (mostra todos os dados)
-            plt.figure(figsize=(10, 6))
-            plt.plot(x_fit, y_fit, 'b.', label="Dados experimentais")
-            plt.plot(x_fit, resultado.best_fit, 'r-', linewidth=2, 
-                    label="Ajuste Lorentziano (2ª metade)")
-            plt.xlabel("Campo (Oe)", fontsize=12)
-            plt.ylabel("Impedância (Ω)", fontsize=12)
-            plt.title(f"Ajuste - {os.path.splitext(nome_arquivo)[0]}", fontsize=14)
-            plt.grid(True, alpha=0.3)
-            plt.legend()
-            
-            # Adicionar parâmetros do ajuste ao gráfico
-            texto_ajuste = (
-                f"Hr = {resultado.params['Hr'].value:.2f} ± {resultado.params['Hr'].stderr:.2f} Oe\n"
-                f"dH = {resultado.params['dH'].value:.2f} ± {resultado.params['dH'].stderr:.2f} Oe"
-            )
-            plt.text(0.02, 0.98, texto_ajuste, transform=plt.gca().transAxes,
-                    verticalalignment='top', bbox=dict(facecolor='white', alpha=0.8))
-            
-            # Salvar gráfico ajustado
-            nome_saida = f"{os.path.splitext(nome_arquivo)[0]}_ajuste.png"
-            caminho_saida = os.path.join(diretorio_destino, nome_saida)
-            plt.savefig(caminho_saida, dpi=300, bbox_inches='tight')
-            plt.close()
-            print(f"Gráfico com ajuste salvo: {caminho_saida}")
-            
-            # Salvar parâmetros do ajuste em arquivo
-            nome_relatorio = f"{os.path.splitext(nome_arquivo)[0]}_parametros.txt"
-            caminho_relatorio = os.path.join(diretorio_destino, nome_relatorio)
-            with open(caminho_relatorio, 'w') as f:
-                f.write(resultado.fit_report())
-            print(f"Relatório de ajuste salvo: {caminho_relatorio}")
+    espectros = _ler_espectros_impedancia(diretorio_origem)
+    espectros = _plotar_brutos_impedancia(espectros, diretorio_destino, renderizador)
+    if metodo_ajuste == 'global':
+        _ajuste_global_impedancia(espectros, diretorio_destino, renderizador, metricas, diretorio_origem)
+        return
+    ajustes = _ajustar_lotes_impedancia(espectros, metodo_ajuste, tamanho_lote, cache, metricas)
 
-        except Exception as e:
-            print(f"ERRO ao processar {nome_arquivo}: {str(e)}")
-        finally:
-            # Limpeza do arquivo temporário
-            if os.path.exists(temp_path):
-                try:
-                    os.remove(temp_path)
-                except Exception as e:
-                    print(f"AVISO: Não foi possível remover arquivo temporário {temp_path}: {str(e)}")
+    # Gráficos e relatórios de cada ajuste, à medida que ficam prontos
+    for nome, x_fit, y_fit, resultado, k in ajustes:
+        valores = _relatar_ajuste_impedancia(nome, x_fit, y_fit, resultado, k, diretorio_destino, renderizador)
+        if valores is not None:
+            lista_Hr.append(valores[0])
+            lista_dH.append(valores[1])
+            nomes_arquivos.append(nome)
 
     # Plot dos resultados após processar todos os arquivos
     if lista_Hr and lista_dH:
-        # Criar array de frequências correspondente ao número de amostras
-        num_amostras = len(lista_Hr)
-        frequencias = np.linspace(1001, 1001 + (num_amostras-1)*10, num_amostras)
-        frequencias_ghz = np.array(frequencias) / 1000
-        
-        print(f"\nNúmero de amostras: {num_amostras}")
-        print(f"Faixa de frequências ajustada: {frequencias[0]} a {frequencias[-1]} MHz")
-
-        # --- AJUSTE PARA FREQUÊNCIA DE RESSONÂNCIA ---
-        modelo_freq = lmfit.Model(frequencia_de_ressonancia)
-        params_freq = modelo_freq.make_params(Hk=100, Meff=1000)
-        params_freq['Hk'].min = 0
-        params_freq['Meff'].min = 0
-        
-        try:
-            # Ajuste invertido (Hr vs frequência)
-            resultado_freq = modelo_freq.fit(frequencias_ghz, params_freq, x=np.array(lista_Hr))
-            
-            # Gráfico para Hr vs Frequência com ajuste
-            plt.figure(figsize=(12, 6))
-            plt.plot(lista_Hr, frequencias_ghz, 'bo', markersize=6, label='Dados experimentais')
-            
-            # Curva ajustada
-            x_fit = np.linspace(min(lista_Hr), max(lista_Hr), 100)
-            plt.plot(x_fit, modelo_freq.eval(resultado_freq.params, x=x_fit), 
-                    'r-', label='Ajuste teórico')
-            
-            plt.xlabel('Campo de Ressonância (Oe)', fontsize=12)
-            plt.ylabel('Frequência (GHz)', fontsize=12)
-            plt.title('Frequência de Ressonância vs Campo', fontsize=14)
-            
-            # Adicionar parâmetros do ajuste
-            texto_ajuste = (
-                f"Hk = {resultado_freq.params['Hk'].value:.2f} ± {resultado_freq.params['Hk'].stderr:.2f} Oe\n"
-                f"Meff = {resultado_freq.params['Meff'].value:.2f} ± {resultado_freq.params['Meff'].stderr:.2f} Oe"
-            )
-            plt.text(0.02, 0.98, texto_ajuste, transform=plt.gca().transAxes,
-                    verticalalignment='top', bbox=dict(facecolor='white', alpha=0.8))
-            
-            plt.grid(True, alpha=0.3)
-            plt.legend()
-            plt.tight_layout()
-            
-            caminho_saida_freq = os.path.join(diretorio_destino, 'frequencia_ressonancia_ajuste.png')
-            plt.savefig(caminho_saida_freq, dpi=300, bbox_inches='tight')
-            plt.close()
-            print(f"Gráfico Frequência de Ressonância salvo: {caminho_saida_freq}")
-            
-            # Salvar parâmetros do ajuste
-            with open(os.path.join(diretorio_destino, 'parametros_frequencia.txt'), 'w') as f:
-                f.write(resultado_freq.fit_report())
-            
-        except Exception as e:
-            print(f"ERRO no ajuste da frequência de ressonância: {str(e)}")
-        
-        # --- AJUSTE PARA LARGURA DE LINHA ---
-        def largura_linha_model(x, dho, alfa):
-            return dho + (alfa * x)  # x já está em GHz, então alfa = α/γ
-        
-        modelo_largura = lmfit.Model(largura_linha_model)
-        params_largura = modelo_largura.make_params(
-            dho=np.mean(lista_dH)/2,  # Valor inicial mais seguro
-            alfa=0.1
-        )
-        params_largura['dho'].min = 0
-        params_largura['alfa'].min = 0
-        
-        try:
-            resultado_largura = modelo_largura.fit(lista_dH, params_largura, x=frequencias_ghz)
-            
-            # Verifica se o ajuste foi bem-sucedido
-            if resultado_largura is not None:
-                # Gráfico para dH vs Frequência com ajuste
-                plt.figure(figsize=(12, 6))
-                plt.plot(frequencias_ghz, lista_dH, 'ro', markersize=6, label='Dados experimentais')
-                
-                # Curva ajustada
-                x_fit = np.linspace(min(frequencias_ghz), max(frequencias_ghz), 100)
-                y_fit = modelo_largura.eval(resultado_largura.params, x=x_fit)
-                plt.plot(x_fit, y_fit, 'b-', 
-                        label=f'Ajuste: ΔH = {resultado_largura.params["dho"].value:.2f} + {resultado_largura.params["alfa"].value:.4f}·f')
-                
-                plt.xlabel('Frequência (GHz)', fontsize=12)
-                plt.ylabel('Largura de Linha (Oe)', fontsize=12)
-                plt.title('Largura de Linha vs Frequência', fontsize=14)
-                
-                # Adicionar parâmetros do ajuste (com verificação de erros)
-                texto_ajuste = []
-                if resultado_largura.params['dho'].stderr is not None:
-                    texto_ajuste.append(f"ΔH₀ = {resultado_largura.params['dho'].value:.2f} ± {resultado_largura.params['dho'].stderr:.2f} Oe")
-                else:
-                    texto_ajuste.append(f"ΔH₀ = {resultado_largura.params['dho'].value:.2f} Oe (erro não disponível)")
-                
-                if resultado_largura.params['alfa'].stderr is not None:
-                    texto_ajuste.append(f"α/γ = {resultado_largura.params['alfa'].value:.4f} ± {resultado_largura.params['alfa'].stderr:.4f}")
-                else:
-                    texto_ajuste.append(f"α/γ = {resultado_largura.params['alfa'].value:.4f} (erro não disponível)")
-                
-                texto_ajuste.append(f"α = {resultado_largura.params['alfa'].value * gamma:.4f} (α = (α/γ)×γ)")
-                
-                plt.text(0.02, 0.98, "\n".join(texto_ajuste), transform=plt.gca().transAxes,
-                        verticalalignment='top', bbox=dict(facecolor='white', alpha=0.8))
-                
-                plt.grid(True, alpha=0.3)
-                plt.legend()
-                plt.tight_layout()
-                
-                caminho_saida_largura = os.path.join(diretorio_destino, 'largura_linha_ajuste.png')
-                plt.savefig(caminho_saida_largura, dpi=300, bbox_inches='tight')
-                plt.close()
-                print(f"Gráfico Largura de Linha salvo: {caminho_saida_largura}")
-                
-                # Salvar parâmetros do ajuste
-                with open(os.path.join(diretorio_destino, 'parametros_largura.txt'), 'w') as f:
-                    f.write(resultado_largura.fit_report())
-            else:
-                print("AVISO: O ajuste da largura de linha retornou None")
-                
-        except Exception as e:
-            print(f"ERRO no ajuste da largura de linha: {str(e)}")
-            # Plot dos dados sem ajuste
-            plt.figure(figsize=(12, 6))
-            plt.plot(frequencias_ghz, lista_dH, 'ro', markersize=6, label='Dados experimentais')
-            plt.xlabel('Frequência (GHz)', fontsize=12)
-            plt.ylabel('Largura de Linha (Oe)', fontsize=12)
-            plt.title('Largura de Linha vs Frequência (ajuste falhou)', fontsize=14)
-            plt.grid(True, alpha=0.3)
-            plt.legend()
-            plt.tight_layout()
-            
-            caminho_saida_largura = os.path.join(diretorio_destino, 'largura_linha_sem_ajuste.png')
-            plt.savefig(caminho_saida_largura, dpi=300, bbox_inches='tight')
-            plt.close()
-            print(f"Gráfico sem ajuste salvo: {caminho_saida_largura}")
-            
-            # Salvar parâmetros do ajuste
-            with open(os.path.join(diretorio_destino, 'parametros_largura.txt'), 'w') as f:
-                f.write(resultado_largura.fit_report())
-            
-        except Exception as e:
-            print(f"ERRO no ajuste da largura de linha: {str(e)}")
+        _ajustes_finais_impedancia(lista_Hr, lista_dH, diretorio_destino, renderizador, metricas, diretorio_origem,
+                                   n_bootstrap, n_processos)
 
 ###############################################################
 ###############################################################
 ###############################################################
 
-def VSM(diretorio_origem, diretorio_caminho, diretorio_destino):
+def _ciclo_vsm(caminho_origem, diretorio_caminho, diretorio_destino, renderizador):
+    """
+    Lê, normaliza e plota um ciclo de histerese (um arquivo de VSM).
+
+    Retorna:
+        tuple ou None: (H, M normalizado), ou None se o arquivo não tem dados
+    """
+    nome_da_amostra = os.path.basename(caminho_origem)
+
+    # Mesmo nome usado nos gráficos quando havia o diretório intermediário
+    nome_do_arquivo = f"arquivo_de_modificação_{nome_da_amostra}"
+
+    colunas = leitura.carregar_colunas_apos(caminho_origem, "(emu)", n_colunas=2)
+    if colunas is None:
+        print(f"AVISO: '(emu)' não encontrado no arquivo {nome_da_amostra}")
+        return None
+    colA, colB = colunas
+
+    # Cópia opcional sem o cabeçalho
+    if diretorio_caminho:
+        with open(caminho_origem, "r") as arquivo_origem:
+            conteudo = arquivo_origem.read()
+        with open(os.path.join(diretorio_caminho, nome_do_arquivo), "w") as arquivo_destino:
+            arquivo_destino.write(conteudo[conteudo.find("(emu)")+5:])
+
+    # Verifica se há dados válidos
+    if len(colB) == 0:
+        print(f"AVISO: Nenhum dado válido no arquivo {nome_do_arquivo}")
+        return None
+
+    # Normaliza os dados
+    nao_sei_oq_vai_sair = histerese.normalizar(colB)
+
+    # Plota e salva o gráfico
+    nome_do_grafico = os.path.join(diretorio_destino, f"grafico_{nome_do_arquivo}.png")
+    g = renderizacao.Grafico(nome_do_grafico, modelo='vsm_ciclo')
+    g.plot(colA, nao_sei_oq_vai_sair)
+    g.xlabel("Field (Oe)")
+    g.ylabel("ARB units")
+    g.text(
+        x=0.98,  # Posição x (98% da largura do gráfico, próximo à borda direita)
+        y=0.02,  # Posição y (2% da altura do gráfico, próximo à borda inferior)
+        s=nome_do_arquivo,  # Texto
+        fontsize=12,  # Tamanho da fonte
+        color="black",  # Cor do texto
+        transform=renderizacao.EIXOS,  # Usar coordenadas relativas ao gráfico
+        horizontalalignment="right",  # Alinhamento horizontal (direita)
+        verticalalignment="bottom"  # Alinhamento vertical (inferior)
+    )
+    g.grid(True)
+    renderizador.enviar(g)
+    return colA, nao_sei_oq_vai_sair
+
+
+def _graficos_angulares_vsm(Valorderemanencia, Valordecoercitividade, diretorio_destino, renderizador):
+    """Remanência e coercitividade contra o ângulo (um ciclo por ângulo, de 0 a 180°)"""
+    # Ângulos igualmente espaçados de 0 a 180°, um por ciclo
+    vetor = np.linspace(0, 180, len(Valorderemanencia))
+    g = renderizacao.Grafico(os.path.join(diretorio_destino, "Remanencia.png"))
+    g.plot(vetor,Valorderemanencia)
+    g.xlabel("Angulos")
+    g.ylabel("ARB units")
+    g.grid(True)
+    renderizador.enviar(g)
+
+    g = renderizacao.Grafico(os.path.join(diretorio_destino, "Coercitividade.png"))
+    g.plot(vetor,Valordecoercitividade)
+    g.xlabel("Angulos")
+    g.ylabel("ARB units")
+    g.grid(True)
+    renderizador.enviar(g)
+
+
+def VSM(diretorio_origem, diretorio_caminho, diretorio_destino, renderizador=None, progresso=None):
+    """
+    Normaliza os ciclos de histerese, plota cada um e a remanência/coercitividade
+    de todos os arquivos.
+
+    O cabeçalho (até "(emu)") é descartado e o bloco numérico é lido direto do
+    arquivo mapeado em memória, em uma passada.
+
+    Args:
+        diretorio_origem (str): Arquivos de medida
+        diretorio_caminho (str ou None): Se informado, recebe uma cópia de cada
+            arquivo sem o cabeçalho (arquivo_de_modificação_*), como antes; None dispensa
+        diretorio_destino (str): Onde salvar os gráficos
+        renderizador (renderizacao.Renderizador, opcional): Para onde vão os gráficos
+        progresso (callable, opcional): Chamado como progresso(n_feitos, n_total, nome)
+            antes de cada arquivo e uma vez no fim; uma exceção levantada nele
+            interrompe a análise
+    """
     # Verifica se o diretório de destino existe; se não, cria
     if not os.path.exists(diretorio_destino):
         os.makedirs(diretorio_destino)
+    if diretorio_caminho:
+        os.makedirs(diretorio_caminho, exist_ok=True)
+    renderizador = renderizador or renderizacao.padrao()
 
-    # Lista os arquivos no diretório de origem
-    arquivos = os.listdir(diretorio_origem)
-    Valorderemanencia = []
-    Valordecoercitividade = []
+    # Lista os arquivos no diretório de origem, em ordem de nome (a ordem dos ângulos)
+    arquivos = sorted(os.listdir(diretorio_origem))
+    ciclos_H = []
+    ciclos_M = []
 
     # Processa cada arquivo no diretório de origem
-    for nome_da_amostra in arquivos:
+    for n_feitos, nome_da_amostra in enumerate(arquivos):
+        if progresso is not None:
+            progresso(n_feitos, len(arquivos), nome_da_amostra)
         caminho_origem = os.path.join(diretorio_origem, nome_da_amostra)
         
         if os.path.isfile(caminho_origem):
-            with open(caminho_origem, "r") as arquivo_origem:
-                conteudo = arquivo_origem.read()
+            ciclo = _ciclo_vsm(caminho_origem, diretorio_caminho, diretorio_destino, renderizador)
+            if ciclo is not None:
+                ciclos_H.append(ciclo[0])
+                ciclos_M.append(ciclo[1])
 
-                # Modifica o conteúdo
-                indice = conteudo.find("(emu)")
-                if indice != -1:
-                    conteudo = conteudo[indice+5:]
-                else:
-                    print(f"AVISO: '(emu)' não encontrado no arquivo {nome_da_amostra}")
-                    continue  # Pula para o próximo arquivo
-
-                # Salva o conteúdo modificado em um novo arquivo
-                novo_nome = f"arquivo_de_modificação_{nome_da_amostra}"
-                caminho_do_meio = os.path.join(diretorio_caminho, novo_nome)
-                with open(caminho_do_meio, "w") as arquivo_destino:
-                    arquivo_destino.write(conteudo)
-
-    # Processa os arquivos modificados
-    arquivos_modificados = os.listdir(diretorio_caminho)
-    for nome_do_arquivo in arquivos_modificados:
-        colunaA = []
-        colunaB = []
-        caminho_do_meio = os.path.join(diretorio_caminho, nome_do_arquivo)
-
-        if os.path.isfile(caminho_do_meio):
-            with open(caminho_do_meio, "r") as arquivo:
-                linhas = arquivo.readlines()
-
-                for linha in linhas:
-                    elementos = linha.split()
-                    if len(elementos) >= 2:
-                        colunaA.append(elementos[0])
-                        colunaB.append(elementos[1])
-
-                # Converte os dados para float
-                colA = list(map(float, colunaA))
-                colB = list(map(float, colunaB))
-
-                # Verifica se há dados válidos
-                if len(colB) == 0:
-                    print(f"AVISO: Nenhum dado válido no arquivo {nome_do_arquivo}")
-                    continue
+    if progresso is not None:
+        progresso(len(arquivos), len(arquivos), None)
 
-                # Normaliza os dados
-                nao_sei_oq_vai_sair = [(2*y - (max(colB) + min(colB))) / (max(colB) - min(colB)) for y in colB]
-                Valorderemanencia.append(remanencia(colA,nao_sei_oq_vai_sair))
-                Valordecoercitividade.append(coercitividade(colA,nao_sei_oq_vai_sair))
-
-                # Plota e salva o gráfico
-                plt.plot(colA, nao_sei_oq_vai_sair)
-                plt.xlabel("Field (Oe)")
-                plt.ylabel("ARB units")
-                plt.text(
-                    x=0.98,  # Posição x (98% da largura do gráfico, próximo à borda direita)
-                    y=0.02,  # Posição y (2% da altura do gráfico, próximo à borda inferior)
-                    s=nome_do_arquivo,  # Texto
-                    fontsize=12,  # Tamanho da fonte
-                    color="black",  # Cor do texto
-                    transform=plt.gca().transAxes,  # Usar coordenadas relativas ao gráfico
-                    horizontalalignment="right",  # Alinhamento horizontal (direita)
-                    verticalalignment="bottom"  # Alinhamento vertical (inferior)
-                )
-                plt.grid(True)
-                nome_do_grafico = os.path.join(diretorio_destino, f"grafico_{nome_do_arquivo}.png")
-                plt.savefig(nome_do_grafico)
-                plt.close()
-
-    vetor = np.linspace(0, 180, 19)
-    plt.plot(vetor,Valorderemanencia)
-    plt.xlabel("Angulos")
-    plt.ylabel("ARB units")
-    plt.grid(True)
-    nome_do_grafico = os.path.join(diretorio_destino, f"Remanencia.png")
-    plt.savefig(nome_do_grafico)
-    plt.close()
-
-    plt.plot(vetor,Valordecoercitividade)
-    plt.xlabel("Angulos")
-    plt.ylabel("ARB units")
-    plt.grid(True)
-    nome_do_grafico = os.path.join(diretorio_destino, f"Coercitividade.png")
-    plt.savefig(nome_do_grafico)
-    plt.close()
+    # Remanência e coercitividade de todos os ciclos de uma vez
+    metricas = histerese.analisar_ciclos(ciclos_H, ciclos_M)
+    _graficos_angulares_vsm(metricas['Mr'], metricas['Hc'], diretorio_destino, renderizador)
 
     return "Tudo feito"
 
@@ -683,184 +1117,232 @@ def VSM(diretorio_origem, diretorio_caminho, diretorio_destino):
 ###############################################################
 ###############################################################
 
-def Resistencia(arquivos_no_diretorio, Diretorio_inicial):
+def Resistencia(arquivos_no_diretorio, Diretorio_inicial, renderizador=None, diretorio_destino=None):
+    renderizador = renderizador or renderizacao.padrao()
+    if diretorio_destino is None:
+        diretorio_destino = 'c:\\Users\\Gabriel\\Desktop\\Backup jamyk\\Py(t)_Jamykson\\teste'
+    else:
+        os.makedirs(diretorio_destino, exist_ok=True)
 
     arquivos_no_diretorio = os.listdir(Diretorio_inicial)
     
     for indice, nome_do_arquivo in enumerate(arquivos_no_diretorio):
         #Neste ponto eu tenho o nome dos arquivos no estado bruto, na variavel nome_dos_arquivos
         #preciso mudar o nome dele para nome_novo.txt
-        ColunaA, ColunaB = [], []
-        
         caminho_a_ser_seguido = os.path.join(Diretorio_inicial,nome_do_arquivo)
 
         if os.path.isfile(caminho_a_ser_seguido):
-            with open(caminho_a_ser_seguido, "r") as arquivo:
-                # Ler todas as linhas do arquivo
-                linhas = arquivo.readlines()
-                
-                # Iterar sobre cada linha do arquivo
-                for linha in linhas:
-                    # Dividir a linha em elementos usando o separador apropriado
-                    elementos = linha.split()  # Supondo que os elementos estejam separados por espaço em branco
-
-                    # Verificar se há pelo menos dois elementos na linha
-                    if len(elementos) >= 2:
-                        # Adicionar os elementos correspondentes a cada coluna
-                        ColunaA.append(elementos[0])
-                        ColunaB.append(elementos[1])
-                    
-
-                colA = list(map(float, ColunaA))
-                colB = list(map(float, ColunaB))
+            # Duas primeiras colunas de cada linha (auxiliar binário nas leituras seguintes)
+            colA, colB = leitura.carregar_colunas(caminho_a_ser_seguido, n_colunas=2)
             nome_grafico = f"{nome_do_arquivo}_{indice}.png"
 
-            plt.plot(colA,colB)
-            plt.xlabel("H(Oe)")
-            plt.ylabel("dR")
-            plt.grid(True)
-            plt.savefig(f'c:\\Users\\Gabriel\\Desktop\\Backup jamyk\\Py(t)_Jamykson\\teste\\{nome_grafico}')
-            plt.close()
+            g = renderizacao.Grafico(os.path.join(diretorio_destino, nome_grafico), modelo='resistencia')
+            g.plot(colA,colB)
+            g.xlabel("H(Oe)")
+            g.ylabel("dR")
+            g.grid(True)
+            renderizador.enviar(g)
 
 ###############################################################
 ###############################################################
 ###############################################################
 
-def DRX(arquivo):
-    # Comprimento de onda da radiação X (exemplo para Cu-Kα)
-    l = 1.54056  
+def DRX(arquivo, picos=None, output_dir=None, renderizador=None, manual=False, deteccao=None,
+        comprimento_onda=kiessig.CU_KALFA, tempo=kiessig.TEMPO_PADRAO):
+    """
+    Espessura do filme a partir dos picos das franjas de DRX (ajuste linear de qf
+    pelo índice do pico).
 
-    # Lendo o arquivo
-    J = pd.read_table(arquivo, names=['K', 'L'], sep=',')
-    
-    # Extraindo os dados
-    x = J['K']
-    y = J['L']
-
-    # Plotando o gráfico para seleção manual de picos
-    plt.figure(figsize=(8, 5))
-    plt.plot(x, y, label="Sinal", color='red')
-    plt.xlabel("Ângulo (°)")
-    plt.ylabel("Intensidade")
-    plt.title("Clique nos picos desejados e pressione Enter")
-    pontos_selecionados = plt.ginput(n=-1, timeout=0)
-    plt.close()
-
-    # Extraindo os valores de ângulo selecionados
-    angulos = np.array([p[0] for p in pontos_selecionados])
+    Args:
+        arquivo (str): Arquivo com duas colunas (2θ, intensidade) separadas por vírgula
+        picos (list, opcional): Ângulos 2θ (graus) dos picos; se omitido, os picos
+            são detectados automaticamente (deteccao_picos.detectar_picos)
+        output_dir (str, opcional): Onde salvar os gráficos e resultados_drx.json;
+            sem ele o ajuste é mostrado na tela
+        renderizador (renderizacao.Renderizador, opcional): Para onde vão os
+            gráficos quando há output_dir
+        manual (bool): True escolhe os picos clicando no gráfico (plt.ginput),
+            como antes da detecção automática
+        deteccao (dict, opcional): Opções de deteccao_picos.detectar_picos
+            (janela, proeminencia, largura, distancia, log, max_picos)
+        comprimento_onda (float): λ da radiação, em nm (padrão: Cu-Kα)
+        tempo (float): Tempo de deposição, em s, para a taxa de crescimento
+
+    Returns:
+        dict: angulos, qf, espessura (nm), taxa (nm/s), seus erros (None com
+        só dois picos), espessura_fft (estimativa independente pela FFT das
+        franjas) e origem dos picos ('informados', 'manual' ou 'automatico')
+    """
+    # Lendo o arquivo (duas colunas separadas por vírgula; auxiliar binário nas leituras seguintes)
+    x, y = leitura.carregar_colunas(arquivo, n_colunas=2, virgula=' ')
+
+    if picos is not None:
+        angulos = np.sort(np.asarray(picos, dtype=float))
+        origem = 'informados'
+    elif manual:
+        # Plotando o gráfico para seleção manual de picos
+        plt.figure(figsize=(8, 5))
+        plt.plot(x, y, label="Sinal", color='red')
+        plt.xlabel("Ângulo (°)")
+        plt.ylabel("Intensidade")
+        plt.title("Clique nos picos desejados e pressione Enter")
+        pontos_selecionados = plt.ginput(n=-1, timeout=0)
+        plt.close()
+
+        # Extraindo os valores de ângulo selecionados
+        angulos = np.sort([p[0] for p in pontos_selecionados])
+        origem = 'manual'
+    else:
+        angulos = deteccao_picos.detectar_picos(x, y, **(deteccao or {}))['posicoes']
+        origem = 'automatico'
     print("Ângulos selecionados:", angulos)
+    if len(angulos) < 2:
+        raise ValueError("São necessários pelo menos dois picos para o ajuste")
 
-    # Convertendo ângulos para qf (com correção na equação)
-    qf = (4 * np.pi * np.sin(np.radians(angulos / 2))) / l
-
-    # Criando índices para ajuste
-    indices = np.arange(len(angulos))
-
-    # Ajuste de curva
-    params, _ = spy.curve_fit(linear_func, indices, qf)
-    a, b = params
+    # qf de cada pico e ajuste linear contra o índice, com erros da covariância
+    qf = kiessig.vetor_espalhamento(angulos, comprimento_onda)
+    ajuste = kiessig.estimar_espessura(angulos, comprimento_onda, tempo)
+    a, b = ajuste['inclinacao'], ajuste['intercepto']
+    espessura, taxa = ajuste['espessura'], ajuste['taxa']
 
-    # Cálculo da espessura e taxa de crescimento
-    espessura = 2 * np.pi / a
-    tempo = 300  # Tempo fixo (em segundos)
-    taxa = espessura / tempo
+    # Conferência independente dos picos: frequência das franjas na FFT
+    espessura_fft = float(kiessig.espessura_fft([(x, y)], comprimento_onda)['espessura'][0])
 
-    print(f"Espessura: {espessura:.4f} nm")
-    print(f"Taxa de crescimento: {taxa:.4f} nm/s")
+    print(f"Espessura: {espessura:.4f} ± {ajuste['erro_espessura']:.4f} nm (FFT: {espessura_fft:.4f} nm)")
+    print(f"Taxa de crescimento: {taxa:.4f} ± {ajuste['erro_taxa']:.4f} nm/s")
 
-    # Plotando os resultados do ajuste
+    # Plotando os resultados do ajuste (qf contra o índice de cada pico)
+    indices = np.arange(len(angulos))
     x_fit = np.linspace(0, len(angulos) - 1, 100)
     y_fit = linear_func(x_fit, a, b)
 
-    plt.figure(figsize=(8, 5))
-    plt.scatter(indices, qf, color='red', label='Pontos Selecionados')
-    plt.plot(x_fit, y_fit, label='Ajuste Linear', linestyle='--', color='blue')
-    plt.xlabel("Índice")
-    plt.ylabel("qf (1/nm)")
-    plt.title("Ajuste Linear de qf")
-    plt.legend()
-    plt.grid()
-    plt.show()
-    return "Tudo Pronto"
+    finito = lambda valor: float(valor) if np.isfinite(valor) else None
+    resultado = {
+        'angulos': angulos.tolist(),
+        'qf': qf.tolist(),
+        'espessura': espessura,
+        'erro_espessura': finito(ajuste['erro_espessura']),
+        'taxa': taxa,
+        'erro_taxa': finito(ajuste['erro_taxa']),
+        'espessura_fft': finito(espessura_fft),
+        'comprimento_onda': comprimento_onda,
+        'tempo': tempo,
+        'origem': origem
+    }
+
+    if output_dir is None:
+        plt.figure(figsize=(8, 5))
+        plt.scatter(indices, qf, color='red', label='Pontos Selecionados')
+        plt.plot(x_fit, y_fit, label='Ajuste Linear', linestyle='--', color='blue')
+        plt.xlabel("Índice")
+        plt.ylabel("qf (1/nm)")
+        plt.title("Ajuste Linear de qf")
+        plt.legend()
+        plt.grid()
+        plt.show()
+        return resultado
+
+    os.makedirs(output_dir, exist_ok=True)
+    renderizador = renderizador or renderizacao.padrao()
+
+    g = renderizacao.Grafico(os.path.join(output_dir, "sinal_drx.png"), figsize=(8, 5))
+    g.plot(x, y, label="Sinal", color='red')
+    for angulo in angulos:
+        g.axvline(angulo, color='gray', linestyle=':')
+    g.xlabel("Ângulo (°)")
+    g.ylabel("Intensidade")
+    g.title("Picos usados no ajuste")
+    renderizador.enviar(g)
+
+    g = renderizacao.Grafico(os.path.join(output_dir, "ajuste_qf.png"), figsize=(8, 5))
+    g.scatter(indices, qf, color='red', label='Pontos Selecionados')
+    g.plot(x_fit, y_fit, label='Ajuste Linear', linestyle='--', color='blue')
+    g.xlabel("Índice")
+    g.ylabel("qf (1/nm)")
+    g.title("Ajuste Linear de qf")
+    g.legend()
+    g.grid()
+    renderizador.enviar(g)
+
+    with open(os.path.join(output_dir, 'resultados_drx.json'), 'w') as f:
+        json.dump(resultado, f, indent=2)
+    return resultado
 
 ###############################################################
 ###############################################################
 ###############################################################
 
-def Eletroima(Diretorio_inicial, Diretorio_final):
-    arquivos_no_diretorio = os.listdir(Diretorio_inicial)
+def _grafico_eletroima(caminho_arquivo, Diretorio_final, renderizador):
+    """
+    Lê um arquivo do eletroímã, centra a tensão em zero e plota o gráfico individual.
+
+    Retorna:
+        tuple ou None: (H, V, nome do arquivo) para o gráfico conjunto
+    """
+    nome_do_arquivo = os.path.basename(caminho_arquivo)
+
+    # Vírgula decimal aceita; auxiliar binário nas leituras seguintes
+    colA, colB = leitura.carregar_colunas(caminho_arquivo, n_colunas=2)
+    if len(colA) == 0:
+        print(f"Erro ao converter os dados do arquivo: {nome_do_arquivo}")
+        return None
+    colB = colB - np.mean(colB)
+
+    # Plotar gráfico individual
+    Caminho_de_saida = os.path.join(Diretorio_final, f"grafico_{nome_do_arquivo}.png")
+    g = renderizacao.Grafico(Caminho_de_saida, dpi=300, bbox_inches='tight', modelo='eletroima_individual')
+    g.plot(colA, colB)
+    g.xlabel("H(Oe)")
+    g.ylabel("V(mV)")
+    g.title("Gráfico individual")
+    g.grid(True)
+
+    # Adicionar nome do arquivo no canto superior direito
+    g.text(
+        x=max(colA),
+        y=max(colB),
+        s=nome_do_arquivo,
+        fontsize=9,
+        ha='right',
+        va='top',
+        bbox=dict(facecolor='white', alpha=0.7, edgecolor='gray')
+    )
+
+    # Salvar gráfico individual
+    renderizador.enviar(g)
+    return colA, colB, nome_do_arquivo
+
+
+def Eletroima(Diretorio_inicial, Diretorio_final, renderizador=None):
+    arquivos_no_diretorio = sorted(os.listdir(Diretorio_inicial))
 
     # Criar diretório de saída se não existir
     os.makedirs(Diretorio_final, exist_ok=True)
+    renderizador = renderizador or renderizacao.padrao()
 
     # Lista para armazenar os dados de todos os arquivos
     todos_os_dados = []
 
     for indice, nome_do_arquivo in enumerate(arquivos_no_diretorio):
         caminho_arquivo = os.path.join(Diretorio_inicial, nome_do_arquivo)
-
-        with open(caminho_arquivo, "r", errors="ignore") as f:
-            linhas = f.readlines()
-
-        ColunaA, ColunaB = [], []
-
-        for linha in linhas:
-            elementos = linha.split()
-            if len(elementos) >= 2:
-                ColunaA.append(elementos[0])
-                ColunaB.append(elementos[1])
-
-        # Trocar vírgulas por pontos
-        ColunaA = trocar_virgula_por_ponto(ColunaA)
-        ColunaB = trocar_virgula_por_ponto(ColunaB)
-
-        try:
-            colA = list(map(float, ColunaA))
-            colB = list(map(float, ColunaB))
-            media = np.mean(colB)
-            colB = [y - media for y in colB]
-
-
-        except ValueError:
-            print(f"Erro ao converter os dados do arquivo: {nome_do_arquivo}")
-            continue
-
-        # Guardar os dados para o gráfico conjunto
-        todos_os_dados.append((colA, colB, nome_do_arquivo))
-
-        # Plotar gráfico individual
-        plt.figure()
-        plt.plot(colA, colB)
-        plt.xlabel("H(Oe)")
-        plt.ylabel("V(mV)")
-        plt.title("Gráfico individual")
-        plt.grid(True)
-
-        # Adicionar nome do arquivo no canto superior direito
-        plt.text(
-            x=max(colA),
-            y=max(colB),
-            s=nome_do_arquivo,
-            fontsize=9,
-            ha='right',
-            va='top',
-            bbox=dict(facecolor='white', alpha=0.7, edgecolor='gray')
-        )
-
-        # Salvar gráfico individual
-        Caminho_de_saida = os.path.join(Diretorio_final, f"grafico_{nome_do_arquivo}.png")
-        plt.savefig(Caminho_de_saida, dpi=300, bbox_inches='tight')
-        print(f"Gráfico salvo: {Caminho_de_saida}")
+        dados = _grafico_eletroima(caminho_arquivo, Diretorio_final, renderizador)
+        if dados is not None:
+            # Guardar os dados para o gráfico conjunto
+            todos_os_dados.append(dados)
 
     # Plotar todos os gráficos juntos
-    plotar_todos_juntos(todos_os_dados,Diretorio_final)
+    plotar_todos_juntos(todos_os_dados,Diretorio_final,renderizador)
 
 ###############################################################
 ###############################################################
 ###############################################################
 
-def FMR(caminho_arquivo, diretorio_destino):
-    
+def FMR(caminho_arquivo, diretorio_destino, n_processos=None, renderizador=None, n_picos=2, forma='lorentz'):
+    """
+    Análise FMR interativa: o primeiro ângulo é ajustado com parâmetros
+    pedidos ao usuário (N picos de forma `forma`, ver modelo_fmr.ModeloPicos)
+    e os demais automaticamente, em paralelo.
+    """
     if not os.path.exists(caminho_arquivo):
         print(f"Erro: Arquivo não encontrado em {caminho_arquivo}")
         return
@@ -868,6 +1350,7 @@ def FMR(caminho_arquivo, diretorio_destino):
     try:
         # Criar diretório de destino se não existir
         os.makedirs(diretorio_destino, exist_ok=True)
+        renderizador = renderizador or renderizacao.padrao()
         
         ajustador = AjustadorMultiplosAngulos(caminho_arquivo)
         
@@ -879,15 +1362,6 @@ def FMR(caminho_arquivo, diretorio_destino):
         angulos_ordenados = np.sort(ajustador.angulos_disponiveis)
         parametros_anteriores = None
         
-        # Listas para armazenar resultados de ambos os picos
-        angulos_plot = []
-        Hr1_plot = []
-        dH1_plot = []
-        Hr2_plot = []
-        dH2_plot = []
-        amplitude1_plot = []  # Para o parâmetro c
-        amplitude2_plot = []  # Para o parâmetro d
-        
          # Loop especial para o primeiro ângulo (0°)
         primeiro_angulo = angulos_ordenados[0]
         while True:
@@ -905,7 +1379,7 @@ def FMR(caminho_arquivo, diretorio_destino):
                 if opcao == '1':
                     parametros = parametros_anteriores
                 elif opcao == '2':
-                    parametros = obter_parametros_iniciais(primeiro_angulo)
+                    parametros = obter_parametros_iniciais(primeiro_angulo, n_picos, forma)
                 elif opcao == '3':
                     break
                 elif opcao == '4':
@@ -914,7 +1388,7 @@ def FMR(caminho_arquivo, diretorio_destino):
                     print("Opção inválida, tente novamente")
                     continue
             else:
-                parametros = obter_parametros_iniciais(primeiro_angulo)
+                parametros = obter_parametros_iniciais(primeiro_angulo, n_picos, forma)
             
             # Realiza o ajuste
             resultado = ajustador.ajustar_angulo(primeiro_angulo, parametros)
@@ -924,13 +1398,6 @@ def FMR(caminho_arquivo, diretorio_destino):
             # Armazena parâmetros
             parametros_anteriores = ajustador.resultados[primeiro_angulo]['parametros']
             
-            # Adiciona aos dados de plotagem
-            angulos_plot.append(primeiro_angulo)
-            Hr1_plot.append(parametros_anteriores['Hr1'])
-            dH1_plot.append(parametros_anteriores['dH1'])
-            Hr2_plot.append(parametros_anteriores['Hr2'])
-            dH2_plot.append(parametros_anteriores['dH2'])
-            
             # Plota os resultados interativamente
             print("\nExibindo gráfico do ajuste (feche para continuar)...")
             fig = ajustador.plotar_angulo(primeiro_angulo, mostrar=True)  # Mostra interativamente
@@ -942,69 +1409,25 @@ def FMR(caminho_arquivo, diretorio_destino):
             plt.close(fig)
             print(f"Gráfico salvo em: {caminho_completo}")            
         
-        # Processa os demais ângulos automaticamente
-        for angulo in angulos_ordenados[1:]:
-            print(f"\n=== Processando ângulo {angulo} (automático) ===")
+        # Processa os demais ângulos automaticamente, em paralelo
+        print(f"\n=== Processando {len(angulos_ordenados) - 1} ângulos restantes (automático) ===")
+        motor = MotorAjusteParalelo(ajustador, n_processos=n_processos)
+        angulos_ajustados, _ = motor.ajustar_todos(parametros_anteriores, angulos_ordenados[1:])
+        
+        for angulo in angulos_ajustados:
+            print(f"\n=== Ângulo {angulo} ===")
             
-            # Usa os parâmetros do ângulo anterior como iniciais
-            resultado = ajustador.ajustar_angulo(angulo, parametros_anteriores)
+            resultado = ajustador.resultados[angulo]['resultado']
             print("\nResultados do ajuste:")
             lmfit.report_fit(resultado.params)
             
-            # Atualiza parâmetros para o próximo ângulo
-            parametros_anteriores = ajustador.resultados[angulo]['parametros']
-            
-            # Adiciona aos dados de plotagem para ambos picos
-            angulos_plot.append(angulo)
-            Hr1_plot.append(parametros_anteriores['Hr1'])
-            dH1_plot.append(parametros_anteriores['dH1'])
-            Hr2_plot.append(parametros_anteriores['Hr2'])
-            dH2_plot.append(parametros_anteriores['dH2'])
-            amplitude1_plot.append(parametros_anteriores['c'])
-            amplitude2_plot.append(parametros_anteriores['d'])
-            
-            # Plota e salva os resultados
-            fig = ajustador.plotar_angulo(angulo, mostrar=False)
+            # Envia o gráfico para a fila de renderização
             nome_arquivo = f"ajuste_angulo_{angulo}.png"
             caminho_completo = os.path.join(diretorio_destino, nome_arquivo)
-            fig.savefig(caminho_completo)
-            plt.close(fig)
-            print(f"Gráfico salvo em: {caminho_completo}")
-        
-        # Plot dos parâmetros em função do ângulo
-        plt.figure(figsize=(15, 10))
+            renderizador.enviar(ajustador.grafico_angulo(angulo, caminho_completo))
         
-        # Subplot para posições dos picos (Hr1 e Hr2)
-        plt.subplot(2, 2, 1)
-        plt.plot(angulos_plot, Hr1_plot, 'bo-', label='Pico 1')
-        plt.plot(angulos_plot, Hr2_plot, 'ro-', label='Pico 2')
-        plt.xlabel('Ângulo (graus)')
-        plt.ylabel('Campo de ressonância (Oe)')
-        plt.title('Variação das posições dos picos com o ângulo')
-        plt.legend()
-        plt.grid(True)
-        
-        # Subplot para larguras dos picos (dH1 e dH2)
-        plt.subplot(2, 2, 2)
-        plt.plot(angulos_plot, dH1_plot, 'bo-', label='Pico 1')
-        plt.plot(angulos_plot, dH2_plot, 'ro-', label='Pico 2')
-        plt.xlabel('Ângulo (graus)')
-        plt.ylabel('Largura do pico (Oe)')
-        plt.title('Variação das larguras dos picos com o ângulo')
-        plt.legend()
-        plt.grid(True)
-        
-        # Subplot para amplitudes dos picos (c e d)
-        plt.subplot(2, 2, 3)
-        plt.plot(angulos_plot, amplitude1_plot, 'bo-', label='Pico 1 (c)')
-        plt.plot(angulos_plot, amplitude2_plot, 'ro-', label='Pico 2 (d)')
-        plt.xlabel('Ângulo (graus)')
-        plt.ylabel('Amplitude do pico')
-        plt.title('Variação das amplitudes dos picos com o ângulo')
-        plt.legend()
-        plt.grid(True)
-        
-        plt.tight_layout()
+        # Plot dos parâmetros de todos os picos em função do ângulo (tabela do ajustador)
+        renderizacao.desenhar(ajustador.grafico_variacao())
         
         # Salva o gráfico de variação dos parâmetros
         nome_arquivo = "variacao_parametros.png"
@@ -1018,3 +1441,203 @@ def FMR(caminho_arquivo, diretorio_destino):
         print(f"\nOcorreu um erro: {str(e)}")
 
     return "Tudo Pronto"
+
+def FMR_automatico(caminho_arquivo, diretorio_destino, parametros_iniciais=None, n_processos=None,
+                   renderizador=None, cache=None, progresso=None, metricas=None, contexto=None, n_picos=None,
+                   forma=None):
+    """
+    Análise FMR completa sem interação: todos os ângulos são ajustados a partir
+    de parametros_iniciais (âncoras em sequência, demais em paralelo), com um
+    gráfico por ângulo, a variação dos parâmetros, a comparação entre ângulos
+    e o relatório resultados_fmr.json.
+
+    Args:
+        caminho_arquivo (str): Arquivo de dados (campo, ângulo, sinal)
+        diretorio_destino (str): Onde salvar gráficos e relatório
+        parametros_iniciais (dict, opcional): Parâmetros iniciais do primeiro
+            ângulo (padrão: dois picos em 1000 e 1200 Oe); o número de picos e a
+            forma saem dos nomes (ver modelo_fmr.ModeloPicos.de_parametros)
+        n_processos (int, opcional): Processos para os ajustes
+        renderizador (renderizacao.Renderizador, opcional): Para onde vão os gráficos
+        cache (cache_ajustes.CacheAjustes, opcional): Reaproveita ajustes já feitos
+        progresso (callable, opcional): Chamado como
+            progresso(angulo, registro, n_concluidos, n_total, caminho, futuro)
+            a cada ângulo ajustado, com o caminho do PNG do ângulo e o Future da
+            renderização (None se ela estiver desativada); uma exceção levantada
+            nele interrompe a análise
+        metricas (metricas.RegistroMetricas, opcional): Recebe as métricas de
+            cada ajuste (ver MotorAjusteParalelo)
+        contexto (dict, opcional): Campos acrescentados a cada registro de
+            métricas (ex.: {'execucao': id da tarefa})
+        n_picos (int, opcional): Número de picos; os que faltarem em
+            parametros_iniciais são completados (ver ModeloPicos.completar)
+        forma (str, opcional): 'lorentz' ou 'dowson'
+
+    Returns:
+        dict: angulos, parametros, graficos_angulo, grafico_variacao,
+        grafico_comparacao, arquivos_gerados, relatorio_path e a tabela de
+        resultados (nomes_parametros, tabela, erros e qui2_reduzido, uma linha
+        por ângulo); os gráficos são renderizados em segundo plano e podem
+        ficar prontos depois do retorno
+    """
+    if not os.path.exists(caminho_arquivo):
+        raise FileNotFoundError(f"Arquivo não encontrado: {caminho_arquivo}")
+
+    os.makedirs(diretorio_destino, exist_ok=True)
+    renderizador = renderizador or renderizacao.padrao()
+
+    ajustador = AjustadorMultiplosAngulos(caminho_arquivo)
+    if ajustador.angulos_disponiveis is None or len(ajustador.angulos_disponiveis) == 0:
+        raise ValueError("Nenhum ângulo encontrado nos dados")
+    angulos_ordenados = np.sort(ajustador.angulos_disponiveis)
+
+    if not parametros_iniciais:
+        parametros_iniciais = {
+            'a': 1, 'b': 0, 'c': 1, 'd': 0.8,
+            'Hr1': 1000, 'dH1': 50,
+            'Hr2': 1200, 'dH2': 50
+        }
+    if n_picos is not None or forma is not None:
+        modelo = modelo_fmr.ModeloPicos.de_parametros(parametros_iniciais)
+        modelo = modelo_fmr.ModeloPicos(n_picos or modelo.n_picos, forma or modelo.forma)
+        parametros_iniciais = modelo.completar(parametros_iniciais)
+
+    def informar_angulo(angulo, registro, n_concluidos, n_total):
+        # O gráfico do ângulo vai para a fila de renderização assim que o ajuste termina
+        caminho = os.path.join(diretorio_destino, f"ajuste_angulo_{angulo}.png")
+        futuro = renderizador.enviar(ajustador.grafico_angulo(angulo, caminho))
+        if progresso is not None:
+            progresso(angulo, registro, n_concluidos, n_total, caminho, futuro)
+
+    motor = MotorAjusteParalelo(ajustador, n_processos=n_processos, cache=cache, metricas=metricas,
+                                contexto=contexto)
+    angulos_ajustados, parametros_ajustados = motor.ajustar_todos(parametros_iniciais, angulos_ordenados,
+                                                                  progresso=informar_angulo)
+    return _saidas_fmr(ajustador, angulos_ajustados, parametros_ajustados, diretorio_destino, renderizador)
+
+
+def _saidas_fmr(ajustador, angulos_ajustados, parametros_ajustados, diretorio_destino, renderizador):
+    """
+    Gráficos de variação e de comparação e o relatório resultados_fmr.json,
+    a partir dos resultados registrados no ajustador (ver FMR_automatico).
+    """
+    resultados = {
+        'angulos': [],
+        'parametros': [],
+        'graficos_angulo': [],
+        'grafico_variacao': None,
+        'grafico_comparacao': None,
+        'arquivos_gerados': [],
+        'relatorio_path': None
+    }
+
+    for angulo, parametros in zip(angulos_ajustados, parametros_ajustados):
+        caminho_completo = os.path.join(diretorio_destino, f"ajuste_angulo_{angulo}.png")
+        resultados['angulos'].append(angulo)
+        resultados['parametros'].append(parametros)
+        resultados['graficos_angulo'].append(caminho_completo)
+        resultados['arquivos_gerados'].append(caminho_completo)
+
+    # Gráfico de variação dos parâmetros com o ângulo
+    caminho_completo = os.path.join(diretorio_destino, "variacao_parametros.png")
+    renderizador.enviar(ajustador.grafico_variacao(caminho_completo))
+
+    resultados['grafico_variacao'] = caminho_completo
+    resultados['arquivos_gerados'].append(caminho_completo)
+
+    # Gráfico de comparação entre ângulos
+    caminho_completo = os.path.join(diretorio_destino, "comparacao_angulos.png")
+    renderizador.enviar(ajustador.grafico_comparacao(caminho_completo))
+
+    resultados['grafico_comparacao'] = caminho_completo
+    resultados['arquivos_gerados'].append(caminho_completo)
+
+    # Tabela de resultados (ângulos x parâmetros), com None no lugar de NaN
+    def sem_nan(matriz):
+        return np.where(np.isfinite(matriz), matriz, None).tolist()
+
+    ajustados = [ajustador.indice_angulo(a) for a in resultados['angulos']]
+    resultados['nomes_parametros'] = list(ajustador.nomes_parametros or ())
+    resultados['tabela'] = sem_nan(ajustador.tabela[ajustados]) if ajustados else []
+    resultados['erros'] = sem_nan(ajustador.erros[ajustados]) if ajustados else []
+    resultados['qui2_reduzido'] = sem_nan(ajustador.qui2_reduzido[ajustados]) if ajustados else []
+
+    # Resultados em JSON
+    relatorio_path = os.path.join(diretorio_destino, 'resultados_fmr.json')
+    with open(relatorio_path, 'w') as f:
+        json.dump(resultados, f, indent=2)
+    resultados['relatorio_path'] = relatorio_path
+    resultados['arquivos_gerados'].append(relatorio_path)
+    return resultados
+
+
+def anisotropia_fmr(resultados, diretorio_destino, frequencia, nomes=None, modelo='completo', fixos=None, pico=1,
+                    renderizador=None):
+    """
+    Ajuste da dependência angular de Hr (anisotropia.ajustar_anisotropia) a
+    uma ou várias análises FMR de uma vez, todas no mesmo ajuste em lote.
+
+    Grava anisotropia_<nome>.png (Hr medido e do modelo contra o ângulo) para
+    cada amostra e anisotropia.json com os parâmetros de todas.
+
+    Args:
+        resultados (dict, str ou lista): Resultado de FMR_automatico /
+            app.processar_fmr ou caminho de resultados_fmr.json, ou uma lista deles
+        diretorio_destino (str): Onde salvar gráficos e relatório
+        frequencia (float): Frequência da medida FMR (GHz)
+        nomes (sequência, opcional): Nome de cada amostra (padrão: a pasta do
+            resultados_fmr.json, ou a posição na lista)
+        modelo (str): 'uniaxial', 'cubica' ou 'completo' (ver anisotropia.MODELOS)
+        fixos (dict, opcional): Parâmetros mantidos fixos (ex.: {'Meff': 8000})
+        pico (int): Qual Hr ajustar (Hr1, Hr2...)
+        renderizador (renderizacao.Renderizador, opcional): Para onde vão os gráficos
+
+    Returns:
+        anisotropia.ResultadoAnisotropia
+    """
+    if isinstance(resultados, (dict, str, os.PathLike)):
+        resultados = [resultados]
+    if nomes is None:
+        nomes = [os.path.basename(os.path.dirname(os.path.abspath(r))) if isinstance(r, (str, os.PathLike))
+                 else f"amostra_{i}" for i, r in enumerate(resultados)]
+        if len(resultados) == 1:
+            nomes = ['fmr']
+    os.makedirs(diretorio_destino, exist_ok=True)
+    renderizador = renderizador or renderizacao.padrao()
+
+    dados = [anisotropia.dados_fmr(r, pico) for r in resultados]
+    resultado = anisotropia.ajustar_anisotropia([a for a, _ in dados], [h for _, h in dados], frequencia, gamma,
+                                                modelo=modelo, fixos=fixos, nomes=nomes)
+
+    for i, nome in enumerate(resultado.nomes):
+        angulos = resultado.angulos[i]
+        curva = np.linspace(angulos.min(), angulos.max(), 361)
+        caminho_saida = os.path.join(diretorio_destino, f"anisotropia_{nome}.png")
+        g = renderizacao.Grafico(caminho_saida, figsize=(10, 6), dpi=300, bbox_inches='tight',
+                                 modelo='anisotropia')
+        g.plot(angulos, resultado.Hr[i], 'bo', markersize=4, label=f"Hr{pico} ajustado")
+        g.plot(curva, resultado.Hr_modelo(i, curva), 'r-', linewidth=2, label=f"Modelo ({modelo})")
+        g.xlabel("Ângulo (graus)", fontsize=12)
+        g.ylabel("Campo de Ressonância (Oe)", fontsize=12)
+        g.title(f"Anisotropia - {nome} ({frequencia:g} GHz)", fontsize=14)
+        g.grid(True, alpha=0.3)
+        g.legend()
+        texto_ajuste = []
+        for parametro, (valor, erro) in resultado.parametros(i).items():
+            unidade = '°' if parametro in anisotropia.ANGULARES else ' Oe'
+            if parametro not in resultado.livres:
+                if valor:
+                    texto_ajuste.append(f"{parametro} = {valor:.2f}{unidade} (fixo)")
+            elif np.isfinite(erro):
+                texto_ajuste.append(f"{parametro} = {valor:.2f} ± {erro:.2f}{unidade}")
+            else:
+                texto_ajuste.append(f"{parametro} = {valor:.2f}{unidade} (erro não disponível)")
+        g.text(0.02, 0.98, "\n".join(texto_ajuste), transform=renderizacao.EIXOS,
+                verticalalignment='top', bbox=dict(facecolor='white', alpha=0.8))
+        renderizador.enviar(g)
+        if not resultado.sucesso[i]:
+            print(f"AVISO: o ajuste de anisotropia de {nome} não convergiu")
+
+    with open(os.path.join(diretorio_destino, 'anisotropia.json'), 'w') as f:
+        json.dump([resultado.exportar(i) for i in range(len(resultado))], f, indent=2)
+    return resultado
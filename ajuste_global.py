@@ -0,0 +1,363 @@
+import numpy as np
+import lorentz_lote
+import incerteza
+
+###############################################################
+###############################################################
+###############################################################
+#Ajuste global da impedância: todos os espectros num só problema de mínimos quadrados
+
+GLOBAIS = ('Hk', 'Meff', 'dho', 'alfa_gamma')
+LOCAIS = ('m', 'n')      # amplitudes da Lorentziana de cada espectro
+MINIMOS_GLOBAIS = np.zeros(len(GLOBAIS))   # Hk, Meff, ΔH0, α/γ >= 0, como nos ajustes finais
+MINIMOS_LOCAIS = np.array([0.0, -np.inf])  # m >= 0, como em lorentz_lote
+
+
+def campo_ressonancia(f, Hk, Meff, gamma):
+    """
+    Hr tal que f = γ√((Hr + Hk)(Hr + Hk + Meff)), a inversa de
+    GMAG.frequencia_de_ressonancia (raiz positiva).
+    """
+    c = (np.asarray(f, dtype=float) / gamma) ** 2
+    return (np.sqrt(Meff**2 + 4 * c) - Meff) / 2 - Hk
+
+
+def _derivada_Meff(f, Meff, gamma):
+    """dHr/dMeff de campo_ressonancia (dHr/dHk é -1)"""
+    c = (np.asarray(f, dtype=float) / gamma) ** 2
+    return (Meff / np.sqrt(Meff**2 + 4 * c) - 1) / 2
+
+
+def _somas(v, inicios):
+    """Soma de v (um valor por ponto) dentro de cada espectro"""
+    return np.add.reduceat(v, inicios)
+
+
+def estimar_globais(xs, ys, frequencias, gamma):
+    """
+    Valores iniciais de Hk, Meff, ΔH0 e α/γ sem ajustar espectro nenhum: Hr de
+    cada espectro no máximo, dH como meia largura a meia altura, e os ajustes
+    vetorizados de incerteza (Kittel e reta) sobre essas estimativas.
+    """
+    Hr = np.empty(len(xs))
+    dH = np.empty(len(xs))
+    for i, (x, y) in enumerate(zip(xs, ys)):
+        k = np.argmax(y)
+        Hr[i] = x[k]
+        acima = x[y >= y[k] / 2]
+        passo = np.abs(np.diff(x)).min() if len(x) > 1 else 1.0
+        dH[i] = max((acima.max() - acima.min()) / 2, passo)
+
+    (Hk,), (Meff,) = incerteza.ajustar_kittel(Hr, frequencias, 100.0, 1000.0, gamma)
+    if not np.isfinite([Hk, Meff]).all():
+        Hk, Meff = 100.0, 1000.0
+    (dho,), (alfa_gamma,) = incerteza.ajustar_reta(frequencias, dH)
+    if not np.isfinite([dho, alfa_gamma]).all():
+        dho, alfa_gamma = np.mean(dH), 0.0
+    return np.maximum([Hk, Meff, dho, alfa_gamma], MINIMOS_GLOBAIS)
+
+
+class ResultadoGlobal:
+    """Parâmetros globais, amplitudes por espectro e estatísticas do ajuste global"""
+
+    def __init__(self, xs, frequencias, gamma, globais, covariancia, locais, erros_locais, chisqr, nfev, sucesso):
+        self.xs = xs
+        self.frequencias = frequencias
+        self.gamma = gamma
+        self.globais = globais            # (4,) na ordem de GLOBAIS
+        self.covariancia = covariancia    # (4, 4), já escalada pelo qui-quadrado reduzido
+        self.locais = locais              # (S, 2) na ordem de LOCAIS
+        self.erros_locais = erros_locais  # (S, 2), nan quando indisponível
+        self.chisqr = chisqr
+        self.nfev = nfev
+        self.sucesso = sucesso
+        self.ndata = sum(len(x) for x in xs)
+        self.nvarys = len(GLOBAIS) + len(LOCAIS) * len(xs)
+        self.redchi = chisqr / max(self.ndata - self.nvarys, 1)
+
+        # Hr e dH de cada espectro saem dos parâmetros globais; erros pela propagação da covariância
+        Hk, Meff, dho, alfa_gamma = globais
+        self.Hr = campo_ressonancia(frequencias, Hk, Meff, gamma)
+        self.dH = dho + alfa_gamma * frequencias
+        gradiente_Hr = np.column_stack((-np.ones_like(frequencias), _derivada_Meff(frequencias, Meff, gamma)))
+        gradiente_dH = np.column_stack((np.ones_like(frequencias), frequencias))
+        with np.errstate(invalid='ignore'):
+            self.erros_Hr = np.sqrt(np.einsum('si,ij,sj->s', gradiente_Hr, covariancia[:2, :2], gradiente_Hr))
+            self.erros_dH = np.sqrt(np.einsum('si,ij,sj->s', gradiente_dH, covariancia[2:, 2:], gradiente_dH))
+
+    def __len__(self):
+        return len(self.locais)
+
+    @property
+    def erros(self):
+        """Erros de Hk, Meff, ΔH0 e α/γ"""
+        d = np.diag(self.covariancia)
+        return np.where(d >= 0, np.sqrt(np.abs(d)), np.nan)
+
+    def parametros(self):
+        """Dicionário {nome: (valor, erro)} dos parâmetros globais, mais α = (α/γ)·γ"""
+        saida = {nome: (float(v), float(e)) for nome, v, e in zip(GLOBAIS, self.globais, self.erros)}
+        saida['alfa'] = (saida['alfa_gamma'][0] * self.gamma, saida['alfa_gamma'][1] * self.gamma)
+        return saida
+
+    def correlacao(self):
+        """Matriz de correlação dos parâmetros globais"""
+        e = self.erros
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.covariancia / np.outer(e, e)
+
+    def melhor_ajuste(self, i, x=None):
+        """Curva do espectro i com Hr e dH dados pelos parâmetros globais"""
+        P = np.array([[*self.locais[i], self.Hr[i], self.dH[i]]])
+        return lorentz_lote.lorentz_lote(self.xs[i] if x is None else x, P)[0]
+
+    def exportar(self, nomes=None):
+        """Resultado em um dicionário serializável em JSON"""
+        nomes = list(nomes) if nomes is not None else [str(i) for i in range(len(self))]
+        correlacao = self.correlacao()
+        return {
+            'parametros': {nome: {'valor': v, 'erro': e if np.isfinite(e) else None}
+                           for nome, (v, e) in self.parametros().items()},
+            'correlacao': np.where(np.isfinite(correlacao), correlacao, None).tolist(),
+            'espectros': [{'nome': nome, 'frequencia': float(f), 'Hr': float(Hr), 'erro_Hr': float(eHr),
+                           'dH': float(dH), 'erro_dH': float(edH), 'm': float(m), 'n': float(n)}
+                          for nome, f, Hr, eHr, dH, edH, (m, n)
+                          in zip(nomes, self.frequencias, self.Hr, self.erros_Hr, self.dH, self.erros_dH, self.locais)],
+            'chisqr': float(self.chisqr),
+            'redchi': float(self.redchi),
+            'ndata': int(self.ndata),
+            'nvarys': int(self.nvarys),
+            'nfev': int(self.nfev),
+            'sucesso': bool(self.sucesso),
+        }
+
+    def relatorio(self):
+        """Relatório em texto no mesmo formato básico de lmfit fit_report"""
+        linhas = [
+            "[[Fit Statistics]]",
+            "    # fitting method   = global Levenberg-Marquardt (Schur)",
+            f"    # function evals   = {self.nfev}",
+            f"    # spectra          = {len(self)}",
+            f"    # data points      = {self.ndata}",
+            f"    # variables        = {self.nvarys}",
+            f"    chi-square         = {self.chisqr:.8g}",
+            f"    reduced chi-square = {self.redchi:.8g}",
+            f"    success            = {bool(self.sucesso)}",
+            "[[Variables]]",
+        ]
+        for nome, (valor, erro) in self.parametros().items():
+            if np.isfinite(erro):
+                linhas.append(f"    {nome + ':':<11} {valor:.8g} +/- {erro:.8g}")
+            else:
+                linhas.append(f"    {nome + ':':<11} {valor:.8g} (erro não disponível)")
+        linhas.append("[[Correlations]]")
+        correlacao = self.correlacao()
+        for a in range(len(GLOBAIS)):
+            for b in range(a + 1, len(GLOBAIS)):
+                if np.isfinite(correlacao[a, b]):
+                    linhas.append(f"    C({GLOBAIS[a]}, {GLOBAIS[b]}) = {correlacao[a, b]:+.4f}")
+        return "\n".join(linhas) + "\n"
+
+
+class _Problema:
+    """
+    Espectros concatenados num único vetor de pontos, com o espectro de cada
+    ponto. O jacobiano é esparso em blocos: cada ponto depende dos 4
+    parâmetros globais e só das 2 amplitudes do seu espectro, então é
+    guardado como duas matrizes densas, (pontos, 4) e (pontos, 2), e nunca
+    como (pontos, 4 + 2·espectros).
+    """
+
+    def __init__(self, xs, ys, frequencias, gamma):
+        tamanhos = np.array([len(x) for x in xs])
+        self.S = len(xs)
+        self.X = np.concatenate(xs).astype(float)
+        self.Y = np.concatenate(ys).astype(float)
+        self.inicios = np.concatenate(([0], np.cumsum(tamanhos)[:-1]))
+        self.espectro = np.repeat(np.arange(self.S), tamanhos)
+        self.f = frequencias
+        self.gamma = gamma
+
+    def parametros_lorentz(self, g, L):
+        """(m, n, Hr, dH) de cada ponto, forma (pontos, 4)"""
+        Hr = campo_ressonancia(self.f, g[0], g[1], self.gamma)
+        dH = g[2] + g[3] * self.f
+        return np.column_stack((L, Hr, dH))[self.espectro]
+
+    def residuo(self, g, L):
+        P = self.parametros_lorentz(g, L)
+        return lorentz_lote.lorentz_lote(self.X[:, None], P)[:, 0] - self.Y
+
+    def jacobiano(self, g, L):
+        """Blocos do jacobiano: (pontos, 4) nos globais e (pontos, 2) nas amplitudes do espectro"""
+        P = self.parametros_lorentz(g, L)
+        J = lorentz_lote.jacobiano_lote(self.X[:, None], P)[:, 0, :]
+        # Regra da cadeia: Hr(Hk, Meff) e dH(ΔH0, α/γ)
+        dHr_dMeff = _derivada_Meff(self.f, g[1], self.gamma)[self.espectro]
+        Jg = np.column_stack((-J[:, 2], J[:, 2] * dHr_dMeff, J[:, 3], J[:, 3] * self.f[self.espectro]))
+        return Jg, J[:, :2]
+
+    def equacoes_normais(self, Jg, Jl, r):
+        """
+        Blocos de JᵀJ e Jᵀr: A (4, 4) dos globais, B (S, 4, 2) globais x
+        amplitudes e D (S, 2, 2) diagonal por espectro; gg (4,) e gl (S, 2).
+        """
+        A = Jg.T @ Jg
+        B = np.empty((self.S, 4, 2))
+        D = np.empty((self.S, 2, 2))
+        for a in range(4):
+            for b in range(2):
+                B[:, a, b] = _somas(Jg[:, a] * Jl[:, b], self.inicios)
+        D[:, 0, 0] = _somas(Jl[:, 0] * Jl[:, 0], self.inicios)
+        D[:, 0, 1] = D[:, 1, 0] = _somas(Jl[:, 0] * Jl[:, 1], self.inicios)
+        D[:, 1, 1] = _somas(Jl[:, 1] * Jl[:, 1], self.inicios)
+        gg = Jg.T @ r
+        gl = np.column_stack((_somas(Jl[:, 0] * r, self.inicios), _somas(Jl[:, 1] * r, self.inicios)))
+        return A, B, D, gg, gl
+
+    def amplitudes_lineares(self, g):
+        """m e n de cada espectro por mínimos quadrados lineares, com Hr e dH dados por g"""
+        Jl = self.jacobiano(g, np.zeros((self.S, 2)))[1]   # o modelo é linear em (m, n)
+        D = np.empty((self.S, 2, 2))
+        D[:, 0, 0] = _somas(Jl[:, 0] ** 2, self.inicios)
+        D[:, 0, 1] = D[:, 1, 0] = _somas(Jl[:, 0] * Jl[:, 1], self.inicios)
+        D[:, 1, 1] = _somas(Jl[:, 1] ** 2, self.inicios)
+        t = np.column_stack((_somas(Jl[:, 0] * self.Y, self.inicios), _somas(Jl[:, 1] * self.Y, self.inicios)))
+        L = np.linalg.solve(D, t[..., None])[..., 0]
+        # Onde m sairia negativo, m = 0 e só n é ajustado
+        negativos = L[:, 0] < 0
+        L[negativos, 0] = 0.0
+        L[negativos, 1] = t[negativos, 1] / D[negativos, 1, 1]
+        return L
+
+
+def _resolver_schur(A, B, D, gg, gl):
+    """
+    Passo de Gauss-Newton do sistema em seta [[A, B], [Bᵀ, D]]·[δg, δl] = -[gg, gl]:
+    os blocos 2x2 de D são invertidos em forma fechada e os globais saem do
+    complemento de Schur, (A - Σ B·D⁻¹·Bᵀ)·δg = -(gg - Σ B·D⁻¹·gl).
+
+    Returns:
+        tuple: (δg, δl, inversa do complemento de Schur)
+    """
+    det = D[:, 0, 0] * D[:, 1, 1] - D[:, 0, 1] * D[:, 1, 0]
+    D_inv = np.empty_like(D)
+    D_inv[:, 0, 0] = D[:, 1, 1] / det
+    D_inv[:, 1, 1] = D[:, 0, 0] / det
+    D_inv[:, 0, 1] = -D[:, 0, 1] / det
+    D_inv[:, 1, 0] = -D[:, 1, 0] / det
+    BD = np.einsum('sak,skl->sal', B, D_inv)
+    schur = A - np.einsum('sal,sbl->ab', BD, B)
+    lado = gg - np.einsum('sal,sl->a', BD, gl)
+    try:
+        schur_inv = np.linalg.inv(schur)
+    except np.linalg.LinAlgError:
+        schur_inv = np.linalg.pinv(schur)
+    dg = -schur_inv @ lado
+    dl = -np.einsum('skl,sl->sk', D_inv, gl + np.einsum('sak,a->sk', B, dg))
+    return dg, dl, schur_inv
+
+
+def ajustar_impedancia_global(xs, ys, frequencias, gamma, iniciais=None, max_iter=200, ftol=1.5e-8, xtol=1.5e-8):
+    """
+    Ajusta todos os espectros de impedância de uma vez, com Hr e dH de cada
+    um presos aos parâmetros globais:
+
+        Hr_i = campo_ressonancia(f_i, Hk, Meff)     (Kittel, GMAG.frequencia_de_ressonancia)
+        dH_i = ΔH0 + (α/γ)·f_i                      (largura de linha)
+
+    e só as amplitudes (m, n) livres por espectro. Substitui os dois estágios
+    de GMAG.impedancia (Lorentziana por espectro, depois Kittel e largura
+    sobre os Hr e dH ajustados), sem o erro do primeiro vazar para o segundo.
+
+    Levenberg-Marquardt como em lorentz_lote, com as equações normais
+    montadas por blocos: JᵀJ tem forma de seta (globais x globais, globais x
+    amplitudes e blocos 2x2 por espectro), então cada passo custa O(pontos)
+    e é resolvido pelo complemento de Schur, um sistema 4x4. Os limites
+    (globais >= 0, m >= 0) são impostos por projeção.
+
+    Args:
+        xs, ys (sequência de np.ndarray): Campo e impedância de cada espectro
+            (grades e tamanhos podem diferir)
+        frequencias (sequência): Frequência de cada espectro (GHz)
+        gamma (float): Razão giromagnética (GHz/Oe)
+        iniciais (sequência, opcional): Hk, Meff, ΔH0 e α/γ iniciais
+            (padrão: estimar_globais)
+        max_iter (int): Número máximo de iterações
+        ftol, xtol (float): Tolerâncias relativas no qui-quadrado e nos parâmetros
+
+    Returns:
+        ResultadoGlobal
+    """
+    xs = [np.asarray(x, dtype=float) for x in xs]
+    ys = [np.asarray(y, dtype=float) for y in ys]
+    f = np.asarray(frequencias, dtype=float)
+    if not len(xs) == len(ys) == len(f):
+        raise ValueError("xs, ys e frequencias devem ter o mesmo tamanho")
+    if len(xs) < 2:
+        raise ValueError("São necessários pelo menos 2 espectros para o ajuste global")
+    if any(len(x) != len(y) or len(x) < 3 for x, y in zip(xs, ys)):
+        raise ValueError("Cada espectro precisa de pelo menos 3 pontos, com x e y do mesmo tamanho")
+
+    problema = _Problema(xs, ys, f, gamma)
+    g = estimar_globais(xs, ys, f, gamma) if iniciais is None else np.array(iniciais, dtype=float)
+    g = np.maximum(g, MINIMOS_GLOBAIS)
+    L = problema.amplitudes_lineares(g)
+
+    r = problema.residuo(g, L)
+    chisqr = r @ r
+    amortecimento = 1e-3
+    nfev = 1
+    convergiu = False
+
+    for _ in range(max_iter):
+        Jg, Jl = problema.jacobiano(g, L)
+        A, B, D, gg, gl = problema.equacoes_normais(Jg, Jl, r)
+
+        # Amortecimento de Marquardt, escalado pelas diagonais de JᵀJ
+        diagonal_A = np.maximum(np.diag(A), 1e-12 * np.diag(A).max() + 1e-300)
+        diagonal_D = np.maximum(np.einsum('skk->sk', D), 1e-300)
+        A_amortecida = A + np.diag(amortecimento * diagonal_A)
+        D_amortecida = D.copy()
+        D_amortecida[:, range(2), range(2)] += amortecimento * diagonal_D
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dg, dl, _ = _resolver_schur(A_amortecida, B, D_amortecida, gg, gl)
+
+        g_novo = np.maximum(g + dg, MINIMOS_GLOBAIS)
+        L_novo = np.maximum(L + dl, MINIMOS_LOCAIS)
+        with np.errstate(invalid='ignore', over='ignore'):
+            r_novo = problema.residuo(g_novo, L_novo)
+        chisqr_novo = r_novo @ r_novo
+        nfev += 1
+
+        if np.isfinite(chisqr_novo) and chisqr_novo <= chisqr:
+            reducao = (chisqr - chisqr_novo) / max(chisqr, 1e-300)
+            passo_pequeno = (np.all(np.abs(g_novo - g) <= xtol * (np.abs(g) + xtol))
+                             and np.all(np.abs(L_novo - L) <= xtol * (np.abs(L) + xtol)))
+            g, L, r, chisqr = g_novo, L_novo, r_novo, chisqr_novo
+            amortecimento = max(amortecimento / 10, 1e-12)
+            if reducao <= ftol or passo_pequeno:
+                convergiu = True
+                break
+        else:
+            amortecimento *= 10
+            # Sem progresso possível: amortecimento enorme e nenhum passo aceito.
+            # Estagnou sem atingir ftol/xtol, então não conta como convergência
+            if amortecimento > 1e12:
+                break
+
+    # Covariância pela inversa de JᵀJ (sem amortecimento) escalada pelo qui-quadrado reduzido, como no lmfit
+    S = len(xs)
+    redchi = chisqr / max(len(problema.X) - len(GLOBAIS) - len(LOCAIS) * S, 1)
+    Jg, Jl = problema.jacobiano(g, L)
+    A, B, D, gg, gl = problema.equacoes_normais(Jg, Jl, r)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        _, _, schur_inv = _resolver_schur(A, B, D, gg, gl)
+        # Bloco das amplitudes da inversa: D⁻¹ + D⁻¹Bᵀ·Schur⁻¹·B·D⁻¹, só a diagonal
+        D_inv = np.linalg.inv(D)
+        DB = np.einsum('skl,sal->ska', D_inv, B)
+        var_locais = (np.einsum('skk->sk', D_inv) + np.einsum('ska,ab,skb->sk', DB, schur_inv, DB)) * redchi
+        erros_locais = np.where(var_locais >= 0, np.sqrt(np.abs(var_locais)), np.nan)
+
+    sucesso = convergiu and bool(np.all(np.isfinite(g)) and np.all(np.isfinite(L)))
+    return ResultadoGlobal(xs, f, gamma, g, schur_inv * redchi, L, erros_locais, float(chisqr), nfev, sucesso)
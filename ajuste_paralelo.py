@@ -0,0 +1,404 @@
+import numpy as np, os, time
+from concurrent.futures import ProcessPoolExecutor
+import cache_ajustes
+import metricas
+import modelo_fmr
+
+###############################################################
+###############################################################
+###############################################################
+#Ajuste de varreduras FMR com vários processos
+
+def _no_limite(resultado, tolerancia=1e-6):
+    """Algum parâmetro variável terminou encostado em um dos seus limites?"""
+    for p in resultado.params.values():
+        if not p.vary:
+            continue
+        for limite in (p.min, p.max):
+            if np.isfinite(limite) and abs(p.value - limite) <= tolerancia * max(1.0, abs(limite)):
+                return True
+    return False
+
+
+def _ajustar_tarefa(tarefa):
+    """
+    Executada nos processos do pool: ajusta um espectro e devolve o resultado do lmfit.
+
+    As sementes são tentadas em ordem e vale o primeiro ajuste que converge
+    sem parâmetros presos nos limites (sinal de que caiu em outro mínimo).
+    Se nenhuma servir, tenta-se ainda a estimativa tirada do próprio espectro
+    e fica o ajuste de menor qui-quadrado. Se todas as tentativas falharem com
+    ValueError (ex.: NaN no jacobiano analítico), elas são refeitas com o
+    jacobiano numérico; se ainda assim nada der certo, o ângulo volta sem
+    resultado em vez de levantar a exceção, para não perder a varredura.
+
+    Returns:
+        tuple: (angulo, resultado, medidas), com medidas = {'tempo': segundos no
+        processo, 'nfev': avaliações somadas de todas as tentativas, 'tentativas'};
+        sem ajuste, resultado é None e medidas traz 'erro' (a mensagem)
+    """
+    inicio = time.perf_counter()
+    classe, angulo, x, y, sementes, jacobiano = tarefa
+    estimativa = dict(sementes[-1])
+    estimativa.update(classe.estimar_parametros(x, y))
+
+    candidatos, erro = [], None
+    medidas = {'nfev': 0, 'tentativas': 0}
+    escolhido = None
+    jacobianos = [jacobiano] if jacobiano == 'numerico' else [jacobiano, 'numerico']
+    for tipo in jacobianos:
+        for semente in list(sementes) + [estimativa]:
+            medidas['tentativas'] += 1
+            try:
+                resultado = classe.ajustar_espectro(x, y, semente, tipo)
+            except (RuntimeError, ValueError) as e:
+                erro = e
+                continue
+            medidas['nfev'] += resultado.nfev
+            if not _no_limite(resultado):
+                escolhido = resultado
+                break
+            candidatos.append(resultado)
+
+        if escolhido is None and candidatos:
+            escolhido = min(candidatos, key=lambda r: r.chisqr)
+        if escolhido is not None or not isinstance(erro, ValueError):
+            break
+
+    medidas['tempo'] = time.perf_counter() - inicio
+    if escolhido is None:
+        medidas['erro'] = str(erro)
+    return angulo, escolhido, medidas
+
+
+class MotorAjusteParalelo:
+    """
+    Ajusta todos os ângulos de um AjustadorMultiplosAngulos distribuindo os
+    ajustes entre processos.
+
+    No caminho sequencial cada ângulo parte do resultado do anterior, o que
+    impede o paralelismo. Aqui um ângulo a cada `passo_ancoras` é ajustado em
+    sequência (âncoras encadeadas, como no caminho original) e os demais são
+    ajustados em rodadas paralelas: em cada rodada, o ângulo do meio de cada
+    intervalo ainda não ajustado parte de uma semente tirada dos dois vizinhos
+    já ajustados, e o intervalo é dividido ao meio para a rodada seguinte.
+
+        'ancoras'      -> parâmetros do vizinho ajustado de ângulo mais próximo
+        'extrapolacao' -> interpolação linear entre os vizinhos ajustados
+                          (extrapolação linear além da última âncora)
+
+    Um ajuste que termina com parâmetros presos nos limites é refeito a partir
+    da semente seguinte (ver `_ajustar_tarefa`). Um ângulo em que nenhuma
+    tentativa dá certo fica em `falhos` ({ângulo: mensagem}) e de fora dos
+    resultados; as sementes dos vizinhos saem dos ângulos ajustados mais
+    próximos.
+
+    As sementes só dependem de ajustes de rodadas anteriores, então o
+    resultado é determinístico e não depende do número de processos nem da
+    ordem de conclusão.
+
+    Com um `cache` (cache_ajustes.CacheAjustes), cada ajuste é procurado antes
+    pela fatia de dados, sementes, jacobiano e código do modelo; um acerto
+    dispensa o lmfit e devolve os parâmetros, erros e estatísticas guardados.
+    Como as sementes são determinísticas, rodar de novo o mesmo arquivo com os
+    mesmos parâmetros iniciais acerta em todos os ângulos.
+
+    Com `metricas` (metricas.RegistroMetricas), cada ângulo deixa um registro
+    com tempo, nfev (somado entre as sementes tentadas), convergência,
+    qui-quadrado reduzido e parâmetros no limite; `contexto` entra em todos os
+    registros (ex.: {'execucao': id da tarefa}).
+    """
+
+    ESTRATEGIAS = ('ancoras', 'extrapolacao')
+
+    def __init__(self, ajustador, n_processos=None, estrategia='extrapolacao', passo_ancoras=8, cache=None,
+                 metricas=None, contexto=None):
+        if estrategia not in self.ESTRATEGIAS:
+            raise ValueError(f"Estratégia desconhecida: {estrategia} (use {', '.join(self.ESTRATEGIAS)})")
+        if passo_ancoras < 1:
+            raise ValueError("passo_ancoras deve ser pelo menos 1")
+        self.ajustador = ajustador
+        self.n_processos = n_processos or os.cpu_count() or 1
+        self.estrategia = estrategia
+        self.passo_ancoras = passo_ancoras
+        self.cache = cache
+        self._modelo = None if cache is None else cache_ajustes.identidade(type(ajustador), modelo_fmr, _ajustar_tarefa,
+                                                                          _no_limite)
+        self.metricas = metricas
+        self.contexto = contexto or {}
+        self.falhos = {}
+
+    def _angulos(self, angulos):
+        if angulos is None:
+            return list(self.ajustador.angulos_disponiveis)
+        return sorted(self.ajustador.angulo_canonico(a) for a in angulos)
+
+    def ajustar_sequencial(self, parametros_iniciais, angulos=None, progresso=None):
+        """
+        Caminho original: cada ângulo parte do ajuste do ângulo anterior.
+
+        `progresso` tem o mesmo papel que em ajustar_todos.
+
+        Returns:
+            tuple: (lista de ângulos, lista de dicionários de parâmetros)
+        """
+        angulos = self._angulos(angulos)
+        parametros = []
+        parametros_anteriores = parametros_iniciais
+        for angulo in angulos:
+            inicio = time.perf_counter()
+            resultado = self.ajustador.ajustar_angulo(angulo, parametros_anteriores)
+            self._registrar_metricas(angulo, resultado, {'tempo': time.perf_counter() - inicio}, metodo='sequencial')
+            parametros_anteriores = self.ajustador.resultados[angulo]['parametros']
+            parametros.append(parametros_anteriores)
+            if progresso is not None:
+                progresso(angulo, self.ajustador.resultados[angulo], len(parametros), len(angulos))
+        return angulos, parametros
+
+    def _consultar_cache(self, tarefas):
+        """Chaves das tarefas e resultados já guardados (None onde não há)"""
+        if self.cache is None:
+            return [None] * len(tarefas), [None] * len(tarefas)
+        chaves, guardados = [], []
+        for _, _, x, y, sementes, jacobiano in tarefas:
+            chaves.append(cache_ajustes.chave(self._modelo, x, y, list(sementes), jacobiano))
+            dados = self.cache.obter(chaves[-1])
+            guardados.append(None if dados is None else cache_ajustes.restaurar_resultado(dados))
+        return chaves, guardados
+
+    def _guardar_cache(self, chave, resultado):
+        if self.cache is None:
+            return
+        try:
+            self.cache.guardar(chave, cache_ajustes.serializar_resultado(resultado), self.ajustador.caminho_arquivo)
+        except OSError as e:
+            print(f"AVISO: não foi possível guardar o ajuste no cache: {str(e)}")
+
+    def _registrar_metricas(self, angulo, resultado, medidas, metodo='paralelo'):
+        if self.metricas is None:
+            return
+        contexto = dict(self.contexto, rotina='fmr', arquivo=self.ajustador.caminho_arquivo, item=float(angulo),
+                        metodo=metodo, tentativas=1)
+        contexto.update(medidas)
+        self.metricas.registrar(metricas.metricas_ajuste(resultado, **contexto))
+
+    def _registrar_falha(self, angulo, medidas, metodo='paralelo'):
+        """Ângulo sem ajuste possível: fica em `falhos` e nas métricas, e a varredura continua"""
+        self.falhos[angulo] = medidas['erro']
+        print(f"AVISO: ângulo {angulo} não pôde ser ajustado: {medidas['erro']}")
+        if self.metricas is not None:
+            registro = dict(self.contexto, rotina='fmr', arquivo=self.ajustador.caminho_arquivo,
+                            item=float(angulo), metodo=metodo, sucesso=False, mensagem=medidas['erro'])
+            registro.update(medidas)
+            self.metricas.registrar(registro)
+
+    def _sementes(self, angulos, ajustados, alvo, esquerda, direita):
+        """
+        Sementes para o ângulo `alvo`, a partir dos vizinhos já ajustados.
+
+        `direita` é None no trecho após o último ângulo ajustado e `esquerda`,
+        no trecho antes do primeiro.
+        """
+        if esquerda is None:
+            return [dict(ajustados[direita])]
+        if direita is None:
+            vizinho = ajustados[esquerda]
+            anteriores = [i for i in ajustados if i < esquerda]
+            if self.estrategia == 'ancoras' or not anteriores:
+                return [dict(vizinho)]
+            # Extrapolação linear a partir dos dois últimos ajustes
+            i0, i1 = max(anteriores), esquerda
+        else:
+            d_esq = angulos[alvo] - angulos[esquerda]
+            d_dir = angulos[direita] - angulos[alvo]
+            vizinho = ajustados[esquerda] if d_esq <= d_dir else ajustados[direita]
+            if self.estrategia == 'ancoras':
+                return [dict(vizinho)]
+            i0, i1 = esquerda, direita
+
+        fracao = (angulos[alvo] - angulos[i0]) / (angulos[i1] - angulos[i0])
+        p0, p1 = ajustados[i0], ajustados[i1]
+        semente = {n: p0[n] + fracao * (p1[n] - p0[n]) for n in vizinho}
+        return [semente, dict(vizinho)]
+
+    def _rodada(self, angulos, ajustados, falhos):
+        """
+        Índices a ajustar na próxima rodada (o meio de cada intervalo em aberto) e
+        suas sementes. Ângulos que falharam fecham os intervalos como os
+        ajustados, mas as sementes só vêm de ajustados.
+        """
+        fixos = sorted(set(ajustados) | set(falhos))
+        intervalos = list(zip(fixos[:-1], fixos[1:])) + [(fixos[-1], None)]
+        validos = sorted(ajustados)
+        rodada = []
+        for esquerda, direita in intervalos:
+            limite = len(angulos) if direita is None else direita
+            if limite - esquerda < 2:
+                continue
+            alvo = (esquerda + limite) // 2 if direita is not None else esquerda + 1 + (limite - esquerda - 1) // 2
+            k = np.searchsorted(validos, alvo)
+            vizinhos = (validos[k - 1] if k > 0 else None, validos[k] if k < len(validos) else None)
+            rodada.append((alvo, self._sementes(angulos, ajustados, alvo, *vizinhos)))
+        return rodada
+
+    def _ajustar_ancora(self, angulos, i, sementes, progresso, n_total, ajustados, falhos):
+        """
+        Ajusta o ângulo i no processo atual (com cache), registra e devolve os
+        parâmetros (os da semente, se o ajuste falhar)
+        """
+        x, y = self.ajustador.dados_angulo(angulos[i])
+        tarefa = (type(self.ajustador), i, x, y, sementes, self.ajustador.jacobiano)
+        inicio = time.perf_counter()
+        (chave,), (resultado,) = self._consultar_cache([tarefa])
+        if resultado is None:
+            _, resultado, medidas = _ajustar_tarefa(tarefa)
+            if resultado is None:
+                self._registrar_falha(angulos[i], medidas, metodo='ancora')
+                falhos.add(i)
+                return sementes[0]
+            self._guardar_cache(chave, resultado)
+        else:
+            medidas = {'tempo': time.perf_counter() - inicio, 'nfev': 0, 'tentativas': 0}
+        self._registrar_metricas(angulos[i], resultado, medidas, metodo='ancora')
+        registro = self.ajustador.registrar_resultado(angulos[i], resultado)
+        ajustados[i] = registro['parametros']
+        if progresso is not None:
+            progresso(angulos[i], registro, *n_total(ajustados))
+        return ajustados[i]
+
+    def _bissecao(self, angulos, ajustados, falhos, progresso, n_total):
+        """Rodadas paralelas, dividindo ao meio os intervalos entre ângulos já ajustados"""
+        classe = type(self.ajustador)
+        jacobiano = self.ajustador.jacobiano
+        valores_angulo = np.asarray(angulos, dtype=float)
+        executor = None
+        try:
+            while len(ajustados) + len(falhos) < len(angulos):
+                if not ajustados:
+                    raise RuntimeError("Nenhuma âncora pôde ser ajustada")
+                tarefas = []
+                for alvo, sementes in self._rodada(valores_angulo, ajustados, falhos):
+                    x, y = self.ajustador.dados_angulo(angulos[alvo])
+                    tarefas.append((classe, alvo, x, y, sementes, jacobiano))
+
+                # Só vão para o ajuste as tarefas que não estão no cache
+                chaves, guardados = self._consultar_cache(tarefas)
+                faltantes = [t for t, r in zip(tarefas, guardados) if r is None]
+                if self.n_processos > 1 and len(faltantes) > 1:
+                    if executor is None:
+                        n = min(self.n_processos, len(angulos) - len(ajustados))
+                        executor = ProcessPoolExecutor(max_workers=n)
+                    novos = iter(executor.map(_ajustar_tarefa, faltantes))
+                else:
+                    novos = (_ajustar_tarefa(t) for t in faltantes)
+
+                concluidos = []
+                for tarefa, chave, resultado in zip(tarefas, chaves, guardados):
+                    if resultado is None:
+                        _, resultado, medidas = next(novos)
+                        if resultado is not None:
+                            self._guardar_cache(chave, resultado)
+                    else:
+                        medidas = {'nfev': 0, 'tentativas': 0}
+                    concluidos.append((tarefa[1], resultado, medidas))
+
+                for alvo, resultado, medidas in concluidos:
+                    if resultado is None:
+                        self._registrar_falha(angulos[alvo], medidas)
+                        falhos.add(alvo)
+                        continue
+                    self._registrar_metricas(angulos[alvo], resultado, medidas)
+                    registro = self.ajustador.registrar_resultado(angulos[alvo], resultado)
+                    ajustados[alvo] = registro['parametros']
+                    if progresso is not None:
+                        progresso(angulos[alvo], registro, *n_total(ajustados))
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+    def ajustar_todos(self, parametros_iniciais, angulos=None, progresso=None):
+        """
+        Ajusta todos os ângulos (ou os indicados) e registra os resultados no ajustador.
+
+        Args:
+            parametros_iniciais (dict): Parâmetros iniciais da primeira âncora
+            angulos (iterável, opcional): Subconjunto de ângulos a ajustar
+            progresso (callable, opcional): Chamado como progresso(angulo, registro,
+                n_concluidos, n_total) após cada ângulo, com o registro devolvido
+                por registrar_resultado; uma exceção levantada nele interrompe o
+                ajuste (ex.: cancelamento de uma tarefa)
+
+        Returns:
+            tuple: (lista de ângulos, lista de dicionários de parâmetros), em ordem
+            de ângulo, sem os ângulos que falharam (ver `falhos`)
+        """
+        angulos = self._angulos(angulos)
+        self.falhos = {}
+        if not angulos:
+            return [], []
+        falhos = set()
+
+        def n_total(ajustados):
+            return len(ajustados) + len(falhos), len(angulos)
+
+        # 1) Âncoras, em sequência: cada uma parte da anterior
+        ajustados = {}
+        anteriores = parametros_iniciais
+        for i in range(0, len(angulos), self.passo_ancoras):
+            anteriores = self._ajustar_ancora(angulos, i, [anteriores], progresso, n_total, ajustados, falhos)
+
+        # 2) Rodadas paralelas, dividindo os intervalos ao meio
+        self._bissecao(angulos, ajustados, falhos, progresso, n_total)
+        indices = sorted(ajustados)
+        return [angulos[i] for i in indices], [ajustados[i] for i in indices]
+
+    def ajustar_faltantes(self, ajustados, angulos=None, progresso=None):
+        """
+        Ajusta só os ângulos que ainda não têm resultado, partindo dos que já têm
+        (ex.: uma sessão retomada, ver sessao_fmr.SessaoFMR).
+
+        Nos trechos antes do primeiro e depois do último ângulo ajustado, as
+        âncoras (uma a cada `passo_ancoras`, mais a da ponta) saem em sequência
+        a partir do vizinho ajustado mais próximo; os intervalos que sobram são
+        preenchidos pelas rodadas paralelas de ajustar_todos.
+
+        Args:
+            ajustados (dict): Parâmetros já ajustados, por ângulo de angulos_disponiveis
+                (pelo menos um)
+            angulos (iterável, opcional): Ângulos considerados (padrão: todos)
+            progresso (callable, opcional): Como em ajustar_todos, com
+                n_concluidos e n_total contando só os ângulos que faltavam
+
+        Returns:
+            tuple: (lista de ângulos ajustados agora, lista de dicionários de parâmetros)
+        """
+        angulos = self._angulos(angulos)
+        indices = {float(a): i for i, a in enumerate(angulos)}
+        ajustados = {indices[float(a)]: dict(p) for a, p in ajustados.items() if float(a) in indices}
+        if not ajustados:
+            raise ValueError("Nenhum ângulo ajustado para partir")
+        existentes = set(ajustados)
+        n_faltantes = len(angulos) - len(existentes)
+        self.falhos = {}
+        falhos = set()
+
+        def n_total(atuais):
+            return len(atuais) + len(falhos) - len(existentes), n_faltantes
+
+        # 1) Âncoras das pontas, em sequência a partir do ajuste mais próximo
+        primeiro, ultimo = min(ajustados), max(ajustados)
+        pontas = [(primeiro, list(range(primeiro - self.passo_ancoras, -1, -self.passo_ancoras)), 0),
+                  (ultimo, list(range(ultimo + self.passo_ancoras, len(angulos), self.passo_ancoras)),
+                   len(angulos) - 1)]
+        for vizinho, trecho, ponta in pontas:
+            if ponta not in ajustados and ponta not in trecho:
+                trecho.append(ponta)
+            anteriores = ajustados[vizinho]
+            for i in trecho:
+                anteriores = self._ajustar_ancora(angulos, i, [anteriores], progresso, n_total, ajustados,
+                                                  falhos)
+
+        # 2) Rodadas paralelas nos intervalos em aberto
+        self._bissecao(angulos, ajustados, falhos, progresso, n_total)
+        novos = sorted(set(ajustados) - existentes)
+        return [angulos[i] for i in novos], [ajustados[i] for i in novos]
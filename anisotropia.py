@@ -0,0 +1,532 @@
+"""
+Ajuste da dependência angular do campo de ressonância FMR, Hr(φ_H), com
+anisotropias no plano uniaxial e cúbica (quatro vezes).
+
+Energia livre por magnetização, com θ medido da normal do filme e φ no plano:
+
+    E/M = -H sinθ cos(φ - φ_H) + (Meff/2) cos²θ - (Hu/2) sin²θ cos²(φ - φu)
+          - (H4/16) sin⁴θ (3 + cos 4(φ - φ4))
+
+Com a magnetização no plano (θ = 90°), o equilíbrio e a condição de
+ressonância (Smit-Beljers) são
+
+    H sin(φ - φ_H) + (Hu/2) sin 2(φ - φu) + (H4/4) sin 4(φ - φ4) = 0
+    (f/γ)² = [H cos(φ - φ_H) + Meff + Hu cos²(φ - φu) + (H4/4)(3 + cos 4(φ - φ4))]
+             · [H cos(φ - φ_H) + Hu cos 2(φ - φu) + H4 cos 4(φ - φ4)]
+
+Sem H4 e com o campo no eixo fácil, volta a GMAG.frequencia_de_ressonancia
+com Hk = Hu. O par (H, φ) é resolvido por Newton para todos os ângulos (e
+amostras) de uma vez, e as derivadas de Hr nos parâmetros saem do teorema da
+função implícita, sem novas soluções do equilíbrio.
+
+Uso:
+    python anisotropia.py resultados_fmr.json [outros.json ...] --frequencia 9.4
+        [--modelo completo] [--pico 1] [--fixo Meff=8000] [--saida anisotropia.json]
+"""
+import argparse, json, os
+import numpy as np
+
+###############################################################
+###############################################################
+###############################################################
+#Modelo angular
+
+PARAMETROS = ('Meff', 'Hu', 'phi_u', 'H4', 'phi_4')
+ANGULARES = ('phi_u', 'phi_4')   # em graus para quem chama, radianos por dentro
+MODELOS = {
+    'uniaxial': ('Meff', 'Hu', 'phi_u'),
+    'cubica': ('Meff', 'H4', 'phi_4'),
+    'completo': PARAMETROS,
+}
+ITERACOES_EQUILIBRIO = 50
+MAX_PASSO_ANGULO = 0.2  # rad por iteração de Newton
+_GRAUS = np.array([np.pi / 180 if nome in ANGULARES else 1.0 for nome in PARAMETROS])
+
+
+def _termos(H, phi, phi_H, P):
+    """Torque (F1), os dois fatores da condição de ressonância (A, B) e senos/cossenos usados nas derivadas"""
+    Meff, Hu, phi_u, H4, phi_4 = (P[:, k, None] for k in range(5))
+    sp, cp = np.sin(phi - phi_H), np.cos(phi - phi_H)
+    sa, ca = np.sin(2 * (phi - phi_u)), np.cos(2 * (phi - phi_u))
+    sb, cb = np.sin(4 * (phi - phi_4)), np.cos(4 * (phi - phi_4))
+    F1 = H * sp + Hu / 2 * sa + H4 / 4 * sb
+    A = H * cp + Meff + Hu * (1 + ca) / 2 + H4 * (3 + cb) / 4
+    B = H * cp + Hu * ca + H4 * cb
+    return F1, A, B, (sp, cp, sa, ca, sb, cb)
+
+
+def _jacobiano_estado(H, P, A, B, trig):
+    """Derivadas de (F1, F2 = A·B - c) em relação a H e φ"""
+    Hu, H4 = P[:, 1, None], P[:, 3, None]
+    sp, cp, sa, ca, sb, cb = trig
+    A_phi = -H * sp - Hu * sa - H4 * sb
+    B_phi = -H * sp - 2 * Hu * sa - 4 * H4 * sb
+    return sp, B, cp * (A + B), A_phi * B + A * B_phi
+
+
+def resolver_ressonancia(phi_H, P, c, iteracoes=ITERACOES_EQUILIBRIO, tolerancia=1e-10):
+    """
+    Campo de ressonância e ângulo de equilíbrio para todos os ângulos de uma vez.
+
+    Newton no par (H, φ), partindo de φ = φ_H e do H que resolve a condição
+    de ressonância com φ = φ_H (uma equação do segundo grau). Supõe a amostra
+    saturada no plano: pontos sem convergência ou fora de um mínimo de
+    energia (∂²E/∂φ² <= 0) saem como NaN.
+
+    Args:
+        phi_H (np.ndarray): Ângulos do campo (rad), forma (S, N)
+        P (np.ndarray): Parâmetros (S, 5) na ordem de PARAMETROS, ângulos em rad
+        c (float): (f/γ)², em Oe²
+
+    Returns:
+        tuple: (H, φ), forma (S, N)
+    """
+    Meff, Hu, phi_u, H4, phi_4 = (P[:, k, None] for k in range(5))
+    ca, cb = np.cos(2 * (phi_H - phi_u)), np.cos(4 * (phi_H - phi_4))
+    a1 = Meff + Hu * (1 + ca) / 2 + H4 * (3 + cb) / 4
+    a2 = Hu * ca + H4 * cb
+    with np.errstate(invalid='ignore'):
+        H = (-(a1 + a2) + np.sqrt((a1 - a2) ** 2 + 4 * c)) / 2
+    phi = np.array(phi_H, dtype=float, copy=True)
+
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        for _ in range(iteracoes):
+            F1, A, B, trig = _termos(H, phi, phi_H, P)
+            F2 = A * B - c
+            F1_H, F1_phi, F2_H, F2_phi = _jacobiano_estado(H, P, A, B, trig)
+            det = F1_H * F2_phi - F1_phi * F2_H
+            dH = -(F2_phi * F1 - F1_phi * F2) / det
+            dphi = np.clip(-(F1_H * F2 - F2_H * F1) / det, -MAX_PASSO_ANGULO, MAX_PASSO_ANGULO)
+            H = H + dH
+            phi = phi + dphi
+            if np.nanmax(np.abs(dH), initial=0.0) <= tolerancia * np.sqrt(c) \
+                    and np.nanmax(np.abs(dphi), initial=0.0) <= tolerancia:
+                break
+        F1, A, B, _ = _termos(H, phi, phi_H, P)
+        ok = (np.abs(F1) <= 1e-6 * np.sqrt(c)) & (np.abs(A * B - c) <= 1e-6 * c) & (B > 0)
+    return np.where(ok, H, np.nan), phi
+
+
+def derivadas_Hr(H, phi, phi_H, P, c):
+    """
+    dHr/dparâmetro pela função implícita: (F1, F2)(H, φ; p) = 0 dá
+    [∂(F1, F2)/∂(H, φ)]·d(H, φ)/dp = -∂(F1, F2)/∂p.
+
+    Returns:
+        np.ndarray: Forma (S, N, 5), ângulos em rad
+    """
+    Hu, H4 = P[:, 1, None], P[:, 3, None]
+    F1, A, B, trig = _termos(H, phi, phi_H, P)
+    sp, cp, sa, ca, sb, cb = trig
+    F1_H, F1_phi, F2_H, F2_phi = _jacobiano_estado(H, P, A, B, trig)
+    det = F1_H * F2_phi - F1_phi * F2_H
+
+    zero = np.zeros_like(H)
+    # (∂F1/∂p, ∂A/∂p, ∂B/∂p) para Meff, Hu, φu, H4, φ4
+    parciais = (
+        (zero, np.ones_like(H), zero),
+        (sa / 2, (1 + ca) / 2, ca),
+        (-Hu * ca, Hu * sa, 2 * Hu * sa),
+        (sb / 4, (3 + cb) / 4, cb),
+        (-H4 * cb, H4 * sb, 4 * H4 * sb),
+    )
+    J = np.empty(H.shape + (5,))
+    for k, (g1, dA, dB) in enumerate(parciais):
+        g2 = dA * B + A * dB
+        J[..., k] = -(F2_phi * g1 - F1_phi * g2) / det
+    return J
+
+
+def campo_ressonancia(angulos, parametros, frequencia, gamma):
+    """
+    Hr(φ_H) de uma amostra.
+
+    Args:
+        angulos (np.ndarray): Ângulos do campo (graus)
+        parametros (dict): Meff, Hu, phi_u (graus), H4, phi_4 (graus); os que
+            faltarem valem 0
+        frequencia (float): Frequência da medida (GHz)
+        gamma (float): Razão giromagnética (GHz/Oe)
+
+    Returns:
+        np.ndarray: Hr (Oe), NaN onde não há solução saturada
+    """
+    P = np.array([[parametros.get(nome, 0.0) for nome in PARAMETROS]]) * _GRAUS
+    phi_H = np.radians(np.atleast_1d(np.asarray(angulos, dtype=float)))[None, :]
+    return resolver_ressonancia(phi_H, P, (frequencia / gamma) ** 2)[0][0]
+
+
+###############################################################
+###############################################################
+###############################################################
+#Ajuste em lote (várias amostras de uma vez)
+
+def dados_fmr(resultados, pico=1):
+    """
+    Ângulos e Hr de uma análise FMR: o dicionário devolvido por
+    GMAG.FMR_automatico / app.processar_fmr ou o caminho de resultados_fmr.json.
+
+    Returns:
+        tuple: (angulos, Hr), só os ângulos com Hr ajustado
+    """
+    if isinstance(resultados, (str, os.PathLike)):
+        with open(resultados) as f:
+            resultados = json.load(f)
+    nome = f'Hr{pico}'
+    if nome not in resultados.get('nomes_parametros', []):
+        raise ValueError(f"Os resultados não têm o parâmetro {nome}")
+    k = resultados['nomes_parametros'].index(nome)
+    angulos = np.array(resultados['angulos'], dtype=float)
+    Hr = np.array([np.nan if linha[k] is None else linha[k] for linha in resultados['tabela']], dtype=float)
+    validos = np.isfinite(Hr)
+    return angulos[validos], Hr[validos]
+
+
+def _empilhar(lista):
+    """Lista de arrays de tamanhos diferentes -> (S, N) com a última posição repetida e a máscara dos pontos reais"""
+    n = max(len(v) for v in lista)
+    saida = np.empty((len(lista), n))
+    mascara = np.zeros((len(lista), n), dtype=bool)
+    for i, v in enumerate(lista):
+        saida[i, :len(v)] = v
+        saida[i, len(v):] = v[-1]
+        mascara[i, :len(v)] = True
+    return saida, mascara
+
+
+def estimativas_iniciais(phi_H, Hr, mascara, c, livres, fixos):
+    """
+    Parâmetros iniciais pelos harmônicos de Hr(φ_H): o termo em 2φ dá Hu e φu,
+    o em 4φ dá H4 e φ4 (Hr é mínimo no eixo fácil), e o valor médio dá Meff
+    pela relação de Kittel isotrópica. As amplitudes são convertidas com a
+    sensibilidade linearizada de Hr a cada termo.
+    """
+    S = len(Hr)
+    X = np.stack((np.ones_like(phi_H), np.cos(2 * phi_H), np.sin(2 * phi_H),
+                  np.cos(4 * phi_H), np.sin(4 * phi_H)), axis=-1) * mascara[..., None]
+    XtX = np.einsum('snk,snl->skl', X, X) + 1e-9 * np.eye(5)
+    coef = np.linalg.solve(XtX, np.einsum('snk,sn->sk', X, Hr * mascara)[..., None])[..., 0]
+
+    H0 = coef[:, 0]
+    P = np.zeros((S, 5))
+    P[:, 0] = c / H0 - H0
+    if 'Meff' in fixos:
+        P[:, 0] = fixos['Meff']
+    A, B = H0 + P[:, 0], H0
+    if 'Hu' in livres:
+        P[:, 1] = np.hypot(coef[:, 1], coef[:, 2]) * (A + B) / (A + B / 2)
+        P[:, 2] = np.arctan2(-coef[:, 2], -coef[:, 1]) / 2
+    if 'H4' in livres:
+        P[:, 3] = np.hypot(coef[:, 3], coef[:, 4]) * (A + B) / (A + B / 4)
+        P[:, 4] = np.arctan2(-coef[:, 4], -coef[:, 3]) / 4
+    if 'Meff' not in fixos:
+        # Parte isotrópica das anisotropias no primeiro fator da ressonância
+        P[:, 0] -= P[:, 1] / 2 + 3 * P[:, 3] / 4
+    for nome, valor in fixos.items():
+        P[:, PARAMETROS.index(nome)] = valor * _GRAUS[PARAMETROS.index(nome)]
+    return P
+
+
+def _normalizar(P, livres):
+    """
+    Representação única: com Meff livre, Hu < 0 equivale a (Meff + Hu, -Hu,
+    φu + 90°) e H4 < 0 a (Meff + 1,5·H4, -H4, φ4 + 45°); φu fica em [0°, 180°)
+    e φ4 em [0°, 90°).
+    """
+    P = P.copy()
+    if 'Meff' in livres:
+        negativo = ('Hu' in livres) & (P[:, 1] < 0)
+        P[negativo, 0] += P[negativo, 1]
+        P[negativo, 1] *= -1
+        P[negativo, 2] += np.pi / 2
+        negativo = ('H4' in livres) & (P[:, 3] < 0)
+        P[negativo, 0] += 1.5 * P[negativo, 3]
+        P[negativo, 3] *= -1
+        P[negativo, 4] += np.pi / 4
+    P[:, 2] = np.mod(P[:, 2], np.pi)
+    P[:, 4] = np.mod(P[:, 4], np.pi / 2)
+    return P
+
+
+class ResultadoAnisotropia:
+    """Parâmetros, erros e estatísticas do ajuste angular (uma linha por amostra)"""
+
+    def __init__(self, nomes, angulos, Hr, valores, erros, livres, chisqr, nfev, sucesso, frequencia, gamma):
+        self.nomes = list(nomes)
+        self.angulos = angulos          # lista de arrays (graus), uma por amostra
+        self.Hr = Hr                    # lista de arrays (Oe)
+        self.valores = valores          # (S, 5) na ordem de PARAMETROS, ângulos em graus
+        self.erros = erros              # (S, 5), 0 nos fixos e nan quando indisponível
+        self.livres = livres            # nomes dos parâmetros ajustados
+        self.chisqr = chisqr
+        self.nfev = nfev
+        self.sucesso = sucesso
+        self.frequencia = frequencia
+        self.gamma = gamma
+        self.ndata = np.array([len(a) for a in angulos])
+        self.redchi = np.asarray(chisqr, dtype=float) / np.maximum(self.ndata - len(livres), 1)
+
+    def __len__(self):
+        return len(self.valores)
+
+    def __getitem__(self, nome):
+        return self.valores[:, PARAMETROS.index(nome)]
+
+    def parametros(self, i):
+        """Dicionário {nome: (valor, erro)} da amostra i"""
+        return {nome: (float(self.valores[i, k]), float(self.erros[i, k])) for k, nome in enumerate(PARAMETROS)}
+
+    def Hr_modelo(self, i, angulos=None):
+        """Hr do modelo ajustado para a amostra i (nos ângulos medidos, por padrão)"""
+        angulos = self.angulos[i] if angulos is None else angulos
+        valores = dict(zip(PARAMETROS, self.valores[i]))
+        return campo_ressonancia(angulos, valores, self.frequencia, self.gamma)
+
+    def exportar(self, i):
+        """Resultado da amostra i em um dicionário serializável em JSON"""
+        return {
+            'nome': self.nomes[i],
+            'parametros': {nome: {'valor': v, 'erro': e if np.isfinite(e) else None,
+                                  'livre': nome in self.livres}
+                           for nome, (v, e) in self.parametros(i).items()},
+            'chisqr': float(self.chisqr[i]),
+            'redchi': float(self.redchi[i]),
+            'ndata': int(self.ndata[i]),
+            'nfev': int(self.nfev[i]),
+            'sucesso': bool(self.sucesso[i]),
+            'frequencia': self.frequencia,
+        }
+
+    def relatorio(self, i):
+        """Relatório em texto no mesmo formato básico de lmfit fit_report"""
+        linhas = [
+            "[[Fit Statistics]]",
+            "    # fitting method   = batched Levenberg-Marquardt (anisotropia)",
+            f"    # function evals   = {self.nfev[i]}",
+            f"    # data points      = {self.ndata[i]}",
+            f"    # variables        = {len(self.livres)}",
+            f"    chi-square         = {self.chisqr[i]:.8g}",
+            f"    reduced chi-square = {self.redchi[i]:.8g}",
+            f"    success            = {bool(self.sucesso[i])}",
+            "[[Variables]]",
+        ]
+        for nome, (valor, erro) in self.parametros(i).items():
+            if nome not in self.livres:
+                linhas.append(f"    {nome + ':':<6} {valor:.8g} (fixed)")
+            elif np.isfinite(erro):
+                linhas.append(f"    {nome + ':':<6} {valor:.8g} +/- {erro:.8g}")
+            else:
+                linhas.append(f"    {nome + ':':<6} {valor:.8g} (erro não disponível)")
+        return "\n".join(linhas) + "\n"
+
+
+def _levenberg_marquardt(P, phi_H, Y, mascara, c, k_livres, max_iter, ftol, xtol):
+    """
+    Laço de ajustar_anisotropia, uma linha de P por amostra (ou ponto de partida).
+
+    Returns:
+        tuple: (P, chisqr, nfev, convergiu)
+    """
+    P = P.copy()
+
+    def residuos(P, linhas):
+        H, phi = resolver_ressonancia(phi_H[linhas], P, c)
+        r = np.where(mascara[linhas], H - Y[linhas], 0.0)
+        return r, phi, np.einsum('sn,sn->s', r, r)
+
+    S = len(P)
+    residuo, phi, chisqr = residuos(P, slice(None))
+    amortecimento = np.full(S, 1e-3)
+    nfev = np.ones(S, dtype=int)
+    convergiu = np.zeros(S, dtype=bool)
+    estagnou = np.zeros(S, dtype=bool)
+    ativos = np.flatnonzero(np.isfinite(chisqr))
+
+    for _ in range(max_iter):
+        if len(ativos) == 0:
+            break
+        Pa = P[ativos]
+        J = derivadas_Hr(residuo[ativos] + Y[ativos], phi[ativos], phi_H[ativos], Pa, c)[..., k_livres]
+        J = np.where(mascara[ativos, :, None], J, 0.0)
+        A = np.einsum('snk,snl->skl', J, J)
+        g = np.einsum('snk,sn->sk', J, residuo[ativos])
+
+        # Amortecimento de Marquardt, escalado pela diagonal de JᵀJ
+        diagonal = np.einsum('skk->sk', A)
+        diagonal = np.maximum(diagonal, 1e-12 * diagonal.max(axis=1, keepdims=True) + 1e-300)
+        A_amortecida = A.copy()
+        A_amortecida[:, range(len(k_livres)), range(len(k_livres))] += amortecimento[ativos, None] * diagonal
+        try:
+            passo = -np.linalg.solve(A_amortecida, g[..., None])[..., 0]
+        except np.linalg.LinAlgError:
+            passo = -np.einsum('skl,sl->sk', np.linalg.pinv(A_amortecida), g)
+
+        P_novo = Pa.copy()
+        P_novo[:, k_livres] += passo
+        residuo_novo, phi_novo, chisqr_novo = residuos(P_novo, ativos)
+        nfev[ativos] += 1
+
+        melhorou = np.isfinite(chisqr_novo) & (chisqr_novo <= chisqr[ativos])
+        aceitos = ativos[melhorou]
+        reducao = (chisqr[aceitos] - chisqr_novo[melhorou]) / np.maximum(chisqr[aceitos], 1e-300)
+        passo_pequeno = np.all(np.abs(P_novo[melhorou] - Pa[melhorou])[:, k_livres]
+                               <= xtol * (np.abs(Pa[melhorou][:, k_livres]) + xtol), axis=1)
+
+        P[aceitos] = P_novo[melhorou]
+        residuo[aceitos] = residuo_novo[melhorou]
+        phi[aceitos] = phi_novo[melhorou]
+        chisqr[aceitos] = chisqr_novo[melhorou]
+        amortecimento[aceitos] = np.maximum(amortecimento[aceitos] / 10, 1e-12)
+        amortecimento[ativos[~melhorou]] *= 10
+
+        convergiu[aceitos[(reducao <= ftol) | passo_pequeno]] = True
+        # Sem progresso possível: amortecimento enorme e nenhum passo aceito.
+        # Sai do laço sem contar como convergência
+        estagnou[ativos[~melhorou & (amortecimento[ativos] > 1e12)]] = True
+        ativos = ativos[~convergiu[ativos] & ~estagnou[ativos]]
+
+    return P, chisqr, nfev, convergiu
+
+
+def ajustar_anisotropia(angulos, Hr, frequencia, gamma, modelo='completo', fixos=None, iniciais=None, nomes=None,
+                        max_iter=200, ftol=1.5e-8, xtol=1.5e-8):
+    """
+    Ajusta o modelo angular a várias amostras de uma vez.
+
+    Levenberg-Marquardt vetorizado como em lorentz_lote: a cada iteração o
+    equilíbrio e a ressonância de todos os ângulos de todas as amostras
+    ativas são resolvidos juntos (resolver_ressonancia), o jacobiano
+    (amostras, ângulos, parâmetros) vem de derivadas_Hr e os sistemas
+    normais são resolvidos em lote, cada amostra com o seu amortecimento.
+
+    Com uma só frequência, Meff e a parte isotrópica das anisotropias se
+    confundem; fixar Meff (ex.: pelo ajuste de Kittel da impedância) deixa
+    Hu e H4 mais bem determinados.
+
+    Args:
+        angulos, Hr (sequência de np.ndarray): Ângulo do campo (graus) e Hr
+            (Oe) de cada amostra; os tamanhos podem diferir
+        frequencia (float): Frequência da medida (GHz)
+        gamma (float): Razão giromagnética (GHz/Oe)
+        modelo (str): 'uniaxial', 'cubica' ou 'completo' (ver MODELOS)
+        fixos (dict, opcional): Parâmetros mantidos fixos, {nome: valor}
+            (ângulos em graus); os que não estão no modelo ficam em 0
+        iniciais (np.ndarray, opcional): Parâmetros iniciais (S, 5), ângulos
+            em graus (padrão: estimativas_iniciais)
+        nomes (sequência, opcional): Nome de cada amostra
+        max_iter (int): Número máximo de iterações
+        ftol, xtol (float): Tolerâncias relativas no qui-quadrado e nos parâmetros
+
+    Returns:
+        ResultadoAnisotropia
+    """
+    if modelo not in MODELOS:
+        raise ValueError(f"Modelo de anisotropia desconhecido: {modelo} (use {', '.join(MODELOS)})")
+    fixos = dict(fixos or {})
+    desconhecidos = set(fixos) - set(PARAMETROS)
+    if desconhecidos:
+        raise ValueError(f"Parâmetros desconhecidos em fixos: {', '.join(sorted(desconhecidos))}")
+    livres = tuple(nome for nome in MODELOS[modelo] if nome not in fixos)
+    if not livres:
+        raise ValueError("Nenhum parâmetro livre para ajustar")
+    angulos = [np.asarray(a, dtype=float) for a in angulos]
+    Hr = [np.asarray(h, dtype=float) for h in Hr]
+    if len(angulos) != len(Hr) or not angulos:
+        raise ValueError("angulos e Hr devem ter o mesmo número de amostras (pelo menos uma)")
+    if any(len(a) != len(h) or len(a) <= len(livres) for a, h in zip(angulos, Hr)):
+        raise ValueError(f"Cada amostra precisa de mais de {len(livres)} ângulos, com angulos e Hr do mesmo tamanho")
+    S = len(angulos)
+    nomes = list(nomes) if nomes is not None else [str(i) for i in range(S)]
+
+    c = (frequencia / gamma) ** 2
+    phi_H, mascara = _empilhar([np.radians(a) for a in angulos])
+    Y, _ = _empilhar(Hr)
+    k_livres = [PARAMETROS.index(nome) for nome in livres]
+
+    if iniciais is None:
+        P = estimativas_iniciais(phi_H, Y, mascara, c, livres, fixos)
+    else:
+        P = np.array(iniciais, dtype=float).reshape(S, 5) * _GRAUS
+        for nome, valor in fixos.items():
+            P[:, PARAMETROS.index(nome)] = valor * _GRAUS[PARAMETROS.index(nome)]
+
+    # Com Meff fixo, Hu < 0 e H4 < 0 não equivalem a eixos girados (ver
+    # _normalizar); os harmônicos só dão o eixo, então também se parte do eixo
+    # girado com o sinal trocado e fica o melhor de cada amostra
+    candidatos = [P]
+    if 'Meff' in fixos:
+        for k, giro in ((1, np.pi / 2), (3, np.pi / 4)):
+            if PARAMETROS[k] in livres:
+                girados = [Q.copy() for Q in candidatos]
+                for Q in girados:
+                    Q[:, k] *= -1
+                    Q[:, k + 1] += giro
+                candidatos += girados
+    n = len(candidatos)
+    P, chisqr, nfev, convergiu = _levenberg_marquardt(
+        np.concatenate(candidatos), np.tile(phi_H, (n, 1)), np.tile(Y, (n, 1)), np.tile(mascara, (n, 1)), c,
+        k_livres, max_iter, ftol, xtol)
+    melhor = np.argmin(np.where(np.isfinite(chisqr), chisqr, np.inf).reshape(n, S), axis=0) * S + np.arange(S)
+    P, chisqr, convergiu = P[melhor], chisqr[melhor], convergiu[melhor]
+    nfev = nfev.reshape(n, S).sum(axis=0)
+
+    # Erros na representação normalizada: inv(JᵀJ) escalada pelo qui-quadrado reduzido, como no lmfit
+    P = _normalizar(P, livres)
+    H, phi = resolver_ressonancia(phi_H, P, c)
+    J = derivadas_Hr(H, phi, phi_H, P, c)[..., k_livres]
+    J = np.where(mascara[..., None] & np.isfinite(J), J, 0.0)
+    n_pontos = mascara.sum(axis=1)
+    redchi = chisqr / np.maximum(n_pontos - len(k_livres), 1)
+    erros = np.zeros((S, 5))
+    erros[:, k_livres] = np.nan
+    for i in range(S):
+        try:
+            cov = np.linalg.inv(J[i].T @ J[i]) * redchi[i]
+        except np.linalg.LinAlgError:
+            continue
+        d = np.diag(cov)
+        erros[i, k_livres] = np.where(d >= 0, np.sqrt(np.abs(d)), np.nan)
+
+    sucesso = convergiu & np.all(np.isfinite(P), axis=1) & np.isfinite(chisqr)
+    return ResultadoAnisotropia(nomes, angulos, Hr, P / _GRAUS, erros / _GRAUS, livres, chisqr, nfev, sucesso,
+                                frequencia, gamma)
+
+
+###############################################################
+###############################################################
+###############################################################
+#Linha de comando
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('resultados', nargs='+', help='resultados_fmr.json de cada amostra')
+    parser.add_argument('--frequencia', type=float, required=True, help='frequência da medida (GHz)')
+    parser.add_argument('--modelo', default='completo', choices=tuple(MODELOS))
+    parser.add_argument('--pico', type=int, default=1)
+    parser.add_argument('--fixo', action='append', default=[], metavar='NOME=VALOR')
+    parser.add_argument('--gamma', type=float, default=0.0028, help='GHz/Oe (o mesmo de GMAG.gamma)')
+    parser.add_argument('--saida', default='anisotropia.json')
+    args = parser.parse_args(argv)
+
+    fixos = {}
+    for item in args.fixo:
+        nome, _, valor = item.partition('=')
+        fixos[nome] = float(valor)
+
+    dados = [dados_fmr(caminho, args.pico) for caminho in args.resultados]
+    nomes = [os.path.basename(os.path.dirname(os.path.abspath(c))) or c for c in args.resultados]
+    resultado = ajustar_anisotropia([a for a, _ in dados], [h for _, h in dados], args.frequencia, args.gamma,
+                                    modelo=args.modelo, fixos=fixos, nomes=nomes)
+
+    print(f"{'amostra':<20} " + " ".join(f"{nome:>18}" for nome in PARAMETROS) + f" {'redchi':>10}")
+    for i, nome in enumerate(resultado.nomes):
+        colunas = [f"{v:>9.4g} ± {e:<6.2g}" for v, e in resultado.parametros(i).values()]
+        print(f"{nome:<20} " + " ".join(colunas) + f" {resultado.redchi[i]:>10.4g}")
+    with open(args.saida, 'w') as f:
+        json.dump([resultado.exportar(i) for i in range(len(resultado))], f, indent=2)
+    print(f"Resultados salvos em {args.saida}")
+    return 0 if resultado.sucesso.all() else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -3,169 +3,43 @@ import os
 import json
 import sys
 import traceback
+import uuid
+import logging
 import tkinter as tk
 from tkinter import filedialog
 import GMAG  # Sua biblioteca de análise
+import renderizacao
+import tarefas
+import eventos
+import cache_ajustes
+import metricas
+import registro_log
+import monitoramento
+import sessao_fmr
 from datetime import datetime
-import numpy as np, matplotlib.pyplot as plt, os, pandas as pd, scipy.optimize as spy, lmfit
-class AjustadorMultiplosAngulos:
-    def __init__(self, caminho_arquivo):
-        self.caminho_arquivo = caminho_arquivo
-        self.dados_completos = None
-        self.angulos_disponiveis = None
-        self.resultados = {}
-        self.carregar_dados()
-        
-    def carregar_dados(self):
-        """Carrega e organiza os dados por ângulo"""
-        try:
-            with open(self.caminho_arquivo, 'r') as f:
-                linhas = f.readlines()
-            
-            dados = []
-            for linha in linhas:
-                if not linha.strip() or linha.strip().startswith(('Filename:', '#')):
-                    continue
-                
-                valores = linha.split()
-                if len(valores) >= 3:
-                    try:
-                        linha_float = [float(v.replace(',', '.')) for v in valores[:3]]
-                        dados.append(linha_float)
-                    except ValueError:
-                        continue
-            
-            if not dados:
-                raise ValueError("Nenhum dado numérico válido encontrado")
-            
-            self.dados_completos = np.array(dados)
-            self.angulos_disponiveis = np.unique(self.dados_completos[:, 1])
-            print(f"Ângulos encontrados: {self.angulos_disponiveis}")
-                
-        except Exception as e:
-            print(f"Erro ao carregar dados: {str(e)}")
-            raise
-
-    @staticmethod
-    def modelo(params, x, y=None):
-        """Função modelo para o ajuste"""
-        a = params['a']
-        b = params['b']
-        c = params['c']
-        Hr1 = params['Hr1']
-        dH1 = params['dH1']
-        modelo = a + b * x + c * (x - Hr1) / ((x - Hr1)**2 + (dH1/2)**2)**2
-        if y is None:
-            return modelo
-        return modelo - y
-
-    def ajustar_angulo(self, angulo, parametros_iniciais):
-        """Realiza o ajuste para um ângulo específico"""
-        try:
-            # Filtra dados para o ângulo especificado
-            mascara = self.dados_completos[:, 1] == angulo
-            x = self.dados_completos[mascara, 0]
-            y = self.dados_completos[mascara, 2]
-            
-            if len(x) == 0:
-                raise ValueError(f"Nenhum dado encontrado para o ângulo {angulo}")
-            
-            params = lmfit.Parameters()
-            for nome, valor in parametros_iniciais.items():
-                params.add(nome, value=valor)
-                
-            params['Hr1'].set(min=900, max=950)
-            params['dH1'].set(min=0, max=100)
-            
-            # Cria o minimizador corretamente
-            minimizer = lmfit.Minimizer(self.modelo, params, fcn_args=(x, y))
-            
-            # Executa o ajuste
-            resultado = minimizer.minimize(method='leastsq')
-            
-            if not resultado.success:
-                raise RuntimeError("O ajuste não convergiu")
-            
-            # Armazena resultados
-            self.resultados[angulo] = {
-                'x': x,
-                'y': y,
-                'resultado': resultado,
-                'parametros': {
-                    'a': resultado.params['a'].value,
-                    'b': resultado.params['b'].value,
-                    'c': resultado.params['c'].value,
-                    'Hr1': resultado.params['Hr1'].value,
-                    'dH1': resultado.params['dH1'].value
-                }
-            }
-            
-            return resultado
-        
-        except Exception as e:
-            print(f"Erro no ajuste para ângulo {angulo}: {str(e)}")
-            raise
-
-    def plotar_angulo(self, angulo):
-        """Plota os dados e o ajuste para um ângulo específico"""
-        if angulo not in self.resultados:
-            raise ValueError(f"Nenhum resultado encontrado para o ângulo {angulo}")
-            
-        dados = self.resultados[angulo]
-        x = dados['x']
-        y = dados['y']
-        resultado = dados['resultado']
-        
-        plt.figure(figsize=(10, 6))
-        plt.plot(x, y, 'bo', label=f'Dados (ângulo={angulo})')
-        plt.plot(x, self.modelo(resultado.params, x), 
-                'r-', lw=2, label='Curva Ajustada')
-        plt.plot(x, y - self.modelo(resultado.params, x),
-                'g--', alpha=0.5, label='Resíduos')
-                
-        plt.xlabel("Campo (Oe)", fontsize=12)
-        plt.ylabel("Sinal (u.a.)", fontsize=12)
-        plt.title(f"Análise para Ângulo {angulo}", fontsize=14)
-        plt.legend()
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-        plt.show()
-
-    def plotar_comparacao(self):
-        """Plota todos os ângulos juntos para comparação"""
-        if not self.resultados:
-            raise ValueError("Nenhum resultado disponível para plotar")
-            
-        plt.figure(figsize=(12, 8))
-        
-        for angulo in sorted(self.resultados.keys()):
-            dados = self.resultados[angulo]
-            plt.plot(dados['x'], dados['y'], 'o', label=f'Ângulo {angulo} (dados)')
-            plt.plot(dados['x'], self.modelo(dados['resultado'].params, dados['x']), 
-                    '-', label=f'Ângulo {angulo} (ajuste)')
-        
-        plt.xlabel("Campo (Oe)", fontsize=12)
-        plt.ylabel("Sinal (u.a.)", fontsize=12)
-        plt.title("Comparação entre Ângulos", fontsize=14)
-        plt.legend()
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-        plt.show()
 
 # Configuração de logging
 LOG_FILE = 'gmag_app.log'
 
 def setup_logging():
-    """Configura o sistema de logging"""
-    from logging import getLogger, FileHandler, Formatter, INFO
-    logger = getLogger('GMAG')
-    handler = FileHandler(LOG_FILE)
-    handler.setFormatter(Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-    logger.addHandler(handler)
-    logger.setLevel(INFO)
-    return logger
+    """
+    Configura o sistema de logging: o logger só enfileira, e uma thread grava
+    em LOG_FILE (uma linha JSON por registro, com rotação por tamanho) e
+    guarda as linhas recentes em memória para get_logs
+    """
+    return registro_log.RegistroLog('GMAG', LOG_FILE)
+
+# Os handlers só são montados em main(): no Windows os processos de ajuste
+# (spawn) reimportam este módulo como __mp_main__ e não podem abrir cada um o
+# seu RotatingFileHandler e a sua thread de escrita no mesmo arquivo
+log_app = None
+logger = logging.getLogger('GMAG')
 
-logger = setup_logging()
+# Eventos do ajuste FMR para a página (função JS eventos_fmr), em lotes limitados por intervalo
+def _enviar_eventos_fmr(lote):
+    eel.eventos_fmr(lote)
+
+publicador_fmr = eventos.PublicadorEventos(_enviar_eventos_fmr)
 
 # Configuração inicial do Eel
 def initialize_eel():
@@ -206,8 +80,14 @@ def selecionar_arquivo(extensoes=None):
         return None
 
 @eel.expose
-def processar_drx(arquivo, dir_saida=None):
-    """Processa o arquivo para DRX com tratamento robusto"""
+def processar_drx(arquivo, dir_saida=None, picos=None, comprimento_onda=None, tempo=None, tarefa=None):
+    """
+    Processa o arquivo para DRX com tratamento robusto
+
+    Os picos das franjas são detectados automaticamente; `picos` (lista de
+    ângulos 2θ) substitui a detecção. `comprimento_onda` (nm) e `tempo` de
+    deposição (s) substituem os padrões de GMAG.DRX (Cu-Kα e 300 s).
+    """
     try:
         if not arquivo or not os.path.exists(arquivo):
             raise FileNotFoundError("Arquivo não encontrado ou não selecionado")
@@ -219,7 +99,10 @@ def processar_drx(arquivo, dir_saida=None):
             raise ValueError("O arquivo está vazio")
         
         # Processamento principal
-        resultado = GMAG.DRX(arquivo, output_dir=dir_saida)
+        if tarefa is not None:
+            tarefa.informar(f"Processando {os.path.basename(arquivo)}")
+        opcoes = {k: v for k, v in (('comprimento_onda', comprimento_onda), ('tempo', tempo)) if v is not None}
+        resultado = GMAG.DRX(arquivo, picos=picos, output_dir=dir_saida, **opcoes)
         
         msg = f"Análise DRX concluída | Arquivo: {os.path.basename(arquivo)}"
         if dir_saida:
@@ -232,6 +115,9 @@ def processar_drx(arquivo, dir_saida=None):
             'result': str(resultado),
             'timestamp': datetime.now().isoformat()
         }
+    except tarefas.TarefaCancelada:
+        logger.info("Análise DRX cancelada")
+        raise
     except Exception as e:
         error_msg = f"Erro no processamento DRX: {str(e)}"
         logger.error(error_msg)
@@ -258,18 +144,36 @@ def selecionar_diretorio(titulo="Selecione um diretório"):
         return None
 
 @eel.expose
-def processar_vsm(dir1, dir2, dir3):
-    """Processa análise VSM com validação e tratamento de erros"""
+def processar_vsm(dir1, dir2=None, dir3=None, tarefa=None):
+    """
+    Processa análise VSM com validação e tratamento de erros
+
+    Aceita (origem, destino) ou, como antes, (origem, intermediário, destino);
+    o diretório intermediário é opcional e só recebe cópias sem cabeçalho.
+    `tarefa` (tarefas.Tarefa) é preenchida quando a análise roda na fila de tarefas.
+    """
     try:
+        if dir3:
+            origem, intermediario, destino = dir1, dir2 or None, dir3
+        else:
+            origem, intermediario, destino = dir1, None, dir2
+
         # Validação dos diretórios
-        for i, dir_path in enumerate([dir1, dir2, dir3], 1):
+        for nome, dir_path in (('de origem', origem), ('de saída', destino)):
             if not dir_path or not os.path.isdir(dir_path):
-                raise ValueError(f"Diretório {i} inválido ou não selecionado")
+                raise ValueError(f"Diretório {nome} inválido ou não selecionado")
+        if intermediario and not os.path.isdir(intermediario):
+            raise ValueError("Diretório intermediário inválido")
         
-        logger.info(f'Iniciando processamento VSM | Dir1: {dir1} | Dir2: {dir2} | Dir3: {dir3}')
+        logger.info(f'Iniciando processamento VSM | Origem: {origem} | Intermediário: {intermediario} | Saída: {destino}')
         
         # Processamento principal
-        resultado = GMAG.VSM(dir1, dir2, dir3)
+        def informar_arquivo(n_feitos, n_total, nome):
+            if tarefa is not None:
+                tarefa.informar(f"Arquivo {nome} ({n_feitos + 1}/{n_total})" if nome else None,
+                                0.9 * n_feitos / max(n_total, 1))
+
+        resultado = GMAG.VSM(origem, intermediario, destino, progresso=informar_arquivo)
         
         msg = "Análise VSM concluída com sucesso"
         logger.info(msg)
@@ -278,8 +182,11 @@ def processar_vsm(dir1, dir2, dir3):
             'message': msg,
             'result': str(resultado),
             'timestamp': datetime.now().isoformat(),
-            'output_dirs': [dir1, dir2, dir3]
+            'output_dirs': [d for d in (origem, intermediario, destino) if d]
         }
+    except tarefas.TarefaCancelada:
+        logger.info("Análise VSM cancelada")
+        raise
     except Exception as e:
         error_msg = f"Erro no processamento VSM: {str(e)}"
         logger.error(error_msg)
@@ -291,7 +198,9 @@ def processar_vsm(dir1, dir2, dir3):
             'timestamp': datetime.now().isoformat()
         }
 @eel.expose
-def processar_fmr(caminho_arquivo, diretorio_destino, parametros_iniciais=None):
+def processar_fmr(caminho_arquivo, diretorio_destino, parametros_iniciais=None, n_processos=None, gerar_graficos=True,
+                  usar_cache=True, n_picos=None, forma=None, sessao=False, frequencia=None,
+                  modelo_anisotropia='completo', tarefa=None):
     """
     Processa análise FMR completa com interface gráfica
     
@@ -299,174 +208,328 @@ def processar_fmr(caminho_arquivo, diretorio_destino, parametros_iniciais=None):
         caminho_arquivo (str): Caminho do arquivo de dados
         diretorio_destino (str): Diretório para salvar resultados
         parametros_iniciais (dict): Parâmetros iniciais para o primeiro ângulo
+        n_processos (int): Número de processos para os ajustes (padrão: número de CPUs)
+        gerar_graficos (bool): False pula a renderização dos gráficos
+        usar_cache (bool): Reaproveita ajustes já feitos com os mesmos dados e
+            parâmetros iniciais (cache_ajustes); False refaz todos
+        n_picos (int): Número de picos do modelo (padrão: os de parametros_iniciais)
+        forma (str): 'lorentz' ou 'dowson' (padrão: pelos nomes de parametros_iniciais)
+        sessao (bool): True acrescenta o arquivo à sessão guardada em
+            diretorio_destino e só ajusta os ângulos que ainda não têm resultado
+            (ver sessao_fmr.FMR_incremental)
+        frequencia (float): Frequência da medida (GHz); quando dada, Hr1(ângulo)
+            também é ajustado pelo modelo de anisotropia (GMAG.anisotropia_fmr)
+            e o resultado vai em resultados['anisotropia']
+        modelo_anisotropia (str): 'uniaxial', 'cubica' ou 'completo'
+        tarefa (tarefas.Tarefa): Preenchida quando a análise roda na fila de tarefas
         
     Returns:
-        dict: Resultados completos da análise
+        dict: Resultados completos da análise (os gráficos são renderizados em
+        segundo plano e podem ficar prontos depois do retorno)
+
+    Durante a análise, eventos são publicados para a página (eventos_fmr):
+    'inicio', 'angulo' a cada ângulo ajustado (parâmetros, erros, qui-quadrado e
+    caminho do PNG), 'grafico' quando o PNG do ângulo fica pronto e 'fim'.
+    Todos levam 'execucao' (o id da tarefa, quando houver) para a página
+    separar análises simultâneas.
     """
+    execucao = tarefa.id if tarefa is not None else uuid.uuid4().hex
     try:
         # Validação dos inputs
         if not os.path.exists(caminho_arquivo):
             raise FileNotFoundError(f"Arquivo não encontrado: {caminho_arquivo}")
         
-        os.makedirs(diretorio_destino, exist_ok=True)
-        
-        # Inicializa o ajustador
-        ajustador = AjustadorMultiplosAngulos(caminho_arquivo)
+        renderizador = renderizacao.padrao() if gerar_graficos else renderizacao.Renderizador(ativo=False)
         
-        if not ajustador.angulos_disponiveis or len(ajustador.angulos_disponiveis) == 0:
-            raise ValueError("Nenhum ângulo encontrado nos dados")
-        
-        # Ordena os ângulos
-        angulos_ordenados = np.sort(ajustador.angulos_disponiveis)
-        
-        # Estrutura para armazenar resultados
-        resultados = {
-            'angulos': [],
-            'parametros': [],
-            'graficos_angulo': [],
-            'grafico_variacao': None,
-            'grafico_comparacao': None,
-            'arquivos_gerados': [],
-            'relatorio_path': None
-        }
-        
-        # Processamento do primeiro ângulo
-        primeiro_angulo = angulos_ordenados[0]
-        logger.info(f"Processando primeiro ângulo ({primeiro_angulo})")
-        
-        # Usa parâmetros padrão se não fornecidos
-        if not parametros_iniciais:
-            parametros_iniciais = {
-                'a': 1, 'b': 0, 'c': 1, 'd': 0.8,
-                'Hr1': 1000, 'dH1': 50, 
-                'Hr2': 1200, 'dH2': 50
-            }
-        
-        # Ajuste do primeiro ângulo
-        resultado = ajustador.ajustar_angulo(primeiro_angulo, parametros_iniciais)
-        parametros_anteriores = ajustador.resultados[primeiro_angulo]['parametros']
-        
-        # Salva gráfico do primeiro ângulo
-        fig = ajustador.plotar_angulo(primeiro_angulo, mostrar=False)
-        nome_arquivo = f"ajuste_angulo_{primeiro_angulo}.png"
-        caminho_completo = os.path.join(diretorio_destino, nome_arquivo)
-        fig.savefig(caminho_completo)
-        plt.close(fig)
-        
-        # Armazena resultados
-        resultados['angulos'].append(primeiro_angulo)
-        resultados['parametros'].append(parametros_anteriores)
-        resultados['graficos_angulo'].append(caminho_completo)
-        resultados['arquivos_gerados'].append(caminho_completo)
-        
-        # Processamento automático dos demais ângulos
-        for angulo in angulos_ordenados[1:]:
-            logger.info(f"Processando ângulo {angulo} automaticamente")
-            
-            resultado = ajustador.ajustar_angulo(angulo, parametros_anteriores)
-            parametros_anteriores = ajustador.resultados[angulo]['parametros']
-            
-            # Salva gráfico do ângulo
-            fig = ajustador.plotar_angulo(angulo, mostrar=False)
-            nome_arquivo = f"ajuste_angulo_{angulo}.png"
-            caminho_completo = os.path.join(diretorio_destino, nome_arquivo)
-            fig.savefig(caminho_completo)
-            plt.close(fig)
-            
-            # Armazena resultados
-            resultados['angulos'].append(angulo)
-            resultados['parametros'].append(parametros_anteriores)
-            resultados['graficos_angulo'].append(caminho_completo)
-            resultados['arquivos_gerados'].append(caminho_completo)
-        
-        # Gera gráfico de variação dos parâmetros
-        fig = plt.figure(figsize=(15, 10))
-        
-        # Prepara dados para plotagem
-        angulos = resultados['angulos']
-        parametros = resultados['parametros']
-        
-        # Extrai parâmetros de interesse
-        Hr1 = [p['Hr1'] for p in parametros]
-        Hr2 = [p['Hr2'] for p in parametros]
-        dH1 = [p['dH1'] for p in parametros]
-        dH2 = [p['dH2'] for p in parametros]
-        amp1 = [p['c'] for p in parametros]
-        amp2 = [p['d'] for p in parametros]
-        
-        # Plot dos parâmetros
-        plt.subplot(2, 2, 1)
-        plt.plot(angulos, Hr1, 'bo-', label='Pico 1')
-        plt.plot(angulos, Hr2, 'ro-', label='Pico 2')
-        plt.xlabel('Ângulo (graus)')
-        plt.ylabel('Campo de ressonância (Oe)')
-        plt.title('Posições dos picos')
-        plt.legend()
-        plt.grid(True)
-        
-        plt.subplot(2, 2, 2)
-        plt.plot(angulos, dH1, 'bo-', label='Pico 1')
-        plt.plot(angulos, dH2, 'ro-', label='Pico 2')
-        plt.xlabel('Ângulo (graus)')
-        plt.ylabel('Largura do pico (Oe)')
-        plt.title('Larguras dos picos')
-        plt.legend()
-        plt.grid(True)
-        
-        plt.subplot(2, 2, 3)
-        plt.plot(angulos, amp1, 'bo-', label='Pico 1 (c)')
-        plt.plot(angulos, amp2, 'ro-', label='Pico 2 (d)')
-        plt.xlabel('Ângulo (graus)')
-        plt.ylabel('Amplitude do pico')
-        plt.title('Amplitudes dos picos')
-        plt.legend()
-        plt.grid(True)
-        
-        plt.tight_layout()
-        
-        # Salva o gráfico
-        nome_arquivo = "variacao_parametros.png"
-        caminho_completo = os.path.join(diretorio_destino, nome_arquivo)
-        fig.savefig(caminho_completo)
-        plt.close(fig)
-        
-        resultados['grafico_variacao'] = caminho_completo
-        resultados['arquivos_gerados'].append(caminho_completo)
-        
-        # Gera gráfico de comparação entre ângulos
-        fig = ajustador.plotar_comparacao()
-        nome_arquivo = "comparacao_angulos.png"
-        caminho_completo = os.path.join(diretorio_destino, nome_arquivo)
-        fig.savefig(caminho_completo)
-        plt.close(fig)
-        
-        resultados['grafico_comparacao'] = caminho_completo
-        resultados['arquivos_gerados'].append(caminho_completo)
-        
-        # Salva resultados em JSON
-        relatorio_path = os.path.join(diretorio_destino, 'resultados_fmr.json')
-        with open(relatorio_path, 'w') as f:
-            json.dump(resultados, f, indent=2)
-        resultados['relatorio_path'] = relatorio_path
-        resultados['arquivos_gerados'].append(relatorio_path)
+        # Ajuste de todos os ângulos (âncoras em sequência, demais em paralelo)
+        logger.info(f"Ajustando ângulos de {caminho_arquivo} com até {n_processos or os.cpu_count()} processos")
+        publicado_inicio = []
+
+        def grafico_pronto(angulo, caminho):
+            def publicar(futuro):
+                publicador_fmr.publicar({
+                    'tipo': 'grafico',
+                    'execucao': execucao,
+                    'angulo': float(angulo),
+                    'grafico': caminho,
+                    'ok': not futuro.cancelled() and futuro.exception() is None
+                })
+            return publicar
+
+        def informar_angulo(angulo, registro, n_concluidos, n_total, caminho, futuro):
+            if not publicado_inicio:
+                publicador_fmr.publicar({
+                    'tipo': 'inicio',
+                    'execucao': execucao,
+                    'arquivo': caminho_arquivo,
+                    'n_total': n_total
+                })
+                publicado_inicio.append(True)
+            if futuro is not None:
+                futuro.add_done_callback(grafico_pronto(angulo, caminho))
+
+            resultado = registro['resultado']
+            publicador_fmr.publicar({
+                'tipo': 'angulo',
+                'execucao': execucao,
+                'angulo': float(angulo),
+                'parametros': {nome: eventos.numero(p.value) for nome, p in resultado.params.items()},
+                'erros': {nome: eventos.numero(p.stderr) for nome, p in resultado.params.items()},
+                'chisqr': eventos.numero(resultado.chisqr),
+                'redchi': eventos.numero(resultado.redchi),
+                'grafico': caminho if futuro is not None else None,
+                'n_concluidos': n_concluidos,
+                'n_total': n_total
+            })
+            if tarefa is not None:
+                tarefa.informar(f"Ângulo {angulo} ajustado ({n_concluidos}/{n_total})",
+                                0.9 * n_concluidos / n_total)
+
+        if tarefa is not None:
+            tarefa.informar("Ajustando ângulos", 0.0)
+        cache = cache_ajustes.padrao() if usar_cache else None
+        acertos_antes = cache.acertos if cache is not None else 0
+        analise = sessao_fmr.FMR_incremental if sessao else GMAG.FMR_automatico
+        resultados = analise(caminho_arquivo, diretorio_destino, parametros_iniciais,
+                             n_processos=n_processos, renderizador=renderizador, cache=cache,
+                             progresso=informar_angulo, metricas=metricas.padrao(),
+                             contexto={'execucao': execucao}, n_picos=n_picos, forma=forma)
+        if cache is not None and cache.acertos > acertos_antes:
+            logger.info(f"{cache.acertos - acertos_antes} ajuste(s) reaproveitado(s) do cache")
+        if frequencia:
+            if tarefa is not None:
+                tarefa.informar("Ajustando a anisotropia", 0.95)
+            try:
+                ajuste = GMAG.anisotropia_fmr(resultados, diretorio_destino, frequencia, modelo=modelo_anisotropia,
+                                              renderizador=renderizador)
+                resultados['anisotropia'] = ajuste.exportar(0)
+                logger.info(f"Anisotropia ajustada:\n{ajuste.relatorio(0)}")
+            except ValueError as e:
+                logger.warning(f"Ajuste de anisotropia não realizado: {str(e)}")
+                resultados['anisotropia'] = None
+        relatorio_path = resultados['relatorio_path']
         
         logger.info("Análise FMR concluída com sucesso")
+        publicador_fmr.publicar({
+            'tipo': 'fim',
+            'execucao': execucao,
+            'success': True,
+            'grafico_variacao': resultados['grafico_variacao'],
+            'grafico_comparacao': resultados['grafico_comparacao'],
+            'relatorio_path': relatorio_path
+        })
         return {
             'success': True,
             'message': "Análise FMR concluída com sucesso",
             'resultados': resultados
         }
         
+    except tarefas.TarefaCancelada:
+        logger.info("Análise FMR cancelada")
+        publicador_fmr.publicar({'tipo': 'fim', 'execucao': execucao, 'success': False, 'message': "Análise cancelada"})
+        raise
     except Exception as e:
         error_msg = f"Erro no processamento FMR: {str(e)}"
         logger.error(error_msg)
         logger.error(traceback.format_exc())
+        publicador_fmr.publicar({'tipo': 'fim', 'execucao': execucao, 'success': False, 'message': error_msg})
+        return {
+            'success': False,
+            'message': error_msg,
+            'error_details': str(e)
+        }
+
+def monitorar_pasta(tipo, origem, destino, intervalo=monitoramento.INTERVALO,
+                    estabilidade=monitoramento.ESTABILIDADE, tarefa=None):
+    """
+    Acompanha a pasta onde o equipamento está gravando e analisa cada arquivo
+    assim que ele fica pronto (ver monitoramento.py), até a tarefa ser cancelada;
+    no cancelamento os ajustes finais são feitos e o resumo é devolvido.
+
+    Ocupa um trabalhador da fila de tarefas enquanto estiver monitorando.
+
+    Args:
+        tipo (str): 'impedancia', 'vsm' ou 'eletroima'
+        origem (str): Pasta monitorada
+        destino (str): Pasta de resultados
+    """
+    try:
+        for nome, dir_path in (('de origem', origem), ('de saída', destino)):
+            if not dir_path or not os.path.isdir(dir_path):
+                raise ValueError(f"Diretório {nome} inválido ou não selecionado")
+        opcoes = {'metricas': metricas.padrao(), 'cache': cache_ajustes.padrao()} if tipo == 'impedancia' else {}
+        analise = monitoramento.criar_analise(tipo, destino, **opcoes)
+        monitor = monitoramento.MonitorPasta(origem, analise, intervalo, estabilidade)
+        logger.info(f'Monitorando {origem} ({tipo}) | Saída: {destino}')
+
+        def informar(novidades, resumo):
+            logger.info(f"Monitoramento: {len(novidades)} arquivo(s) novo(s), {resumo['arquivos']} no total")
+            if tarefa is not None:
+                tarefa.informar(f"{resumo['arquivos']} arquivo(s) analisado(s)")
+
+        parar = (lambda: tarefa.cancelamento_pedido) if tarefa is not None else None
+        try:
+            resumo = monitor.executar(parar=parar, progresso=informar)
+        except tarefas.TarefaCancelada:
+            # Cancelamento visto em informar, no meio de uma varredura: executar
+            # já finalizou a análise, então o resumo final está pronto
+            resumo = analise.resumo()
+        renderizacao.padrao().aguardar()
+        logger.info(f"Monitoramento de {origem} encerrado: {resumo['arquivos']} arquivo(s)")
+        return {
+            'success': True,
+            'message': "Monitoramento encerrado",
+            'resumo': resumo,
+            'timestamp': datetime.now().isoformat()
+        }
+    except Exception as e:
+        error_msg = f"Erro no monitoramento: {str(e)}"
+        logger.error(error_msg)
+        logger.error(traceback.format_exc())
+        return {
+            'success': False,
+            'message': error_msg,
+            'error_details': str(e)
+        }
+
+# Fila de tarefas: as análises rodam em segundo plano e a interface consulta o andamento
+TIPOS_TAREFA = {
+    'fmr': processar_fmr,
+    'vsm': processar_vsm,
+    'drx': processar_drx,
+    'monitor': monitorar_pasta,
+}
+
+@eel.expose
+def iniciar_tarefa(tipo, argumentos=None):
+    """
+    Submete uma análise à fila de tarefas e retorna na hora
+
+    Args:
+        tipo (str): 'fmr', 'vsm', 'drx' ou 'monitor'
+        argumentos (list ou dict): Argumentos de processar_<tipo>, posicionais
+            (lista) ou nomeados (dicionário)
+
+    Returns:
+        dict: success e id da tarefa, para estado_tarefa/cancelar_tarefa
+    """
+    try:
+        if tipo not in TIPOS_TAREFA:
+            raise ValueError(f"Tipo de tarefa desconhecido: {tipo}")
+        if isinstance(argumentos, dict):
+            args, kwargs = [], argumentos
+        else:
+            args, kwargs = list(argumentos or []), {}
+
+        id_tarefa = tarefas.padrao().submeter(tipo, TIPOS_TAREFA[tipo], *args,
+                                               descricao=f"{tipo.upper()}: {args[0] if args else ''}", **kwargs)
+        logger.info(f'Tarefa {tipo.upper()} submetida: {id_tarefa}')
+        return {
+            'success': True,
+            'id': id_tarefa,
+            'timestamp': datetime.now().isoformat()
+        }
+    except Exception as e:
+        error_msg = f"Erro ao submeter tarefa: {str(e)}"
+        logger.error(error_msg)
         return {
             'success': False,
             'message': error_msg,
             'error_details': str(e)
         }
 
+@eel.expose
+def estado_tarefa(id_tarefa, desde=0):
+    """
+    Estado, progresso e mensagens novas de uma tarefa
+
+    Args:
+        id_tarefa (str): Id devolvido por iniciar_tarefa
+        desde (int): Índice da primeira mensagem desejada (o 'proxima' da consulta anterior)
+    """
+    try:
+        return dict(tarefas.padrao().estado(id_tarefa, desde), success=True)
+    except Exception as e:
+        return {'success': False, 'message': str(e)}
+
+@eel.expose
+def listar_tarefas():
+    """Resumo de todas as tarefas (em execução, na fila e finalizadas recentes)"""
+    return tarefas.padrao().listar()
+
+@eel.expose
+def cancelar_tarefa(id_tarefa):
+    """Pede o cancelamento de uma tarefa; a análise para no próximo ponto de verificação"""
+    try:
+        cancelada = tarefas.padrao().cancelar(id_tarefa)
+        if cancelada:
+            logger.info(f'Cancelamento pedido para a tarefa {id_tarefa}')
+        return {'success': cancelada,
+                'message': "Cancelamento pedido" if cancelada else "A tarefa já terminou"}
+    except Exception as e:
+        return {'success': False, 'message': str(e)}
+
+@eel.expose
+def limpar_cache_ajustes(caminho_arquivo=None):
+    """Esquece os ajustes guardados (todos, ou só os do arquivo indicado)"""
+    try:
+        cache = cache_ajustes.padrao()
+        if caminho_arquivo:
+            removidas = cache.invalidar_origem(caminho_arquivo)
+            msg = f"{removidas} ajuste(s) de {os.path.basename(caminho_arquivo)} removido(s) do cache"
+        else:
+            cache.limpar()
+            msg = "Cache de ajustes limpo"
+        logger.info(msg)
+        return {'success': True, 'message': msg}
+    except Exception as e:
+        logger.error(f"Erro ao limpar o cache de ajustes: {str(e)}")
+        return {'success': False, 'message': str(e)}
+
+@eel.expose
+def obter_metricas(rotina=None, execucao=None, desde=0):
+    """
+    Métricas dos ajustes e gráficos (tempo, nfev, convergência, qui-quadrado).
+
+    Args:
+        rotina (str, opcional): Só desta rotina ('fmr', 'impedancia', 'grafico')
+        execucao (str, opcional): Só desta execução (o 'execucao' dos eventos da análise FMR)
+        desde (int): Só registros com seq >= desde; passe o 'proximo' da chamada
+            anterior para receber só os novos
+
+    Returns:
+        dict: success, registros, resumo (totais por rotina dos registros
+        devolvidos) e proximo
+    """
+    try:
+        registro = metricas.padrao()
+        proximo = registro.proximo
+        registros = registro.listar(rotina=rotina, execucao=execucao, desde=desde)
+        return {'success': True, 'registros': registros, 'resumo': registro.resumo(registros),
+                'proximo': proximo}
+    except Exception as e:
+        logger.error(f"Erro ao obter métricas: {str(e)}")
+        return {'success': False, 'message': str(e)}
+
+@eel.expose
+def exportar_metricas(caminho, formato=None, rotina=None, execucao=None):
+    """Grava as métricas em CSV ou JSON (formato pela extensão, se não for dado)"""
+    try:
+        n = metricas.padrao().exportar(caminho, formato, rotina=rotina, execucao=execucao)
+        msg = f"{n} registro(s) de métricas exportado(s) para {caminho}"
+        logger.info(msg)
+        return {'success': True, 'message': msg}
+    except Exception as e:
+        logger.error(f"Erro ao exportar métricas: {str(e)}")
+        return {'success': False, 'message': str(e)}
+
+@eel.expose
+def limpar_metricas():
+    """Esquece as métricas guardadas"""
+    metricas.padrao().limpar()
+    logger.info("Métricas limpas")
+    return {'success': True, 'message': "Métricas limpas"}
+
 @eel.expose
 def visualizar_grafico(caminho_arquivo):
     """Abre uma visualização do gráfico salvo"""
@@ -521,20 +584,24 @@ def carregar_configuracoes():
 
 @eel.expose
 def get_logs(limit=100):
-    """Obtém os últimos logs para exibição na interface"""
+    """Obtém os últimos logs para exibição na interface (da memória ou do fim do arquivo)"""
     try:
-        if os.path.exists(LOG_FILE):
-            with open(LOG_FILE, 'r') as f:
-                lines = f.readlines()[-limit:]
-                return ''.join(lines)
+        if log_app is None:
+            return "Nenhum log disponível"
+        linhas = log_app.ultimas(int(limit))
+        if linhas:
+            return '\n'.join(linhas) + '\n'
         return "Nenhum log disponível"
     except Exception as e:
         return f"Erro ao ler logs: {str(e)}"
 
 # Inicialização segura da aplicação
 def main():
+    global log_app
+    log_app = setup_logging()
     try:
         initialize_eel()
+        eel.spawn(publicador_fmr.laco, eel.sleep)
         logger.info("Iniciando aplicativo GMAG")
         
         # Configurações de inicialização
@@ -563,6 +630,7 @@ def main():
         logger.critical(traceback.format_exc())
         sys.exit(1)
     finally:
+        tarefas.padrao().encerrar(cancelar=True)
         logger.info("Aplicativo GMAG encerrado")
 
 if __name__ == '__main__':
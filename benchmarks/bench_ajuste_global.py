@@ -0,0 +1,75 @@
+"""
+Benchmark do ajuste global da impedância (ajuste_global.py) contra o caminho
+em duas etapas de GMAG.impedancia (Lorentziana por espectro com lorentz_lote,
+depois Kittel e largura de linha sobre Hr e dH), em espectros sintéticos
+gerados com Hk, Meff, ΔH0 e α/γ conhecidos. Também mostra a memória que um
+jacobiano denso (pontos x parâmetros) ocuparia no lugar dos blocos.
+
+Uso:
+    python benchmarks/bench_ajuste_global.py [--espectros 20 100 300] [--pontos 2000] [--ruido 0.05]
+"""
+import argparse, os, sys, time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import GMAG, ajuste_global, lorentz_lote, incerteza
+
+VERDADEIROS = {'Hk': 30.0, 'Meff': 800.0, 'dho': 10.0, 'alfa_gamma': 25.0}
+
+
+def gerar_espectros(n_espectros, n_pontos, ruido, semente=0):
+    """Segunda metade de cada espectro (como em impedancia), 1001 MHz + 10 MHz por espectro"""
+    rng = np.random.default_rng(semente)
+    f = (1001 + 10 * np.arange(n_espectros)) / 1000
+    Hr = ajuste_global.campo_ressonancia(f, VERDADEIROS['Hk'], VERDADEIROS['Meff'], GMAG.gamma)
+    dH = VERDADEIROS['dho'] + VERDADEIROS['alfa_gamma'] * f
+    # Janela de campo que acompanha a ressonância, como numa varredura real
+    x = np.linspace(0, 1, n_pontos)
+    xs = [Hr[i] - 5 * dH[i] + 10 * dH[i] * x for i in range(n_espectros)]
+    P = np.column_stack((np.full(n_espectros, 5.0), np.full(n_espectros, 0.8), Hr, dH))
+    ys = [lorentz_lote.lorentz_lote(xs[i], P[i:i + 1])[0] + rng.normal(0, ruido, n_pontos)
+          for i in range(n_espectros)]
+    return xs, ys, f
+
+
+def duas_etapas(xs, ys, f):
+    """Ajuste por espectro e depois Kittel e reta (os mesmos ajustes vetorizados do bootstrap)"""
+    Hr, dH = np.empty(len(xs)), np.empty(len(xs))
+    for i, (x, y) in enumerate(zip(xs, ys)):
+        resultado = lorentz_lote.ajustar_lorentz_lote(x, y[None, :])
+        Hr[i], dH[i] = resultado['Hr'][0], resultado['dH'][0]
+    (Hk,), (Meff,) = incerteza.ajustar_kittel(Hr, f, 100.0, 1000.0, GMAG.gamma, iteracoes=1000)
+    (dho,), (alfa_gamma,) = incerteza.ajustar_reta(f, dH)
+    return {'Hk': Hk, 'Meff': Meff, 'dho': dho, 'alfa_gamma': alfa_gamma}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--espectros', type=int, nargs='+', default=[20, 100, 300])
+    parser.add_argument('--pontos', type=int, default=2000)
+    parser.add_argument('--ruido', type=float, default=0.05)
+    args = parser.parse_args()
+
+    print(f"{'espectros':>10} {'pontos':>9} {'global (s)':>11} {'2 etapas (s)':>13} "
+          f"{'|ΔHk| global':>13} {'|ΔHk| 2 etapas':>15} {'J denso (MB)':>13} {'J blocos (MB)':>14}")
+    for n in args.espectros:
+        xs, ys, f = gerar_espectros(n, args.pontos, args.ruido)
+
+        t0 = time.perf_counter()
+        resultado = ajuste_global.ajustar_impedancia_global(xs, ys, f, GMAG.gamma)
+        t_global = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        separado = duas_etapas(xs, ys, f)
+        t_etapas = time.perf_counter() - t0
+
+        pontos = n * args.pontos
+        denso = pontos * (len(ajuste_global.GLOBAIS) + len(ajuste_global.LOCAIS) * n) * 8 / 1e6
+        blocos = pontos * (len(ajuste_global.GLOBAIS) + len(ajuste_global.LOCAIS)) * 8 / 1e6
+        print(f"{n:>10} {pontos:>9} {t_global:>11.3f} {t_etapas:>13.3f} "
+              f"{abs(resultado.globais[0] - VERDADEIROS['Hk']):>13.3f} "
+              f"{abs(separado['Hk'] - VERDADEIROS['Hk']):>15.3f} {denso:>13.0f} {blocos:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark do MotorAjusteParalelo contra o ajuste sequencial encadeado
+(cada ângulo partindo do anterior), em uma varredura FMR sintética.
+
+Uso:
+    python benchmarks/bench_ajuste_paralelo.py [--angulos 90] [--pontos 2000] [--processos 1 2 4 8]
+"""
+import argparse, os, sys, tempfile, time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import GMAG
+from ajuste_paralelo import MotorAjusteParalelo
+
+PARAMETROS_INICIAIS = {'a': 0, 'b': 0, 'c': -1e6, 'Hr1': 925, 'dH1': 40}
+
+
+def gerar_varredura(caminho, n_angulos, n_pontos, semente=0):
+    """Varredura sintética: Hr1 e dH1 variam suavemente com o ângulo"""
+    rng = np.random.default_rng(semente)
+    campo = np.linspace(800, 1050, n_pontos)
+    blocos = []
+    for angulo in np.linspace(0, 360, n_angulos, endpoint=False):
+        Hr = 925 + 20 * np.cos(np.radians(2 * angulo))
+        dH = 40 + 10 * np.sin(np.radians(angulo)) ** 2
+        sinal = -1e6 * (campo - Hr) / ((campo - Hr) ** 2 + (dH / 2) ** 2) ** 2
+        sinal += 0.01 * np.abs(sinal).max() * rng.normal(size=n_pontos)
+        blocos.append(np.column_stack([campo, np.full(n_pontos, angulo), sinal]))
+    np.savetxt(caminho, np.vstack(blocos))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--angulos', type=int, default=90)
+    parser.add_argument('--pontos', type=int, default=2000)
+    parser.add_argument('--processos', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument('--estrategia', default='ancoras', choices=MotorAjusteParalelo.ESTRATEGIAS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        caminho = os.path.join(tmp, 'varredura.dat')
+        gerar_varredura(caminho, args.angulos, args.pontos)
+
+        ajustador = GMAG.AjustadorMultiplosAngulos(caminho)
+        t0 = time.perf_counter()
+        _, serial = MotorAjusteParalelo(ajustador).ajustar_sequencial(PARAMETROS_INICIAIS)
+        t_serial = time.perf_counter() - t0
+        print(f"\nsequencial: {t_serial:.3f} s ({args.angulos} ângulos x {args.pontos} pontos)")
+
+        print(f"{'processos':>10} {'tempo (s)':>10} {'ganho':>8} {'max |dHr1| (Oe)':>16} {'max |ddH1| (Oe)':>16}")
+        for n in sorted(set(args.processos)):
+            ajustador = GMAG.AjustadorMultiplosAngulos(caminho)
+            motor = MotorAjusteParalelo(ajustador, n_processos=n, estrategia=args.estrategia)
+            t0 = time.perf_counter()
+            _, paralelo = motor.ajustar_todos(PARAMETROS_INICIAIS)
+            t = time.perf_counter() - t0
+            dHr = max(abs(p['Hr1'] - s['Hr1']) for p, s in zip(paralelo, serial))
+            ddH = max(abs(p['dH1'] - s['dH1']) for p, s in zip(paralelo, serial))
+            print(f"{n:>10} {t:>10.3f} {t_serial / t:>7.2f}x {dHr:>16.2e} {ddH:>16.2e}")
+
+
+if __name__ == '__main__':
+    main()
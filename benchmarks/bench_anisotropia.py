@@ -0,0 +1,82 @@
+"""
+Benchmark do ajuste de anisotropia (anisotropia.py) em amostras sintéticas:
+equilíbrio + ressonância resolvidos para todos os ângulos de uma vez contra
+um fsolve por ângulo, e o ajuste em lote de muitas amostras contra um
+ajuste por amostra (o mesmo código, uma amostra por chamada).
+
+Uso:
+    python benchmarks/bench_anisotropia.py [--amostras 10 100 1000] [--angulos 72] [--frequencia 9.4]
+"""
+import argparse, os, sys, time
+import numpy as np
+from scipy.optimize import fsolve
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import GMAG, anisotropia
+
+
+def gerar_amostras(n_amostras, n_angulos, frequencia, ruido=1.0, semente=0):
+    """Parâmetros sorteados e Hr(ângulo) de cada amostra, com ruído"""
+    rng = np.random.default_rng(semente)
+    verdadeiros = np.column_stack((rng.uniform(6000, 10000, n_amostras), rng.uniform(0, 80, n_amostras),
+                                   rng.uniform(0, 180, n_amostras), rng.uniform(0, 40, n_amostras),
+                                   rng.uniform(0, 90, n_amostras)))
+    angulos = np.linspace(0, 360, n_angulos, endpoint=False)
+    Hr = [anisotropia.campo_ressonancia(angulos, dict(zip(anisotropia.PARAMETROS, v)), frequencia, GMAG.gamma)
+          + rng.normal(0, ruido, n_angulos) for v in verdadeiros]
+    return verdadeiros, [angulos] * n_amostras, Hr
+
+
+def ressonancia_fsolve(angulos, parametros, frequencia):
+    """Referência: equilíbrio e ressonância resolvidos ângulo a ângulo com scipy.optimize.fsolve"""
+    P = np.array([[parametros[nome] for nome in anisotropia.PARAMETROS]]) * anisotropia._GRAUS
+    c = (frequencia / GMAG.gamma) ** 2
+    H0 = anisotropia.resolver_ressonancia(np.radians(angulos)[None, :], P, c)[0][0]
+    saida = np.empty(len(angulos))
+    for i, phi_H in enumerate(np.radians(angulos)):
+        def condicoes(v):
+            F1, A, B, _ = anisotropia._termos(np.array([[v[0]]]), np.array([[v[1]]]), phi_H, P)
+            return [F1[0, 0], (A * B - c)[0, 0] / np.sqrt(c)]
+        saida[i] = fsolve(condicoes, [H0[i] + 5, phi_H])[0]
+    return saida
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--amostras', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--angulos', type=int, default=72)
+    parser.add_argument('--frequencia', type=float, default=9.4)
+    args = parser.parse_args()
+
+    verdadeiros, angulos, Hr = gerar_amostras(1, args.angulos, args.frequencia)
+    parametros = dict(zip(anisotropia.PARAMETROS, verdadeiros[0]))
+    t0 = time.perf_counter()
+    referencia = ressonancia_fsolve(angulos[0], parametros, args.frequencia)
+    t_fsolve = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    vetorizado = anisotropia.campo_ressonancia(angulos[0], parametros, args.frequencia, GMAG.gamma)
+    t_vetor = time.perf_counter() - t0
+    print(f"\nHr em {args.angulos} ângulos: fsolve {1e3 * t_fsolve:.2f} ms, vetorizado {1e3 * t_vetor:.2f} ms "
+          f"({t_fsolve / t_vetor:.0f}x), max |ΔHr| = {np.max(np.abs(referencia - vetorizado)):.1e} Oe\n")
+
+    print(f"{'amostras':>9} {'lote (s)':>9} {'uma a uma (s)':>14} {'ganho':>7} {'convergiram':>12} "
+          f"{'mediana |ΔHu| (Oe)':>19}")
+    for n in args.amostras:
+        verdadeiros, angulos, Hr = gerar_amostras(n, args.angulos, args.frequencia)
+
+        t0 = time.perf_counter()
+        resultado = anisotropia.ajustar_anisotropia(angulos, Hr, args.frequencia, GMAG.gamma)
+        t_lote = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for a, h in zip(angulos, Hr):
+            anisotropia.ajustar_anisotropia([a], [h], args.frequencia, GMAG.gamma)
+        t_um = time.perf_counter() - t0
+
+        erro_Hu = np.median(np.abs(resultado['Hu'] - verdadeiros[:, 1]))
+        print(f"{n:>9} {t_lote:>9.3f} {t_um:>14.3f} {t_um / t_lote:>6.1f}x {resultado.sucesso.sum():>12} "
+              f"{erro_Hu:>19.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark da espessura por franjas de Kiessig em muitas varreduras:
+espessura.ajustar_franjas (uma chamada vetorizada) contra um curve_fit de
+linear_func por varredura, como o DRX fazia. Confere que as espessuras batem e
+mede também a estimativa por FFT (espessura.espessura_fft).
+
+Uso:
+    python benchmarks/bench_espessura.py [--varreduras 10000] [--pontos-fft 4000]
+"""
+import argparse, os, sys, time
+import numpy as np
+import scipy.optimize as spy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import espessura
+
+
+def linear_func(x, a, b):
+    return a * x + b
+
+
+def gerar_picos(n_varreduras, semente=0):
+    """Picos de franjas de filmes entre 10 e 80 nm, com 4 a 30 picos e ruído de posição"""
+    rng = np.random.default_rng(semente)
+    espessuras = rng.uniform(10, 80, n_varreduras)
+    picos = []
+    for d in espessuras:
+        n = rng.integers(4, 31)
+        q = 2 * np.pi / d * (np.arange(n) + 3)
+        dois_theta = 2 * np.degrees(np.arcsin(q * espessura.CU_KALFA / (4 * np.pi)))
+        picos.append(dois_theta + rng.normal(scale=1e-3, size=n))
+    return picos, espessuras
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--varreduras', type=int, default=10000)
+    parser.add_argument('--pontos-fft', type=int, default=4000)
+    args = parser.parse_args()
+
+    picos, espessuras = gerar_picos(args.varreduras)
+
+    t0 = time.perf_counter()
+    vetorizado = espessura.ajustar_franjas(picos)
+    t_vet = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    laco = []
+    for p in picos:
+        qf = espessura.vetor_espalhamento(p)
+        (a, b), _ = spy.curve_fit(linear_func, np.arange(len(p)), qf)
+        laco.append(2 * np.pi / a)
+    t_laco = time.perf_counter() - t0
+
+    diferenca = np.max(np.abs(vetorizado['espessura'] - laco) / laco)
+    desvio = np.abs(vetorizado['espessura'] - espessuras) / vetorizado['erro_espessura']
+    print(f"{args.varreduras} varreduras")
+    print(f"  curve_fit por varredura: {t_laco:8.3f} s")
+    print(f"  ajustar_franjas:         {t_vet:8.3f} s  ({t_laco / t_vet:.0f}x)")
+    print(f"  maior diferença relativa: {diferenca:.1e}; erro real / erro estimado (mediana): {np.median(desvio):.2f}")
+
+    rng = np.random.default_rng(1)
+    n_fft = min(args.varreduras, 200)
+    x = np.linspace(0.5, 6, args.pontos_fft)
+    q = espessura.vetor_espalhamento(x)
+    varreduras = [(x, q**-4 * (1.5 + np.cos(q * d)) * (1 + 0.02 * rng.normal(size=x.size))) for d in espessuras[:n_fft]]
+    t0 = time.perf_counter()
+    fft = espessura.espessura_fft(varreduras)
+    t_fft = time.perf_counter() - t0
+    erro_fft = np.max(np.abs(fft['espessura'] - espessuras[:n_fft]) / espessuras[:n_fft])
+    print(f"  espessura_fft ({n_fft} varreduras de {args.pontos_fft} pontos): {t_fft:.3f} s, "
+          f"maior erro relativo {erro_fft:.1e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark dos modelos de figura reaproveitáveis (renderizacao.Grafico com
+`modelo`) contra uma figura nova por arquivo, no gráfico de ajuste de
+impedancia. Mede o tempo por gráfico, o número de figuras abertas e o pico
+de memória do processo.
+
+Uso:
+    python benchmarks/bench_figuras.py [--arquivos 1000] [--dpi 100]
+"""
+import argparse, os, resource, sys, tempfile, time
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import renderizacao
+
+
+def grafico_ajuste(i, x, caminho, dpi, modelo):
+    """Mesmo gráfico de ajuste gerado por GMAG.impedancia para cada arquivo"""
+    Hr, dH = 2000 + i % 500, 60 + i % 40
+    y = dH**2 / ((x - Hr)**2 + dH**2)
+    g = renderizacao.Grafico(caminho, figsize=(10, 6), dpi=dpi, bbox_inches='tight', modelo=modelo)
+    g.plot(x, y + 0.01 * np.sin(i * x), 'b.', label="Dados experimentais")
+    g.plot(x, y, 'r-', linewidth=2, label="Ajuste Lorentziano (2ª metade)")
+    g.xlabel("Campo (Oe)", fontsize=12)
+    g.ylabel("Impedância (Ω)", fontsize=12)
+    g.title(f"Ajuste - arquivo_{i}", fontsize=14)
+    g.grid(True, alpha=0.3)
+    g.legend()
+    g.text(0.02, 0.98, f"Hr = {Hr:.2f} ± 0.10 Oe\ndH = {dH:.2f} ± 0.10 Oe", transform=renderizacao.EIXOS,
+           verticalalignment='top', bbox=dict(facecolor='white', alpha=0.8))
+    return g
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--arquivos', type=int, default=1000)
+    parser.add_argument('--pontos', type=int, default=800)
+    parser.add_argument('--dpi', type=int, default=100)
+    args = parser.parse_args()
+
+    x = np.linspace(1500, 3000, args.pontos)
+    print(f"{'figuras':>10} {'ms/gráfico':>11} {'figuras abertas':>16} {'pico RSS (MB)':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for modo, modelo in (('novas', None), ('modelo', 'impedancia_ajuste')):
+            t0 = time.perf_counter()
+            for i in range(args.arquivos):
+                caminho = os.path.join(tmp, f"{modo}_{i % 10}.png")
+                renderizacao.renderizar(grafico_ajuste(i, x, caminho, args.dpi, modelo))
+            tempo = (time.perf_counter() - t0) / args.arquivos
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            print(f"{modo:>10} {1000 * tempo:>11.1f} {len(plt.get_fignums()):>16} {rss:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
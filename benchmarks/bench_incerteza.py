@@ -0,0 +1,72 @@
+"""
+Benchmark do bootstrap das incertezas da impedância (incerteza.py): réplicas
+ajustadas em blocos vetorizados, com 1 a N processos, contra um laço de
+ajustes lmfit (uma réplica por vez, como seria com GMAG.impedancia), em
+dados sintéticos de Kittel e largura de linha.
+
+Uso:
+    python benchmarks/bench_incerteza.py [--espectros 60] [--amostras 5000] [--lmfit 200] [--processos 1 2 4]
+"""
+import argparse, os, sys, time
+import numpy as np, lmfit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import GMAG, incerteza
+
+
+def gerar_dados(n_espectros, Hk=30.0, Meff=800.0, semente=0):
+    """Hr e dH de cada frequência (1001 MHz + 10 MHz por espectro), com ruído"""
+    rng = np.random.default_rng(semente)
+    f = (1001 + 10 * np.arange(n_espectros)) / 1000
+    u = (-Meff + np.sqrt(Meff**2 + 4 * (f / GMAG.gamma)**2)) / 2
+    Hr = u - Hk + rng.normal(0, 2, n_espectros)
+    dH = 10 + 25 * f + rng.normal(0, 1, n_espectros)
+    return Hr, dH, f
+
+
+def bootstrap_lmfit(Hr, dH, f, n_amostras, semente=0):
+    """Bootstrap por resíduos com um ajuste lmfit por réplica (referência)"""
+    rng = np.random.default_rng(semente)
+    modelo = lmfit.Model(GMAG.frequencia_de_ressonancia)
+    params = modelo.make_params(Hk=100, Meff=1000)
+    params['Hk'].min = 0
+    params['Meff'].min = 0
+    ajuste = modelo.fit(f, params, x=Hr)
+    f_ajuste = ajuste.best_fit
+    Hk = []
+    for _ in range(n_amostras):
+        f_b = f_ajuste + (f - f_ajuste)[rng.integers(0, len(f), len(f))]
+        Hk.append(modelo.fit(f_b, ajuste.params, x=Hr).params['Hk'].value)
+        np.polyfit(f, dH, 1)
+    return np.std(Hk, ddof=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--espectros', type=int, default=60)
+    parser.add_argument('--amostras', type=int, default=5000)
+    parser.add_argument('--lmfit', type=int, default=200, help='réplicas do laço lmfit')
+    parser.add_argument('--processos', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    Hr, dH, f = gerar_dados(args.espectros)
+
+    t0 = time.perf_counter()
+    erro_lmfit = bootstrap_lmfit(Hr, dH, f, args.lmfit)
+    t_lmfit = (time.perf_counter() - t0) / args.lmfit
+    print(f"\nlaço lmfit: {1e3 * t_lmfit:.2f} ms/réplica, erro de Hk = {erro_lmfit:.3f} Oe ({args.lmfit} réplicas)")
+
+    print(f"{'método':>9} {'processos':>10} {'tempo (s)':>10} {'ms/réplica':>11} {'ganho':>8} {'erro Hk (Oe)':>13}")
+    for metodo in incerteza.METODOS:
+        for n in sorted(set(args.processos)):
+            t0 = time.perf_counter()
+            resultado = incerteza.incerteza_impedancia(Hr, dH, f, GMAG.gamma, n_amostras=args.amostras,
+                                                       metodo=metodo, n_processos=n)
+            t = time.perf_counter() - t0
+            por_replica = t / args.amostras
+            print(f"{metodo:>9} {n:>10} {t:>10.3f} {1e3 * por_replica:>11.4f} {t_lmfit / por_replica:>7.0f}x "
+                  f"{resultado['erro']['Hk']:>13.3f}")
+
+
+if __name__ == '__main__':
+    main()
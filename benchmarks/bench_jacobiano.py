@@ -0,0 +1,64 @@
+"""
+Benchmark do jacobiano analítico (Dfun) contra o jacobiano numérico do
+MINPACK em AjustadorMultiplosAngulos.ajustar_espectro, para o modelo de um
+pico e o de dois picos. Também confere que os dois modos chegam aos mesmos
+parâmetros.
+
+Uso:
+    python benchmarks/bench_jacobiano.py [--espectros 50] [--pontos 2000]
+"""
+import argparse, os, sys, time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from GMAG import AjustadorMultiplosAngulos
+
+CASOS = {
+    'um pico': {'a': 0, 'b': 0, 'c': -1e6, 'Hr1': 920, 'dH1': 45},
+    'dois picos': {'a': 0, 'b': 0, 'c': -1e6, 'Hr1': 920, 'dH1': 45,
+                   'd': -5e5, 'Hr2': 1010, 'dH2': 35},
+}
+
+
+def gerar_espectros(parametros_iniciais, n_espectros, n_pontos, semente=0):
+    """Espectros sintéticos com picos deslocados em relação aos parâmetros iniciais"""
+    rng = np.random.default_rng(semente)
+    x = np.linspace(800, 1100, n_pontos)
+    espectros = []
+    for _ in range(n_espectros):
+        verdadeiros = dict(parametros_iniciais)
+        verdadeiros['Hr1'] = rng.uniform(910, 940)
+        verdadeiros['dH1'] = rng.uniform(30, 60)
+        if 'Hr2' in verdadeiros:
+            verdadeiros['Hr2'] = rng.uniform(990, 1030)
+        y = AjustadorMultiplosAngulos.avaliar(verdadeiros, x)
+        espectros.append((x, y + 0.01 * np.abs(y).max() * rng.normal(size=n_pontos)))
+    return espectros
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--espectros', type=int, default=50)
+    parser.add_argument('--pontos', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'modelo':>11} {'jacobiano':>10} {'nfev/ângulo':>12} {'ms/ângulo':>10} {'max |dp|/|p|':>14}")
+    for nome, parametros_iniciais in CASOS.items():
+        espectros = gerar_espectros(parametros_iniciais, args.espectros, args.pontos)
+        resultados = {}
+        for modo in ('numerico', 'analitico'):
+            t0 = time.perf_counter()
+            resultados[modo] = [AjustadorMultiplosAngulos.ajustar_espectro(x, y, parametros_iniciais, modo)
+                                for x, y in espectros]
+            resultados[modo + '_tempo'] = (time.perf_counter() - t0) / len(espectros)
+
+        diferenca = max(abs(a.params[p].value - n.params[p].value) / max(abs(n.params[p].value), 1e-12)
+                        for a, n in zip(resultados['analitico'], resultados['numerico'])
+                        for p in ('c', 'Hr1', 'dH1'))
+        for modo in ('numerico', 'analitico'):
+            nfev = np.mean([r.nfev for r in resultados[modo]])
+            print(f"{nome:>11} {modo:>10} {nfev:>12.1f} {1000 * resultados[modo + '_tempo']:>10.2f} {diferenca:>14.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark do carregador vetorizado (leitura.carregar_colunas) contra o
+carregador linha a linha original de AjustadorMultiplosAngulos.carregar_dados,
+e das leituras seguintes, que só mapeiam em memória o auxiliar .npy gravado
+na primeira.
+
+Uso:
+    python benchmarks/bench_leitura.py [--linhas 100000 1000000 10000000]
+"""
+import argparse, os, sys, tempfile, time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import leitura
+
+
+def carregar_linha_a_linha(caminho_arquivo):
+    """Carregador original (readlines + float por valor)"""
+    with open(caminho_arquivo, 'r') as f:
+        linhas = f.readlines()
+    dados = []
+    for linha in linhas:
+        if not linha.strip() or linha.strip().startswith(('Filename:', '#')):
+            continue
+        valores = linha.split()
+        if len(valores) >= 3:
+            try:
+                dados.append([float(v.replace(',', '.')) for v in valores[:3]])
+            except ValueError:
+                continue
+    return np.array(dados)
+
+
+def gerar_arquivo(caminho, n_linhas, pontos_por_angulo=2000, semente=0):
+    """Gera uma varredura FMR sintética com vírgula decimal e cabeçalhos por ângulo"""
+    rng = np.random.default_rng(semente)
+    with open(caminho, 'w') as f:
+        escritas = 0
+        angulo = 0.0
+        while escritas < n_linhas:
+            n = min(pontos_por_angulo, n_linhas - escritas)
+            campo = np.linspace(500, 1500, n)
+            sinal = rng.normal(size=n)
+            f.write(f"Filename: angulo_{angulo:.1f}.dat\n# Campo Angulo Sinal\n")
+            bloco = np.column_stack([campo, np.full(n, angulo), sinal])
+            texto = "\n".join(" ".join(f"{v:.6f}" for v in linha) for linha in bloco)
+            f.write(texto.replace('.', ',') + "\n")
+            escritas += n
+            angulo += 2.5
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--linhas', type=int, nargs='+', default=[10**5, 10**6, 10**7])
+    parser.add_argument('--sem-original', action='store_true',
+                        help='Não executa o carregador original (útil para 10^7 linhas)')
+    args = parser.parse_args()
+
+    print(f"{'linhas':>10} {'MB':>8} {'original (s)':>14} {'vetorizado (s)':>16} {'ganho':>8} {'auxiliar (ms)':>15}")
+    with tempfile.TemporaryDirectory() as tmp:
+        leitura.DIRETORIO_AUXILIAR = os.path.join(tmp, 'auxiliares')
+        for n in args.linhas:
+            caminho = os.path.join(tmp, f"fmr_{n}.dat")
+            gerar_arquivo(caminho, n)
+            tamanho = os.path.getsize(caminho) / 2**20
+
+            t0 = time.perf_counter()
+            colunas = leitura.carregar_colunas(caminho)  # grava o auxiliar
+            t_vet = time.perf_counter() - t0
+            assert len(colunas[0]) == n
+
+            t0 = time.perf_counter()
+            mapeadas = leitura.carregar_colunas(caminho)
+            t_aux = time.perf_counter() - t0
+            assert all(np.array_equal(a, b) for a, b in zip(colunas, mapeadas))
+
+            if args.sem_original:
+                print(f"{n:>10} {tamanho:>8.1f} {'-':>14} {t_vet:>16.3f} {'-':>8} {1000 * t_aux:>15.2f}")
+                continue
+
+            t0 = time.perf_counter()
+            dados = carregar_linha_a_linha(caminho)
+            t_orig = time.perf_counter() - t0
+            assert np.array_equal(dados, np.column_stack(colunas))
+            print(f"{n:>10} {tamanho:>8.1f} {t_orig:>14.3f} {t_vet:>16.3f} {t_orig / t_vet:>7.1f}x {1000 * t_aux:>15.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark do ajuste em lote da Lorentziana de impedancia (lorentz_lote)
+contra o caminho original, um lmfit.Model por arquivo. Também confere que
+os dois caminhos chegam aos mesmos parâmetros e erros.
+
+Uso:
+    python benchmarks/bench_lorentz_lote.py [--espectros 500] [--pontos 1000]
+"""
+import argparse, os, sys, time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import lorentz_lote
+
+
+def gerar_espectros(n_espectros, n_pontos, semente=0):
+    """Segunda metade de varreduras sintéticas, todas na mesma grade de campo"""
+    rng = np.random.default_rng(semente)
+    x = np.linspace(1500, 3000, n_pontos)
+    P = np.column_stack([rng.uniform(1, 3, n_espectros), rng.uniform(-0.5, 0.5, n_espectros),
+                         rng.uniform(1900, 2600, n_espectros), rng.uniform(50, 200, n_espectros)])
+    Y = lorentz_lote.lorentz_lote(x, P) + 0.02 * rng.normal(size=(n_espectros, n_pontos))
+    return x, Y
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--espectros', type=int, default=500)
+    parser.add_argument('--pontos', type=int, default=1000)
+    args = parser.parse_args()
+
+    x, Y = gerar_espectros(args.espectros, args.pontos)
+
+    t0 = time.perf_counter()
+    lote = lorentz_lote.ajustar_lorentz_lote(x, Y)
+    tempo_lote = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    individual = lorentz_lote.ajustar_lorentz_individual(x, Y)
+    tempo_individual = time.perf_counter() - t0
+
+    print(f"{'caminho':>10} {'tempo (s)':>10} {'ms/espectro':>12} {'reajustes lmfit':>16}")
+    print(f"{'lote':>10} {tempo_lote:>10.2f} {1000 * tempo_lote / len(Y):>12.2f} {np.sum(lote.metodo == 'lmfit'):>16}")
+    print(f"{'lmfit':>10} {tempo_individual:>10.2f} {1000 * tempo_individual / len(Y):>12.2f} {'-':>16}")
+
+    print(f"\n{'parâmetro':>10} {'max |dp|/erro':>14} {'max |de|/erro':>14}")
+    for nome in lorentz_lote.NOMES:
+        erro = individual.stderr(nome)
+        dp = np.nanmax(np.abs(lote[nome] - individual[nome]) / erro)
+        de = np.nanmax(np.abs(lote.stderr(nome) - erro) / erro)
+        print(f"{nome:>10} {dp:>14.2e} {de:>14.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark do modelo de N picos (modelo_fmr.ModeloPicos) no ajuste de um
+espectro, com 2 a 4 picos nas formas Lorentziana e Dowson, jacobiano
+analítico contra o numérico do MINPACK. Também mostra o erro das posições
+ajustadas em relação às verdadeiras.
+
+Uso:
+    python benchmarks/bench_modelo_fmr.py [--espectros 20] [--pontos 2000]
+"""
+import argparse, os, sys, time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from GMAG import AjustadorMultiplosAngulos
+import modelo_fmr
+
+
+def gerar_espectros(modelo, n_espectros, n_pontos, semente=0):
+    """Espectros sintéticos e os parâmetros iniciais (verdadeiros deslocados) de cada um"""
+    rng = np.random.default_rng(semente)
+    x = np.linspace(800, 900 + 150 * modelo.n_picos, n_pontos)
+    espectros = []
+    for _ in range(n_espectros):
+        verdadeiros = {'a': 0.0, 'b': 0.0}
+        for k in range(1, modelo.n_picos + 1):
+            verdadeiros[modelo_fmr.nome_amplitude(k)] = -rng.uniform(0.5e6, 1e6)
+            verdadeiros[f'Hr{k}'] = (rng.uniform(910, 940) if k == 1 else 800 + 150 * k + rng.uniform(-10, 10))
+            verdadeiros[f'dH{k}'] = rng.uniform(30, 60)
+            if modelo.forma == 'dowson':
+                verdadeiros[f'assim{k}'] = rng.uniform(-0.3, 0.3)
+        verdadeiros = modelo.completar(verdadeiros)
+        y = modelo.avaliar(verdadeiros, x)
+        y = y + 0.01 * np.abs(y).max() * rng.normal(size=n_pontos)
+        iniciais = {nome: (v + rng.uniform(-5, 5) if nome.startswith('Hr') else v * rng.uniform(0.8, 1.2))
+                    for nome, v in verdadeiros.items()}
+        espectros.append((x, y, verdadeiros, iniciais))
+    return espectros
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--espectros', type=int, default=20)
+    parser.add_argument('--pontos', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'picos':>5} {'forma':>8} {'jacobiano':>10} {'nfev':>7} {'ms/espectro':>12} {'max |dHr| (Oe)':>15}")
+    for forma in modelo_fmr.FORMAS:
+        for n_picos in (2, 3, 4):
+            modelo = modelo_fmr.ModeloPicos(n_picos, forma)
+            espectros = gerar_espectros(modelo, args.espectros, args.pontos)
+            for modo in ('numerico', 'analitico'):
+                t0 = time.perf_counter()
+                resultados = [AjustadorMultiplosAngulos.ajustar_espectro(x, y, iniciais, modo)
+                              for x, y, _, iniciais in espectros]
+                tempo = (time.perf_counter() - t0) / len(espectros)
+                nfev = np.mean([r.nfev for r in resultados])
+                erro = max(abs(r.params[f'Hr{k}'].value - verdadeiros[f'Hr{k}'])
+                           for r, (_, _, verdadeiros, _) in zip(resultados, espectros)
+                           for k in range(1, n_picos + 1))
+                print(f"{n_picos:>5} {forma:>8} {modo:>10} {nfev:>7.1f} {1000 * tempo:>12.2f} {erro:>15.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Benchmark da detecção automática de picos (deteccao_picos.detectar_picos) em
+varreduras de refletividade sintéticas com muitas franjas, conferindo quantas
+franjas foram achadas e o erro de posição contra os máximos verdadeiros.
+
+Uso:
+    python benchmarks/bench_picos.py [--pontos 10000 100000 1000000] [--franjas 150]
+"""
+import argparse, os, sys, time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import deteccao_picos
+
+
+def gerar_varredura(n_pontos, n_franjas, ruido=0.02, semente=0):
+    """Refletividade decaindo com franjas de Kiessig e ruído multiplicativo"""
+    rng = np.random.default_rng(semente)
+    x = np.linspace(0.5, 8.0, n_pontos)
+    periodo = 7.5 / n_franjas
+    y = 1e6 * np.exp(-1.2 * x) * (1.3 + np.cos(2 * np.pi * (x - 0.5) / periodo))
+    y *= 1 + ruido * rng.normal(size=n_pontos)
+    # Máximos do sinal sem ruído, achados numa grade bem mais fina
+    fina = np.linspace(0.5, 8.0, 20 * n_pontos)
+    log_fino = -1.2 * fina / np.log(10) + np.log10(1.3 + np.cos(2 * np.pi * (fina - 0.5) / periodo))
+    i = np.flatnonzero((log_fino[1:-1] > log_fino[:-2]) & (log_fino[1:-1] >= log_fino[2:])) + 1
+    return x, y, fina[i]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pontos', type=int, nargs='+', default=[10**4, 10**5, 10**6])
+    parser.add_argument('--franjas', type=int, default=150)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'pontos':>9} {'franjas':>8} {'achadas':>8} {'tempo (ms)':>11} {'erro máx':>10} {'(% período)':>12} {'(passos)':>9}")
+    for n in args.pontos:
+        x, y, verdadeiros = gerar_varredura(n, args.franjas)
+        tempos = []
+        for _ in range(args.repeticoes):
+            t0 = time.perf_counter()
+            r = deteccao_picos.detectar_picos(x, y)
+            tempos.append(time.perf_counter() - t0)
+        erro = np.abs(verdadeiros[:, None] - r['posicoes'][None, :]).min(axis=0).max()
+        periodo = 7.5 / args.franjas
+        print(f"{n:>9} {len(verdadeiros):>8} {len(r['posicoes']):>8} {1000 * min(tempos):>11.1f} "
+              f"{erro:>10.2e} {100 * erro / periodo:>12.3f} {erro / (x[1] - x[0]):>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
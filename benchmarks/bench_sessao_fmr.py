@@ -0,0 +1,56 @@
+"""
+Benchmark da sessão FMR (sessao_fmr.SessaoFMR): uma varredura que chega em
+partes, refeita por inteiro a cada parte (FMR_automatico) contra a sessão,
+que só ajusta os ângulos novos. Os gráficos ficam desativados.
+
+Uso:
+    python benchmarks/bench_sessao_fmr.py [--angulos 90] [--partes 5] [--pontos 2000] [--processos 4]
+"""
+import argparse, os, sys, tempfile, time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import GMAG, renderizacao, sessao_fmr
+from bench_ajuste_paralelo import PARAMETROS_INICIAIS, gerar_varredura
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--angulos', type=int, default=90)
+    parser.add_argument('--partes', type=int, default=5)
+    parser.add_argument('--pontos', type=int, default=2000)
+    parser.add_argument('--processos', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    renderizador = renderizacao.Renderizador(ativo=False)
+    with tempfile.TemporaryDirectory() as tmp:
+        completo = os.path.join(tmp, 'varredura.dat')
+        gerar_varredura(completo, args.angulos, args.pontos)
+        dados = np.loadtxt(completo)
+        angulos = np.unique(dados[:, 1])
+
+        print(f"{'parte':>6} {'ângulos':>8} {'tudo de novo (s)':>17} {'sessão (s)':>11} {'novos':>6} "
+              f"{'max |dHr1| (Oe)':>16}")
+        for k, grupo in enumerate(np.array_split(angulos, args.partes), start=1):
+            parte = os.path.join(tmp, f'parte_{k}.dat')
+            np.savetxt(parte, dados[np.isin(dados[:, 1], grupo)])
+            acumulado = os.path.join(tmp, f'ate_{k}.dat')
+            np.savetxt(acumulado, dados[dados[:, 1] <= grupo[-1]])
+
+            t0 = time.perf_counter()
+            tudo = GMAG.FMR_automatico(acumulado, os.path.join(tmp, f'tudo_{k}'), PARAMETROS_INICIAIS,
+                                       n_processos=args.processos, renderizador=renderizador)
+            t_tudo = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            sessao = sessao_fmr.FMR_incremental(parte, os.path.join(tmp, 'sessao'), PARAMETROS_INICIAIS,
+                                                n_processos=args.processos, renderizador=renderizador)
+            t_sessao = time.perf_counter() - t0
+
+            diferenca = max(abs(a['Hr1'] - b['Hr1']) for a, b in zip(tudo['parametros'], sessao['parametros']))
+            print(f"{k:>6} {len(sessao['angulos']):>8} {t_tudo:>17.3f} {t_sessao:>11.3f} "
+                  f"{len(sessao['novos']):>6} {diferenca:>16.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+import hashlib, json, os, threading, time, types, uuid
+import numpy as np, lmfit
+from lmfit.minimizer import MinimizerResult
+
+###############################################################
+###############################################################
+###############################################################
+#Cache em disco de resultados de ajuste, endereçado pelo conteúdo
+
+DIRETORIO_PADRAO = os.path.join(os.path.expanduser('~'), '.gmag', 'cache_ajustes')
+MAX_BYTES = 256 * 1024**2
+VERSAO = 1  # muda quando o formato das entradas muda
+
+
+def _atualizar_hash(h, objeto):
+    """Alimenta o hash com um objeto de forma estável (arrays pelos bytes, dicionários ordenados)"""
+    if isinstance(objeto, np.ndarray):
+        objeto = np.ascontiguousarray(objeto)
+        h.update(f"nd{objeto.dtype.str}{objeto.shape}".encode())
+        h.update(objeto.tobytes())
+    elif isinstance(objeto, dict):
+        h.update(b"{")
+        for k in sorted(objeto, key=str):
+            _atualizar_hash(h, str(k))
+            _atualizar_hash(h, objeto[k])
+        h.update(b"}")
+    elif isinstance(objeto, (list, tuple)):
+        h.update(b"[")
+        for item in objeto:
+            _atualizar_hash(h, item)
+        h.update(b"]")
+    elif isinstance(objeto, lmfit.Parameters):
+        _atualizar_hash(h, {nome: (p.value, p.min, p.max, p.vary, p.expr) for nome, p in objeto.items()})
+    elif isinstance(objeto, (float, np.floating)):
+        # Parâmetros soltos com 12 algarismos: sementes vindas de ajustes refeitos
+        # variam no último bit (ordem de soma no BLAS) e não devem mudar a chave
+        h.update(f"f{float(objeto):.12g}".encode())
+    else:
+        h.update(f"{type(objeto).__name__}:{objeto!r}".encode())
+
+
+def chave(*partes):
+    """
+    Chave de cache (sha256 em hexadecimal) das partes dadas: arrays de dados,
+    identidade do modelo, parâmetros iniciais, limites, opções...
+    """
+    h = hashlib.sha256(f"v{VERSAO}".encode())
+    for parte in partes:
+        _atualizar_hash(h, parte)
+    return h.hexdigest()
+
+
+def identidade(*objetos):
+    """
+    Identidade do código que define um ajuste: nome e bytecode das funções
+    dadas (classes e módulos entram com todas as suas funções e métodos).
+    Alterar o modelo, os limites fixados no código ou a estratégia de sementes
+    muda a identidade e, com ela, todas as chaves.
+    """
+    h = hashlib.sha256()
+
+    def codigo(c):
+        h.update(c.co_code)
+        for constante in c.co_consts:
+            if hasattr(constante, 'co_code'):
+                codigo(constante)
+            elif isinstance(constante, frozenset):  # a ordem do repr muda entre processos
+                h.update(repr(sorted(map(repr, constante))).encode())
+            else:
+                h.update(repr(constante).encode())
+
+    def incluir(objeto):
+        objeto = getattr(objeto, '__func__', objeto)  # classmethod / staticmethod
+        if hasattr(objeto, '__code__'):
+            h.update(objeto.__qualname__.encode())
+            codigo(objeto.__code__)
+            return
+        # Classe ou módulo: só o que foi definido nele (não o que foi importado)
+        modulo = objeto.__name__ if isinstance(objeto, types.ModuleType) else objeto.__module__
+        for nome, membro in sorted(vars(objeto).items()):
+            membro = getattr(membro, '__func__', membro)
+            if getattr(membro, '__module__', None) == modulo and (hasattr(membro, '__code__') or isinstance(membro, type)):
+                incluir(membro)
+
+    for objeto in objetos:
+        incluir(objeto)
+    return h.hexdigest()
+
+
+def origem(caminho):
+    """(caminho absoluto, mtime_ns, tamanho) do arquivo de dados, guardado em cada entrada"""
+    info = os.stat(caminho)
+    return [os.path.abspath(caminho), info.st_mtime_ns, info.st_size]
+
+
+class CacheAjustes:
+    """
+    Resultados de ajuste guardados em disco, um arquivo JSON por chave.
+
+    A chave sai do conteúdo (chave(...)): a fatia de dados ajustada, a
+    identidade do modelo e os parâmetros iniciais e limites. Se o arquivo de
+    origem muda, a fatia muda e a chave também, então um resultado antigo nunca
+    é devolvido para dados novos; além disso, cada entrada registra o arquivo de
+    origem (mtime e tamanho) e é descartada ao ser lida se ele tiver mudado.
+
+    O tamanho total é limitado a `max_bytes`: quando passa do limite, saem as
+    entradas usadas há mais tempo (a data de modificação do arquivo é
+    atualizada a cada acerto). Vários processos podem usar o mesmo diretório;
+    as escritas são atômicas (arquivo temporário + os.replace).
+
+    Args:
+        diretorio (str, opcional): Onde guardar (padrão: ~/.gmag/cache_ajustes)
+        max_bytes (int): Tamanho máximo do cache em disco
+    """
+
+    def __init__(self, diretorio=None, max_bytes=MAX_BYTES):
+        self.diretorio = diretorio or DIRETORIO_PADRAO
+        self.max_bytes = max_bytes
+        self.acertos = 0
+        self.faltas = 0
+        self._tamanho = None  # total em bytes, calculado na primeira escrita
+        self._trava = threading.Lock()
+        os.makedirs(self.diretorio, exist_ok=True)
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, chave[:2], chave + '.json')
+
+    def _entradas(self):
+        """(caminho, tamanho, mtime) de todas as entradas"""
+        entradas = []
+        for sub in os.scandir(self.diretorio):
+            if not sub.is_dir():
+                continue
+            for arquivo in os.scandir(sub.path):
+                if arquivo.name.endswith('.json'):
+                    try:
+                        info = arquivo.stat()
+                    except FileNotFoundError:
+                        continue
+                    entradas.append((arquivo.path, info.st_size, info.st_mtime))
+        return entradas
+
+    def obter(self, chave):
+        """
+        Entrada guardada para a chave.
+
+        Returns:
+            dict ou None: None se não houver entrada válida
+        """
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, 'r') as f:
+                entrada = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.faltas += 1
+            return None
+
+        fonte = entrada.get('origem')
+        if fonte is not None:
+            try:
+                atual = origem(fonte[0])
+            except OSError:
+                atual = None
+            if atual != fonte:
+                self.descartar(chave)
+                self.faltas += 1
+                return None
+
+        try:
+            os.utime(caminho)  # marca como usada agora (LRU)
+        except OSError:
+            pass
+        self.acertos += 1
+        return entrada['dados']
+
+    def guardar(self, chave, dados, arquivo_origem=None):
+        """
+        Guarda `dados` (serializável em JSON) na chave e poda o cache se preciso.
+
+        Args:
+            arquivo_origem (str, opcional): Arquivo de onde vieram os dados; a
+                entrada é invalidada se ele for modificado
+        """
+        entrada = {'dados': dados, 'criada': time.time()}
+        if arquivo_origem is not None:
+            entrada['origem'] = origem(arquivo_origem)
+        caminho = self._caminho(chave)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.{uuid.uuid4().hex}.tmp"
+        with open(temporario, 'w') as f:
+            json.dump(entrada, f)
+        tamanho = os.path.getsize(temporario)
+        try:
+            anterior = os.path.getsize(caminho)  # entrada da mesma chave, substituída
+        except FileNotFoundError:
+            anterior = 0
+        os.replace(temporario, caminho)
+
+        with self._trava:
+            if self._tamanho is None:
+                self._tamanho = sum(t for _, t, _ in self._entradas())
+            else:
+                self._tamanho += tamanho - anterior
+            if self._tamanho > self.max_bytes:
+                self._podar()
+
+    def _podar(self):
+        """Remove as entradas menos usadas até o cache ficar em 90% do limite"""
+        entradas = sorted(self._entradas(), key=lambda e: e[2])
+        total = sum(t for _, t, _ in entradas)
+        for caminho, tamanho, _ in entradas:
+            if total <= 0.9 * self.max_bytes:
+                break
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+            total -= tamanho
+        self._tamanho = total
+
+    def descartar(self, chave):
+        """Remove a entrada da chave, se existir"""
+        try:
+            os.remove(self._caminho(chave))
+        except FileNotFoundError:
+            pass
+
+    def invalidar_origem(self, caminho):
+        """
+        Remove todas as entradas vindas do arquivo dado.
+
+        Returns:
+            int: Número de entradas removidas
+        """
+        caminho = os.path.abspath(caminho)
+        removidas = 0
+        for arquivo, _, _ in self._entradas():
+            try:
+                with open(arquivo, 'r') as f:
+                    fonte = json.load(f).get('origem')
+            except (OSError, json.JSONDecodeError):
+                continue
+            if fonte is not None and fonte[0] == caminho:
+                os.remove(arquivo)
+                removidas += 1
+        with self._trava:
+            self._tamanho = None
+        return removidas
+
+    def limpar(self):
+        """Remove todas as entradas"""
+        for arquivo, _, _ in self._entradas():
+            try:
+                os.remove(arquivo)
+            except FileNotFoundError:
+                pass
+        with self._trava:
+            self._tamanho = 0
+
+
+###############################################################
+#Conversão de resultados do lmfit
+
+def serializar_resultado(resultado):
+    """Parâmetros (com erros e limites) e estatísticas de um resultado do lmfit, em JSON"""
+    return {
+        'params': resultado.params.dumps(),
+        'estatisticas': {nome: (getattr(resultado, nome, None).item()
+                                if isinstance(getattr(resultado, nome, None), np.generic)
+                                else getattr(resultado, nome, None))
+                         for nome in ('chisqr', 'redchi', 'aic', 'bic', 'nfev', 'ndata',
+                                      'nvarys', 'nfree', 'success', 'method', 'message')},
+    }
+
+
+def restaurar_resultado(dados):
+    """
+    MinimizerResult com os parâmetros e estatísticas guardados (sem o resíduo
+    nem a matriz de covariância). O atributo `cache` é True.
+    """
+    params = lmfit.Parameters().loads(dados['params'])
+    resultado = MinimizerResult(params=params, var_names=[n for n, p in params.items() if p.vary],
+                                cache=True, **dados['estatisticas'])
+    resultado.errorbars = all(p.stderr is not None for p in params.values() if p.vary)
+    return resultado
+
+
+_padrao = None
+_trava_padrao = threading.Lock()
+
+
+def padrao():
+    """Cache compartilhado (diretório padrão), criado no primeiro uso"""
+    global _padrao
+    with _trava_padrao:
+        if _padrao is None:
+            _padrao = CacheAjustes()
+        return _padrao
@@ -0,0 +1,179 @@
+import numpy as np
+from scipy.signal import savgol_filter, savgol_coeffs, oaconvolve, find_peaks
+
+###############################################################
+###############################################################
+###############################################################
+#Detecção automática de picos (franjas de DRX/XRR)
+
+JANELA_DIRETA = 64  # janelas maiores que isso são convoluídas por FFT
+
+
+def _impar(n, minimo=5):
+    n = max(int(n), minimo)
+    return n if n % 2 else n + 1
+
+
+def periodo_dominante(y):
+    """
+    Período (em pontos) da oscilação mais forte do sinal, pelo pico do espectro
+    de potência depois de tirar a tendência linear. As franjas de um filme são
+    quase periódicas, então isso dá a escala para a suavização e para a
+    distância mínima entre picos.
+
+    Returns:
+        float: Período em pontos (np.inf se o sinal não oscila)
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n < 8:
+        return np.inf
+    t = np.arange(n)
+    y = y - np.polyval(np.polyfit(t, y, 1), t)
+    potencia = np.abs(np.fft.rfft(y * np.hanning(n)))**2
+    potencia[:2] = 0  # nível médio e variações da ordem do tamanho da varredura
+    k = int(np.argmax(potencia))
+    return n / k if k > 0 and potencia[k] > 0 else np.inf
+
+
+def suavizar(y, janela, ordem=3):
+    """
+    Savitzky-Golay: suaviza o ruído sem deslocar nem achatar muito os picos.
+
+    Janelas largas (varreduras longas com franjas largas) usam convolução por
+    FFT, que não depende do tamanho da janela; as bordas recebem o mesmo ajuste
+    polinomial do modo 'interp' de savgol_filter.
+    """
+    y = np.asarray(y, dtype=float)
+    janela = _impar(janela)
+    if janela >= len(y):
+        return y
+    ordem = min(ordem, janela - 1)
+    if janela <= JANELA_DIRETA:
+        return savgol_filter(y, janela, ordem)
+    suave = oaconvolve(y, savgol_coeffs(janela, ordem, use='conv'), mode='same')
+    meia = janela // 2
+    suave[:meia] = savgol_filter(y[:janela], janela, ordem)[:meia]
+    suave[-meia:] = savgol_filter(y[-janela:], janela, ordem)[-meia:]
+    return suave
+
+
+def refinar_posicoes(x, y, indices, meia_janela):
+    """
+    Posição de cada pico com resolução melhor que o passo da varredura: uma
+    parábola é ajustada (mínimos quadrados) aos 2*meia_janela+1 pontos em volta
+    de cada máximo e a posição é o vértice. Todos os picos são ajustados de uma
+    vez, resolvendo os sistemas 3x3 empilhados.
+
+    Args:
+        x, y (np.ndarray): Varredura
+        indices (np.ndarray): Índices dos máximos locais
+        meia_janela (int): Pontos de cada lado usados no ajuste
+
+    Returns:
+        tuple: (posições, alturas) nos vértices; picos em que a parábola não
+        tem máximo dentro da janela ficam no ponto amostrado
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    indices = np.asarray(indices, dtype=int)
+    if len(indices) == 0:
+        return np.empty(0), np.empty(0)
+    meia_janela = max(int(meia_janela), 1)
+
+    deslocamentos = np.arange(-meia_janela, meia_janela + 1)
+    vizinhos = np.clip(indices[:, None] + deslocamentos, 0, len(x) - 1)
+    t = x[vizinhos] - x[indices][:, None]  # centrado no máximo, para o sistema ficar bem condicionado
+    v = y[vizinhos]
+
+    # Equações normais de v = a t² + b t + c, uma por pico
+    potencias = np.stack([t**2, t, np.ones_like(t)], axis=-1)     # (n_picos, janela, 3)
+    A = np.einsum('pji,pjk->pik', potencias, potencias)
+    B = np.einsum('pji,pj->pi', potencias, v)
+    singular = np.abs(np.linalg.det(A)) < 1e-300
+    A[singular] = np.eye(3)
+    a, b, c = np.linalg.solve(A, B[..., None])[..., 0].T
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vertice = -b / (2 * a)
+    valido = ~singular & (a < 0) & (np.abs(vertice) <= np.abs(t).max(axis=1))
+    posicoes = np.where(valido, x[indices] + vertice, x[indices])
+    alturas = np.where(valido, c - b**2 / (4 * a), y[indices])
+    return posicoes, alturas
+
+
+def detectar_picos(x, y, janela=None, proeminencia=0.05, largura=None, distancia=None, log=None,
+                   max_picos=None):
+    """
+    Encontra os picos (franjas) de uma varredura de DRX/XRR.
+
+    O sinal é suavizado (Savitzky-Golay), os máximos locais são filtrados por
+    proeminência, largura e distância mínima (scipy.signal.find_peaks) e a
+    posição de cada um é refinada por uma parábola ajustada em volta do máximo.
+    Sem janela/distância, a escala vem do período dominante das franjas.
+
+    Args:
+        x, y (np.ndarray): Ângulo (2θ) e intensidade
+        janela (int, opcional): Pontos da janela de suavização (padrão: 1/4 do
+            período das franjas; 0 ou 1 não suaviza)
+        proeminencia (float): Proeminência mínima, como fração da amplitude do
+            sinal suavizado
+        largura (float, opcional): Largura mínima do pico, em pontos (padrão: janela/2)
+        distancia (float, opcional): Distância mínima entre picos, em pontos
+            (padrão: metade do período das franjas)
+        log (bool, opcional): Procura os picos em log10(y), como é usual em
+            refletividade; o padrão é usar log quando y é positivo e cobre mais
+            de duas décadas
+        max_picos (int, opcional): Mantém só os mais proeminentes
+
+    Returns:
+        dict: 'posicoes' (refinadas, em ordem crescente de x), 'indices',
+        'alturas', 'proeminencias' e 'larguras' (em unidades de x), um
+        elemento por pico
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if x.shape != y.shape or x.ndim != 1:
+        raise ValueError("x e y devem ser vetores do mesmo tamanho")
+    ordem = np.argsort(x, kind='stable')
+    x, y = x[ordem], y[ordem]
+    vazio = {chave: np.empty(0) for chave in ('posicoes', 'alturas', 'proeminencias', 'larguras')}
+    vazio['indices'] = np.empty(0, dtype=int)
+    if len(x) < 3:
+        return vazio
+
+    if log is None:
+        log = bool(np.all(y > 0) and y.max() / y.min() > 100)
+    sinal = np.log10(y) if log else y
+
+    periodo = periodo_dominante(sinal)
+    escala = periodo if np.isfinite(periodo) else len(x) / 10
+    if janela is None:
+        janela = _impar(escala / 4)
+    suave = suavizar(sinal, janela) if janela > 1 else sinal
+    if largura is None:
+        largura = max(janela / 2, 1)
+    if distancia is None:
+        distancia = max(escala / 2, 1)
+
+    amplitude = np.ptp(suave)
+    if not amplitude > 1e-9 * np.abs(suave).max():
+        return vazio  # sinal constante: só sobraria o erro de arredondamento da suavização
+    indices, propriedades = find_peaks(suave, prominence=proeminencia * amplitude, width=largura,
+                                       distance=distancia)
+    if max_picos is not None and len(indices) > max_picos:
+        mantidos = np.sort(np.argsort(propriedades['prominences'])[::-1][:max_picos])
+        indices = indices[mantidos]
+        propriedades = {k: v[mantidos] for k, v in propriedades.items()}
+    if len(indices) == 0:
+        return vazio
+
+    posicoes, alturas = refinar_posicoes(x, suave, indices, max(janela // 2, 2))
+    passo = np.median(np.diff(x))
+    return {
+        'posicoes': posicoes,
+        'indices': ordem[indices],
+        'alturas': 10**alturas if log else alturas,
+        'proeminencias': propriedades['prominences'],
+        'larguras': propriedades['widths'] * passo,
+    }
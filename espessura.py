@@ -0,0 +1,184 @@
+import numpy as np
+
+###############################################################
+###############################################################
+###############################################################
+#Espessura de filmes pelas franjas de Kiessig (DRX/XRR), várias varreduras por chamada
+
+CU_KALFA = 0.154056  # nm
+TEMPO_PADRAO = 300   # s de deposição
+
+
+def _empilhar(vetores):
+    """
+    Empilha vetores de tamanhos diferentes em uma matriz (n_varreduras, n_max)
+    completada com NaN.
+
+    Retorna:
+        tuple: (matriz, comprimentos)
+    """
+    vetores = [np.asarray(v, dtype=float).ravel() for v in vetores]
+    comprimentos = np.array([len(v) for v in vetores], dtype=int)
+    matriz = np.full((len(vetores), comprimentos.max(initial=0)), np.nan)
+    for i, v in enumerate(vetores):
+        matriz[i, :len(v)] = v
+    return matriz, comprimentos
+
+
+def _por_varredura(valor, n, nome):
+    """Escalar ou um valor por varredura, como vetor (n,)"""
+    valor = np.asarray(valor, dtype=float)
+    if valor.ndim == 0:
+        return np.full(n, float(valor))
+    if valor.shape != (n,):
+        raise ValueError(f"{nome} deve ser um escalar ou ter um valor por varredura ({n})")
+    return valor
+
+
+def vetor_espalhamento(dois_theta, comprimento_onda=CU_KALFA):
+    """q = 4π sen(θ) / λ, com 2θ em graus (mesma unidade inversa de λ)"""
+    return 4 * np.pi * np.sin(np.radians(np.asarray(dois_theta, dtype=float) / 2)) / comprimento_onda
+
+
+def ajustar_franjas(picos, comprimento_onda=CU_KALFA, tempo=TEMPO_PADRAO):
+    """
+    Espessura de várias varreduras em uma chamada, pelo ajuste linear de q
+    contra o índice das franjas: q_n = a n + b, com a = 2π / espessura.
+
+    As retas de todas as varreduras saem das somas de mínimos quadrados
+    calculadas de uma vez sobre a matriz de picos (completada com NaN); os erros
+    vêm da covariância do ajuste (variância dos resíduos com n - 2 graus de
+    liberdade) e são propagados para a espessura e a taxa.
+
+    Args:
+        picos (list): Posições 2θ (graus) dos picos de cada varredura, em
+            ordem crescente; o número de picos pode variar entre varreduras
+        comprimento_onda (float ou array): λ de cada varredura, em nm
+        tempo (float ou array): Tempo de deposição de cada varredura, em s
+
+    Returns:
+        dict: Arrays com uma entrada por varredura: 'espessura' (nm),
+        'erro_espessura', 'taxa' (nm/s), 'erro_taxa', 'inclinacao' (1/nm),
+        'erro_inclinacao', 'intercepto', 'erro_intercepto', 'n_picos'; os erros
+        são NaN com dois picos (sem graus de liberdade) e todos os valores são
+        NaN com menos de dois
+    """
+    P, n = _empilhar(picos)
+    n_varreduras = len(n)
+    lam = _por_varredura(comprimento_onda, n_varreduras, "comprimento_onda")
+    t = _por_varredura(tempo, n_varreduras, "tempo")
+
+    q = vetor_espalhamento(P, lam[:, None])
+    valido = ~np.isnan(q)
+    k = np.where(valido, np.arange(P.shape[1]), 0.0)
+    q0 = np.where(valido, q, 0.0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        k_medio = k.sum(axis=1) / n
+        q_medio = q0.sum(axis=1) / n
+        dk = np.where(valido, k - k_medio[:, None], 0.0)
+        dq = np.where(valido, q0 - q_medio[:, None], 0.0)
+        Skk = (dk**2).sum(axis=1)
+        a = (dk * dq).sum(axis=1) / Skk
+        b = q_medio - a * k_medio
+        residuos = np.where(valido, dq - a[:, None] * dk, 0.0)
+        s2 = (residuos**2).sum(axis=1) / (n - 2)
+        s2 = np.where(n > 2, s2, np.nan)
+        erro_a = np.sqrt(s2 / Skk)
+        erro_b = np.sqrt(s2 * (1 / n + k_medio**2 / Skk))
+
+        a = np.where(n >= 2, a, np.nan)
+        espessura = 2 * np.pi / a
+        erro_espessura = 2 * np.pi * erro_a / a**2
+    return {
+        'espessura': espessura,
+        'erro_espessura': erro_espessura,
+        'taxa': espessura / t,
+        'erro_taxa': erro_espessura / t,
+        'inclinacao': a,
+        'erro_inclinacao': erro_a,
+        'intercepto': np.where(n >= 2, b, np.nan),
+        'erro_intercepto': erro_b,
+        'n_picos': n,
+    }
+
+
+def espessura_fft(varreduras, comprimento_onda=CU_KALFA, n_pontos=None, fator_zeros=8, grau_tendencia=3,
+                  espessura_min=None):
+    """
+    Espessura pela frequência dominante das franjas, para conferir o ajuste dos
+    picos sem depender da detecção deles.
+
+    Cada varredura é levada a uma grade uniforme em q (n_pontos), usa-se
+    log10(I) sem a tendência polinomial e uma janela de Hann; as transformadas
+    de todas as varreduras são feitas juntas (rfft ao longo das linhas). Como as
+    franjas são periódicas em q com período 2π/espessura, a frequência f do
+    máximo do espectro (ciclos por unidade de q) dá espessura = 2π f; a posição
+    do máximo é refinada por uma parábola nos três pontos em volta.
+
+    Args:
+        varreduras (list): Pares (2θ em graus, intensidade) de cada varredura
+        comprimento_onda (float ou array): λ de cada varredura, em nm
+        n_pontos (int, opcional): Pontos da grade em q (padrão: o maior número
+            de pontos entre as varreduras)
+        fator_zeros (int): Preenchimento com zeros (afina a grade de frequências)
+        grau_tendencia (int): Grau do polinômio removido de log10(I)
+        espessura_min (float, opcional): Ignora espessuras menores (nm); o
+            padrão descarta as duas primeiras frequências da grade sem zeros,
+            dominadas pelo que sobrou da tendência
+
+    Returns:
+        dict: 'espessura' (nm) e 'resolucao' (nm; espaçamento da grade sem
+        zeros, 2π/Δq, uma escala para comparar com o ajuste), por varredura
+    """
+    n_varreduras = len(varreduras)
+    lam = _por_varredura(comprimento_onda, n_varreduras, "comprimento_onda")
+    n_pontos = n_pontos or max(len(x) for x, _ in varreduras)
+    if n_pontos < 8:
+        raise ValueError("Varreduras curtas demais para a estimativa por FFT")
+
+    sinais = np.empty((n_varreduras, n_pontos))
+    passos = np.empty(n_varreduras)
+    u = np.linspace(-1, 1, n_pontos)
+    for i, ((x, y), l) in enumerate(zip(varreduras, lam)):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        ordem = np.argsort(x)
+        q = vetor_espalhamento(x[ordem], l)
+        positivo = y[ordem] > 0
+        if np.count_nonzero(positivo) < 8:
+            sinais[i], passos[i] = 0.0, np.nan  # sem sinal para transformar: espessura NaN
+            continue
+        grade = np.linspace(q[positivo].min(), q[positivo].max(), n_pontos)
+        sinais[i] = np.interp(grade, q[positivo], np.log10(y[ordem][positivo]))
+        passos[i] = grade[1] - grade[0]
+
+    # Tendência polinomial de todas as varreduras de uma vez (mesma grade normalizada)
+    V = np.vander(u, grau_tendencia + 1)
+    coeficientes, *_ = np.linalg.lstsq(V, sinais.T, rcond=None)
+    sinais = (sinais - (V @ coeficientes).T) * np.hanning(n_pontos)
+
+    n_fft = fator_zeros * n_pontos
+    potencia = np.abs(np.fft.rfft(sinais, n=n_fft, axis=1))**2
+    if espessura_min is None:
+        minimo = 2 * fator_zeros * np.ones(n_varreduras)
+    else:
+        minimo = np.ceil(espessura_min / (2 * np.pi) * n_fft * passos)
+    potencia[np.arange(potencia.shape[1])[None, :] < minimo[:, None]] = 0
+
+    k = np.clip(np.argmax(potencia, axis=1), 1, potencia.shape[1] - 2)
+    linhas = np.arange(n_varreduras)
+    p0, p1, p2 = potencia[linhas, k - 1], potencia[linhas, k], potencia[linhas, k + 1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        deslocamento = np.where(p0 - 2 * p1 + p2 < 0, 0.5 * (p0 - p2) / (p0 - 2 * p1 + p2), 0.0)
+    f = (k + deslocamento) / (n_fft * passos)
+    return {
+        'espessura': 2 * np.pi * f,
+        'resolucao': 2 * np.pi / (n_pontos * passos),
+    }
+
+
+def estimar_espessura(picos, comprimento_onda=CU_KALFA, tempo=TEMPO_PADRAO):
+    """Espessura de uma única varredura (ver ajustar_franjas), como floats"""
+    resultado = ajustar_franjas([picos], comprimento_onda, tempo)
+    return {chave: (int(valor[0]) if chave == 'n_picos' else float(valor[0])) for chave, valor in resultado.items()}
@@ -0,0 +1,72 @@
+import threading, math
+from collections import deque
+
+###############################################################
+###############################################################
+###############################################################
+#Eventos de andamento enviados à interface (Python -> JS)
+
+INTERVALO = 0.25     # segundos entre envios
+MAX_POR_LOTE = 50    # eventos por envio; o excedente vai no envio seguinte
+MAX_FILA = 10000     # sem página conectada, os mais antigos são descartados
+
+
+def numero(valor):
+    """float pronto para JSON: None no lugar de NaN, infinito ou ausente"""
+    if valor is None:
+        return None
+    valor = float(valor)
+    return valor if math.isfinite(valor) else None
+
+
+class PublicadorEventos:
+    """
+    Junta eventos publicados por qualquer thread e os entrega em lotes, no
+    máximo um lote a cada `intervalo` segundos.
+
+    As análises rodam em threads da fila de tarefas, mas o websocket do Eel
+    pertence ao laço do gevent; por isso publicar() só enfileira, e o envio é
+    feito por laco(), que deve rodar no laço do gevent (eel.spawn). Juntar os
+    eventos também limita a taxa de mensagens em varreduras grandes.
+
+    Args:
+        enviar (callable): Recebe a lista de eventos de um lote (ex.: uma
+            função JS exposta, chamada pelo Eel)
+        intervalo (float): Segundos entre envios
+        max_por_lote (int): Eventos por envio
+        max_fila (int): Eventos guardados enquanto ninguém recebe
+    """
+
+    def __init__(self, enviar, intervalo=INTERVALO, max_por_lote=MAX_POR_LOTE, max_fila=MAX_FILA):
+        self.enviar = enviar
+        self.intervalo = intervalo
+        self.max_por_lote = max_por_lote
+        self._fila = deque(maxlen=max_fila)
+        self._trava = threading.Lock()
+
+    def publicar(self, evento):
+        """Enfileira um evento (dicionário serializável em JSON); pode ser chamado de qualquer thread"""
+        with self._trava:
+            self._fila.append(evento)
+
+    def descarregar(self):
+        """
+        Envia um lote com os eventos mais antigos da fila.
+
+        Returns:
+            int: Número de eventos enviados
+        """
+        with self._trava:
+            lote = [self._fila.popleft() for _ in range(min(len(self._fila), self.max_por_lote))]
+        if lote:
+            self.enviar(lote)
+        return len(lote)
+
+    def laco(self, dormir):
+        """Descarrega a fila para sempre, esperando `intervalo` entre os lotes com dormir(segundos)"""
+        while True:
+            try:
+                self.descarregar()
+            except Exception as e:
+                print(f"ERRO ao enviar eventos: {str(e)}")
+            dormir(self.intervalo)
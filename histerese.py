@@ -0,0 +1,164 @@
+import warnings
+import numpy as np
+
+###############################################################
+###############################################################
+###############################################################
+#Análise vetorizada de ciclos de histerese (VSM)
+
+def _empilhar(vetores):
+    """
+    Empilha vetores de tamanhos diferentes em uma matriz (n_ciclos, n_max)
+    completada com NaN.
+
+    Retorna:
+        tuple: (matriz, comprimentos)
+    """
+    vetores = [np.asarray(v, dtype=float).ravel() for v in vetores]
+    comprimentos = np.array([len(v) for v in vetores], dtype=int)
+    matriz = np.full((len(vetores), comprimentos.max(initial=0)), np.nan)
+    for i, v in enumerate(vetores):
+        matriz[i, :len(v)] = v
+    return matriz, comprimentos
+
+
+def normalizar(M):
+    """
+    Leva cada ciclo para o intervalo [-1, 1]: (2M - (max + min)) / (max - min).
+
+    Args:
+        M (np.ndarray): Um ciclo (N,) ou vários (n_ciclos, N); NaN é ignorado
+
+    Returns:
+        np.ndarray: Mesmo formato de M
+    """
+    M = np.asarray(M, dtype=float)
+    maximo = np.nanmax(M, axis=-1, keepdims=True)
+    minimo = np.nanmin(M, axis=-1, keepdims=True)
+    return (2 * M - (maximo + minimo)) / (maximo - minimo)
+
+
+def ponto_de_retorno(H, comprimentos=None):
+    """
+    Índice em que o campo inverte o sentido (o ponto mais distante do início
+    da varredura), que separa o ramo de ida do ramo de volta.
+
+    Args:
+        H (np.ndarray): Campos, (n_ciclos, N)
+        comprimentos (np.ndarray, opcional): Número de pontos válidos de cada ciclo
+
+    Returns:
+        np.ndarray: Índice do retorno de cada ciclo
+    """
+    H = np.atleast_2d(H)
+    distancia = np.abs(H - H[:, :1])
+    if comprimentos is not None:
+        distancia = np.where(np.arange(H.shape[1]) < comprimentos[:, None], distancia, -np.inf)
+    return np.nanargmax(np.where(np.isnan(distancia), -np.inf, distancia), axis=1)
+
+
+def cruzamentos_zero(x, y, retorno, comprimentos):
+    """
+    Valor de x onde y cruza zero em cada ramo, por interpolação linear entre
+    as duas amostras vizinhas ao cruzamento. Havendo mais de um cruzamento no
+    ramo (ruído perto de zero), vale o primeiro no sentido da varredura.
+
+    Args:
+        x, y (np.ndarray): (n_ciclos, N)
+        retorno (np.ndarray): Índice do ponto de retorno de cada ciclo
+        comprimentos (np.ndarray): Número de pontos válidos de cada ciclo
+
+    Returns:
+        np.ndarray: (n_ciclos, 2) com o cruzamento na ida e na volta (NaN se não houver)
+    """
+    n_ciclos, N = y.shape
+    if N < 2:
+        return np.full((n_ciclos, 2), np.nan)
+    y0, y1 = y[:, :-1], y[:, 1:]
+    x0, x1 = x[:, :-1], x[:, 1:]
+    i = np.arange(N - 1)
+    valido = i < (comprimentos[:, None] - 1)
+    cruza = valido & (np.sign(y0) * np.sign(y1) <= 0) & ~((y0 == 0) & (y1 == 0))
+
+    resultado = np.full((n_ciclos, 2), np.nan)
+    linhas = np.arange(n_ciclos)
+    for ramo, no_ramo in enumerate((i < retorno[:, None], i >= retorno[:, None])):
+        candidatos = cruza & no_ramo
+        primeiro = np.where(candidatos, i, N).min(axis=1)
+        achou = primeiro < N - 1
+        k = np.minimum(primeiro, N - 2)
+        ya, yb = y0[linhas, k], y1[linhas, k]
+        xa, xb = x0[linhas, k], x1[linhas, k]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            fracao = np.where(yb != ya, ya / (ya - yb), 0.0)
+        resultado[:, ramo] = np.where(achou, xa + fracao * (xb - xa), np.nan)
+    return resultado
+
+
+def area_do_ciclo(H, M, comprimentos):
+    """Área do ciclo fechado (fórmula do laço de Gauss), em unidades de H x M"""
+    H = np.nan_to_num(H)
+    M = np.nan_to_num(M)
+    ultimo = comprimentos - 1
+    linhas = np.arange(len(H))
+    termos = H[:, :-1] * M[:, 1:] - H[:, 1:] * M[:, :-1]
+    termos = np.where(np.arange(H.shape[1] - 1) < ultimo[:, None], termos, 0.0)
+    fechamento = H[linhas, ultimo] * M[:, 0] - H[:, 0] * M[linhas, ultimo]
+    return 0.5 * np.abs(termos.sum(axis=1) + fechamento)
+
+
+def analisar_ciclos(campos, momentos, normalizado=False):
+    """
+    Métricas de vários ciclos de histerese em uma só chamada.
+
+    Cada ciclo é dividido no ponto de retorno do campo. Em cada ramo, Hc é o
+    campo onde M cruza zero e Mr é o momento onde H cruza zero, ambos
+    interpolados linearmente; os valores finais são a média dos módulos nos
+    dois ramos.
+
+    Args:
+        campos (list ou np.ndarray): Campos de cada ciclo (tamanhos podem diferir)
+        momentos (list ou np.ndarray): Momentos de cada ciclo
+        normalizado (bool): True normaliza os momentos para [-1, 1] antes das métricas
+
+    Returns:
+        dict: Arrays com uma entrada por ciclo:
+            'Mr', 'Hc', 'Ms' (meia amplitude de M), 'quadratura' (Mr/Ms),
+            'area' (área do ciclo), 'Mr_ramos' e 'Hc_ramos' ((n_ciclos, 2): ida, volta)
+    """
+    H, comprimentos = _empilhar(campos)
+    M, comprimentos_M = _empilhar(momentos)
+    if not np.array_equal(comprimentos, comprimentos_M):
+        raise ValueError("Campos e momentos com números de pontos diferentes")
+    if len(H) == 0:
+        return {chave: np.empty((0, 2) if chave.endswith('_ramos') else 0)
+                for chave in ('Mr', 'Hc', 'Ms', 'quadratura', 'area', 'Mr_ramos', 'Hc_ramos')}
+    if normalizado:
+        M = normalizar(M)
+
+    retorno = ponto_de_retorno(H, comprimentos)
+    Hc_ramos = cruzamentos_zero(H, M, retorno, comprimentos)
+    Mr_ramos = cruzamentos_zero(M, H, retorno, comprimentos)
+
+    with warnings.catch_warnings():
+        # Ciclo sem cruzamento em nenhum ramo: a métrica fica NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        Hc = np.nanmean(np.abs(Hc_ramos), axis=1)
+        Mr = np.nanmean(np.abs(Mr_ramos), axis=1)
+    Ms = (np.nanmax(M, axis=1) - np.nanmin(M, axis=1)) / 2
+    return {
+        'Mr': Mr,
+        'Hc': Hc,
+        'Ms': Ms,
+        'quadratura': Mr / Ms,
+        'area': area_do_ciclo(H, M, comprimentos),
+        'Mr_ramos': Mr_ramos,
+        'Hc_ramos': Hc_ramos,
+    }
+
+
+def analisar_ciclo(H, M, normalizado=False):
+    """Métricas de um único ciclo (ver analisar_ciclos), como floats"""
+    resultado = analisar_ciclos([H], [M], normalizado)
+    return {chave: (valor[0].tolist() if valor.ndim > 1 else float(valor[0]))
+            for chave, valor in resultado.items()}
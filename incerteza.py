@@ -0,0 +1,234 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+###############################################################
+###############################################################
+###############################################################
+#Incertezas por bootstrap dos ajustes finais da impedância (Kittel e largura de linha)
+
+PARAMETROS = ('Hk', 'Meff', 'dho', 'alfa_gamma', 'alfa')
+METODOS = ('residuos', 'pares')
+N_AMOSTRAS = 2000
+TAMANHO_BLOCO = 500   # réplicas ajustadas juntas em cada tarefa do pool
+ITERACOES = 100       # limite do Levenberg-Marquardt de cada réplica
+# Abaixo de réplicas x espectros, sem n_processos dado, tudo roda no processo
+# atual: abrir o pool custa mais que ajustar
+MIN_PARALELO = 2_000_000
+
+
+def kittel(H, Hk, Meff, gamma):
+    """f = γ√((H + Hk)(H + Hk + Meff)), como GMAG.frequencia_de_ressonancia"""
+    return gamma * np.sqrt((H + Hk) * (H + Hk + Meff))
+
+
+def ajustar_kittel(H, f, Hk, Meff, gamma, iteracoes=ITERACOES, tolerancia=1e-12):
+    """
+    Ajusta a relação de Kittel a várias séries de uma vez: cada linha de
+    (H, f) é um problema de mínimos quadrados independente, e todas avançam
+    juntas num Levenberg-Marquardt vetorizado (as equações normais 2x2 de
+    cada linha são resolvidas em forma fechada).
+
+    Os limites Hk ≥ 0 e Meff ≥ 0 (os do ajuste lmfit de GMAG) são impostos
+    projetando cada passo.
+
+    Args:
+        H, f (np.ndarray): (séries, pontos), ou (pontos,) compartilhado por todas
+        Hk, Meff (float ou np.ndarray): Valores iniciais, um por série ou comuns
+
+    Returns:
+        tuple: (Hk, Meff), arrays com uma posição por série; NaN onde o ajuste falhou
+    """
+    H, f = np.atleast_2d(np.asarray(H, dtype=float)), np.atleast_2d(np.asarray(f, dtype=float))
+    n_series = max(H.shape[0], f.shape[0])
+    p = np.empty((n_series, 2))
+    p[:, 0], p[:, 1] = Hk, Meff
+
+    def residuos(p):
+        with np.errstate(invalid='ignore'):
+            r = kittel(H, p[:, :1], p[:, 1:], gamma) - f
+        return r, np.einsum('ij,ij->i', r, r)
+
+    r, custo = residuos(p)
+    amortecimento = np.full(n_series, 1e-3)
+    ativos = np.isfinite(custo)
+    for _ in range(iteracoes):
+        u = H + p[:, :1]
+        v = u + p[:, 1:]
+        s = 2 * np.sqrt(u * v) / gamma
+        J0, J1 = (u + v) / s, u / s   # df/dHk e df/dMeff
+        a00 = np.einsum('ij,ij->i', J0, J0)
+        a01 = np.einsum('ij,ij->i', J0, J1)
+        a11 = np.einsum('ij,ij->i', J1, J1)
+        g0 = np.einsum('ij,ij->i', J0, r)
+        g1 = np.einsum('ij,ij->i', J1, r)
+        m00 = a00 * (1 + amortecimento)
+        m11 = a11 * (1 + amortecimento)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            det = m00 * m11 - a01 * a01
+            passo = np.column_stack(((a01 * g1 - m11 * g0) / det, (a01 * g0 - m00 * g1) / det))
+        novo = np.maximum(p + passo, 0.0)
+        r_novo, custo_novo = residuos(novo)
+
+        melhor = ativos & np.isfinite(custo_novo) & (custo_novo < custo)
+        convergiu = melhor & (custo - custo_novo <= tolerancia * custo)
+        p[melhor] = novo[melhor]
+        r = np.where(melhor[:, None], r_novo, r)
+        custo = np.where(melhor, custo_novo, custo)
+        amortecimento = np.where(melhor, amortecimento / 10, amortecimento * 10)
+        # Sem melhora possível nem com passo muito amortecido: está no mínimo
+        ativos &= ~convergiu & (amortecimento < 1e10)
+        if not ativos.any():
+            break
+
+    p[~np.isfinite(custo)] = np.nan
+    return p[:, 0], p[:, 1]
+
+
+def ajustar_reta(x, y):
+    """
+    Mínimos quadrados de y = a + b·x em cada linha, em forma fechada.
+
+    Returns:
+        tuple: (a, b), um valor por linha
+    """
+    x, y = np.broadcast_arrays(np.atleast_2d(x), np.atleast_2d(y))
+    xm = x.mean(axis=1, keepdims=True)
+    ym = y.mean(axis=1, keepdims=True)
+    dx = x - xm
+    with np.errstate(divide='ignore', invalid='ignore'):
+        b = np.einsum('ij,ij->i', dx, y - ym) / np.einsum('ij,ij->i', dx, dx)
+    return ym[:, 0] - b * xm[:, 0], b
+
+
+def _replicas(tarefa):
+    """
+    Executada nos processos do pool: sorteia e ajusta um bloco de réplicas.
+
+    Returns:
+        np.ndarray: (réplicas, 4) com Hk, Meff, dho e alfa_gamma
+    """
+    H, dH, f, metodo, estimativa, gamma, semente, n = tarefa
+    rng = np.random.default_rng(semente)
+    sorteio = rng.integers(0, len(H), size=(n, len(H)))
+    Hk, Meff, dho, alfa_gamma = estimativa
+
+    if metodo == 'pares':
+        # Espectros inteiros (Hr, dH e frequência) sorteados com reposição
+        Hb, fb = H[sorteio], f[sorteio]
+        Hk_b, Meff_b = ajustar_kittel(Hb, fb, Hk, Meff, gamma)
+        dho_b, alfa_b = ajustar_reta(fb, dH[sorteio])
+    else:
+        # Curvas ajustadas + resíduos sorteados (os mesmos espectros nos dois
+        # ajustes), escalados por √(n/(n - 2)) para compensar os graus de liberdade
+        escala = np.sqrt(len(H) / (len(H) - 2))
+        f_ajuste = kittel(H, Hk, Meff, gamma)
+        dH_ajuste = dho + alfa_gamma * f
+        Hk_b, Meff_b = ajustar_kittel(H, f_ajuste + escala * (f - f_ajuste)[sorteio], Hk, Meff, gamma)
+        dho_b, alfa_b = ajustar_reta(f, dH_ajuste + escala * (dH - dH_ajuste)[sorteio])
+    return np.column_stack((Hk_b, Meff_b, dho_b, alfa_b))
+
+
+def incerteza_impedancia(lista_Hr, lista_dH, frequencias, gamma, n_amostras=N_AMOSTRAS, metodo='residuos',
+                         nivel=0.95, n_processos=None, semente=0, Hk=100.0, Meff=1000.0):
+    """
+    Intervalos de confiança e correlações de Hk, Meff, ΔH0 e α por bootstrap.
+
+    Cada réplica refaz os dois ajustes finais de GMAG.impedancia (Kittel,
+    frequência contra Hr; largura de linha, dH = ΔH0 + (α/γ)·f) sobre dados
+    reamostrados; as réplicas são ajustadas em blocos vetorizados
+    (ajustar_kittel, ajustar_reta), distribuídos entre processos. Cada bloco
+    tem a sua semente (SeedSequence), então o resultado não depende do número
+    de processos.
+
+        'residuos' -> curvas ajustadas + resíduos sorteados (Hr e f fixos)
+        'pares'    -> espectros sorteados com reposição
+
+    A reta da largura de linha é ajustada sem os limites ΔH0 ≥ 0 e α ≥ 0 do
+    lmfit, que só mudam o resultado quando o ajuste sem limites sai negativo.
+
+    Args:
+        lista_Hr, lista_dH (sequência): Hr e dH de cada espectro (Oe)
+        frequencias (sequência): Frequência de cada espectro (GHz)
+        gamma (float): Razão giromagnética usada no ajuste (GHz/Oe)
+        n_amostras (int): Número de réplicas
+        metodo (str): 'residuos' ou 'pares'
+        nivel (float): Nível dos intervalos de confiança (percentis)
+        n_processos (int, opcional): Processos (padrão: número de CPUs, ou 1
+            para problemas menores que MIN_PARALELO)
+        semente (int): Semente dos sorteios
+        Hk, Meff (float): Valores iniciais do ajuste de Kittel
+
+    Returns:
+        dict: parametros, estimativa, erro (desvio padrão das réplicas),
+        intervalo ([inferior, superior] por parâmetro), correlacao (matriz na
+        ordem de parametros), nivel, metodo, n_amostras (réplicas válidas) e
+        n_falhas
+    """
+    if metodo not in METODOS:
+        raise ValueError(f"Método de bootstrap desconhecido: {metodo} (use {', '.join(METODOS)})")
+    if not 0 < nivel < 1:
+        raise ValueError("nivel deve estar entre 0 e 1")
+    if n_amostras < 2:
+        raise ValueError("n_amostras deve ser pelo menos 2")
+    H, dH, f = (np.asarray(v, dtype=float) for v in (lista_Hr, lista_dH, frequencias))
+    if not len(H) == len(dH) == len(f):
+        raise ValueError("lista_Hr, lista_dH e frequencias devem ter o mesmo tamanho")
+    if len(H) < 3:
+        raise ValueError("São necessários pelo menos 3 espectros para o bootstrap")
+
+    # Estimativa pontual pelos mesmos ajustes das réplicas
+    (Hk0,), (Meff0,) = ajustar_kittel(H, f, Hk, Meff, gamma, iteracoes=10 * ITERACOES)
+    (dho0,), (alfa0,) = ajustar_reta(f, dH)
+    if not np.isfinite([Hk0, Meff0, dho0, alfa0]).all():
+        raise RuntimeError("O ajuste dos dados originais falhou")
+    estimativa = (Hk0, Meff0, dho0, alfa0)
+
+    tamanhos = [TAMANHO_BLOCO] * (n_amostras // TAMANHO_BLOCO)
+    if n_amostras % TAMANHO_BLOCO:
+        tamanhos.append(n_amostras % TAMANHO_BLOCO)
+    sementes = np.random.SeedSequence(semente).spawn(len(tamanhos))
+    tarefas = [(H, dH, f, metodo, estimativa, gamma, s, n) for s, n in zip(sementes, tamanhos)]
+
+    if n_processos is None:
+        n_processos = (os.cpu_count() or 1) if n_amostras * len(H) >= MIN_PARALELO else 1
+    if n_processos > 1 and len(tarefas) > 1:
+        with ProcessPoolExecutor(max_workers=min(n_processos, len(tarefas))) as executor:
+            blocos = list(executor.map(_replicas, tarefas))
+    else:
+        blocos = [_replicas(t) for t in tarefas]
+
+    amostras = np.vstack(blocos)
+    amostras = np.column_stack((amostras, amostras[:, 3] * gamma))
+    validas = np.isfinite(amostras).all(axis=1)
+    amostras = amostras[validas]
+    if len(amostras) < 2:
+        raise RuntimeError("Nenhuma réplica do bootstrap convergiu")
+
+    cauda = 50 * (1 - nivel)
+    inferior, superior = np.percentile(amostras, [cauda, 100 - cauda], axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlacao = np.corrcoef(amostras, rowvar=False)
+    valores = estimativa + (alfa0 * gamma,)
+    return {
+        'parametros': list(PARAMETROS),
+        'estimativa': dict(zip(PARAMETROS, map(float, valores))),
+        'erro': dict(zip(PARAMETROS, map(float, amostras.std(axis=0, ddof=1)))),
+        'intervalo': {nome: [float(i), float(s)] for nome, i, s in zip(PARAMETROS, inferior, superior)},
+        'correlacao': np.where(np.isfinite(correlacao), correlacao, None).tolist(),
+        'nivel': nivel,
+        'metodo': metodo,
+        'n_amostras': int(validas.sum()),
+        'n_falhas': int((~validas).sum()),
+    }
+
+
+def resumo(resultado):
+    """Texto com estimativa, erro e intervalo de cada parâmetro"""
+    linhas = [f"Bootstrap ({resultado['metodo']}, {resultado['n_amostras']} réplicas, "
+              f"IC {100 * resultado['nivel']:.0f}%):"]
+    for nome in resultado['parametros']:
+        inferior, superior = resultado['intervalo'][nome]
+        linhas.append(f"  {nome} = {resultado['estimativa'][nome]:.4g} ± {resultado['erro'][nome]:.2g} "
+                      f"[{inferior:.4g}, {superior:.4g}]")
+    return "\n".join(linhas)
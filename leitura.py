@@ -0,0 +1,380 @@
+import numpy as np, warnings, mmap, os, json, hashlib, uuid
+
+###############################################################
+###############################################################
+###############################################################
+#Leitura vetorizada dos arquivos de medida
+
+TAMANHO_BLOCO = 1 << 24  # 16 MB por bloco, mantém a memória auxiliar limitada
+DIRETORIO_AUXILIAR = os.path.join(os.path.expanduser('~'), '.gmag', 'leitura')
+VERSAO_AUXILIAR = 1  # muda quando o formato ou a conversão mudam
+MAX_BYTES_AUXILIAR = 2 * 1024**3  # acima disso saem os auxiliares menos usados
+
+_ESPACO = 32
+_NOVA_LINHA = 10
+_NAO_NUMERICO = np.ones(256, dtype=bool)
+_NAO_NUMERICO[list(b"0123456789.+-eE \n")] = False
+
+
+def _tabela_traducao(virgula):
+    """Monta a tabela de bytes.translate: tabs/CR viram espaço e a vírgula vira `virgula`"""
+    tabela = bytearray(range(256))
+    for c in b"\t\r\v\f":
+        tabela[c] = _ESPACO
+    tabela[ord(",")] = ord(virgula)
+    return bytes(tabela)
+
+
+def _analisar_bloco(arr, n_colunas):
+    """
+    Apaga (troca por espaço), no próprio bloco, tudo o que não deve ser lido.
+
+    O bloco deve terminar em '\\n' e já estar traduzido (só espaço e '\\n' como
+    separadores). Uma linha é válida quando tem pelo menos `n_colunas` campos e
+    esses campos só contêm caracteres numéricos — cabeçalhos como 'Filename:'
+    ou '#' caem nesta regra. Das linhas válidas sobram apenas os primeiros
+    `n_colunas` campos; as demais linhas são apagadas por inteiro.
+
+    Retorna:
+        int: Número de linhas válidas que restaram no bloco
+    """
+    nova_linha = arr == _NOVA_LINHA
+    espaco = (arr == _ESPACO) | nova_linha
+
+    # Limites dos campos: todo campo termina antes de um espaço, pois o bloco acaba em '\\n'
+    inicios = np.flatnonzero(~espaco[1:] & espaco[:-1]) + 1
+    if not espaco[0]:
+        inicios = np.concatenate(([0], inicios))
+    fins = np.flatnonzero(~espaco[:-1] & espaco[1:]) + 1
+    if len(inicios) == 0:
+        return 0
+
+    fins_linha = np.flatnonzero(nova_linha)
+    n_linhas = len(fins_linha)
+    linha_do_campo = np.searchsorted(fins_linha, inicios)
+    campos_por_linha = np.bincount(linha_do_campo, minlength=n_linhas)
+    primeiro_campo = np.cumsum(campos_por_linha) - campos_por_linha
+    ordem_do_campo = np.arange(len(inicios)) - primeiro_campo[linha_do_campo]
+
+    # Caracteres não numéricos nos campos aproveitados invalidam a linha inteira
+    linha_valida = campos_por_linha >= n_colunas
+    invalidos = np.flatnonzero(_NAO_NUMERICO[arr])
+    if len(invalidos):
+        campo_do_byte = np.searchsorted(inicios, invalidos, side='right') - 1
+        campo_do_byte = campo_do_byte[ordem_do_campo[campo_do_byte] < n_colunas]
+        linha_valida[linha_do_campo[campo_do_byte]] = False
+
+    descartar = (ordem_do_campo >= n_colunas) | ~linha_valida[linha_do_campo]
+    if descartar.any():
+        # Índices de todos os bytes dos campos descartados, sem percorrer o bloco inteiro
+        comprimentos = fins[descartar] - inicios[descartar]
+        deslocamentos = inicios[descartar] - (np.cumsum(comprimentos) - comprimentos)
+        arr[np.arange(comprimentos.sum()) + np.repeat(deslocamentos, comprimentos)] = _ESPACO
+    return int(linha_valida.sum())
+
+
+def _analisar_linha_a_linha(texto, n_colunas):
+    """Caminho lento (linha a linha), usado quando o caminho vetorizado encontra campos malformados"""
+    dados = []
+    for linha in texto.splitlines():
+        valores = linha.split()
+        if len(valores) >= n_colunas:
+            try:
+                dados.append([float(v) for v in valores[:n_colunas]])
+            except ValueError:
+                continue
+    return np.array(dados, dtype=float).reshape(-1, n_colunas)
+
+
+def analisar_colunas(conteudo, n_colunas=3, virgula='.', tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Converte um buffer de texto em uma matriz numérica (linhas x n_colunas).
+
+    Linhas vazias, cabeçalhos ('Filename:', '#', texto em geral) e linhas com
+    menos de `n_colunas` campos são descartadas; colunas excedentes são
+    ignoradas. O buffer é processado em blocos alinhados a quebras de linha.
+
+    Args:
+        conteudo (bytes ou str): Conteúdo do arquivo
+        n_colunas (int): Número de colunas a extrair de cada linha
+        virgula (str): '.' quando a vírgula é separador decimal, ' ' quando é separador de campos
+        tamanho_bloco (int): Tamanho aproximado (em bytes) de cada bloco processado
+
+    Returns:
+        np.ndarray: Matriz float64 de forma (n_linhas, n_colunas)
+    """
+    if isinstance(conteudo, str):
+        conteudo = conteudo.encode('utf-8', errors='replace')
+    conteudo = conteudo.translate(_tabela_traducao(virgula))
+    if not conteudo.endswith(b"\n"):
+        conteudo += b"\n"
+
+    partes = []
+    inicio = 0
+    while inicio < len(conteudo):
+        fim = conteudo.rfind(b"\n", inicio, inicio + tamanho_bloco) + 1
+        if fim <= inicio:
+            # Linha maior que o bloco: estende até a próxima quebra
+            fim = conteudo.find(b"\n", inicio + tamanho_bloco) + 1
+        bloco = bytearray(conteudo[inicio:fim])
+        n_linhas = _analisar_bloco(np.frombuffer(bloco, dtype=np.uint8), n_colunas)
+        valores = None
+        if n_linhas:
+            with warnings.catch_warnings():
+                warnings.simplefilter('error', DeprecationWarning)
+                try:
+                    valores = np.fromstring(bytes(bloco), dtype=float, sep=' ')
+                except (DeprecationWarning, ValueError):
+                    valores = None
+            if valores is None or valores.size != n_linhas * n_colunas:
+                # Campos como '1.2.3' ou '1e' passam no filtro de caracteres mas não são números
+                valores = _analisar_linha_a_linha(conteudo[inicio:fim].decode('utf-8', errors='replace'), n_colunas)
+        if valores is not None and valores.size:
+            partes.append(valores.reshape(-1, n_colunas))
+        inicio = fim
+
+    if not partes:
+        return np.empty((0, n_colunas))
+    return np.concatenate(partes) if len(partes) > 1 else partes[0]
+
+
+###############################################################
+#Arquivos auxiliares binários (.npy) com as colunas já convertidas
+
+def _caminho_auxiliar(caminho_arquivo, opcoes):
+    """Base do nome do auxiliar (sem extensão): um por arquivo de origem e opções de leitura"""
+    chave = repr((VERSAO_AUXILIAR, os.path.abspath(caminho_arquivo), opcoes)).encode('utf-8')
+    return os.path.join(DIRETORIO_AUXILIAR, hashlib.sha1(chave).hexdigest())
+
+
+def _resumo_conteudo(conteudo):
+    """Hash (blake2b) do conteúdo do arquivo de origem"""
+    return hashlib.blake2b(conteudo, digest_size=20).hexdigest()
+
+
+def _ler_auxiliar(caminho_arquivo, opcoes):
+    """
+    Colunas guardadas no auxiliar, mapeadas em memória, se ele ainda vale para
+    o arquivo de origem.
+
+    O auxiliar vale quando o tamanho do arquivo é o mesmo e a data de
+    modificação também; se só a data mudou (arquivo copiado ou tocado), o
+    conteúdo é comparado pelo hash e, se for igual, o auxiliar é revalidado.
+
+    Returns:
+        tuple: (encontrado, colunas), com colunas None quando o arquivo não
+        tem o bloco procurado (ex.: marcador ausente)
+    """
+    base = _caminho_auxiliar(caminho_arquivo, opcoes)
+    try:
+        with open(base + '.json', 'r') as f:
+            meta = json.load(f)
+        info = os.stat(caminho_arquivo)
+    except (OSError, ValueError):
+        return False, None
+
+    if meta.get('tamanho') != info.st_size:
+        return False, None
+    if meta.get('mtime_ns') != info.st_mtime_ns:
+        with open(caminho_arquivo, 'rb') as f:
+            if info.st_size == 0:
+                resumo = _resumo_conteudo(b"")
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                    resumo = _resumo_conteudo(mapa)
+        if resumo != meta.get('hash'):
+            return False, None
+        meta['mtime_ns'] = info.st_mtime_ns
+        try:
+            _gravar_atomico(base + '.json', lambda f: json.dump(meta, f), 'w')
+        except OSError:
+            pass  # continua valendo nesta leitura; o hash é refeito na próxima
+
+    else:
+        try:
+            os.utime(base + '.json')  # marca como usado agora (LRU)
+        except OSError:
+            pass
+
+    if meta.get('vazio'):
+        return True, None
+    try:
+        dados = np.load(base + '.npy', mmap_mode='r')
+    except (OSError, ValueError):
+        return False, None
+    return True, tuple(dados[j] for j in range(dados.shape[0]))
+
+
+def _gravar_atomico(caminho, escrever, modo='wb'):
+    """Escreve em um temporário e troca de nome: leitores nunca veem um arquivo pela metade"""
+    temporario = f"{caminho}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temporario, modo) as f:
+            escrever(f)
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+
+def _gravar_auxiliar(caminho_arquivo, opcoes, info, resumo, colunas):
+    """Guarda as colunas (matriz n_colunas x n_linhas, cada coluna contígua) e os dados de validação"""
+    base = _caminho_auxiliar(caminho_arquivo, opcoes)
+    meta = {'origem': os.path.abspath(caminho_arquivo), 'opcoes': repr(opcoes),
+            'tamanho': info.st_size, 'mtime_ns': info.st_mtime_ns, 'hash': resumo,
+            'vazio': colunas is None}
+    try:
+        os.makedirs(DIRETORIO_AUXILIAR, exist_ok=True)
+        if colunas is not None:
+            _gravar_atomico(base + '.npy', lambda f: np.save(f, colunas))
+        _gravar_atomico(base + '.json', lambda f: json.dump(meta, f), 'w')
+    except OSError as e:
+        warnings.warn(f"Não foi possível gravar o auxiliar de {caminho_arquivo}: {str(e)}")
+        return
+    _podar_auxiliares(manter=os.path.basename(base))
+
+
+def _podar_auxiliares(manter=None, max_bytes=None):
+    """
+    Se os auxiliares passarem de `max_bytes` (padrão MAX_BYTES_AUXILIAR),
+    remove os menos usados (pela data do .json, tocada a cada leitura) até
+    ficarem em 90% do limite, como em cache_ajustes.CacheAjustes. O auxiliar
+    `manter` (o recém-gravado) nunca sai.
+    """
+    max_bytes = MAX_BYTES_AUXILIAR if max_bytes is None else max_bytes
+    grupos = {}  # base -> [tamanho, último uso, caminhos]
+    try:
+        arquivos = list(os.scandir(DIRETORIO_AUXILIAR))
+    except OSError:
+        return
+    for arquivo in arquivos:
+        base, extensao = os.path.splitext(arquivo.name)
+        if extensao not in ('.npy', '.json'):
+            continue
+        try:
+            info = arquivo.stat()
+        except OSError:
+            continue
+        grupo = grupos.setdefault(base, [0, 0.0, []])
+        grupo[0] += info.st_size
+        grupo[2].append(arquivo.path)
+        if extensao == '.json' or not grupo[1]:
+            grupo[1] = info.st_mtime
+
+    total = sum(g[0] for g in grupos.values())
+    if total <= max_bytes:
+        return
+    for base, (tamanho, _, caminhos) in sorted(grupos.items(), key=lambda g: g[1][1]):
+        if total <= 0.9 * max_bytes:
+            break
+        if base == manter:
+            continue
+        try:
+            # O .json primeiro: sem ele o .npy já não é lido
+            for caminho in sorted(caminhos, key=lambda c: not c.endswith('.json')):
+                os.remove(caminho)
+        except OSError:
+            continue  # ex.: .npy ainda mapeado em memória no Windows
+        total -= tamanho
+
+
+def _carregar(caminho_arquivo, opcoes, converter, auxiliar):
+    """
+    Lê o arquivo com converter(conteúdo mapeado) -> matriz (n_linhas, n_colunas)
+    ou None, passando antes pelo auxiliar binário quando `auxiliar` é True.
+    """
+    if auxiliar:
+        encontrado, colunas = _ler_auxiliar(caminho_arquivo, opcoes)
+        if encontrado:
+            return colunas
+
+    with open(caminho_arquivo, 'rb') as f:
+        # A assinatura é tirada antes da leitura: se o arquivo mudar no meio,
+        # o auxiliar nasce desatualizado e é refeito na próxima vez
+        info = os.fstat(f.fileno())
+        if info.st_size == 0:
+            dados = converter(b"")
+            resumo = _resumo_conteudo(b"")
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                dados = converter(mapa)
+                resumo = _resumo_conteudo(mapa) if auxiliar else None
+
+    colunas = None if dados is None else np.ascontiguousarray(dados.T)
+    if auxiliar:
+        _gravar_auxiliar(caminho_arquivo, opcoes, info, resumo, colunas)
+    return None if colunas is None else tuple(colunas[j] for j in range(colunas.shape[0]))
+
+
+def limpar_auxiliares():
+    """Apaga todos os arquivos auxiliares (são refeitos na próxima leitura de cada arquivo)"""
+    if not os.path.isdir(DIRETORIO_AUXILIAR):
+        return
+    for nome in os.listdir(DIRETORIO_AUXILIAR):
+        if nome.endswith(('.npy', '.json', '.tmp')):
+            os.remove(os.path.join(DIRETORIO_AUXILIAR, nome))
+
+
+###############################################################
+#Leitura dos arquivos
+
+def carregar_colunas(caminho_arquivo, n_colunas=3, virgula='.', auxiliar=True, ordenar_por=None):
+    """
+    Lê um arquivo de medida e devolve suas colunas numéricas.
+
+    Na primeira leitura as colunas convertidas são guardadas em um auxiliar
+    binário (.npy em DIRETORIO_AUXILIAR); as leituras seguintes do mesmo
+    arquivo, enquanto ele não mudar, só mapeiam o auxiliar em memória.
+
+    Args:
+        caminho_arquivo (str): Caminho do arquivo de dados
+        n_colunas (int): Número de colunas a extrair
+        virgula (str): '.' para vírgula decimal, ' ' para vírgula como separador
+        auxiliar (bool): False sempre converte o texto, sem ler nem gravar o auxiliar
+        ordenar_por (int, opcional): Coluna pela qual as linhas são ordenadas
+            (ordenação estável) antes de gravar o auxiliar; as leituras
+            seguintes já vêm ordenadas, sem custo
+
+    Returns:
+        tuple: `n_colunas` arrays 1-D contíguos (float64); somente leitura
+        quando vêm do auxiliar
+    """
+    def converter(conteudo):
+        dados = analisar_colunas(conteudo[:], n_colunas, virgula)
+        if ordenar_por is not None:
+            dados = dados[np.argsort(dados[:, ordenar_por], kind='stable')]
+        return dados
+
+    opcoes = ('colunas', n_colunas, virgula) + (() if ordenar_por is None else (('ordem', ordenar_por),))
+    return _carregar(caminho_arquivo, opcoes, converter, auxiliar)
+
+
+def carregar_colunas_apos(caminho_arquivo, marcador, n_colunas=2, virgula='.', auxiliar=True):
+    """
+    Lê as colunas numéricas que vêm depois da primeira ocorrência de `marcador`
+    (ex.: o fim do cabeçalho "(emu)" dos arquivos de VSM).
+
+    O arquivo é mapeado em memória: a busca pelo marcador e a conversão do
+    bloco numérico são feitas em uma passada, sem cópias intermediárias em
+    disco. Como em carregar_colunas, o resultado fica em um auxiliar binário.
+
+    Args:
+        caminho_arquivo (str): Caminho do arquivo de dados
+        marcador (bytes ou str): Texto que encerra o cabeçalho
+        n_colunas (int): Número de colunas a extrair
+        virgula (str): '.' para vírgula decimal, ' ' para vírgula como separador
+        auxiliar (bool): False sempre converte o texto, sem ler nem gravar o auxiliar
+
+    Returns:
+        tuple ou None: `n_colunas` arrays 1-D, ou None se o marcador não existir
+    """
+    if isinstance(marcador, str):
+        marcador = marcador.encode('utf-8')
+
+    def converter(conteudo):
+        indice = conteudo.find(marcador)
+        if indice == -1:
+            return None
+        return analisar_colunas(conteudo[indice + len(marcador):], n_colunas, virgula)
+
+    return _carregar(caminho_arquivo, ('apos', marcador, n_colunas, virgula), converter, auxiliar)
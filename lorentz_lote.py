@@ -0,0 +1,273 @@
+import numpy as np, lmfit
+
+###############################################################
+###############################################################
+###############################################################
+#Ajuste simultâneo de muitos espectros com a Lorentziana assimétrica
+
+NOMES = ('m', 'n', 'Hr', 'dH')  # mesma ordem dos argumentos de GMAG.lorentz
+MINIMOS = np.array([0.0, -np.inf, -np.inf, 0.0])  # m >= 0 e dH >= 0, como em impedancia
+
+
+def lorentz_lote(x, P):
+    """
+    Lorentziana assimétrica avaliada para vários conjuntos de parâmetros.
+
+    Args:
+        x (np.ndarray): Grade de campo comum, forma (N,)
+        P (np.ndarray): Parâmetros (m, n, Hr, dH), forma (S, 4)
+
+    Returns:
+        np.ndarray: Forma (S, N)
+    """
+    m, n, Hr, dH = (P[:, k, None] for k in range(4))
+    u = x - Hr
+    D = u**2 + dH**2
+    return (m * dH**2 + n * dH * u) / D
+
+
+def jacobiano_lote(x, P):
+    """Derivadas de lorentz_lote em relação a (m, n, Hr, dH), forma (S, N, 4)"""
+    m, n, Hr, dH = (P[:, k, None] for k in range(4))
+    u = x - Hr
+    D = u**2 + dH**2
+    D2 = D**2
+    J = np.empty(u.shape + (4,))
+    J[..., 0] = dH**2 / D
+    J[..., 1] = dH * u / D
+    J[..., 2] = (2 * m * dH**2 * u + n * dH * (u**2 - dH**2)) / D2
+    J[..., 3] = (2 * m * dH * u**2 + n * u * (u**2 - dH**2)) / D2
+    return J
+
+
+def estimativas_iniciais(x, Y):
+    """Mesmas estimativas usadas em impedancia: pico no máximo, largura = faixa/10, n = 0"""
+    P = np.empty((Y.shape[0], 4))
+    P[:, 0] = Y.max(axis=1)
+    P[:, 1] = 0.0
+    P[:, 2] = x[np.argmax(Y, axis=1)]
+    P[:, 3] = (x.max() - x.min()) / 10
+    return P
+
+
+class ResultadoLote:
+    """Parâmetros, erros e estatísticas de um ajuste em lote (uma linha por espectro)"""
+
+    def __init__(self, x, valores, erros, chisqr, nfev, sucesso, metodo):
+        self.x = x
+        self.valores = valores      # (S, 4) na ordem de NOMES
+        self.erros = erros          # (S, 4), nan quando indisponível
+        self.chisqr = chisqr
+        self.nfev = nfev
+        self.sucesso = sucesso
+        self.metodo = metodo        # 'lote' ou 'lmfit' para cada espectro
+        self.ndata = len(x)
+        self.redchi = np.asarray(chisqr, dtype=float) / max(self.ndata - len(NOMES), 1)
+
+    def __len__(self):
+        return len(self.valores)
+
+    def __getitem__(self, nome):
+        return self.valores[:, NOMES.index(nome)]
+
+    def stderr(self, nome):
+        return self.erros[:, NOMES.index(nome)]
+
+    def parametros(self, i):
+        """Dicionário {nome: (valor, erro)} do espectro i"""
+        return {nome: (self.valores[i, k], self.erros[i, k]) for k, nome in enumerate(NOMES)}
+
+    def melhor_ajuste(self, i, x=None):
+        """Curva ajustada do espectro i (na grade do ajuste, por padrão)"""
+        return lorentz_lote(self.x if x is None else x, self.valores[i:i + 1])[0]
+
+    def exportar(self, i):
+        """Dados do espectro i em um dicionário serializável em JSON (ex.: para o cache de ajustes)"""
+        return {
+            'valores': self.valores[i].tolist(),
+            'erros': self.erros[i].tolist(),
+            'chisqr': float(self.chisqr[i]),
+            'redchi': float(self.redchi[i]),
+            'nfev': int(self.nfev[i]),
+            'sucesso': bool(self.sucesso[i]),
+            'metodo': str(self.metodo[i]),
+        }
+
+    @classmethod
+    def importar(cls, x, linhas):
+        """ResultadoLote montado a partir de dicionários de exportar(), um por espectro"""
+        resultado = cls(np.asarray(x, dtype=float),
+                        np.array([l['valores'] for l in linhas], dtype=float).reshape(-1, len(NOMES)),
+                        np.array([l['erros'] for l in linhas], dtype=float).reshape(-1, len(NOMES)),
+                        np.array([l['chisqr'] for l in linhas], dtype=float),
+                        np.array([l['nfev'] for l in linhas], dtype=int),
+                        np.array([l['sucesso'] for l in linhas], dtype=bool),
+                        np.array([l['metodo'] for l in linhas], dtype=object))
+        resultado.redchi = np.array([l['redchi'] for l in linhas], dtype=float)
+        return resultado
+
+    def relatorio(self, i):
+        """Relatório em texto no mesmo formato básico de lmfit fit_report"""
+        linhas = [
+            "[[Fit Statistics]]",
+            f"    # fitting method   = {'batched Levenberg-Marquardt' if self.metodo[i] == 'lote' else 'leastsq (lmfit)'}",
+            f"    # function evals   = {self.nfev[i]}",
+            f"    # data points      = {self.ndata}",
+            f"    # variables        = {len(NOMES)}",
+            f"    chi-square         = {self.chisqr[i]:.8g}",
+            f"    reduced chi-square = {self.redchi[i]:.8g}",
+            f"    success            = {bool(self.sucesso[i])}",
+            "[[Variables]]",
+        ]
+        for k, nome in enumerate(NOMES):
+            valor, erro = self.valores[i, k], self.erros[i, k]
+            if np.isfinite(erro):
+                linhas.append(f"    {nome + ':':<4} {valor:.8g} +/- {erro:.8g}")
+            else:
+                linhas.append(f"    {nome + ':':<4} {valor:.8g} (erro não disponível)")
+        return "\n".join(linhas) + "\n"
+
+
+def _erros_padrao(J, chisqr, n_pontos):
+    """Erros a partir de inv(JᵀJ) escalada pelo qui-quadrado reduzido, como no lmfit"""
+    A = np.einsum('snk,snl->skl', J, J)
+    erros = np.full(A.shape[:2], np.nan)
+    redchi = chisqr / max(n_pontos - A.shape[1], 1)
+    for i in range(len(A)):
+        try:
+            cov = np.linalg.inv(A[i]) * redchi[i]
+        except np.linalg.LinAlgError:
+            continue
+        d = np.diag(cov)
+        erros[i] = np.where(d >= 0, np.sqrt(np.abs(d)), np.nan)
+    return erros
+
+
+def ajustar_lorentz_lmfit(x, y, p0=None):
+    """Ajuste individual com lmfit.Model, exatamente como em impedancia"""
+    from GMAG import lorentz
+    if p0 is None:
+        p0 = estimativas_iniciais(x, y[None, :])[0]
+    modelo = lmfit.Model(lorentz)
+    params = modelo.make_params(**dict(zip(NOMES, map(float, p0))))
+    params['dH'].min = 0
+    params['m'].min = 0
+    return modelo.fit(y, params, x=x)
+
+
+def ajustar_lorentz_lote(x, Y, p0=None, max_iter=200, ftol=1.5e-8, xtol=1.5e-8, reserva_lmfit=True):
+    """
+    Ajusta a Lorentziana assimétrica a todos os espectros de Y de uma só vez.
+
+    Levenberg-Marquardt vetorizado: a cada iteração o jacobiano de todos os
+    espectros ainda ativos é montado em um único array (S, N, 4) e os
+    sistemas 4x4 são resolvidos em lote. Cada espectro tem seu próprio fator
+    de amortecimento e sai do laço quando converge. Os limites m >= 0 e
+    dH >= 0 são impostos por projeção.
+
+    Args:
+        x (np.ndarray): Grade de campo comum a todos os espectros, forma (N,)
+        Y (np.ndarray): Espectros empilhados, forma (S, N)
+        p0 (np.ndarray, opcional): Parâmetros iniciais (S, 4); padrão: estimativas_iniciais
+        max_iter (int): Número máximo de iterações
+        ftol, xtol (float): Tolerâncias relativas no qui-quadrado e nos parâmetros
+        reserva_lmfit (bool): Reajusta com lmfit os espectros que não convergirem
+
+    Returns:
+        ResultadoLote
+    """
+    x = np.asarray(x, dtype=float)
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    S, N = Y.shape
+    P = estimativas_iniciais(x, Y) if p0 is None else np.array(p0, dtype=float).reshape(S, 4)
+    P = np.maximum(P, MINIMOS)
+
+    residuo = lorentz_lote(x, P) - Y
+    chisqr = np.einsum('sn,sn->s', residuo, residuo)
+    amortecimento = np.full(S, 1e-3)
+    nfev = np.ones(S, dtype=int)
+    convergiu = np.zeros(S, dtype=bool)
+    estagnou = np.zeros(S, dtype=bool)
+    ativos = np.arange(S)
+
+    for _ in range(max_iter):
+        if len(ativos) == 0:
+            break
+        Pa = P[ativos]
+        J = jacobiano_lote(x, Pa)
+        A = np.einsum('snk,snl->skl', J, J)
+        g = np.einsum('snk,sn->sk', J, residuo[ativos])
+
+        # Amortecimento de Marquardt, escalado pela diagonal de JᵀJ
+        diagonal = np.einsum('skk->sk', A)
+        diagonal = np.maximum(diagonal, 1e-12 * diagonal.max(axis=1, keepdims=True) + 1e-300)
+        A_amortecida = A.copy()
+        A_amortecida[:, range(4), range(4)] += amortecimento[ativos, None] * diagonal
+        try:
+            passo = -np.linalg.solve(A_amortecida, g[..., None])[..., 0]
+        except np.linalg.LinAlgError:
+            passo = -np.einsum('skl,sl->sk', np.linalg.pinv(A_amortecida), g)
+
+        P_novo = np.maximum(Pa + passo, MINIMOS)
+        residuo_novo = lorentz_lote(x, P_novo) - Y[ativos]
+        chisqr_novo = np.einsum('sn,sn->s', residuo_novo, residuo_novo)
+        nfev[ativos] += 1
+
+        melhorou = np.isfinite(chisqr_novo) & (chisqr_novo <= chisqr[ativos])
+        aceitos = ativos[melhorou]
+        reducao = (chisqr[aceitos] - chisqr_novo[melhorou]) / np.maximum(chisqr[aceitos], 1e-300)
+        passo_pequeno = np.all(np.abs(P_novo[melhorou] - Pa[melhorou])
+                               <= xtol * (np.abs(Pa[melhorou]) + xtol), axis=1)
+
+        P[aceitos] = P_novo[melhorou]
+        residuo[aceitos] = residuo_novo[melhorou]
+        chisqr[aceitos] = chisqr_novo[melhorou]
+        amortecimento[aceitos] = np.maximum(amortecimento[aceitos] / 10, 1e-12)
+        amortecimento[ativos[~melhorou]] *= 10
+
+        convergiu[aceitos[(reducao <= ftol) | passo_pequeno]] = True
+        # Sem progresso possível: amortecimento enorme e nenhum passo aceito.
+        # Sai do laço sem contar como convergência (vai para a reserva lmfit)
+        estagnou[ativos[~melhorou & (amortecimento[ativos] > 1e12)]] = True
+        ativos = ativos[~convergiu[ativos] & ~estagnou[ativos]]
+
+    sucesso = convergiu & np.all(np.isfinite(P), axis=1)
+    erros = _erros_padrao(jacobiano_lote(x, P), chisqr, N)
+    metodo = np.array(['lote'] * S, dtype=object)
+    resultado = ResultadoLote(x, P, erros, chisqr, nfev, sucesso, metodo)
+
+    if reserva_lmfit:
+        _reajustar_lmfit(resultado, Y, np.flatnonzero(~sucesso))
+    return resultado
+
+
+def _reajustar_lmfit(resultado, Y, indices):
+    """Refaz com lmfit, um a um, os espectros indicados e atualiza `resultado` no lugar"""
+    for i in indices:
+        try:
+            ajuste = ajustar_lorentz_lmfit(resultado.x, Y[i])
+        except Exception as e:
+            print(f"AVISO: ajuste lmfit falhou para o espectro {i}: {str(e)}")
+            continue
+        resultado.valores[i] = [ajuste.params[nome].value for nome in NOMES]
+        resultado.erros[i] = [np.nan if ajuste.params[nome].stderr is None else ajuste.params[nome].stderr
+                              for nome in NOMES]
+        resultado.chisqr[i] = ajuste.chisqr
+        resultado.redchi[i] = ajuste.redchi
+        resultado.nfev[i] = ajuste.nfev
+        resultado.sucesso[i] = ajuste.success
+        resultado.metodo[i] = 'lmfit'
+
+
+def ajustar_lorentz_individual(x, Y):
+    """
+    Caminho original: um ajuste lmfit por espectro, com o mesmo formato de saída
+    de ajustar_lorentz_lote.
+    """
+    x = np.asarray(x, dtype=float)
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    S = len(Y)
+    resultado = ResultadoLote(x, np.full((S, 4), np.nan), np.full((S, 4), np.nan), np.full(S, np.nan),
+                              np.zeros(S, dtype=int), np.zeros(S, dtype=bool), np.array(['lmfit'] * S, dtype=object))
+    _reajustar_lmfit(resultado, Y, range(S))
+    return resultado
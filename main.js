@@ -110,7 +110,7 @@ function carregarVSM() {
             <button onclick="selecionarDiretorio('dir1')" class="btn btn-secondary">Selecionar</button>
         </div>
         <div class="form-group">
-            <label for="dir2">Diretório de Entrada 2:</label>
+            <label for="dir2">Diretório Intermediário (opcional):</label>
             <input type="text" id="dir2" class="form-control" placeholder="Selecione o diretório">
             <button onclick="selecionarDiretorio('dir2')" class="btn btn-secondary">Selecionar</button>
         </div>
@@ -121,6 +121,7 @@ function carregarVSM() {
         </div>
         <button onclick="processarVSM()" class="btn btn-primary">Executar VSM</button>
         <div id="statusVSM" class="mt-3"></div>
+        <div id="tarefasVSM"></div>
     `);
 }
 
@@ -139,6 +140,7 @@ function carregarDRX() {
         </div>
         <button onclick="enviarParaDRX()" class="btn btn-primary">Processar DRX</button>
         <div id="statusDRX" class="mt-3"></div>
+        <div id="tarefasDRX"></div>
     `);
 }
 
@@ -157,6 +159,9 @@ function carregarFMR() {
         </div>
         <button onclick="enviarParaFMR()" class="btn btn-primary">Processar FMR</button>
         <div id="statusFMR" class="mt-3"></div>
+        <div id="tarefasFMR"></div>
+        <div id="resultadosFMR" class="mt-3"></div>
+        <div id="detalhesFMR" class="mt-3"></div>
     `);
 }
 
@@ -164,6 +169,87 @@ function setMainContent(html) {
     document.querySelector('.main-content').innerHTML = html;
 }
 
+// =============================================
+// TAREFAS EM SEGUNDO PLANO
+// =============================================
+
+// As análises rodam na fila de tarefas do Python; a página só consulta o andamento
+const INTERVALO_CONSULTA_MS = 500;
+const ESTADOS_FINAIS = { concluida: 'alert-success', erro: 'alert-danger', cancelada: 'alert-warning' };
+
+async function submeterTarefa(tipo, argumentos, containerId, aoConcluir) {
+    const resposta = await eel.iniciar_tarefa(tipo, argumentos)();
+    if (!resposta.success) {
+        throw new Error(resposta.message);
+    }
+    criarCartaoTarefa(resposta.id, tipo, containerId);
+    acompanharTarefa(resposta.id, aoConcluir);
+    return resposta.id;
+}
+
+function criarCartaoTarefa(id, tipo, containerId) {
+    const cartao = document.createElement('div');
+    cartao.id = `tarefa-${id}`;
+    cartao.className = 'alert alert-info tarefa';
+    cartao.innerHTML = `
+        <strong>${tipo.toUpperCase()}</strong> — <span class="estado-tarefa">pendente</span>
+        <button class="btn btn-secondary btn-cancelar" onclick="cancelarTarefa('${id}')">Cancelar</button>
+        <progress max="1" value="0" style="width: 100%"></progress>
+        <pre class="mensagens-tarefa" style="max-height: 150px; overflow-y: auto"></pre>
+    `;
+    document.getElementById(containerId).prepend(cartao);
+}
+
+async function acompanharTarefa(id, aoConcluir, desde = 0) {
+    const cartao = document.getElementById(`tarefa-${id}`);
+    if (!cartao) {
+        return;  // página trocada: a tarefa continua, mas sem acompanhamento aqui
+    }
+    let estado;
+    try {
+        estado = await eel.estado_tarefa(id, desde)();
+    } catch (erro) {
+        console.error('Erro ao consultar tarefa:', erro);
+        setTimeout(() => acompanharTarefa(id, aoConcluir, desde), INTERVALO_CONSULTA_MS);
+        return;
+    }
+    if (!estado.success) {
+        cartao.className = 'alert alert-danger tarefa';
+        cartao.querySelector('.estado-tarefa').textContent = estado.message;
+        return;
+    }
+
+    cartao.querySelector('.estado-tarefa').textContent =
+        `${estado.estado} (${Math.round(100 * estado.progresso)}%)`;
+    cartao.querySelector('progress').value = estado.progresso;
+    if (estado.mensagens.length) {
+        const log = cartao.querySelector('.mensagens-tarefa');
+        log.textContent += estado.mensagens.join('\n') + '\n';
+        log.scrollTop = log.scrollHeight;
+    }
+
+    if (estado.estado in ESTADOS_FINAIS) {
+        cartao.className = `alert ${ESTADOS_FINAIS[estado.estado]} tarefa`;
+        cartao.querySelector('.btn-cancelar').remove();
+        if (estado.erro) {
+            cartao.querySelector('.estado-tarefa').textContent += `: ${estado.erro}`;
+        }
+        if (aoConcluir) {
+            aoConcluir(estado);
+        }
+        return;
+    }
+    setTimeout(() => acompanharTarefa(id, aoConcluir, estado.proxima), INTERVALO_CONSULTA_MS);
+}
+
+async function cancelarTarefa(id) {
+    const resposta = await eel.cancelar_tarefa(id)();
+    const cartao = document.getElementById(`tarefa-${id}`);
+    if (cartao && resposta.success) {
+        cartao.querySelector('.estado-tarefa').textContent = 'cancelando...';
+    }
+}
+
 // =============================================
 // FUNÇÕES DE PROCESSAMENTO
 // =============================================
@@ -186,15 +272,13 @@ async function processarVSM() {
     const statusElement = document.getElementById('statusVSM');
     
     try {
-        if (!dir1 || !dir2 || !dir3) {
-            throw new Error('Por favor, selecione todos os diretórios.');
+        if (!dir1 || !dir3) {
+            throw new Error('Por favor, selecione os diretórios de entrada e de saída.');
         }
         
-        statusElement.innerHTML = '<div class="alert alert-info">Processando VSM... Aguarde.</div>';
-        
-        const resultado = await eel.processar_vsm(dir1, dir2, dir3)();
+        await submeterTarefa('vsm', [dir1, dir2 || null, dir3], 'tarefasVSM');
         
-        statusElement.innerHTML = `<div class="alert alert-success">${resultado}</div>`;
+        statusElement.innerHTML = '<div class="alert alert-success">Análise VSM enviada.</div>';
     } catch (erro) {
         statusElement.innerHTML = `<div class="alert alert-danger">Erro: ${erro.message}</div>`;
     }
@@ -208,9 +292,7 @@ async function enviarParaDRX() {
 async function processarFMR() {
     const arquivoInput = document.getElementById('arquivoFMR');
     const dirOutput = document.getElementById('dirFMR').value;
-    const btnProcessar = document.getElementById('btnProcessarFMR');
     const statusElement = document.getElementById('statusFMR');
-    const resultadosContainer = document.getElementById('resultadosFMR');
     
     // Validação
     if (!arquivoInput.files.length || !dirOutput) {
@@ -219,10 +301,6 @@ async function processarFMR() {
     }
     
     try {
-        // Configura estado de processamento
-        btnProcessar.disabled = true;
-        btnProcessar.innerHTML = '<span class="loading"></span> Processando...';
-        resultadosContainer.innerHTML = '';
         showStatus('statusFMR', 'Preparando análise FMR...', 'warning');
         
         // Obtém parâmetros iniciais do formulário
@@ -237,31 +315,115 @@ async function processarFMR() {
             dH2: parseFloat(document.getElementById('param_dh2').value) || 50
         };
         
-        // Chamada para o Python
-        const resultado = await eel.processar_fmr(
-            arquivoInput.files[0].path,
-            dirOutput,
-            parametrosIniciais
-        )();
-        
-        // Tratamento do resultado
-        if (resultado.success) {
-            showStatus('statusFMR', resultado.message, 'success');
-            exibirResultadosFMR(resultado.resultados);
-        } else {
-            showStatus('statusFMR', resultado.message, 'error');
-        }
+        // Envia para a fila de tarefas; os resultados aparecem quando a tarefa termina
+        await submeterTarefa(
+            'fmr',
+            [arquivoInput.files[0].path, dirOutput, parametrosIniciais],
+            'tarefasFMR',
+            estado => {
+                if (estado.estado === 'concluida') {
+                    showStatus('statusFMR', estado.resultado.message, 'success');
+                    exibirResultadosFMR(estado.resultado.resultados);
+                }
+            }
+        );
+        showStatus('statusFMR', 'Análise FMR enviada', 'warning');
     } catch (error) {
         showStatus('statusFMR', `Erro: ${error.message}`, 'error');
-    } finally {
-        btnProcessar.disabled = false;
-        btnProcessar.textContent = 'Processar FMR';
     }
 }
 
 
-function exibirResultadosFMR(resultados) {
+// Eventos do ajuste FMR enviados pelo Python em lotes: os resultados aparecem ângulo a ângulo
+eel.expose(eventos_fmr);
+function eventos_fmr(lote) {
     const container = document.getElementById('resultadosFMR');
+    if (!container) {
+        return;
+    }
+    lote.forEach(evento => tratarEventoFMR(container, evento));
+}
+
+function formatarNumero(valor) {
+    return valor === null || valor === undefined ? '—' : Number(valor).toPrecision(5);
+}
+
+function secaoExecucaoFMR(container, execucao) {
+    let secao = document.getElementById(`execucao-${execucao}`);
+    if (!secao) {
+        secao = document.createElement('div');
+        secao.id = `execucao-${execucao}`;
+        secao.className = 'card';
+        secao.innerHTML = `
+            <h3 class="titulo-execucao">Análise FMR</h3>
+            <p class="andamento-execucao"></p>
+            <table class="tabela-angulos">
+                <thead>
+                    <tr><th>Ângulo</th><th>Hr1</th><th>dH1</th><th>Hr2</th><th>dH2</th><th>χ² reduzido</th></tr>
+                </thead>
+                <tbody></tbody>
+            </table>
+            <div class="gallery"></div>
+        `;
+        container.prepend(secao);
+    }
+    return secao;
+}
+
+function tratarEventoFMR(container, evento) {
+    const secao = secaoExecucaoFMR(container, evento.execucao);
+    const andamento = secao.querySelector('.andamento-execucao');
+
+    if (evento.tipo === 'inicio') {
+        secao.querySelector('.titulo-execucao').textContent = `Análise FMR: ${evento.arquivo}`;
+        andamento.textContent = `0/${evento.n_total} ângulos ajustados`;
+    } else if (evento.tipo === 'angulo') {
+        andamento.textContent = `${evento.n_concluidos}/${evento.n_total} ângulos ajustados`;
+
+        // Linhas em ordem de ângulo, qualquer que seja a ordem de chegada
+        const p = evento.parametros;
+        const linha = document.createElement('tr');
+        linha.dataset.angulo = evento.angulo;
+        linha.innerHTML = `
+            <td>${evento.angulo}°</td>
+            <td>${formatarNumero(p.Hr1)}</td><td>${formatarNumero(p.dH1)}</td>
+            <td>${formatarNumero(p.Hr2)}</td><td>${formatarNumero(p.dH2)}</td>
+            <td>${formatarNumero(evento.redchi)}</td>
+        `;
+        const corpo = secao.querySelector('tbody');
+        const seguinte = Array.from(corpo.children).find(l => Number(l.dataset.angulo) > evento.angulo);
+        corpo.insertBefore(linha, seguinte || null);
+
+        if (evento.grafico) {
+            const item = document.createElement('div');
+            item.className = 'gallery-item';
+            item.dataset.angulo = evento.angulo;
+            item.innerHTML = `
+                <img alt="Renderizando..." class="img-thumbnail" onclick="visualizarGrafico('${evento.grafico}')">
+                <div class="gallery-caption">Ângulo ${evento.angulo}°</div>
+            `;
+            secao.querySelector('.gallery').appendChild(item);
+        }
+    } else if (evento.tipo === 'grafico') {
+        const imagem = secao.querySelector(`.gallery-item[data-angulo="${evento.angulo}"] img`);
+        if (imagem) {
+            if (evento.ok) {
+                imagem.src = evento.grafico;
+            } else {
+                imagem.alt = 'Falha ao gerar o gráfico';
+            }
+        }
+    } else if (evento.tipo === 'fim') {
+        andamento.textContent = evento.success
+            ? `${andamento.textContent} — análise concluída`
+            : `${andamento.textContent} — ${evento.message}`;
+    }
+}
+
+
+function exibirResultadosFMR(resultados) {
+    // Os resultados parciais de cada análise ficam em resultadosFMR; aqui vai o detalhamento da última concluída
+    const container = document.getElementById('detalhesFMR') || document.getElementById('resultadosFMR');
     container.innerHTML = `
         <div class="tabs">
             <button class="tab-btn active" onclick="abrirTab(event, 'resumo')">Resumo</button>
@@ -391,7 +553,6 @@ async function processarArquivo(tipo) {
     const inputArquivo = document.getElementById(`arquivo${tipo}`);
     const inputDiretorio = document.getElementById(`dir${tipo}`);
     const statusElement = document.getElementById(`status${tipo}`);
-    const botao = event.target;
     
     try {
         // Validação
@@ -399,24 +560,16 @@ async function processarArquivo(tipo) {
             throw new Error(`Por favor, selecione o arquivo e o diretório para ${tipo}`);
         }
         
-        // Feedback visual
-        botao.disabled = true;
-        botao.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Processando...';
-        
-        statusElement.innerHTML = '<div class="alert alert-info">Processando arquivo... Aguarde.</div>';
-        
-        // Processamento
-        const resultado = await eel[`processar_${tipo.toLowerCase()}`](
-            inputArquivo.files[0].path, 
-            inputDiretorio.value
-        )();
+        // Processamento em segundo plano
+        await submeterTarefa(
+            tipo.toLowerCase(),
+            [inputArquivo.files[0].path, inputDiretorio.value],
+            `tarefas${tipo}`
+        );
         
-        statusElement.innerHTML = `<div class="alert alert-success">${resultado}</div>`;
+        statusElement.innerHTML = `<div class="alert alert-success">Análise ${tipo} enviada.</div>`;
     } catch (erro) {
         statusElement.innerHTML = `<div class="alert alert-danger">Erro no processamento ${tipo}: ${erro.message}</div>`;
-    } finally {
-        botao.disabled = false;
-        botao.textContent = `Processar ${tipo}`;
     }
 }
 
@@ -0,0 +1,190 @@
+import csv, json, math, os, threading, time
+from collections import deque
+
+###############################################################
+###############################################################
+###############################################################
+#Métricas de cada ajuste (e de cada gráfico): tempo, nfev, convergência, qui-quadrado
+
+MAX_REGISTROS = 100000  # os mais antigos são descartados
+
+# Colunas da exportação em CSV, nesta ordem
+CAMPOS = ('seq', 'instante', 'rotina', 'execucao', 'arquivo', 'item', 'metodo', 'tempo', 'nfev', 'tentativas',
+          'sucesso', 'redchi', 'chisqr', 'ndata', 'nvarys', 'no_limite', 'cache', 'lote', 'mensagem')
+
+
+def parametros_no_limite(params, tolerancia=1e-6):
+    """Nomes dos parâmetros variáveis (lmfit.Parameters) que terminaram encostados em um limite"""
+    nomes = []
+    for nome, p in params.items():
+        if not p.vary:
+            continue
+        for limite in (p.min, p.max):
+            if math.isfinite(limite) and abs(p.value - limite) <= tolerancia * max(1.0, abs(limite)):
+                nomes.append(nome)
+                break
+    return nomes
+
+
+def metricas_ajuste(resultado, tempo=None, **contexto):
+    """
+    Dicionário de métricas de um resultado do lmfit (MinimizerResult ou
+    ModelResult), mais os campos de contexto dados (rotina, arquivo, item...).
+    """
+    metricas = {
+        'tempo': tempo,
+        'nfev': getattr(resultado, 'nfev', None),
+        'sucesso': bool(getattr(resultado, 'success', False)),
+        'redchi': getattr(resultado, 'redchi', None),
+        'chisqr': getattr(resultado, 'chisqr', None),
+        'ndata': getattr(resultado, 'ndata', None),
+        'nvarys': getattr(resultado, 'nvarys', None),
+        'no_limite': parametros_no_limite(resultado.params),
+        'cache': bool(getattr(resultado, 'cache', False)),
+        'mensagem': getattr(resultado, 'message', None),
+    }
+    metricas.update(contexto)
+    return metricas
+
+
+def _limpo(valor):
+    """Valor pronto para JSON: numpy vira Python, NaN e infinito viram None"""
+    if hasattr(valor, 'item') and not isinstance(valor, (list, tuple, dict)):
+        valor = valor.item()
+    if isinstance(valor, float) and not math.isfinite(valor):
+        return None
+    if isinstance(valor, (list, tuple)):
+        return [_limpo(v) for v in valor]
+    return valor
+
+
+class RegistroMetricas:
+    """
+    Guarda as métricas de ajustes e gráficos, de qualquer thread.
+
+    Cada registro é um dicionário com os campos de CAMPOS (os que faltam ficam
+    None) e um número de sequência crescente, usado por listar(desde=...) para
+    a interface pedir só os registros novos.
+
+    Args:
+        max_registros (int): Registros mantidos; os mais antigos são descartados
+    """
+
+    def __init__(self, max_registros=MAX_REGISTROS):
+        self._registros = deque(maxlen=max_registros)
+        self._seq = 0
+        self._trava = threading.Lock()
+
+    @property
+    def proximo(self):
+        """Número de sequência que o próximo registro vai receber"""
+        return self._seq
+
+    def registrar(self, metricas):
+        """Acrescenta um registro (dicionário com campos de CAMPOS; outros campos são ignorados)"""
+        registro = {campo: _limpo(metricas.get(campo)) for campo in CAMPOS}
+        registro['instante'] = registro['instante'] or time.time()
+        with self._trava:
+            registro['seq'] = self._seq
+            self._seq += 1
+            self._registros.append(registro)
+        return registro
+
+    def listar(self, rotina=None, execucao=None, desde=0):
+        """
+        Registros guardados, em ordem de chegada.
+
+        Args:
+            rotina (str, opcional): Só desta rotina ('fmr', 'impedancia', 'grafico'...)
+            execucao (str, opcional): Só desta execução (ex.: id da tarefa)
+            desde (int): Só registros com seq >= desde
+        """
+        with self._trava:
+            registros = list(self._registros)
+        return [r for r in registros
+                if r['seq'] >= desde
+                and (rotina is None or r['rotina'] == rotina)
+                and (execucao is None or r['execucao'] == execucao)]
+
+    def resumo(self, registros=None):
+        """
+        Totais por rotina: número de registros, falhas, acertos do cache,
+        ajustes com parâmetros no limite, tempo (total, médio, máximo), nfev
+        (total, máximo) e os itens mais lentos e com mais avaliações.
+
+        Returns:
+            dict: rotina -> totais
+        """
+        registros = self.listar() if registros is None else registros
+        grupos = {}
+        for r in registros:
+            grupos.setdefault(r['rotina'], []).append(r)
+        resumo = {}
+        for rotina, grupo in grupos.items():
+            tempos = [r['tempo'] for r in grupo if r['tempo'] is not None]
+            nfevs = [r['nfev'] for r in grupo if r['nfev'] is not None]
+            resumo[rotina] = {
+                'n': len(grupo),
+                'falhas': sum(1 for r in grupo if r['sucesso'] is False),
+                'cache': sum(1 for r in grupo if r['cache']),
+                'no_limite': sum(1 for r in grupo if r['no_limite']),
+                'tempo_total': sum(tempos),
+                'tempo_medio': sum(tempos) / len(tempos) if tempos else None,
+                'tempo_max': max(tempos, default=None),
+                'nfev_total': sum(nfevs),
+                'nfev_max': max(nfevs, default=None),
+                'mais_lentos': [(r['arquivo'], r['item'], r['tempo'])
+                                for r in sorted((r for r in grupo if r['tempo'] is not None),
+                                                key=lambda r: r['tempo'], reverse=True)[:5]],
+                'mais_avaliacoes': [(r['arquivo'], r['item'], r['nfev'])
+                                    for r in sorted((r for r in grupo if r['nfev'] is not None),
+                                                    key=lambda r: r['nfev'], reverse=True)[:5]],
+            }
+        return resumo
+
+    def exportar(self, caminho, formato=None, **filtros):
+        """
+        Grava os registros (filtrados como em listar) em CSV ou JSON.
+
+        Args:
+            caminho (str): Arquivo de saída
+            formato (str, opcional): 'csv' ou 'json' (padrão: pela extensão)
+
+        Returns:
+            int: Número de registros gravados
+        """
+        formato = (formato or os.path.splitext(caminho)[1].lstrip('.') or 'csv').lower()
+        if formato not in ('csv', 'json'):
+            raise ValueError(f"Formato desconhecido: {formato} (use 'csv' ou 'json')")
+        registros = self.listar(**filtros)
+        diretorio = os.path.dirname(os.path.abspath(caminho))
+        os.makedirs(diretorio, exist_ok=True)
+        if formato == 'json':
+            with open(caminho, 'w', encoding='utf-8') as f:
+                json.dump({'registros': registros, 'resumo': self.resumo(registros)}, f, indent=2,
+                          ensure_ascii=False)
+        else:
+            with open(caminho, 'w', newline='', encoding='utf-8') as f:
+                escritor = csv.DictWriter(f, fieldnames=CAMPOS)
+                escritor.writeheader()
+                for r in registros:
+                    escritor.writerow(dict(r, no_limite=';'.join(r['no_limite'] or [])))
+        return len(registros)
+
+    def limpar(self):
+        """Esquece todos os registros (a sequência continua crescendo)"""
+        with self._trava:
+            self._registros.clear()
+
+
+_padrao = None
+_trava_padrao = threading.Lock()
+
+
+def padrao():
+    """Registro compartilhado pelo processo (ajustes, gráficos e endpoints da interface)"""
+    global _padrao
+    with _trava_padrao:
+        if _padrao is None:
+            _padrao = RegistroMetricas()
+        return _padrao
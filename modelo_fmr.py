@@ -0,0 +1,214 @@
+import numpy as np, lmfit
+
+###############################################################
+###############################################################
+###############################################################
+#Modelo de N picos de FMR (derivada de Lorentziana ou Dowson) sobre uma linha de base comum
+
+FORMAS = ('lorentz', 'dowson')
+
+# Nomes das amplitudes, pico 1, 2, 3...: 'c' e 'd' são os nomes de sempre dos
+# dois primeiros picos (relatórios, processar_fmr); a partir do sétimo, A7, A8...
+_AMPLITUDES = 'cdefgh'
+
+# Valores para completar parâmetros que faltam (ver ModeloPicos.completar)
+AMPLITUDE_PADRAO = 0.5
+LARGURA_PADRAO = 50.0
+ESPACAMENTO_PADRAO = 200.0  # Oe entre picos acrescentados
+
+
+def nome_amplitude(k):
+    """Nome da amplitude do pico k (a partir de 1)"""
+    return _AMPLITUDES[k - 1] if k <= len(_AMPLITUDES) else f'A{k}'
+
+
+def _numero_pico(nome):
+    """k de 'Hr<k>' (None para outros nomes)"""
+    if nome.startswith('Hr') and nome[2:].isdigit():
+        return int(nome[2:])
+    return None
+
+
+class ModeloPicos:
+    """
+    Soma de N picos sobre a linha de base a + b·x, avaliada em uma só
+    expressão vetorizada (pontos x picos), com jacobiano analítico.
+
+    Cada pico k tem amplitude A (c, d, e... ver nome_amplitude), posição Hrk e
+    largura dHk; com u = x - Hrk e w = dHk/2:
+
+        'lorentz': A · u / (u² + w²)²
+        'dowson':  A · (u + assimk·(w² - u²)/(2w)) / (u² + w²)²
+
+    A forma de Dowson mistura à derivada da absorção a derivada da dispersão
+    (assimk = 0 volta à Lorentziana), para linhas assimétricas de amostras
+    condutoras.
+
+    Os parâmetros seguem um layout fixo (`nomes`): a, b e, para cada pico,
+    amplitude, Hrk, dHk (e assimk); `indice` dá a coluna de cada nome.
+
+    Args:
+        n_picos (int): Número de picos
+        forma (str): 'lorentz' ou 'dowson'
+    """
+
+    def __init__(self, n_picos=1, forma='lorentz'):
+        if n_picos < 1:
+            raise ValueError("n_picos deve ser pelo menos 1")
+        if forma not in FORMAS:
+            raise ValueError(f"Forma de pico desconhecida: {forma} (use {', '.join(FORMAS)})")
+        self.n_picos = n_picos
+        self.forma = forma
+        por_pico = 4 if forma == 'dowson' else 3
+        nomes = ['a', 'b']
+        for k in range(1, n_picos + 1):
+            nomes += [nome_amplitude(k), f'Hr{k}', f'dH{k}'] + ([f'assim{k}'] if forma == 'dowson' else [])
+        self.nomes = tuple(nomes)
+        self.indice = {nome: i for i, nome in enumerate(self.nomes)}
+        # Colunas de amplitude, posição, largura (e assimetria) de todos os picos
+        self._colunas = [np.arange(2 + j, len(nomes), por_pico) for j in range(por_pico)]
+
+    def __repr__(self):
+        return f"ModeloPicos(n_picos={self.n_picos}, forma={self.forma!r})"
+
+    def __eq__(self, outro):
+        return isinstance(outro, ModeloPicos) and (self.n_picos, self.forma) == (outro.n_picos, outro.forma)
+
+    def __hash__(self):
+        return hash((self.n_picos, self.forma))
+
+    @classmethod
+    def de_parametros(cls, parametros):
+        """
+        Modelo correspondente aos nomes dos parâmetros (dicionário ou
+        lmfit.Parameters): um pico para cada Hrk, Dowson se houver algum assimk.
+        """
+        picos = [k for k in map(_numero_pico, parametros) if k is not None]
+        n_picos = max(picos, default=1)
+        forma = 'dowson' if any(nome.startswith('assim') for nome in parametros) else 'lorentz'
+        return cls(n_picos, forma)
+
+    def vetor(self, parametros):
+        """Valores no layout de `nomes` (dicionário, lmfit.Parameters ou vetor já no layout)"""
+        if isinstance(parametros, lmfit.Parameters):
+            parametros = parametros.valuesdict()
+        if isinstance(parametros, dict):
+            try:
+                return np.array([parametros[nome] for nome in self.nomes], dtype=float)
+            except KeyError as e:
+                raise ValueError(f"Falta o parâmetro {e.args[0]} para {self!r}") from None
+        vetor = np.asarray(parametros, dtype=float)
+        if vetor.shape != (len(self.nomes),):
+            raise ValueError(f"Esperados {len(self.nomes)} parâmetros para {self!r}, recebidos {vetor.shape}")
+        return vetor
+
+    def completar(self, parametros=None):
+        """
+        Dicionário com todos os parâmetros do modelo: os dados e, para os que
+        faltam, amplitude AMPLITUDE_PADRAO, largura LARGURA_PADRAO, assimetria
+        0 e posições a ESPACAMENTO_PADRAO Oe depois do pico anterior.
+        """
+        completos = {'a': 1.0, 'b': 0.0}
+        completos.update(parametros or {})
+        for k in range(1, self.n_picos + 1):
+            completos.setdefault(nome_amplitude(k), AMPLITUDE_PADRAO)
+            completos.setdefault(f'Hr{k}', completos.get(f'Hr{k - 1}', 1000.0 - ESPACAMENTO_PADRAO)
+                                 + ESPACAMENTO_PADRAO)
+            completos.setdefault(f'dH{k}', LARGURA_PADRAO)
+            if self.forma == 'dowson':
+                completos.setdefault(f'assim{k}', 0.0)
+        return {nome: completos[nome] for nome in self.nomes}
+
+    def descricoes(self):
+        """Texto curto de cada parâmetro, para pedir valores ao usuário e rotular gráficos"""
+        descricoes = {'a': 'offset', 'b': 'inclinação'}
+        for k in range(1, self.n_picos + 1):
+            descricoes[nome_amplitude(k)] = f'amplitude pico {k}'
+            descricoes[f'Hr{k}'] = f'posição pico {k} em Oe'
+            descricoes[f'dH{k}'] = f'largura pico {k} em Oe'
+            descricoes[f'assim{k}'] = f'assimetria pico {k}'
+        return {nome: descricoes[nome] for nome in self.nomes}
+
+    def _termos(self, p, x):
+        """Matrizes (pontos, picos) comuns ao modelo e ao jacobiano"""
+        A = p[self._colunas[0]]
+        u = x[:, None] - p[self._colunas[1]]
+        w = p[self._colunas[2]] / 2
+        D = u * u + w * w
+        if self.forma == 'dowson':
+            alfa = p[self._colunas[3]]
+            N = u + alfa * (w * w - u * u) / (2 * w)
+        else:
+            alfa, N = None, u
+        return A, u, w, D, alfa, N
+
+    def avaliar(self, parametros, x):
+        """Sinal do modelo em x"""
+        p = self.vetor(parametros)
+        x = np.asarray(x, dtype=float)
+        A, u, w, D, alfa, N = self._termos(p, x)
+        return p[0] + p[1] * x + (N / (D * D)) @ A
+
+    def jacobiano_completo(self, parametros, x):
+        """Derivadas em relação a todos os parâmetros: (pontos, len(nomes)), no layout de `nomes`"""
+        p = self.vetor(parametros)
+        x = np.asarray(x, dtype=float)
+        A, u, w, D, alfa, N = self._termos(p, x)
+        # Tudo como razões em 1/D: com larguras enormes (um pico que virou linha
+        # de base) D² ainda cabe em float mas D³ não, e inf/inf daria NaN
+        q = 1 / D
+        jac = np.empty((len(x), len(self.nomes)))
+        jac[:, 0] = 1.0
+        jac[:, 1] = x
+        jac[:, self._colunas[0]] = N * q * q
+        if alfa is None:
+            dN_du = 1.0
+            dN_dw = 0.0
+        else:
+            dN_du = 1 - alfa * u / w
+            dN_dw = alfa / (2 * w * w) * D
+            jac[:, self._colunas[3]] = A * ((w - u) * (w + u) * q) * q / (2 * w)
+        # d/dHr = -d/du; d/d(dH) = (1/2) d/dw
+        jac[:, self._colunas[1]] = -A * (dN_du - 4 * u * N * q) * q * q
+        jac[:, self._colunas[2]] = A * (dN_dw - 4 * w * N * q) * q * q / 2
+        return jac
+
+    ###############################################################
+    #Interface com o lmfit
+
+    def parametros(self, iniciais):
+        """lmfit.Parameters na ordem de `nomes` (a ordem das colunas de jacobiano)"""
+        params = lmfit.Parameters()
+        for nome in self.nomes:
+            params.add(nome, value=iniciais[nome])
+        return params
+
+    def _variaveis(self, params):
+        return [self.indice[nome] for nome, p in params.items() if p.vary]
+
+    def residuo(self, params, x, y=None):
+        """Função objetivo do lmfit: modelo - y (o modelo, sem y)"""
+        modelo = self.avaliar(params, x)
+        if y is None:
+            return modelo
+        return modelo - y
+
+    def jacobiano(self, params, x, y=None):
+        """Dfun do lmfit: colunas dos parâmetros variáveis, na ordem em que aparecem em params"""
+        return self.jacobiano_completo(params, x)[:, self._variaveis(params)]
+
+    def estimar(self, x, y):
+        """
+        Estimativa tirada do espectro, sem ajuste: linha de base e o primeiro
+        pico pelos extremos do sinal (ver AjustadorMultiplosAngulos.estimar_parametros).
+        """
+        i_max, i_min = int(np.argmax(y)), int(np.argmin(y))
+        Hr = (x[i_max] + x[i_min]) / 2
+        dH = max(np.sqrt(3) * abs(x[i_max] - x[i_min]), np.finfo(float).eps)
+        w = dH / 2
+        # Para A·u/(u² + w²)² os extremos ficam em u = ±w/√3, com valor ±9/(16√3 w³)
+        extremo = 9 / (16 * np.sqrt(3) * w**3)
+        sinal = 1.0 if x[i_max] > x[i_min] else -1.0
+        return {'a': float(np.median(y)), 'b': 0.0,
+                nome_amplitude(1): sinal * (y[i_max] - y[i_min]) / (2 * extremo),
+                'Hr1': float(Hr), 'dH1': float(dH)}
@@ -0,0 +1,561 @@
+"""
+Modo de monitoramento: acompanha a pasta onde o equipamento grava um arquivo
+por frequência (impedância) ou por ângulo (VSM, eletroímã) e processa só os
+arquivos novos ou modificados, atualizando os resultados agregados a cada
+rodada.
+
+Uso:
+    python monitoramento.py impedancia ORIGEM DESTINO [--intervalo 1] [--estabilidade 1] [--atualizacao 10]
+
+Ctrl+C encerra; no encerramento os ajustes agregados completos são refeitos
+(ver ImpedanciaIncremental.finalizar). Os gráficos agregados e o resumo JSON
+são refeitos no máximo a cada --atualizacao segundos (ver AnaliseIncremental.atualizar).
+"""
+import argparse, json, os, sys, threading, time
+import numpy as np
+import GMAG, histerese, renderizacao
+
+###############################################################
+###############################################################
+###############################################################
+#Varredura da pasta
+
+INTERVALO = 1.0      # segundos entre varreduras
+ESTABILIDADE = 1.0   # segundos sem mudança antes de um arquivo ser lido (ainda sendo gravado)
+INTERVALO_ATUALIZACAO = 10.0  # segundos mínimos entre duas atualizações dos gráficos agregados e do resumo
+
+
+def _assinatura(entrada):
+    info = entrada.stat()
+    return info.st_mtime_ns, info.st_size
+
+
+class VarreduraPasta:
+    """
+    Arquivos novos ou modificados de uma pasta desde a última varredura.
+
+    Um arquivo só é entregue quando a assinatura (mtime, tamanho) não muda
+    entre duas varreduras e a última modificação tem pelo menos `estabilidade`
+    segundos, para não ler um arquivo que o equipamento ainda está gravando.
+
+    Args:
+        diretorio (str): Pasta monitorada
+        estabilidade (float): Segundos desde a última modificação (0 entrega na hora)
+    """
+
+    def __init__(self, diretorio, estabilidade=ESTABILIDADE):
+        self.diretorio = diretorio
+        self.estabilidade = estabilidade
+        self.entregues = {}    # nome -> assinatura já processada
+        self._vistos = {}      # nome -> assinatura da varredura anterior
+
+    def novidades(self):
+        """
+        Nomes dos arquivos prontos para processar, em ordem de modificação.
+
+        Returns:
+            list: Arquivos novos ou modificados (já marcados como entregues)
+        """
+        agora = time.time_ns()
+        atuais, prontos = {}, []
+        with os.scandir(self.diretorio) as entradas:
+            for entrada in entradas:
+                if not entrada.is_file() or entrada.name.startswith('.'):
+                    continue
+                try:
+                    assinatura = _assinatura(entrada)
+                except FileNotFoundError:
+                    continue
+                atuais[entrada.name] = assinatura
+                if self.entregues.get(entrada.name) == assinatura:
+                    continue
+                estavel = self.estabilidade <= 0 or (
+                    self._vistos.get(entrada.name) == assinatura
+                    and agora - assinatura[0] >= self.estabilidade * 1e9)
+                if estavel:
+                    prontos.append((assinatura[0], entrada.name))
+        self._vistos = atuais
+        prontos.sort()
+        for _, nome in prontos:
+            self.entregues[nome] = atuais[nome]
+        return [nome for _, nome in prontos]
+
+
+###############################################################
+#Análises incrementais
+
+class SomasRegressao:
+    """
+    Somas de uma regressão linear y = a + b·x, atualizadas ponto a ponto.
+
+    Acrescentar ou retirar um ponto custa O(1) e o ajuste sai das somas, sem
+    percorrer os pontos; retirar permite trocar o ponto de um arquivo modificado.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.sx = self.sy = self.sxx = self.sxy = self.syy = 0.0
+
+    def _somar(self, x, y, sinal):
+        self.n += sinal
+        self.sx += sinal * x
+        self.sy += sinal * y
+        self.sxx += sinal * x * x
+        self.sxy += sinal * x * y
+        self.syy += sinal * y * y
+
+    def adicionar(self, x, y):
+        self._somar(float(x), float(y), 1)
+
+    def remover(self, x, y):
+        self._somar(float(x), float(y), -1)
+
+    def ajuste(self):
+        """
+        Returns:
+            dict: a, b e seus erros (None com menos de 3 pontos); a e b são NaN
+            com menos de 2 pontos ou x todos iguais
+        """
+        resultado = {'a': np.nan, 'b': np.nan, 'erro_a': None, 'erro_b': None, 'n': self.n}
+        if self.n < 2:
+            return resultado
+        sxx = self.sxx - self.sx**2 / self.n
+        if sxx <= 0:
+            return resultado
+        sxy = self.sxy - self.sx * self.sy / self.n
+        b = sxy / sxx
+        a = (self.sy - b * self.sx) / self.n
+        resultado.update(a=a, b=b)
+        if self.n > 2:
+            syy = self.syy - self.sy**2 / self.n
+            s2 = max(syy - b * sxy, 0.0) / (self.n - 2)
+            resultado['erro_b'] = float(np.sqrt(s2 / sxx))
+            resultado['erro_a'] = float(np.sqrt(s2 * (1 / self.n + (self.sx / self.n)**2 / sxx)))
+        return resultado
+
+
+class AnaliseIncremental:
+    """
+    Base das análises do monitoramento: processar() trata um arquivo (custo
+    que não depende de quantos já foram tratados), atualizar() refaz os
+    gráficos agregados e o resumo e finalizar() roda no encerramento.
+
+    Os agregados numéricos são mantidos arquivo a arquivo em processar(); só
+    redesenhar() e gravar_resumo() percorrem todos os arquivos, e por isso
+    rodam no máximo a cada `intervalo_atualizacao` segundos (ver atualizar).
+
+    A ordem de chegada (data de modificação, e o nome entre arquivos da mesma
+    rodada com a mesma data) define a posição de cada arquivo (frequência ou
+    ângulo); um arquivo modificado mantém a posição. A análise da pasta
+    inteira (GMAG.impedancia, VSM, Eletroima) ordena os arquivos pelo nome:
+    as duas coincidem quando o equipamento grava os arquivos na ordem dos
+    nomes (ex.: numerados com zeros à esquerda), e não em geral.
+    """
+
+    nome = None
+
+    def __init__(self, diretorio_destino, renderizador=None, intervalo_atualizacao=INTERVALO_ATUALIZACAO):
+        os.makedirs(diretorio_destino, exist_ok=True)
+        self.diretorio_destino = diretorio_destino
+        self.renderizador = renderizador or renderizacao.padrao()
+        self.intervalo_atualizacao = intervalo_atualizacao
+        self.posicoes = {}   # nome do arquivo -> posição de chegada
+        self.falhas = {}     # nome do arquivo -> mensagem
+        self.pendente = False  # há novidades ainda fora dos gráficos e do resumo
+        self._ultima_atualizacao = -np.inf
+
+    def posicao(self, nome_arquivo):
+        return self.posicoes.setdefault(nome_arquivo, len(self.posicoes))
+
+    def falhou(self, caminho, mensagem):
+        """
+        Registra a falha de um arquivo; se ele já tinha entrado nos agregados
+        (arquivo modificado), o valor antigo sai deles (ver retirar)
+        """
+        nome = os.path.basename(caminho)
+        self.falhas[nome] = mensagem
+        if nome in self.posicoes:
+            self.retirar(self.posicoes[nome])
+        return False
+
+    def retirar(self, posicao):
+        """Tira dos agregados o valor da posição, se houver"""
+
+    def processar(self, caminho):
+        """Trata um arquivo novo ou modificado; devolve True se ele entrou nos agregados"""
+        raise NotImplementedError
+
+    def atualizar(self, forcar=False):
+        """
+        Gráficos agregados e resumo, depois de uma rodada com novidades.
+
+        Dentro de `intervalo_atualizacao` segundos da atualização anterior só
+        marca `pendente`; MonitorPasta chama de novo nas rodadas seguintes,
+        com ou sem novidades, até a atualização sair.
+
+        Returns:
+            bool: True se os gráficos e o resumo foram refeitos
+        """
+        agora = time.monotonic()
+        if not forcar and agora - self._ultima_atualizacao < self.intervalo_atualizacao:
+            self.pendente = True
+            return False
+        self.pendente = False
+        self._ultima_atualizacao = agora
+        self.redesenhar()
+        self.gravar_resumo()
+        return True
+
+    def redesenhar(self):
+        """Gráficos agregados (percorrem todos os arquivos; ver atualizar)"""
+
+    def finalizar(self):
+        """Chamado no encerramento do monitoramento"""
+        self.atualizar(forcar=True)
+
+    def resumo(self, completo=True):
+        """
+        Estado da análise; completo=False deixa de fora as listas por arquivo
+        (custo que não cresce com o número de arquivos, para o progresso)
+        """
+        resumo = {'analise': self.nome, 'arquivos': len(self.posicoes), 'n_falhas': len(self.falhas)}
+        if completo:
+            resumo['falhas'] = dict(self.falhas)
+        return resumo
+
+    def gravar_resumo(self):
+        caminho = os.path.join(self.diretorio_destino, f'monitoramento_{self.nome}.json')
+        temporario = caminho + '.tmp'
+        with open(temporario, 'w') as f:
+            json.dump(self.resumo(), f, indent=2, default=_json)
+        os.replace(temporario, caminho)
+        return caminho
+
+
+def _json(valor):
+    """Números do numpy para o json.dump, NaN como None"""
+    valor = float(valor)
+    return valor if np.isfinite(valor) else None
+
+
+class ImpedanciaIncremental(AnaliseIncremental):
+    """
+    Impedância arquivo a arquivo: gráfico bruto, ajuste Lorentziano,
+    gráfico do ajuste e relatório do espectro, como em GMAG.impedancia.
+
+    Os agregados ao vivo (Kittel e largura de linha) são atualizados em O(1)
+    por arquivo a partir de somas de regressão:
+
+        largura:  dH = ΔH0 + (α/γ)·f, reta direta em f
+        Kittel:   (f/γ)² - Hr² = Hk(Hk + Meff) + (2Hk + Meff)·Hr, reta em Hr,
+                  de onde Meff = √(b² - 4a) e Hk = (b - Meff)/2
+
+    A forma linearizada de Kittel pesa os pontos de outro jeito que o ajuste
+    não linear de GMAG.impedancia; finalizar() refaz os dois ajustes finais
+    exatamente como na análise da pasta inteira.
+    """
+
+    nome = 'impedancia'
+
+    def __init__(self, diretorio_destino, renderizador=None, metodo_ajuste='lote', cache=None, metricas=None,
+                 intervalo_atualizacao=INTERVALO_ATUALIZACAO):
+        super().__init__(diretorio_destino, renderizador, intervalo_atualizacao)
+        if metodo_ajuste not in ('lote', 'lmfit'):
+            raise ValueError(f"Método de ajuste desconhecido: {metodo_ajuste} (use 'lote' ou 'lmfit')")
+        self.metodo_ajuste = metodo_ajuste
+        self.cache = cache
+        self.metricas = metricas
+        self.valores = {}   # posição -> (Hr, dH)
+        self.kittel = SomasRegressao()
+        self.largura = SomasRegressao()
+
+    @staticmethod
+    def frequencia(posicao):
+        """Frequência (GHz) da posição, como em GMAG.impedancia: 1001 MHz + 10 MHz por espectro"""
+        return (1001 + 10 * posicao) / 1000
+
+    def _somar(self, posicao, Hr, dH, sinal):
+        f = self.frequencia(posicao)
+        metodo = 'adicionar' if sinal > 0 else 'remover'
+        getattr(self.kittel, metodo)(Hr, (f / GMAG.gamma)**2 - Hr**2)
+        getattr(self.largura, metodo)(f, dH)
+
+    def processar(self, caminho):
+        espectro = GMAG._ler_espectro_impedancia(caminho)
+        if espectro is None:
+            return self.falhou(caminho, "Arquivo sem dados legíveis")
+        espectros = GMAG._plotar_brutos_impedancia([espectro], self.diretorio_destino, self.renderizador)
+        for nome, x_fit, y_fit, resultado, k in GMAG._ajustar_lotes_impedancia(
+                espectros, self.metodo_ajuste, 1, self.cache, self.metricas):
+            valores = GMAG._relatar_ajuste_impedancia(nome, x_fit, y_fit, resultado, k, self.diretorio_destino,
+                                                      self.renderizador)
+            if valores is None:
+                break
+            posicao = self.posicao(os.path.basename(caminho))
+            self.retirar(posicao)
+            self.valores[posicao] = valores
+            self._somar(posicao, *valores, 1)
+            self.falhas.pop(os.path.basename(caminho), None)
+            return True
+        return self.falhou(caminho, "O ajuste não convergiu")
+
+    def retirar(self, posicao):
+        if posicao in self.valores:
+            self._somar(posicao, *self.valores.pop(posicao), -1)
+
+    def ajustes(self):
+        """Kittel (Hk, Meff) e largura de linha (ΔH0, α/γ, α) a partir das somas"""
+        reta = self.kittel.ajuste()
+        discriminante = reta['b']**2 - 4 * reta['a']
+        Meff = np.sqrt(discriminante) if discriminante >= 0 else np.nan
+        Hk = (reta['b'] - Meff) / 2
+        largura = self.largura.ajuste()
+        return {
+            'Hk': Hk, 'Meff': Meff,
+            'dho': largura['a'], 'erro_dho': largura['erro_a'],
+            'alfa_gamma': largura['b'], 'erro_alfa_gamma': largura['erro_b'],
+            'alfa': largura['b'] * GMAG.gamma,
+            'n': self.largura.n,
+        }
+
+    def _listas(self):
+        posicoes = sorted(self.valores)
+        Hr = np.array([self.valores[p][0] for p in posicoes])
+        dH = np.array([self.valores[p][1] for p in posicoes])
+        return np.array([self.frequencia(p) for p in posicoes]), Hr, dH
+
+    def redesenhar(self):
+        if not self.valores:
+            return
+        ajustes = self.ajustes()
+        f, Hr, dH = self._listas()
+
+        g = renderizacao.Grafico(os.path.join(self.diretorio_destino, 'frequencia_ressonancia_ao_vivo.png'),
+                                 figsize=(12, 6))
+        g.plot(Hr, f, 'bo', markersize=6, label='Dados experimentais')
+        if np.isfinite(ajustes['Hk']) and len(Hr) > 1:
+            x = np.linspace(Hr.min(), Hr.max(), 100)
+            g.plot(x, GMAG.frequencia_de_ressonancia(x, ajustes['Hk'], ajustes['Meff']), 'r-',
+                   label=f"Hk = {ajustes['Hk']:.2f} Oe, Meff = {ajustes['Meff']:.2f} Oe (linearizado)")
+        g.xlabel('Campo de Ressonância (Oe)', fontsize=12)
+        g.ylabel('Frequência (GHz)', fontsize=12)
+        g.title(f'Frequência de Ressonância vs Campo ({len(Hr)} espectros)', fontsize=14)
+        g.grid(True, alpha=0.3)
+        g.legend()
+        g.tight_layout()
+        self.renderizador.enviar(g)
+
+        g = renderizacao.Grafico(os.path.join(self.diretorio_destino, 'largura_linha_ao_vivo.png'), figsize=(12, 6))
+        g.plot(f, dH, 'ro', markersize=6, label='Dados experimentais')
+        if np.isfinite(ajustes['dho']):
+            x = np.linspace(f.min(), f.max(), 100)
+            g.plot(x, ajustes['dho'] + ajustes['alfa_gamma'] * x, 'b-',
+                   label=f"ΔH = {ajustes['dho']:.2f} + {ajustes['alfa_gamma']:.4f}·f")
+        g.xlabel('Frequência (GHz)', fontsize=12)
+        g.ylabel('Largura de Linha (Oe)', fontsize=12)
+        g.title(f'Largura de Linha vs Frequência ({len(f)} espectros)', fontsize=14)
+        g.grid(True, alpha=0.3)
+        g.legend()
+        g.tight_layout()
+        self.renderizador.enviar(g)
+
+    def finalizar(self):
+        super().finalizar()
+        if self.valores:
+            _, Hr, dH = self._listas()
+            GMAG._ajustes_finais_impedancia(list(Hr), list(dH), self.diretorio_destino, self.renderizador,
+                                            self.metricas)
+
+    def resumo(self, completo=True):
+        resumo = super().resumo(completo)
+        resumo['ajustes'] = self.ajustes()
+        if completo:
+            nomes = {p: nome for nome, p in self.posicoes.items()}
+            resumo['espectros'] = [{'arquivo': nomes[p], 'frequencia': self.frequencia(p), 'Hr': Hr, 'dH': dH}
+                                   for p, (Hr, dH) in sorted(self.valores.items())]
+        return resumo
+
+
+class VSMIncremental(AnaliseIncremental):
+    """
+    VSM arquivo a arquivo: ciclo normalizado e plotado (GMAG._ciclo_vsm),
+    remanência e coercitividade guardadas por posição; os gráficos contra o
+    ângulo são refeitos a cada rodada.
+    """
+
+    nome = 'vsm'
+
+    def __init__(self, diretorio_destino, renderizador=None, diretorio_caminho=None,
+                 intervalo_atualizacao=INTERVALO_ATUALIZACAO):
+        super().__init__(diretorio_destino, renderizador, intervalo_atualizacao)
+        self.diretorio_caminho = diretorio_caminho
+        self.valores = {}   # posição -> (Mr, Hc)
+
+    def processar(self, caminho):
+        ciclo = GMAG._ciclo_vsm(caminho, self.diretorio_caminho, self.diretorio_destino, self.renderizador)
+        if ciclo is None:
+            return self.falhou(caminho, "Arquivo sem dados de ciclo")
+        metricas = histerese.analisar_ciclo(*ciclo)
+        self.valores[self.posicao(os.path.basename(caminho))] = (metricas['Mr'], metricas['Hc'])
+        self.falhas.pop(os.path.basename(caminho), None)
+        return True
+
+    def retirar(self, posicao):
+        self.valores.pop(posicao, None)
+
+    def redesenhar(self):
+        if self.valores:
+            Mr, Hc = zip(*(self.valores[p] for p in sorted(self.valores)))
+            GMAG._graficos_angulares_vsm(np.array(Mr), np.array(Hc), self.diretorio_destino, self.renderizador)
+
+    def resumo(self, completo=True):
+        resumo = super().resumo(completo)
+        if completo:
+            nomes = {p: nome for nome, p in self.posicoes.items()}
+            resumo['ciclos'] = [{'arquivo': nomes[p], 'Mr': Mr, 'Hc': Hc}
+                                for p, (Mr, Hc) in sorted(self.valores.items())]
+        return resumo
+
+
+class EletroimaIncremental(AnaliseIncremental):
+    """
+    Eletroímã arquivo a arquivo: gráfico individual (GMAG._grafico_eletroima)
+    e, a cada atualização, o gráfico com todas as curvas.
+    """
+
+    nome = 'eletroima'
+
+    def __init__(self, diretorio_destino, renderizador=None, intervalo_atualizacao=INTERVALO_ATUALIZACAO):
+        super().__init__(diretorio_destino, renderizador, intervalo_atualizacao)
+        self.curvas = {}   # posição -> (H, V, nome)
+
+    def processar(self, caminho):
+        dados = GMAG._grafico_eletroima(caminho, self.diretorio_destino, self.renderizador)
+        if dados is None:
+            return self.falhou(caminho, "Arquivo sem dados legíveis")
+        self.curvas[self.posicao(os.path.basename(caminho))] = dados
+        self.falhas.pop(os.path.basename(caminho), None)
+        return True
+
+    def retirar(self, posicao):
+        self.curvas.pop(posicao, None)
+
+    def redesenhar(self):
+        if self.curvas:
+            GMAG.plotar_todos_juntos([self.curvas[p] for p in sorted(self.curvas)], self.diretorio_destino,
+                                     self.renderizador)
+
+
+ANALISES = {
+    'impedancia': ImpedanciaIncremental,
+    'vsm': VSMIncremental,
+    'eletroima': EletroimaIncremental,
+}
+
+
+###############################################################
+#Laço de monitoramento
+
+class MonitorPasta:
+    """
+    Varre a pasta a cada `intervalo` segundos e passa as novidades à análise.
+
+    Args:
+        diretorio_origem (str): Pasta onde o equipamento grava
+        analise (AnaliseIncremental): Quem processa os arquivos
+        intervalo (float): Segundos entre varreduras
+        estabilidade (float): Ver VarreduraPasta
+    """
+
+    def __init__(self, diretorio_origem, analise, intervalo=INTERVALO, estabilidade=ESTABILIDADE):
+        if not os.path.isdir(diretorio_origem):
+            raise FileNotFoundError(f"Diretório de origem não encontrado: {diretorio_origem}")
+        self.varredura = VarreduraPasta(diretorio_origem, estabilidade)
+        self.analise = analise
+        self.intervalo = intervalo
+        self.processados = 0
+
+    def ciclo(self):
+        """
+        Uma varredura: processa as novidades e, se houve alguma (ou se uma
+        atualização ficou pendente), atualiza os agregados.
+
+        Returns:
+            list: Arquivos processados nesta varredura
+        """
+        novidades = self.varredura.novidades()
+        for nome in novidades:
+            if self.analise.processar(os.path.join(self.varredura.diretorio, nome)):
+                self.processados += 1
+        if novidades or self.analise.pendente:
+            self.analise.atualizar()
+        return novidades
+
+    def executar(self, parar=None, max_ciclos=None, progresso=None):
+        """
+        Monitora até `parar` (threading.Event ou função sem argumentos que
+        devolve True) ou até `max_ciclos` varreduras; finaliza a análise no fim.
+
+        Args:
+            progresso (callable, opcional): Chamado como progresso(novidades,
+                resumo) após cada varredura com novidades, com o resumo curto
+                (analise.resumo(completo=False)); uma exceção
+                levantada nele encerra o monitoramento (depois de finalizar)
+
+        Returns:
+            dict: Resumo final da análise
+        """
+        if isinstance(parar, threading.Event):
+            parar = parar.is_set
+        ciclos = 0
+        try:
+            while not (parar is not None and parar()):
+                novidades = self.ciclo()
+                ciclos += 1
+                if novidades and progresso is not None:
+                    progresso(novidades, self.analise.resumo(completo=False))
+                if max_ciclos is not None and ciclos >= max_ciclos:
+                    break
+                time.sleep(self.intervalo)
+        finally:
+            self.analise.finalizar()
+        return self.analise.resumo()
+
+
+def criar_analise(tipo, diretorio_destino, **opcoes):
+    """Análise incremental do tipo ('impedancia', 'vsm' ou 'eletroima')"""
+    if tipo not in ANALISES:
+        raise ValueError(f"Análise desconhecida: {tipo} (use {', '.join(ANALISES)})")
+    return ANALISES[tipo](diretorio_destino, **opcoes)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('analise', choices=sorted(ANALISES))
+    parser.add_argument('origem')
+    parser.add_argument('destino')
+    parser.add_argument('--intervalo', type=float, default=INTERVALO)
+    parser.add_argument('--estabilidade', type=float, default=ESTABILIDADE)
+    parser.add_argument('--atualizacao', type=float, default=INTERVALO_ATUALIZACAO)
+    args = parser.parse_args(argv)
+
+    renderizador = renderizacao.padrao()
+    analise = criar_analise(args.analise, args.destino, renderizador=renderizador,
+                            intervalo_atualizacao=args.atualizacao)
+    monitor = MonitorPasta(args.origem, analise, args.intervalo, args.estabilidade)
+
+    def informar(novidades, resumo):
+        print(f"{len(novidades)} arquivo(s) processado(s); {resumo['arquivos']} no total")
+
+    print(f"Monitorando {args.origem} (Ctrl+C para encerrar)")
+    try:
+        monitor.executar(progresso=informar)
+    except KeyboardInterrupt:
+        pass
+    renderizador.aguardar()
+    print(f"Resumo em {os.path.join(args.destino, f'monitoramento_{args.analise}.json')}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,327 @@
+"""
+Execução das análises do GMAG sem interface, para o servidor de processamento.
+
+Um manifesto JSON lista as amostras e a análise de cada uma; as amostras são
+processadas em um pool de processos e, no fim, uma tabela de resumo é impressa
+e gravada (resumo_lote.csv e resumo_lote.json no diretório de saída). As
+métricas dos ajustes e gráficos de cada amostra ficam em <destino>/metricas.csv.
+
+Uso:
+    python processamento_lote.py manifesto.json [--saida resultados] [--processos 4] [--no-plots]
+
+Manifesto:
+    {
+      "saida": "resultados",
+      "amostras": [
+        {"nome": "A1", "analise": "fmr", "arquivo": "A1/fmr.dat",
+         "parametros_iniciais": {"Hr1": 950, "dH1": 40}, "n_picos": 3, "forma": "dowson",
+         "frequencia": 9.4, "modelo_anisotropia": "uniaxial"},
+        {"nome": "A1_vsm", "analise": "vsm", "origem": "A1/vsm"},
+        {"nome": "A1_imp", "analise": "impedancia", "origem": "A1/imp", "metodo_ajuste": "lote",
+         "n_bootstrap": 2000},
+        {"nome": "A1_ele", "analise": "eletroima", "origem": "A1/ele"},
+        {"nome": "A1_res", "analise": "resistencia", "origem": "A1/res"},
+        {"nome": "A1_drx", "analise": "drx", "arquivo": "A1/drx.csv"},
+        {"nome": "A2_drx", "analise": "drx", "arquivo": "A2/drx.csv", "picos": [38.1, 39.4, 40.8]}
+      ]
+    }
+
+Com "frequencia" (GHz), a análise FMR também ajusta Hr1(ângulo) pelo modelo
+de anisotropia (GMAG.anisotropia_fmr; "modelo_anisotropia": "uniaxial",
+"cubica" ou "completo").
+
+"metodo_ajuste": "global" ajusta todos os espectros de impedância num só
+problema (ajuste_global), no lugar do ajuste por espectro seguido dos ajustes
+finais.
+
+Sem "picos", os picos de DRX são detectados automaticamente ("deteccao" aceita
+as opções de deteccao_picos.detectar_picos); "comprimento_onda" (nm) e "tempo"
+de deposição (s) são opcionais. Caminhos relativos valem a
+partir da pasta do manifesto. Cada amostra grava em "destino" (padrão:
+<saida>/<nome>).
+
+Códigos de saída: 0 se todas as amostras terminaram, 1 se alguma falhou,
+2 se o manifesto é inválido.
+"""
+import argparse, csv, json, os, sys, time, traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import matplotlib.pyplot as plt
+import GMAG, renderizacao, cache_ajustes, metricas
+
+OK = 'ok'
+FALHA = 'erro'
+
+SAIDA_OK = 0
+SAIDA_FALHAS = 1
+SAIDA_MANIFESTO = 2
+
+# Campos de cada análise: obrigatórios e opcionais (repassados à função do GMAG)
+ANALISES = {
+    'fmr': (('arquivo',), ('parametros_iniciais', 'n_picos', 'forma', 'frequencia', 'modelo_anisotropia')),
+    'vsm': (('origem',), ('intermediario',)),
+    'impedancia': (('origem',), ('metodo_ajuste', 'tamanho_lote', 'n_bootstrap')),
+    'eletroima': (('origem',), ()),
+    'resistencia': (('origem',), ()),
+    'drx': (('arquivo',), ('picos', 'deteccao', 'comprimento_onda', 'tempo')),
+}
+
+_CAMINHOS = ('arquivo', 'origem', 'intermediario', 'destino')
+
+
+class ManifestoInvalido(ValueError):
+    """Manifesto ilegível ou com amostras mal descritas"""
+
+
+def carregar_manifesto(caminho, saida=None):
+    """
+    Lê e valida o manifesto.
+
+    Args:
+        caminho (str): Arquivo JSON do manifesto
+        saida (str, opcional): Diretório de saída (substitui o "saida" do manifesto)
+
+    Returns:
+        tuple: (diretório de saída, lista de amostras com caminhos absolutos e destino)
+    """
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            manifesto = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        raise ManifestoInvalido(f"Não foi possível ler o manifesto {caminho}: {str(e)}")
+
+    base = os.path.dirname(os.path.abspath(caminho))
+    amostras = manifesto.get('amostras') if isinstance(manifesto, dict) else None
+    if not isinstance(amostras, list) or not amostras:
+        raise ManifestoInvalido("O manifesto precisa de uma lista 'amostras' não vazia")
+    saida = os.path.join(base, saida or manifesto.get('saida') or 'resultados_lote')
+
+    validadas, nomes = [], set()
+    for i, amostra in enumerate(amostras):
+        if not isinstance(amostra, dict):
+            raise ManifestoInvalido(f"Amostra {i}: esperado um objeto")
+        analise = str(amostra.get('analise', '')).lower()
+        if analise not in ANALISES:
+            raise ManifestoInvalido(f"Amostra {i}: análise desconhecida '{amostra.get('analise')}' "
+                                    f"(use {', '.join(ANALISES)})")
+        obrigatorios, opcionais = ANALISES[analise]
+        faltando = [campo for campo in obrigatorios if amostra.get(campo) in (None, '', [])]
+        if faltando:
+            raise ManifestoInvalido(f"Amostra {i} ({analise}): faltam os campos {', '.join(faltando)}")
+        desconhecidos = set(amostra) - set(obrigatorios) - set(opcionais) - {'nome', 'analise', 'destino'}
+        if desconhecidos:
+            raise ManifestoInvalido(f"Amostra {i} ({analise}): campos desconhecidos {', '.join(sorted(desconhecidos))}")
+
+        nome = str(amostra.get('nome') or f"{i:03d}_{analise}")
+        if nome in nomes:
+            raise ManifestoInvalido(f"Nome de amostra repetido: {nome}")
+        nomes.add(nome)
+
+        amostra = dict(amostra, nome=nome, analise=analise)
+        for campo in _CAMINHOS:
+            if amostra.get(campo):
+                amostra[campo] = os.path.join(base, amostra[campo])
+        amostra.setdefault('destino', os.path.join(saida, nome))
+        validadas.append(amostra)
+    return saida, validadas
+
+
+###############################################################
+#Execução de uma amostra (em um processo do pool)
+
+def _iniciar_processo(graficos):
+    """Processos do lote: sem janelas, e gráficos desenhados no próprio processo (ou nenhum)"""
+    plt.switch_backend('Agg')
+    renderizacao.configurar(ativo=graficos, n_processos=0)
+
+
+def _arquivos_gerados(diretorio):
+    if not os.path.isdir(diretorio):
+        return 0
+    return sum(len(arquivos) for _, _, arquivos in os.walk(diretorio))
+
+
+def executar_amostra(amostra):
+    """
+    Roda a análise de uma amostra e devolve uma linha do resumo.
+
+    Cada análise usa um só processo (os ajustes FMR rodam em sequência), já
+    que o paralelismo do lote é entre amostras.
+
+    Returns:
+        dict: nome, analise, estado ('ok' ou 'erro'), tempo (s), destino,
+        arquivos (gerados no destino), resumo e erro
+    """
+    inicio = time.perf_counter()
+    destino = amostra['destino']
+    linha = {'nome': amostra['nome'], 'analise': amostra['analise'], 'estado': OK, 'tempo': 0.0,
+             'destino': destino, 'arquivos': 0, 'resumo': '', 'erro': ''}
+    try:
+        os.makedirs(destino, exist_ok=True)
+        analise = amostra['analise']
+        renderizador = renderizacao.padrao()
+        erros_antes = renderizador.n_erros  # o renderizador do processo serve várias amostras
+        registro = metricas.padrao()
+        desde = registro.proximo
+
+        if analise == 'fmr':
+            resultados = GMAG.FMR_automatico(amostra['arquivo'], destino, amostra.get('parametros_iniciais'),
+                                             n_processos=1, renderizador=renderizador,
+                                             cache=cache_ajustes.padrao(), metricas=registro,
+                                             contexto={'execucao': amostra['nome']},
+                                             n_picos=amostra.get('n_picos'), forma=amostra.get('forma'))
+            linha['resumo'] = f"{len(resultados['angulos'])} ângulos ajustados"
+            if amostra.get('frequencia'):
+                ajuste = GMAG.anisotropia_fmr(resultados, destino, amostra['frequencia'], nomes=[amostra['nome']],
+                                              modelo=amostra.get('modelo_anisotropia', 'completo'),
+                                              renderizador=renderizador)
+                parametros = ajuste.parametros(0)
+                linha['resumo'] += ", " + ", ".join(f"{nome} = {parametros[nome][0]:.1f}" for nome in ajuste.livres)
+        elif analise == 'vsm':
+            GMAG.VSM(amostra['origem'], amostra.get('intermediario'), destino, renderizador=renderizador)
+            linha['resumo'] = f"{len(os.listdir(amostra['origem']))} arquivos"
+        elif analise == 'impedancia':
+            GMAG.impedancia(amostra['origem'], destino, metodo_ajuste=amostra.get('metodo_ajuste', 'lote'),
+                            tamanho_lote=amostra.get('tamanho_lote', 64), renderizador=renderizador,
+                            cache=cache_ajustes.padrao(), metricas=registro,
+                            n_bootstrap=amostra.get('n_bootstrap', 0), n_processos=1)
+            if amostra.get('metodo_ajuste') == 'global':
+                with open(os.path.join(destino, 'ajuste_global.json')) as f:
+                    linha['resumo'] = f"{len(json.load(f)['espectros'])} espectros no ajuste global"
+            else:
+                relatorios = [n for n in os.listdir(destino) if n.endswith('_parametros.txt')]
+                linha['resumo'] = f"{len(relatorios)} espectros ajustados"
+        elif analise == 'eletroima':
+            GMAG.Eletroima(amostra['origem'], destino, renderizador=renderizador)
+            linha['resumo'] = f"{len(os.listdir(amostra['origem']))} arquivos"
+        elif analise == 'resistencia':
+            GMAG.Resistencia(None, amostra['origem'], renderizador=renderizador, diretorio_destino=destino)
+            linha['resumo'] = f"{len(os.listdir(amostra['origem']))} arquivos"
+        elif analise == 'drx':
+            opcoes = {k: amostra[k] for k in ('comprimento_onda', 'tempo') if k in amostra}
+            resultado = GMAG.DRX(amostra['arquivo'], picos=amostra.get('picos'), output_dir=destino,
+                                 renderizador=renderizador, deteccao=amostra.get('deteccao'), **opcoes)
+            erro, fft = resultado['erro_espessura'], resultado['espessura_fft']
+            linha['resumo'] = (f"{len(resultado['angulos'])} picos ({resultado['origem']}), espessura "
+                               f"{resultado['espessura']:.3f}" + (f" ± {erro:.3f}" if erro is not None else "")
+                               + " nm" + (f" (FFT {fft:.3f})" if fft is not None else "")
+                               + f", taxa {resultado['taxa']:.4f} nm/s")
+
+        renderizador.aguardar()
+        if registro.proximo > desde:
+            registro.exportar(os.path.join(destino, 'metricas.csv'), desde=desde)
+        n_erros = renderizador.n_erros - erros_antes
+        if n_erros:
+            # `erros` guarda só os mais recentes: o primeiro desta amostra que ainda está lá
+            erros = list(renderizador.erros)[-n_erros:]
+            raise RuntimeError(f"{n_erros} gráfico(s) falharam: {erros[0]}")
+    except Exception as e:
+        linha['estado'] = FALHA
+        linha['erro'] = str(e) or type(e).__name__
+        if os.path.isdir(destino):
+            with open(os.path.join(destino, 'erro.txt'), 'w') as f:
+                f.write(traceback.format_exc())
+    finally:
+        linha['tempo'] = round(time.perf_counter() - inicio, 3)
+        linha['arquivos'] = _arquivos_gerados(destino)
+    return linha
+
+
+###############################################################
+#Lote
+
+def executar_lote(amostras, n_processos=None, graficos=True, ao_concluir=None):
+    """
+    Processa as amostras em um pool de processos.
+
+    Args:
+        amostras (list): Amostras validadas (carregar_manifesto)
+        n_processos (int, opcional): Amostras processadas ao mesmo tempo (padrão: número de CPUs)
+        graficos (bool): False não gera nenhum gráfico
+        ao_concluir (callable, opcional): Chamado com cada linha do resumo assim que a amostra termina
+
+    Returns:
+        list: Linhas do resumo, na ordem do manifesto
+    """
+    n_processos = min(n_processos or os.cpu_count() or 1, len(amostras))
+    linhas = {}
+    with ProcessPoolExecutor(max_workers=n_processos, initializer=_iniciar_processo,
+                             initargs=(graficos,)) as executor:
+        futuros = {executor.submit(executar_amostra, amostra): amostra for amostra in amostras}
+        for futuro in as_completed(futuros):
+            amostra = futuros[futuro]
+            try:
+                linha = futuro.result()
+            except Exception as e:
+                # O processo morreu (ex.: falta de memória) antes de devolver a linha
+                linha = {'nome': amostra['nome'], 'analise': amostra['analise'], 'estado': FALHA, 'tempo': None,
+                         'destino': amostra['destino'], 'arquivos': 0, 'resumo': '', 'erro': str(e)}
+            linhas[amostra['nome']] = linha
+            if ao_concluir is not None:
+                ao_concluir(linha)
+    return [linhas[amostra['nome']] for amostra in amostras]
+
+
+COLUNAS = ('nome', 'analise', 'estado', 'tempo', 'arquivos', 'resumo', 'erro', 'destino')
+
+
+def gravar_resumo(linhas, diretorio):
+    """Grava resumo_lote.csv e resumo_lote.json; devolve os dois caminhos"""
+    os.makedirs(diretorio, exist_ok=True)
+    caminho_csv = os.path.join(diretorio, 'resumo_lote.csv')
+    with open(caminho_csv, 'w', newline='', encoding='utf-8') as f:
+        escritor = csv.DictWriter(f, fieldnames=COLUNAS)
+        escritor.writeheader()
+        escritor.writerows(linhas)
+    caminho_json = os.path.join(diretorio, 'resumo_lote.json')
+    with open(caminho_json, 'w', encoding='utf-8') as f:
+        json.dump(linhas, f, indent=2, ensure_ascii=False)
+    return caminho_csv, caminho_json
+
+
+def tabela_resumo(linhas):
+    """Tabela de texto com uma linha por amostra"""
+    colunas = ('nome', 'analise', 'estado', 'tempo', 'arquivos', 'resumo')
+    textos = [[('-' if l[c] is None else f"{l[c]:.1f}" if c == 'tempo' else str(l[c])) for c in colunas]
+              for l in linhas]
+    for texto, l in zip(textos, linhas):
+        if l['estado'] != OK:
+            texto[-1] = l['erro']
+    larguras = [max([len(c)] + [len(t[i]) for t in textos]) for i, c in enumerate(colunas)]
+    formatar = lambda valores: "  ".join(v.ljust(n) for v, n in zip(valores, larguras)).rstrip()
+    return "\n".join([formatar(colunas), formatar(['-' * n for n in larguras])] + [formatar(t) for t in textos])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('manifesto', help='Arquivo JSON com as amostras')
+    parser.add_argument('--saida', help='Diretório de saída (substitui o "saida" do manifesto)')
+    parser.add_argument('--processos', type=int, default=None, help='Amostras processadas ao mesmo tempo')
+    parser.add_argument('--no-plots', dest='graficos', action='store_false', help='Não gera gráficos')
+    args = parser.parse_args(argv)
+
+    try:
+        saida, amostras = carregar_manifesto(args.manifesto, args.saida)
+    except ManifestoInvalido as e:
+        print(f"ERRO: {str(e)}", file=sys.stderr)
+        return SAIDA_MANIFESTO
+
+    print(f"{len(amostras)} amostra(s), saída em {saida}")
+    inicio = time.perf_counter()
+
+    def ao_concluir(linha):
+        print(f"[{linha['estado']}] {linha['nome']} ({linha['analise']})"
+              + (f": {linha['erro']}" if linha['estado'] != OK else ""), flush=True)
+
+    linhas = executar_lote(amostras, args.processos, args.graficos, ao_concluir)
+    caminho_csv, _ = gravar_resumo(linhas, saida)
+
+    falhas = sum(l['estado'] != OK for l in linhas)
+    print()
+    print(tabela_resumo(linhas))
+    print(f"\n{len(linhas) - falhas}/{len(linhas)} amostra(s) concluída(s) em {time.perf_counter() - inicio:.1f} s"
+          f" | resumo: {caminho_csv}")
+    return SAIDA_FALHAS if falhas else SAIDA_OK
+
+
+if __name__ == '__main__':
+    sys.exit(main())
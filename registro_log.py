@@ -0,0 +1,174 @@
+import atexit, copy, json, logging, os, queue, threading, time
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+###############################################################
+###############################################################
+###############################################################
+#Logging do aplicativo: fila + thread de escrita, arquivo JSON com rotação, últimas linhas em memória
+
+MAX_BYTES = 5 * 1024**2   # tamanho de cada arquivo antes da rotação
+N_BACKUPS = 5             # arquivos antigos mantidos (gmag_app.log.1 ... .5)
+CAPACIDADE = 2000         # linhas recentes guardadas em memória
+FORMATO_TEXTO = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Atributos que todo LogRecord tem; o resto veio de extra={...} e vai para o JSON
+_PADRAO = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class FormatadorJSON(logging.Formatter):
+    """
+    Um objeto JSON por linha: instante (ISO 8601), nivel, logger, mensagem,
+    modulo, linha, thread, os campos passados em extra={...} e, se houver, a
+    exceção formatada.
+    """
+
+    def format(self, record):
+        registro = {
+            'instante': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created))
+                        + f'.{int(record.msecs):03d}',
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensagem': record.getMessage(),
+            'modulo': record.module,
+            'linha': record.lineno,
+            'thread': record.threadName,
+        }
+        for nome, valor in vars(record).items():
+            if nome not in _PADRAO and not nome.startswith('_'):
+                registro[nome] = valor
+        if record.exc_info:
+            registro['excecao'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            registro['excecao'] = record.exc_text
+        return json.dumps(registro, ensure_ascii=False, default=str)
+
+
+_formatador = logging.Formatter()
+
+
+class _ParaFila(QueueHandler):
+    """
+    QueueHandler que mantém a exceção separada da mensagem (o padrão junta as
+    duas no texto), para ela ir no campo 'excecao' do JSON
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _formatador.formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def texto(linha_json):
+    """Linha JSON do arquivo no formato de exibição (FORMATO_TEXTO); linhas que não são JSON passam como estão"""
+    try:
+        registro = json.loads(linha_json)
+        instante = registro['instante'].replace('T', ' ').replace('.', ',')
+        linha = f"{instante} - {registro['nivel']} - {registro['mensagem']}"
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return linha_json
+    if registro.get('excecao'):
+        linha += '\n' + registro['excecao']
+    return linha
+
+
+class MemoriaRecente(logging.Handler):
+    """Guarda as últimas `capacidade` mensagens já formatadas, para a interface"""
+
+    def __init__(self, capacidade=CAPACIDADE):
+        super().__init__()
+        self.linhas = deque(maxlen=capacidade)
+        self.setFormatter(logging.Formatter(FORMATO_TEXTO))
+
+    def emit(self, record):
+        try:
+            self.linhas.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+    def ultimas(self, n):
+        # list(deque) é atômico em relação ao append de outra thread
+        return list(self.linhas)[-n:] if n > 0 else []
+
+
+def ultimas_linhas(caminho, n, bloco=64 * 1024):
+    """
+    Últimas `n` linhas de um arquivo, lendo blocos a partir do fim (o custo
+    depende de n, não do tamanho do arquivo).
+
+    Returns:
+        list: Linhas sem o '\\n', da mais antiga para a mais recente
+    """
+    if n <= 0:
+        return []
+    with open(caminho, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        posicao = f.tell()
+        dados = b''
+        while posicao > 0 and dados.count(b'\n') <= n:
+            passo = min(bloco, posicao)
+            posicao -= passo
+            f.seek(posicao)
+            dados = f.read(passo) + dados
+    linhas = dados.decode('utf-8', errors='replace').splitlines()
+    return linhas[-n:]
+
+
+class RegistroLog:
+    """
+    Logging sem bloquear quem registra: o logger só põe o registro em uma fila
+    (QueueHandler) e uma thread (QueueListener) grava no arquivo, em JSON com
+    rotação por tamanho, e nas linhas recentes em memória.
+
+    Args:
+        nome (str): Logger configurado
+        caminho (str): Arquivo de log
+        nivel (int): Nível mínimo
+        max_bytes (int): Tamanho de cada arquivo antes da rotação
+        n_backups (int): Arquivos antigos mantidos
+        capacidade (int): Linhas recentes em memória
+    """
+
+    def __init__(self, nome, caminho, nivel=logging.INFO, max_bytes=MAX_BYTES, n_backups=N_BACKUPS,
+                 capacidade=CAPACIDADE):
+        self.caminho = caminho
+        self.memoria = MemoriaRecente(capacidade)
+        # delay: o arquivo só é aberto no primeiro registro
+        arquivo = RotatingFileHandler(caminho, maxBytes=max_bytes, backupCount=n_backups, encoding='utf-8',
+                                      delay=True)
+        arquivo.setFormatter(FormatadorJSON())
+
+        self.fila = queue.SimpleQueue()
+        self.logger = logging.getLogger(nome)
+        self.logger.setLevel(nivel)
+        self.logger.addHandler(_ParaFila(self.fila))
+        self.ouvinte = QueueListener(self.fila, arquivo, self.memoria, respect_handler_level=True)
+        self.ouvinte.start()
+        self._parado = False
+        self._trava = threading.Lock()
+        atexit.register(self.parar)
+
+    def parar(self):
+        """Grava o que ainda está na fila e encerra a thread de escrita"""
+        with self._trava:
+            if self._parado:
+                return
+            self._parado = True
+        self.ouvinte.stop()
+        for handler in self.ouvinte.handlers:
+            handler.close()
+
+    def ultimas(self, n=100):
+        """
+        Últimas `n` mensagens, no formato de exibição: da memória quando ela
+        tem o suficiente; senão, do fim do arquivo (ex.: logo após abrir o
+        aplicativo, para mostrar a sessão anterior).
+        """
+        linhas = self.memoria.ultimas(n)
+        if len(linhas) >= n or not os.path.exists(self.caminho):
+            return linhas
+        return [texto(linha) for linha in ultimas_linhas(self.caminho, n)]
@@ -0,0 +1,300 @@
+import json, os, uuid
+import numpy as np, lmfit
+from lmfit.minimizer import MinimizerResult
+import GMAG, cache_ajustes, leitura, modelo_fmr, renderizacao
+from GMAG import AjustadorMultiplosAngulos
+from ajuste_paralelo import MotorAjusteParalelo, _ajustar_tarefa, _no_limite
+
+###############################################################
+###############################################################
+###############################################################
+#Sessão FMR: ajustes guardados em disco, novos arquivos e ângulos ajustados sem refazer a varredura
+
+ARQUIVO_SESSAO = 'sessao_fmr.npz'
+VERSAO = 1  # muda quando o formato do arquivo da sessão muda
+
+# Parâmetros iniciais de uma sessão nova sem parâmetros dados (os mesmos de FMR_automatico)
+PARAMETROS_PADRAO = {'a': 1, 'b': 0, 'c': 1, 'd': 0.8, 'Hr1': 1000, 'dH1': 50, 'Hr2': 1200, 'dH2': 50}
+
+
+def _resultado_guardado(nomes, valores, erros, qui2):
+    """MinimizerResult só com os parâmetros (valor e erro) e o qui-quadrado reduzido guardados"""
+    params = lmfit.Parameters()
+    for nome, valor, erro in zip(nomes, valores, erros):
+        params.add(nome, value=float(valor))
+        params[nome].stderr = None if np.isnan(erro) else float(erro)
+    return MinimizerResult(params=params, var_names=list(nomes), redchi=float(qui2), success=True, guardado=True)
+
+
+class SessaoFMR(AjustadorMultiplosAngulos):
+    """
+    AjustadorMultiplosAngulos que junta vários arquivos de dados e guarda os
+    ajustes em `diretorio`/sessao_fmr.npz, para que uma varredura possa
+    crescer (arquivos novos, ângulos a mais) sem refazer o que já foi ajustado.
+
+    O arquivo da sessão tem uma linha por ângulo ajustado (valores, erros e
+    qui-quadrado reduzido no layout de modelo_fmr.ModeloPicos) e a chave da
+    fatia de dados de cada ângulo; ao reabrir, só valem os ajustes cuja fatia
+    não mudou. Um ângulo medido em mais de um arquivo usa os dados do arquivo
+    adicionado por último.
+
+    Args:
+        diretorio (str): Onde ficam o arquivo da sessão, os gráficos e o relatório
+        caminhos (iterável, opcional): Arquivos de dados a acrescentar
+        tolerancia_angulo (float): Como em AjustadorMultiplosAngulos
+        jacobiano (str): Como em AjustadorMultiplosAngulos
+    """
+
+    def __init__(self, diretorio, caminhos=(), tolerancia_angulo=1e-3, jacobiano='analitico'):
+        os.makedirs(diretorio, exist_ok=True)
+        self.diretorio = diretorio
+        self.caminho_sessao = os.path.join(diretorio, ARQUIVO_SESSAO)
+        self.arquivos = []
+        self._chaves = {}  # ângulo -> chave da fatia de dados ajustada
+        # Identidade do código do ajuste: mudar o modelo ou os limites invalida a sessão
+        self._identidade = cache_ajustes.identidade(AjustadorMultiplosAngulos, modelo_fmr, _ajustar_tarefa,
+                                                    _no_limite)
+        guardado = self._ler_sessao()
+        for caminho in (guardado['meta']['arquivos'] if guardado else []):
+            if os.path.exists(caminho):
+                self.arquivos.append(caminho)
+            else:
+                print(f"AVISO: arquivo da sessão não encontrado, ângulos dele descartados: {caminho}")
+        for caminho in caminhos:
+            self._incluir(caminho)
+        super().__init__(self.arquivos[-1] if self.arquivos else None, tolerancia_angulo, jacobiano)
+        if guardado:
+            self._reaproveitar(guardado)
+
+    def _incluir(self, caminho):
+        if not os.path.exists(caminho):
+            raise FileNotFoundError(f"Arquivo não encontrado: {caminho}")
+        caminho = os.path.abspath(caminho)
+        if caminho not in self.arquivos:
+            self.arquivos.append(caminho)
+        self.caminho_arquivo = caminho
+
+    def carregar_dados(self):
+        """Junta os arquivos da sessão; em ângulos repetidos, valem os dados do último arquivo"""
+        if not self.arquivos:
+            self.campo = self.sinal = self.angulos_disponiveis = np.empty(0)
+            self.dados_completos = np.empty((0, 3))
+            self.limites_angulo = np.empty((0, 2), dtype=int)
+            return
+
+        partes = []
+        for k, caminho in enumerate(self.arquivos):
+            campo, angulo, sinal = leitura.carregar_colunas(caminho, n_colunas=3, ordenar_por=1)
+            partes.append((campo, angulo, sinal, np.full(len(campo), k)))
+        campo, angulo, sinal, origem = (np.concatenate(coluna) for coluna in zip(*partes))
+        if len(campo) == 0:
+            raise ValueError("Nenhum dado numérico válido encontrado")
+
+        # Grupos de ângulo do conjunto: em cada um ficam só as linhas do arquivo mais recente
+        ordem = np.argsort(angulo, kind='stable')
+        inicios = np.concatenate(([0], np.flatnonzero(np.diff(angulo[ordem]) > self.tolerancia_angulo) + 1))
+        grupo = np.repeat(np.arange(len(inicios)), np.diff(np.append(inicios, len(angulo))))
+        ultimo = np.maximum.reduceat(origem[ordem], inicios)
+        manter = np.zeros(len(angulo), dtype=bool)
+        manter[ordem[origem[ordem] == ultimo[grupo]]] = True
+
+        self._organizar(campo[manter], angulo[manter], sinal[manter])
+        print(f"Ângulos na sessão: {self.angulos_disponiveis}")
+
+    def _chave(self, angulo):
+        x, y = self.dados_angulo(angulo)
+        return cache_ajustes.chave(self._identidade, self.jacobiano, x, y)
+
+    def registrar_resultado(self, angulo, resultado):
+        registro = super().registrar_resultado(angulo, resultado)
+        angulo = self.angulo_canonico(angulo)
+        self._chaves[angulo] = self._chave(angulo)
+        return registro
+
+    def _reaproveitar(self, guardado):
+        """Registra os ajustes guardados cuja fatia de dados continua a mesma"""
+        nomes = guardado['meta']['nomes']
+        reaproveitados = 0
+        for angulo, chave, valores, erros, qui2 in zip(guardado['angulos'], guardado['chaves'], guardado['tabela'],
+                                                        guardado['erros'], guardado['qui2']):
+            try:
+                angulo = self.angulo_canonico(angulo)
+            except ValueError:
+                continue
+            if self._chave(angulo) == chave:
+                self.registrar_resultado(angulo, _resultado_guardado(nomes, valores, erros, qui2))
+                reaproveitados += 1
+        if reaproveitados < len(guardado['angulos']):
+            print(f"Sessão: {reaproveitados} de {len(guardado['angulos'])} ajustes guardados reaproveitados")
+
+    def _descartar_resultados(self):
+        self.resultados = {}
+        self._chaves = {}
+        self.modelo_picos = self.nomes_parametros = None
+        self.tabela = self.erros = self.qui2_reduzido = None
+
+    def adicionar(self, caminho):
+        """
+        Acrescenta um arquivo de dados (ou relê um já incluído que mudou);
+        os ajustes dos ângulos cujos dados não mudaram continuam valendo.
+        """
+        self._incluir(caminho)
+        anteriores = [(angulo, self._chaves[angulo], registro['resultado'])
+                      for angulo, registro in self.resultados.items()]
+        self._descartar_resultados()
+        self.carregar_dados()
+        for angulo, chave, resultado in anteriores:
+            try:
+                angulo = self.angulo_canonico(angulo)
+            except ValueError:
+                continue
+            if self._chave(angulo) == chave:
+                self.registrar_resultado(angulo, resultado)
+
+    def faltantes(self):
+        """Ângulos ainda sem ajuste"""
+        return [a for a in self.angulos_disponiveis if a not in self.resultados]
+
+    ###############################################################
+    #Ajuste e saídas
+
+    def _modelo_pedido(self, parametros_iniciais, n_picos, forma):
+        """Modelo e parâmetros iniciais do ajuste: os dados, os da sessão ou os padrões"""
+        if parametros_iniciais:
+            modelo = modelo_fmr.ModeloPicos.de_parametros(parametros_iniciais)
+        elif self.modelo_picos is not None:
+            modelo = self.modelo_picos
+        else:
+            parametros_iniciais = PARAMETROS_PADRAO
+            modelo = modelo_fmr.ModeloPicos.de_parametros(parametros_iniciais)
+        modelo = modelo_fmr.ModeloPicos(n_picos or modelo.n_picos, forma or modelo.forma)
+        return modelo, modelo.completar(parametros_iniciais or PARAMETROS_PADRAO)
+
+    def ajustar(self, parametros_iniciais=None, n_picos=None, forma=None, n_processos=None, cache=None,
+                progresso=None, metricas=None, contexto=None):
+        """
+        Ajusta só os ângulos que ainda não têm resultado e grava a sessão.
+
+        Cada ângulo novo parte do vizinho ajustado mais próximo (ver
+        MotorAjusteParalelo.ajustar_faltantes); parametros_iniciais só são
+        usados numa sessão ainda vazia. Pedir outro modelo (número de picos ou
+        forma) descarta os ajustes da sessão e refaz todos.
+
+        A sessão é gravada também se o ajuste for interrompido (ex.:
+        cancelamento pelo `progresso`), com os ângulos concluídos até ali.
+
+        Args:
+            progresso, metricas, contexto, cache, n_processos: Como em MotorAjusteParalelo
+
+        Returns:
+            tuple: (ângulos ajustados agora, seus dicionários de parâmetros)
+        """
+        if len(self.angulos_disponiveis) == 0:
+            raise ValueError("Nenhum ângulo na sessão: adicione um arquivo de dados")
+        modelo, parametros_iniciais = self._modelo_pedido(parametros_iniciais, n_picos, forma)
+        if self.modelo_picos is not None and modelo != self.modelo_picos:
+            print(f"Sessão: modelo alterado de {self.modelo_picos!r} para {modelo!r}; todos os ângulos serão reajustados")
+            self._descartar_resultados()
+
+        motor = MotorAjusteParalelo(self, n_processos=n_processos, cache=cache, metricas=metricas,
+                                    contexto=contexto)
+        try:
+            if self.resultados:
+                ajustados = {a: r['parametros'] for a, r in self.resultados.items()}
+                return motor.ajustar_faltantes(ajustados, progresso=progresso)
+            return motor.ajustar_todos(parametros_iniciais, progresso=progresso)
+        finally:
+            self.salvar()
+
+    def salvar(self):
+        """Grava os ajustes no arquivo da sessão (escrita atômica)"""
+        angulos = sorted(self.resultados)
+        indices = [self.indice_angulo(a) for a in angulos]
+        meta = {
+            'versao': VERSAO,
+            'arquivos': self.arquivos,
+            'nomes': list(self.nomes_parametros or ()),
+            'jacobiano': self.jacobiano,
+        }
+        colunas = len(meta['nomes'])
+        dados = {
+            'meta': np.array(json.dumps(meta)),
+            'angulos': np.array(angulos, dtype=float),
+            'chaves': np.array([self._chaves[a] for a in angulos], dtype='U64'),
+            'tabela': self.tabela[indices] if indices else np.empty((0, colunas)),
+            'erros': self.erros[indices] if indices else np.empty((0, colunas)),
+            'qui2': self.qui2_reduzido[indices] if indices else np.empty(0),
+        }
+        temporario = f"{self.caminho_sessao}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temporario, 'wb') as f:
+                np.savez_compressed(f, **dados)
+            os.replace(temporario, self.caminho_sessao)
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+        return self.caminho_sessao
+
+    def _ler_sessao(self):
+        """Conteúdo do arquivo da sessão (None se não existe ou é de outra versão)"""
+        if not os.path.exists(self.caminho_sessao):
+            return None
+        try:
+            with np.load(self.caminho_sessao) as arquivo:
+                guardado = {nome: arquivo[nome] for nome in arquivo.files}
+            guardado['meta'] = json.loads(str(guardado['meta']))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"AVISO: arquivo da sessão ilegível, começando do zero: {str(e)}")
+            return None
+        if guardado['meta'].get('versao') != VERSAO:
+            print("AVISO: arquivo da sessão de outra versão, começando do zero")
+            return None
+        return guardado
+
+
+def FMR_incremental(caminho_arquivo, diretorio_destino, parametros_iniciais=None, n_processos=None,
+                    renderizador=None, cache=None, progresso=None, metricas=None, contexto=None, n_picos=None,
+                    forma=None):
+    """
+    Como GMAG.FMR_automatico, mas dentro da sessão guardada em diretorio_destino:
+    o arquivo entra na sessão e só os ângulos sem ajuste são ajustados.
+
+    Só os gráficos dos ângulos ajustados agora são renderizados (e os que
+    faltarem no diretório); a variação dos parâmetros, a comparação e o
+    resultados_fmr.json saem das tabelas da sessão, sem refazer ajustes.
+
+    Args:
+        caminho_arquivo (str, opcional): Arquivo a acrescentar (None só atualiza a sessão)
+        demais: Como em GMAG.FMR_automatico
+
+    Returns:
+        dict: O mesmo de GMAG.FMR_automatico, com 'novos' (ângulos ajustados
+        nesta chamada) e 'sessao' (caminho do arquivo da sessão)
+    """
+    renderizador = renderizador or renderizacao.padrao()
+    sessao = SessaoFMR(diretorio_destino, [caminho_arquivo] if caminho_arquivo is not None else ())
+
+    def informar_angulo(angulo, registro, n_concluidos, n_total):
+        caminho = os.path.join(diretorio_destino, f"ajuste_angulo_{angulo}.png")
+        futuro = renderizador.enviar(sessao.grafico_angulo(angulo, caminho))
+        if progresso is not None:
+            progresso(angulo, registro, n_concluidos, n_total, caminho, futuro)
+
+    if sessao.faltantes():
+        novos, _ = sessao.ajustar(parametros_iniciais, n_picos, forma, n_processos=n_processos, cache=cache,
+                                  progresso=informar_angulo, metricas=metricas, contexto=contexto)
+    else:
+        novos = []
+    print(f"Sessão: {len(novos)} ângulo(s) ajustado(s) agora, {len(sessao.resultados)} no total")
+
+    angulos = sorted(sessao.resultados)
+    for angulo in angulos:
+        caminho = os.path.join(diretorio_destino, f"ajuste_angulo_{angulo}.png")
+        if angulo not in novos and not os.path.exists(caminho):
+            renderizador.enviar(sessao.grafico_angulo(angulo, caminho))
+
+    resultados = GMAG._saidas_fmr(sessao, angulos, [sessao.resultados[a]['parametros'] for a in angulos],
+                                  diretorio_destino, renderizador)
+    resultados['novos'] = [float(a) for a in novos]
+    resultados['sessao'] = sessao.caminho_sessao
+    return resultados
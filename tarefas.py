@@ -0,0 +1,250 @@
+import os, threading, time, uuid, traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+###############################################################
+###############################################################
+###############################################################
+#Fila de tarefas em segundo plano (análises disparadas pela interface)
+
+PENDENTE = 'pendente'
+EXECUTANDO = 'executando'
+CONCLUIDA = 'concluida'
+ERRO = 'erro'
+CANCELADA = 'cancelada'
+
+FINAIS = (CONCLUIDA, ERRO, CANCELADA)
+
+MAX_HISTORICO = 100  # tarefas finalizadas mantidas para consulta
+
+
+class TarefaCancelada(Exception):
+    """Levantada dentro de uma tarefa quando o cancelamento foi pedido"""
+
+
+class Tarefa:
+    """
+    Uma análise submetida ao GerenciadorTarefas.
+
+    A função da tarefa recebe o próprio objeto no argumento `tarefa` e o usa
+    para relatar o andamento (informar) e para ver se deve parar
+    (verificar_cancelamento). O cancelamento é cooperativo: uma tarefa em
+    execução só para no próximo ponto de verificação.
+    """
+
+    def __init__(self, tipo, descricao=None):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.descricao = descricao or tipo
+        self.estado = PENDENTE
+        self.progresso = 0.0
+        self.mensagens = []
+        self.resultado = None
+        self.erro = None
+        self.criada = time.time()
+        self.iniciada = None
+        self.finalizada = None
+        self._cancelar = threading.Event()
+        self._trava = threading.Lock()
+        self._futuro = None
+
+    @property
+    def cancelamento_pedido(self):
+        return self._cancelar.is_set()
+
+    def verificar_cancelamento(self):
+        """Levanta TarefaCancelada se o cancelamento foi pedido"""
+        if self._cancelar.is_set():
+            raise TarefaCancelada(f"Tarefa {self.id} cancelada")
+
+    def informar(self, mensagem=None, progresso=None):
+        """
+        Registra o andamento da tarefa e verifica o cancelamento.
+
+        Args:
+            mensagem (str, opcional): Linha acrescentada ao histórico da tarefa
+            progresso (float, opcional): Fração concluída, entre 0 e 1
+        """
+        with self._trava:
+            if mensagem is not None:
+                self.mensagens.append(mensagem)
+            if progresso is not None:
+                self.progresso = min(max(float(progresso), 0.0), 1.0)
+        self.verificar_cancelamento()
+
+    def resumo(self, desde=0):
+        """
+        Estado da tarefa em um dicionário serializável em JSON.
+
+        Args:
+            desde (int): Só devolve as mensagens a partir deste índice, para a
+                interface receber apenas as novas a cada consulta
+
+        Returns:
+            dict: id, tipo, descricao, estado, progresso, mensagens, proxima
+            (índice para a próxima consulta), resultado, erro e horários
+        """
+        with self._trava:
+            return {
+                'id': self.id,
+                'tipo': self.tipo,
+                'descricao': self.descricao,
+                'estado': self.estado,
+                'progresso': self.progresso,
+                'mensagens': self.mensagens[desde:],
+                'proxima': len(self.mensagens),
+                'resultado': self.resultado if self.estado in FINAIS else None,
+                'erro': self.erro,
+                'criada': self.criada,
+                'iniciada': self.iniciada,
+                'finalizada': self.finalizada,
+            }
+
+
+class GerenciadorTarefas:
+    """
+    Executa tarefas em um pool de threads e guarda o estado de cada uma.
+
+    As análises passam a maior parte do tempo em numpy/lmfit (que liberam o
+    GIL), em processos filhos (MotorAjusteParalelo) ou esperando a renderização,
+    então threads bastam para rodar várias ao mesmo tempo sem bloquear quem
+    submeteu.
+
+    Args:
+        n_trabalhadores (int, opcional): Tarefas executadas ao mesmo tempo
+            (padrão: metade das CPUs, no mínimo 2); as demais esperam na fila
+        max_historico (int): Tarefas finalizadas guardadas para consulta
+    """
+
+    def __init__(self, n_trabalhadores=None, max_historico=MAX_HISTORICO):
+        self.n_trabalhadores = n_trabalhadores or max(2, (os.cpu_count() or 1) // 2)
+        self.max_historico = max_historico
+        self._executor = ThreadPoolExecutor(max_workers=self.n_trabalhadores, thread_name_prefix='tarefa')
+        self._tarefas = OrderedDict()
+        self._trava = threading.Lock()
+
+    def submeter(self, tipo, funcao, *args, descricao=None, **kwargs):
+        """
+        Coloca funcao(*args, tarefa=<Tarefa>, **kwargs) na fila.
+
+        Uma função que devolve um dicionário com 'success' False termina em
+        estado de erro, com a 'message' do dicionário.
+
+        Returns:
+            str: Id da tarefa
+        """
+        tarefa = Tarefa(tipo, descricao)
+        with self._trava:
+            self._tarefas[tarefa.id] = tarefa
+            self._descartar_antigas()
+        tarefa._futuro = self._executor.submit(self._executar, tarefa, funcao, args, kwargs)
+        return tarefa.id
+
+    def _executar(self, tarefa, funcao, args, kwargs):
+        if tarefa.cancelamento_pedido:
+            self._finalizar(tarefa, CANCELADA)
+            return
+        with tarefa._trava:
+            tarefa.estado = EXECUTANDO
+            tarefa.iniciada = time.time()
+        try:
+            resultado = funcao(*args, tarefa=tarefa, **kwargs)
+        except TarefaCancelada:
+            self._finalizar(tarefa, CANCELADA)
+        except Exception as e:
+            self._finalizar(tarefa, ERRO, erro=str(e), mensagem=traceback.format_exc())
+        else:
+            if tarefa.cancelamento_pedido:
+                self._finalizar(tarefa, CANCELADA, resultado)
+            elif isinstance(resultado, dict) and resultado.get('success') is False:
+                self._finalizar(tarefa, ERRO, resultado, erro=resultado.get('message'))
+            else:
+                self._finalizar(tarefa, CONCLUIDA, resultado)
+
+    def _finalizar(self, tarefa, estado, resultado=None, erro=None, mensagem=None):
+        """Grava o estado final e o que o acompanha de uma vez, sob a trava da tarefa"""
+        with tarefa._trava:
+            if tarefa.estado in FINAIS:
+                return
+            tarefa.resultado = resultado
+            tarefa.erro = erro
+            if mensagem is not None:
+                tarefa.mensagens.append(mensagem)
+            if estado == CONCLUIDA:
+                tarefa.progresso = 1.0
+            tarefa.finalizada = time.time()
+            tarefa.estado = estado
+
+    def _descartar_antigas(self):
+        """Esquece as tarefas finalizadas mais antigas além de max_historico"""
+        finalizadas = [i for i, t in self._tarefas.items() if t.estado in FINAIS]
+        for i in finalizadas[:max(len(finalizadas) - self.max_historico, 0)]:
+            del self._tarefas[i]
+
+    def obter(self, id_tarefa):
+        """Tarefa com o id dado; ValueError se não existir"""
+        with self._trava:
+            tarefa = self._tarefas.get(id_tarefa)
+        if tarefa is None:
+            raise ValueError(f"Tarefa não encontrada: {id_tarefa}")
+        return tarefa
+
+    def estado(self, id_tarefa, desde=0):
+        """Resumo da tarefa (ver Tarefa.resumo)"""
+        return self.obter(id_tarefa).resumo(desde)
+
+    def listar(self):
+        """Resumos de todas as tarefas conhecidas, sem mensagens nem resultados"""
+        with self._trava:
+            tarefas = list(self._tarefas.values())
+        resumos = []
+        for tarefa in tarefas:
+            resumo = tarefa.resumo(desde=len(tarefa.mensagens))
+            resumo['resultado'] = None
+            resumos.append(resumo)
+        return resumos
+
+    def cancelar(self, id_tarefa):
+        """
+        Pede o cancelamento. Uma tarefa ainda na fila não chega a rodar; uma em
+        execução para no próximo ponto de verificação.
+
+        Returns:
+            bool: False se a tarefa já tinha terminado
+        """
+        tarefa = self.obter(id_tarefa)
+        if tarefa.estado in FINAIS:
+            return False
+        tarefa._cancelar.set()
+        if tarefa._futuro is not None and tarefa._futuro.cancel():
+            self._finalizar(tarefa, CANCELADA)
+        return True
+
+    def aguardar(self, id_tarefa, tempo_limite=None):
+        """Bloqueia até a tarefa terminar e devolve seu resumo"""
+        tarefa = self.obter(id_tarefa)
+        if tarefa._futuro is not None and not tarefa._futuro.cancelled():
+            tarefa._futuro.result(timeout=tempo_limite)
+        return tarefa.resumo()
+
+    def encerrar(self, cancelar=False):
+        """Encerra o pool; cancelar=True pede o cancelamento de tudo que não terminou"""
+        if cancelar:
+            with self._trava:
+                ids = [i for i, t in self._tarefas.items() if t.estado not in FINAIS]
+            for i in ids:
+                self.cancelar(i)
+        self._executor.shutdown(wait=True)
+
+
+_padrao = None
+_trava_padrao = threading.Lock()
+
+
+def padrao():
+    """Gerenciador compartilhado pelos endpoints da interface"""
+    global _padrao
+    with _trava_padrao:
+        if _padrao is None:
+            _padrao = GerenciadorTarefas()
+        return _padrao
@@ -0,0 +1,99 @@
+"""
+Ajuste global da impedância (ajuste_global.py): recuperação dos parâmetros
+conhecidos, covariância pelo complemento de Schur contra o jacobiano denso
+e o estado de sucesso quando o Levenberg-Marquardt estagna.
+"""
+import numpy as np
+import pytest
+
+import ajuste_global
+
+GAMMA = 0.0028
+VERDADEIROS = np.array([50.0, 8000.0, 10.0, 5.0])   # Hk, Meff, ΔH0, α/γ
+FREQUENCIAS = np.linspace(2.0, 7.0, 6)
+
+
+def espectros(n_pontos=400, ruido=0.005, semente=0, frequencias=FREQUENCIAS):
+    """Lorentzianas com Hr e dH dados pelos parâmetros globais, amplitudes aleatórias"""
+    rng = np.random.default_rng(semente)
+    Hk, Meff, dho, alfa_gamma = VERDADEIROS
+    Hr = ajuste_global.campo_ressonancia(frequencias, Hk, Meff, GAMMA)
+    dH = dho + alfa_gamma * frequencias
+    locais = np.column_stack((rng.uniform(0.5, 2.0, len(frequencias)), rng.uniform(-0.3, 0.3, len(frequencias))))
+    xs, ys = [], []
+    for i in range(len(frequencias)):
+        x = np.linspace(0, 1000, n_pontos + 10 * i)   # grades de tamanhos diferentes
+        P = np.array([[*locais[i], Hr[i], dH[i]]])
+        xs.append(x)
+        ys.append(ajuste_global.lorentz_lote.lorentz_lote(x, P)[0] + rng.normal(scale=ruido, size=len(x)))
+    return xs, ys, locais
+
+
+def jacobiano_denso(problema, g, L):
+    """Jacobiano completo (pontos, 4 + 2·espectros), montado a partir dos blocos"""
+    Jg, Jl = problema.jacobiano(g, L)
+    J = np.zeros((len(problema.X), len(ajuste_global.GLOBAIS) + 2 * problema.S))
+    J[:, :4] = Jg
+    for k in range(2):
+        J[np.arange(len(problema.X)), 4 + 2 * problema.espectro + k] = Jl[:, k]
+    return J
+
+
+def test_recupera_parametros_conhecidos():
+    xs, ys, locais = espectros()
+    resultado = ajuste_global.ajustar_impedancia_global(xs, ys, FREQUENCIAS, GAMMA)
+    assert resultado.sucesso
+    assert np.all(np.abs(resultado.globais - VERDADEIROS) < 5 * resultado.erros)
+    np.testing.assert_allclose(resultado.globais, VERDADEIROS, rtol=0.05)
+    np.testing.assert_allclose(resultado.locais, locais, atol=0.02)
+    parametros = resultado.parametros()
+    assert parametros['alfa'][0] == pytest.approx(parametros['alfa_gamma'][0] * GAMMA)
+
+
+def test_covariancia_schur_igual_jacobiano_denso():
+    frequencias = FREQUENCIAS[:3]
+    xs, ys, _ = espectros(n_pontos=60, ruido=0.02, semente=1, frequencias=frequencias)
+    resultado = ajuste_global.ajustar_impedancia_global(xs, ys, frequencias, GAMMA)
+
+    problema = ajuste_global._Problema(xs, ys, frequencias, GAMMA)
+    J = jacobiano_denso(problema, resultado.globais, resultado.locais)
+    covariancia = np.linalg.inv(J.T @ J) * resultado.redchi
+
+    np.testing.assert_allclose(resultado.covariancia, covariancia[:4, :4], rtol=1e-6)
+    np.testing.assert_allclose(resultado.erros_locais.ravel(), np.sqrt(np.diag(covariancia)[4:]), rtol=1e-6)
+    assert resultado.nvarys == J.shape[1]
+    assert resultado.ndata == J.shape[0]
+
+
+def test_estagnado_nao_conta_como_sucesso(monkeypatch):
+    xs, ys, _ = espectros(n_pontos=50)
+    residuo = ajuste_global._Problema.residuo
+    chamadas = []
+
+    def sempre_pior(self, g, L):
+        # Todo passo tentado piora o qui-quadrado: o amortecimento só cresce
+        chamadas.append(1)
+        return residuo(self, g, L) + (0.0 if len(chamadas) == 1 else 1.0)
+
+    monkeypatch.setattr(ajuste_global._Problema, 'residuo', sempre_pior)
+    resultado = ajuste_global.ajustar_impedancia_global(xs, ys, FREQUENCIAS, GAMMA)
+    assert np.all(np.isfinite(resultado.globais)) and np.all(np.isfinite(resultado.locais))
+    assert not resultado.sucesso
+    assert resultado.nfev == 1 + 16   # de 1e-3 até passar de 1e12
+
+
+def test_max_iter_esgotado_nao_conta_como_sucesso():
+    xs, ys, _ = espectros(n_pontos=50)
+    resultado = ajuste_global.ajustar_impedancia_global(xs, ys, FREQUENCIAS, GAMMA, max_iter=1)
+    assert not resultado.sucesso
+
+
+@pytest.mark.parametrize('xs, ys, frequencias', [
+    ([np.arange(5.0)] * 2, [np.arange(5.0)] * 3, [1.0, 2.0]),
+    ([np.arange(5.0)], [np.arange(5.0)], [1.0]),
+    ([np.arange(2.0)] * 2, [np.arange(2.0)] * 2, [1.0, 2.0]),
+    ([np.arange(5.0)] * 2, [np.arange(4.0)] * 2, [1.0, 2.0]),
+])
+def test_entradas_invalidas(xs, ys, frequencias):
+    with pytest.raises(ValueError):
+        ajuste_global.ajustar_impedancia_global(xs, ys, frequencias, GAMMA)
@@ -0,0 +1,152 @@
+"""
+Ajuste angular com anisotropias uniaxial e cúbica (anisotropia.py): redução
+a GMAG.frequencia_de_ressonancia, ida e volta campo_ressonancia ->
+ajustar_anisotropia em várias amostras e as equivalências de _normalizar.
+"""
+import numpy as np
+import pytest
+
+import anisotropia, GMAG
+from anisotropia import PARAMETROS
+
+GAMMA = GMAG.gamma
+FREQUENCIA = 9.4
+AMOSTRAS = [
+    {'Meff': 8000.0, 'Hu': 60.0, 'phi_u': 30.0, 'H4': 20.0, 'phi_4': 10.0},
+    {'Meff': 12000.0, 'Hu': 25.0, 'phi_u': 120.0, 'H4': 40.0, 'phi_4': 70.0},
+    {'Meff': 6000.0, 'Hu': 100.0, 'phi_u': 75.0, 'H4': 5.0, 'phi_4': 35.0},
+]
+
+
+def medir(parametros, n_angulos, ruido=0.1, semente=0):
+    """Hr sintético de uma amostra, com ruído gaussiano em Oe"""
+    angulos = np.linspace(0, 360, n_angulos, endpoint=False)
+    Hr = anisotropia.campo_ressonancia(angulos, parametros, FREQUENCIA, GAMMA)
+    return angulos, Hr + np.random.default_rng(semente).normal(scale=ruido, size=n_angulos)
+
+
+def como_array(parametros):
+    return np.array([parametros.get(nome, 0.0) for nome in PARAMETROS])
+
+
+def test_sem_H4_no_eixo_facil_volta_a_kittel():
+    for Meff, Hu, phi_u in [(8000.0, 60.0, 30.0), (15000.0, 0.0, 0.0), (3000.0, 200.0, 135.0)]:
+        Hr = anisotropia.campo_ressonancia([phi_u], {'Meff': Meff, 'Hu': Hu, 'phi_u': phi_u}, FREQUENCIA, GAMMA)
+        assert GMAG.frequencia_de_ressonancia(Hr[0], Hu, Meff) == pytest.approx(FREQUENCIA, rel=1e-10)
+
+
+def test_isotropico_nao_depende_do_angulo():
+    Hr = anisotropia.campo_ressonancia(np.arange(0, 360, 15), {'Meff': 8000.0}, FREQUENCIA, GAMMA)
+    np.testing.assert_allclose(GMAG.frequencia_de_ressonancia(Hr, 0.0, 8000.0), FREQUENCIA, rtol=1e-10)
+    assert np.ptp(Hr) < 1e-8
+
+
+def test_derivadas_contra_diferencas_finitas():
+    c = (FREQUENCIA / GAMMA) ** 2
+    phi_H = np.radians(np.linspace(0, 360, 24, endpoint=False))[None, :]
+    P = (como_array(AMOSTRAS[0]) * anisotropia._GRAUS)[None, :]
+    H, phi = anisotropia.resolver_ressonancia(phi_H, P, c)
+    J = anisotropia.derivadas_Hr(H, phi, phi_H, P, c)
+    for k in range(5):
+        h = 1e-6 * max(abs(P[0, k]), 1.0)
+        mais, menos = P.copy(), P.copy()
+        mais[0, k] += h
+        menos[0, k] -= h
+        numerico = (anisotropia.resolver_ressonancia(phi_H, mais, c)[0]
+                    - anisotropia.resolver_ressonancia(phi_H, menos, c)[0]) / (2 * h)
+        np.testing.assert_allclose(J[..., k], numerico, rtol=1e-4, atol=1e-6)
+
+
+def test_ida_e_volta_varias_amostras():
+    dados = [medir(p, n, semente=i) for i, (p, n) in enumerate(zip(AMOSTRAS, (36, 72, 50)))]
+    resultado = anisotropia.ajustar_anisotropia([a for a, _ in dados], [h for _, h in dados], FREQUENCIA, GAMMA,
+                                                nomes=['a', 'b', 'c'])
+    assert resultado.sucesso.all()
+    assert resultado.nomes == ['a', 'b', 'c']
+    np.testing.assert_array_equal(resultado.ndata, [36, 72, 50])
+    for i, verdadeiros in enumerate(AMOSTRAS):
+        for nome, valor in verdadeiros.items():
+            obtido, erro = resultado.parametros(i)[nome]
+            assert abs(obtido - valor) < max(5 * erro, 1e-6), (i, nome, obtido, valor, erro)
+        np.testing.assert_allclose(resultado.Hr_modelo(i), dados[i][1], atol=0.5)
+        assert resultado.redchi[i] < 0.1   # ruído de 0,1 Oe
+
+
+def test_meff_fixo_com_eixo_duro():
+    # Hu < 0 com Meff fixo não é um eixo girado: as partidas com sinal trocado o encontram
+    verdadeiros = {'Meff': 8000.0, 'Hu': -50.0, 'phi_u': 40.0}
+    angulos, Hr = medir(verdadeiros, 36)
+    resultado = anisotropia.ajustar_anisotropia([angulos], [Hr], FREQUENCIA, GAMMA, modelo='uniaxial',
+                                                fixos={'Meff': 8000.0})
+    assert resultado.sucesso[0]
+    assert resultado.livres == ('Hu', 'phi_u')
+    assert resultado['Meff'][0] == 8000.0 and resultado.erros[0, 0] == 0.0
+    assert resultado['Hu'][0] == pytest.approx(-50.0, abs=0.5)
+    assert np.mod(resultado['phi_u'][0], 180.0) == pytest.approx(40.0, abs=0.5)
+    assert "(fixed)" in resultado.relatorio(0)
+
+
+@pytest.mark.parametrize('livres', [PARAMETROS, ('Hu', 'phi_u', 'H4', 'phi_4')])
+def test_normalizar_preserva_Hr(livres):
+    rng = np.random.default_rng(3)
+    c = (FREQUENCIA / GAMMA) ** 2
+    P = np.column_stack((rng.uniform(5000, 12000, 20), rng.uniform(-80, 80, 20), rng.uniform(-2 * np.pi, 2 * np.pi, 20),
+                         rng.uniform(-30, 30, 20), rng.uniform(-2 * np.pi, 2 * np.pi, 20)))
+    if 'Meff' not in livres:
+        P[:, 1] = np.abs(P[:, 1])
+        P[:, 3] = np.abs(P[:, 3])
+    Q = anisotropia._normalizar(P, livres)
+    phi_H = np.tile(np.radians(np.arange(0, 360, 10.0)), (20, 1))
+    np.testing.assert_allclose(anisotropia.resolver_ressonancia(phi_H, Q, c)[0],
+                               anisotropia.resolver_ressonancia(phi_H, P, c)[0], rtol=1e-9)
+    assert np.all((Q[:, 2] >= 0) & (Q[:, 2] < np.pi))
+    assert np.all((Q[:, 4] >= 0) & (Q[:, 4] < np.pi / 2))
+    if 'Meff' in livres:
+        assert np.all(Q[:, 1] >= 0) and np.all(Q[:, 3] >= 0)
+    np.testing.assert_array_equal(anisotropia._normalizar(Q, livres), Q)   # já normalizado: não muda
+
+
+def test_estagnado_nao_conta_como_sucesso(monkeypatch):
+    angulos, Hr = medir(AMOSTRAS[0], 36)
+    resolver = anisotropia.resolver_ressonancia
+    chamadas = []
+
+    def sempre_pior(phi_H, P, c, *args, **kwargs):
+        # Nenhum passo tentado tem solução: o amortecimento só cresce
+        chamadas.append(1)
+        H, phi = resolver(phi_H, P, c, *args, **kwargs)
+        return (H if len(chamadas) == 1 else np.full_like(H, np.nan)), phi
+
+    monkeypatch.setattr(anisotropia, 'resolver_ressonancia', sempre_pior)
+    resultado = anisotropia.ajustar_anisotropia([angulos], [Hr], FREQUENCIA, GAMMA)
+    assert not resultado.sucesso[0]
+    assert resultado.nfev[0] == 1 + 16
+
+
+@pytest.mark.parametrize('argumentos, mensagem', [
+    ({'modelo': 'triaxial'}, 'desconhecido'),
+    ({'fixos': {'Ms': 1.0}}, 'desconhecidos'),
+    ({'modelo': 'uniaxial', 'fixos': {'Meff': 1.0, 'Hu': 0.0, 'phi_u': 0.0}}, 'Nenhum parâmetro livre'),
+])
+def test_argumentos_invalidos(argumentos, mensagem):
+    angulos, Hr = medir(AMOSTRAS[0], 36)
+    with pytest.raises(ValueError, match=mensagem):
+        anisotropia.ajustar_anisotropia([angulos], [Hr], FREQUENCIA, GAMMA, **argumentos)
+
+
+def test_dados_invalidos():
+    angulos, Hr = medir(AMOSTRAS[0], 36)
+    with pytest.raises(ValueError, match='mesmo número'):
+        anisotropia.ajustar_anisotropia([angulos], [], FREQUENCIA, GAMMA)
+    with pytest.raises(ValueError, match='mais de 5'):
+        anisotropia.ajustar_anisotropia([angulos[:5]], [Hr[:5]], FREQUENCIA, GAMMA)
+
+
+def test_dados_fmr(tmp_path):
+    resultados = {'angulos': [0, 10, 20], 'nomes_parametros': ['a', 'Hr1', 'dH1'],
+                  'tabela': [[0, 900.0, 30], [0, None, 30], [0, 910.0, 30]]}
+    angulos, Hr = anisotropia.dados_fmr(resultados)
+    np.testing.assert_array_equal(angulos, [0, 20])
+    np.testing.assert_array_equal(Hr, [900.0, 910.0])
+    with pytest.raises(ValueError, match='Hr2'):
+        anisotropia.dados_fmr(resultados, pico=2)
@@ -0,0 +1,167 @@
+"""
+Cache de ajustes (cache_ajustes.py): acertos que dispensam o ajuste,
+invalidação pelo arquivo de origem, poda LRU e identidade do código.
+"""
+import os, subprocess, sys, textwrap, types
+import lmfit
+import numpy as np
+import pytest
+
+import GMAG, cache_ajustes, leitura, modelo_fmr
+from ajuste_paralelo import MotorAjusteParalelo, _ajustar_tarefa, _no_limite
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARAMETROS_INICIAIS = {'a': 0, 'b': 0, 'c': -1e6, 'Hr1': 925, 'dH1': 40}
+
+
+@pytest.fixture(autouse=True)
+def auxiliares_temporarios(tmp_path, monkeypatch):
+    monkeypatch.setattr(leitura, 'DIRETORIO_AUXILIAR', str(tmp_path / 'auxiliares'))
+
+
+@pytest.fixture
+def varredura(tmp_path):
+    rng = np.random.default_rng(0)
+    campo = np.linspace(800, 1050, 300)
+    blocos = []
+    for angulo in (0, 30, 60, 90):
+        Hr = 925 + 15 * np.cos(np.radians(2 * angulo))
+        sinal = -1e6 * (campo - Hr) / ((campo - Hr) ** 2 + 20.0 ** 2) ** 2
+        sinal += 0.01 * np.abs(sinal).max() * rng.normal(size=len(campo))
+        blocos.append(np.column_stack((campo, np.full(len(campo), angulo), sinal)))
+    caminho = tmp_path / 'fmr.dat'
+    np.savetxt(caminho, np.vstack(blocos))
+    return str(caminho)
+
+
+def tocar(caminho, segundos):
+    """Muda a data de modificação em `segundos` (sem depender da resolução do relógio)"""
+    info = os.stat(caminho)
+    os.utime(caminho, ns=(info.st_atime_ns, info.st_mtime_ns + int(segundos * 1e9)))
+
+
+def test_acerto_dispensa_o_ajuste(tmp_path, varredura, monkeypatch):
+    cache = cache_ajustes.CacheAjustes(str(tmp_path / 'cache'))
+    ajustador = GMAG.AjustadorMultiplosAngulos(varredura)
+    MotorAjusteParalelo(ajustador, n_processos=1, cache=cache).ajustar_todos(PARAMETROS_INICIAIS)
+    originais = {a: r['resultado'] for a, r in ajustador.resultados.items()}
+    assert cache.acertos == 0
+
+    def sem_ajuste(*args, **kwargs):
+        raise AssertionError("o ajuste não deveria rodar com o cache cheio")
+
+    # Trocar um método do ajustador mudaria a identidade (e as chaves); o lmfit não entra nela
+    monkeypatch.setattr(lmfit.Minimizer, 'minimize', sem_ajuste)
+    ajustador = GMAG.AjustadorMultiplosAngulos(varredura)
+    MotorAjusteParalelo(ajustador, n_processos=1, cache=cache).ajustar_todos(PARAMETROS_INICIAIS)
+
+    assert cache.acertos == len(originais)
+    for angulo, original in originais.items():
+        restaurado = ajustador.resultados[angulo]['resultado']
+        assert restaurado.cache is True
+        for nome, p in original.params.items():
+            assert restaurado.params[nome].value == p.value
+            assert restaurado.params[nome].stderr == p.stderr
+        for estatistica in ('chisqr', 'redchi', 'nfev', 'ndata', 'nfree', 'success'):
+            assert getattr(restaurado, estatistica) == getattr(original, estatistica)
+
+
+@pytest.mark.parametrize('mudanca', ['mtime', 'tamanho'])
+def test_origem_alterada_descarta_a_entrada(tmp_path, mudanca):
+    origem = tmp_path / 'dados.dat'
+    origem.write_text("1 2 3\n")
+    cache = cache_ajustes.CacheAjustes(str(tmp_path / 'cache'))
+    chave = cache_ajustes.chave('teste', 1)
+    cache.guardar(chave, {'valor': 1}, str(origem))
+    assert cache.obter(chave) == {'valor': 1}
+
+    if mudanca == 'mtime':
+        tocar(origem, 5)
+    else:
+        with open(origem, 'a') as f:
+            f.write("4 5 6\n")
+
+    assert cache.obter(chave) is None
+    assert not os.path.exists(cache._caminho(chave))
+
+
+def test_poda_lru(tmp_path):
+    cache = cache_ajustes.CacheAjustes(str(tmp_path / 'cache'), max_bytes=10**9)
+    chaves = [cache_ajustes.chave('entrada', i) for i in range(10)]
+    for i, chave in enumerate(chaves):
+        cache.guardar(chave, {'dados': 'x' * 1000})
+        os.utime(cache._caminho(chave), (1000 + i, 1000 + i))  # a mais antiga primeiro
+    cache.obter(chaves[0])  # usada agora: passa a ser a mais recente
+    tamanho = os.path.getsize(cache._caminho(chaves[0]))
+
+    cache.max_bytes = 6 * tamanho
+    cache.guardar(cache_ajustes.chave('nova'), {'dados': 'x' * 1000})
+
+    restantes = [c for c in chaves if os.path.exists(cache._caminho(c))]
+    total = sum(t for _, t, _ in cache._entradas())
+    assert total <= 0.9 * cache.max_bytes
+    assert total == cache._tamanho
+    assert chaves[0] in restantes
+    assert restantes == [chaves[0]] + chaves[len(chaves) - len(restantes) + 1:]
+
+
+def test_substituir_entrada_nao_infla_o_tamanho(tmp_path):
+    cache = cache_ajustes.CacheAjustes(str(tmp_path / 'cache'))
+    chave = cache_ajustes.chave('mesma')
+    cache.guardar(chave, {'dados': 'x'})
+    for n in (10, 1000, 100):
+        cache.guardar(chave, {'dados': 'x' * n})
+    assert cache._tamanho == sum(t for _, t, _ in cache._entradas())
+
+
+def test_restaurar_resultado_serializado():
+    x = np.linspace(800, 1050, 200)
+    y = modelo_fmr.ModeloPicos().avaliar(dict(PARAMETROS_INICIAIS, c=-1e6, dH1=35.0), x)
+    resultado = GMAG.AjustadorMultiplosAngulos.ajustar_espectro(x, y + 1e-4 * np.sin(x), PARAMETROS_INICIAIS)
+
+    restaurado = cache_ajustes.restaurar_resultado(cache_ajustes.serializar_resultado(resultado))
+
+    assert restaurado.params.valuesdict() == resultado.params.valuesdict()
+    assert [p.stderr for p in restaurado.params.values()] == [p.stderr for p in resultado.params.values()]
+    assert (restaurado.params['Hr1'].min, restaurado.params['Hr1'].max) == (900, 950)
+    assert restaurado.var_names == resultado.var_names
+    assert restaurado.errorbars
+
+
+def test_identidade_estavel_entre_processos():
+    codigo = ("import cache_ajustes, modelo_fmr, GMAG\n"
+              "from ajuste_paralelo import _ajustar_tarefa, _no_limite\n"
+              "print(cache_ajustes.identidade(GMAG.AjustadorMultiplosAngulos, modelo_fmr, _ajustar_tarefa, "
+              "_no_limite))")
+    saidas = set()
+    for semente in ('1', '2'):
+        ambiente = dict(os.environ, PYTHONHASHSEED=semente, PYTHONPATH=RAIZ)
+        saida = subprocess.run([sys.executable, '-c', codigo], capture_output=True, text=True, env=ambiente,
+                               cwd=RAIZ, check=True).stdout
+        saidas.add(saida.strip().splitlines()[-1])
+    local = cache_ajustes.identidade(GMAG.AjustadorMultiplosAngulos, modelo_fmr, _ajustar_tarefa, _no_limite)
+    assert saidas == {local}
+
+
+def modulo(fonte):
+    m = types.ModuleType('modelo_teste')
+    exec(textwrap.dedent(fonte), m.__dict__)
+    return m
+
+
+def test_identidade_muda_com_o_codigo():
+    original = modulo("""
+        def modelo(x, a):
+            return a * x + 1
+        LIMITES = {'a': (0, 1)}
+    """)
+    igual = modulo("""
+        def modelo(x, a):
+            return a * x + 1
+    """)
+    outro = modulo("""
+        def modelo(x, a):
+            return a * x + 2
+    """)
+    assert cache_ajustes.identidade(original) == cache_ajustes.identidade(igual)
+    assert cache_ajustes.identidade(original) != cache_ajustes.identidade(outro)
@@ -0,0 +1,86 @@
+"""
+Detecção automática de picos (deteccao_picos.py) numa varredura de Kiessig
+sintética: posições dentro de uma fração do passo, com e sem ruído.
+"""
+import numpy as np
+import pytest
+
+import deteccao_picos, espessura
+
+ESPESSURA = 30.0            # nm
+DECAIMENTO, FRANJAS = 0.8, 0.3   # log10(I) = -DECAIMENTO q + FRANJAS cos(ESPESSURA q)
+DOIS_THETA = np.linspace(0.5, 6.0, 5000)
+PASSO = DOIS_THETA[1] - DOIS_THETA[0]
+
+
+def varredura(ruido=0.0, semente=0):
+    q = espessura.vetor_espalhamento(DOIS_THETA)
+    y = 10 ** (-DECAIMENTO * q + FRANJAS * np.cos(ESPESSURA * q))
+    return y * (1 + ruido * np.random.default_rng(semente).normal(size=len(y)))
+
+
+def picos_verdadeiros():
+    """Máximos de log10(I): -DECAIMENTO - FRANJAS·d·sen(d q) = 0, no ramo descendente do cosseno"""
+    q = espessura.vetor_espalhamento(DOIS_THETA[[0, -1]])
+    n = np.arange(100)
+    qn = (2 * np.pi * n - np.arcsin(DECAIMENTO / (FRANJAS * ESPESSURA))) / ESPESSURA
+    qn = qn[(qn > q[0]) & (qn < q[1])]
+    return 2 * np.degrees(np.arcsin(qn * espessura.CU_KALFA / (4 * np.pi)))
+
+
+@pytest.mark.parametrize('ruido, tolerancia', [(0.0, 0.5), (0.02, 1.0)])
+def test_posicoes_abaixo_de_um_passo(ruido, tolerancia):
+    esperados = picos_verdadeiros()
+    picos = deteccao_picos.detectar_picos(DOIS_THETA, varredura(ruido))
+    assert len(picos['posicoes']) == len(esperados)
+    assert np.abs(picos['posicoes'] - esperados).max() < tolerancia * PASSO
+    assert np.all(np.diff(picos['posicoes']) > 0)
+    np.testing.assert_allclose(DOIS_THETA[picos['indices']], esperados, atol=5 * PASSO)
+    assert np.all(picos['alturas'] > 0) and np.all(picos['larguras'] > 0)
+
+
+def test_ordem_dos_pontos_nao_importa():
+    y = varredura()
+    embaralhar = np.random.default_rng(1).permutation(len(y))
+    direto = deteccao_picos.detectar_picos(DOIS_THETA, y)
+    embaralhado = deteccao_picos.detectar_picos(DOIS_THETA[embaralhar], y[embaralhar])
+    np.testing.assert_allclose(embaralhado['posicoes'], direto['posicoes'])
+    # Os índices apontam para a ordem recebida
+    np.testing.assert_array_equal(embaralhar[embaralhado['indices']], direto['indices'])
+
+
+def test_max_picos_fica_com_os_mais_proeminentes():
+    todos = deteccao_picos.detectar_picos(DOIS_THETA, varredura())
+    tres = deteccao_picos.detectar_picos(DOIS_THETA, varredura(), max_picos=3)
+    assert len(tres['posicoes']) == 3
+    mais_proeminentes = np.sort(np.argsort(todos['proeminencias'])[::-1][:3])
+    np.testing.assert_allclose(tres['posicoes'], todos['posicoes'][mais_proeminentes])
+
+
+def test_janela_fft_igual_savgol_direto():
+    y = np.random.default_rng(2).normal(size=3000).cumsum()
+    janela = deteccao_picos.JANELA_DIRETA + 41
+    np.testing.assert_allclose(deteccao_picos.suavizar(y, janela),
+                               deteccao_picos.savgol_filter(y, janela, 3), rtol=1e-9, atol=1e-9)
+
+
+def test_refinar_posicoes_parabola_exata():
+    x = np.linspace(0, 10, 101)
+    y = -(x - 3.337) ** 2 + 4.0
+    posicoes, alturas = deteccao_picos.refinar_posicoes(x, y, [33], 3)
+    assert posicoes[0] == pytest.approx(3.337, abs=1e-10)
+    assert alturas[0] == pytest.approx(4.0, abs=1e-10)
+
+
+def test_periodo_dominante():
+    t = np.arange(1000)
+    assert deteccao_picos.periodo_dominante(np.sin(2 * np.pi * t / 50) + 0.01 * t) == pytest.approx(50, rel=0.02)
+    assert deteccao_picos.periodo_dominante(np.ones(4)) == np.inf
+
+
+def test_entradas_degeneradas():
+    with pytest.raises(ValueError):
+        deteccao_picos.detectar_picos(np.arange(5.0), np.arange(4.0))
+    vazio = deteccao_picos.detectar_picos([0.0, 1.0], [1.0, 2.0])
+    assert len(vazio['posicoes']) == 0 and vazio['indices'].dtype.kind == 'i'
+    assert len(deteccao_picos.detectar_picos(DOIS_THETA, np.ones_like(DOIS_THETA))['posicoes']) == 0
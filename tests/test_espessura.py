@@ -0,0 +1,109 @@
+"""
+Espessura pelas franjas de Kiessig (espessura.py): ajuste linear dos picos e
+FFT da varredura numa varredura sintética de espessura conhecida, e o DRX de
+GMAG de ponta a ponta com a detecção automática.
+"""
+import json
+import numpy as np
+import pytest
+
+import deteccao_picos, espessura, GMAG, leitura, renderizacao
+
+ESPESSURA = 30.0
+DECAIMENTO, FRANJAS = 0.8, 0.3
+DOIS_THETA = np.linspace(0.5, 6.0, 5000)
+
+
+@pytest.fixture(autouse=True)
+def auxiliares_temporarios(tmp_path, monkeypatch):
+    monkeypatch.setattr(leitura, 'DIRETORIO_AUXILIAR', str(tmp_path / 'auxiliares'))
+
+
+def varredura(d=ESPESSURA, comprimento_onda=espessura.CU_KALFA, ruido=0.0, semente=0):
+    """log10(I) = -DECAIMENTO q + FRANJAS cos(d q): franjas com período 2π/d em q"""
+    q = espessura.vetor_espalhamento(DOIS_THETA, comprimento_onda)
+    y = 10 ** (-DECAIMENTO * q + FRANJAS * np.cos(d * q))
+    return y * (1 + ruido * np.random.default_rng(semente).normal(size=len(y)))
+
+
+def picos(d, n, primeiro=3, comprimento_onda=espessura.CU_KALFA, ruido=0.0, semente=0):
+    """2θ de n franjas consecutivas, q_n = 2π(n + primeiro)/d, com ruído de posição em graus"""
+    q = 2 * np.pi / d * (np.arange(n) + primeiro)
+    dois_theta = 2 * np.degrees(np.arcsin(q * comprimento_onda / (4 * np.pi)))
+    return dois_theta + ruido * np.random.default_rng(semente).normal(size=n)
+
+
+def test_ajuste_exato():
+    resultado = espessura.estimar_espessura(picos(ESPESSURA, 12), tempo=150)
+    assert resultado['espessura'] == pytest.approx(ESPESSURA, rel=1e-10)
+    assert resultado['taxa'] == pytest.approx(ESPESSURA / 150, rel=1e-10)
+    assert resultado['intercepto'] == pytest.approx(2 * np.pi / ESPESSURA * 3, rel=1e-10)
+    assert resultado['n_picos'] == 12
+    assert resultado['erro_espessura'] < 1e-8
+
+
+def test_lote_com_numeros_de_picos_diferentes():
+    espessuras = np.array([12.0, 30.0, 75.0, 40.0])
+    lista = [picos(d, n, ruido=1e-3, semente=i) for i, (d, n) in enumerate(zip(espessuras, (5, 20, 30, 2)))]
+    lambdas = np.array([espessura.CU_KALFA] * 3 + [0.15])
+    lista[3] = picos(40.0, 2, comprimento_onda=0.15)
+    resultado = espessura.ajustar_franjas(lista, comprimento_onda=lambdas)
+    np.testing.assert_array_equal(resultado['n_picos'], [5, 20, 30, 2])
+    assert np.all(np.abs(resultado['espessura'][:3] - espessuras[:3]) < 4 * resultado['erro_espessura'][:3])
+    # Dois picos: a reta passa por eles, sem graus de liberdade para o erro
+    assert resultado['espessura'][3] == pytest.approx(40.0, rel=1e-10)
+    assert np.isnan(resultado['erro_espessura'][3])
+    for i, p in enumerate(lista):
+        sozinho = espessura.estimar_espessura(p, lambdas[i])
+        assert sozinho['espessura'] == pytest.approx(resultado['espessura'][i], rel=1e-12)
+
+
+def test_menos_de_dois_picos_e_argumentos_invalidos():
+    assert np.isnan(espessura.estimar_espessura([1.0])['espessura'])
+    with pytest.raises(ValueError, match='comprimento_onda'):
+        espessura.ajustar_franjas([picos(30.0, 5)] * 2, comprimento_onda=[0.15, 0.15, 0.15])
+
+
+@pytest.mark.parametrize('ruido', [0.0, 0.02])
+def test_picos_detectados_e_fft_dao_a_espessura(ruido):
+    y = varredura(ruido=ruido)
+    detectados = deteccao_picos.detectar_picos(DOIS_THETA, y)['posicoes']
+    espessura_por_picos = espessura.estimar_espessura(detectados)['espessura']
+    fft = espessura.espessura_fft([(DOIS_THETA, y)])
+    assert espessura_por_picos == pytest.approx(ESPESSURA, rel=1e-4)
+    assert abs(fft['espessura'][0] - ESPESSURA) < 0.05 * fft['resolucao'][0]
+
+
+def test_fft_em_lote():
+    espessuras = [20.0, 30.0, 45.0]
+    varreduras = [(DOIS_THETA, varredura(d)) for d in espessuras]
+    varreduras.append((DOIS_THETA[::2], varredura(25.0)[::2]))   # menos pontos
+    varreduras.append((DOIS_THETA, np.zeros_like(DOIS_THETA)))   # sem sinal
+    resultado = espessura.espessura_fft(varreduras)
+    np.testing.assert_allclose(resultado['espessura'][:4], espessuras + [25.0], rtol=1e-3)
+    assert np.isnan(resultado['espessura'][4])
+    with pytest.raises(ValueError):
+        espessura.espessura_fft([(DOIS_THETA[:5], varredura()[:5])])
+
+
+def test_drx_automatico(tmp_path):
+    arquivo = tmp_path / 'filme.csv'
+    np.savetxt(arquivo, np.column_stack((DOIS_THETA, varredura(ruido=0.01))), delimiter=',')
+    saida = tmp_path / 'drx'
+    resultado = GMAG.DRX(str(arquivo), output_dir=str(saida), renderizador=renderizacao.Renderizador(ativo=False),
+                         tempo=100)
+    assert resultado['origem'] == 'automatico'
+    assert len(resultado['angulos']) == 19
+    assert resultado['espessura'] == pytest.approx(ESPESSURA, rel=1e-3)
+    assert resultado['espessura_fft'] == pytest.approx(ESPESSURA, rel=1e-2)
+    assert resultado['taxa'] == pytest.approx(resultado['espessura'] / 100)
+    with open(saida / 'resultados_drx.json') as f:
+        assert json.load(f)['espessura'] == resultado['espessura']
+
+    informados = GMAG.DRX(str(arquivo), picos=picos(ESPESSURA, 6)[::-1], output_dir=str(saida),
+                          renderizador=renderizacao.Renderizador(ativo=False))
+    assert informados['origem'] == 'informados'
+    assert informados['angulos'] == sorted(informados['angulos'])
+    assert informados['espessura'] == pytest.approx(ESPESSURA, rel=1e-10)
+    with pytest.raises(ValueError, match='dois picos'):
+        GMAG.DRX(str(arquivo), picos=[1.0], output_dir=str(saida), renderizador=renderizacao.Renderizador(ativo=False))
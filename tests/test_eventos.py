@@ -0,0 +1,116 @@
+"""
+Publicador de eventos para a interface (eventos.py): lotes de no máximo
+MAX_POR_LOTE, um envio por intervalo e descarte dos mais antigos com a fila
+cheia. O envio e o relógio são falsos: laco() recebe a função de dormir.
+"""
+import threading
+import numpy as np
+import pytest
+
+import eventos
+
+
+class Parar(Exception):
+    """Tira laco() do seu while True depois de um número de voltas"""
+
+
+class Relogio:
+    """Tempo simulado: dormir() só avança o relógio"""
+
+    def __init__(self, voltas):
+        self.agora = 0.0
+        self.voltas = voltas
+        self.pausas = []
+
+    def dormir(self, segundos):
+        self.pausas.append(segundos)
+        self.agora += segundos
+        if len(self.pausas) >= self.voltas:
+            raise Parar()
+
+
+def publicador_falso(relogio=None, **kwargs):
+    envios = []
+    enviar = lambda lote: envios.append((relogio.agora if relogio else None, list(lote)))
+    return eventos.PublicadorEventos(enviar, **kwargs), envios
+
+
+def test_lotes_de_no_maximo_50():
+    publicador, envios = publicador_falso()
+    for i in range(120):
+        publicador.publicar({'i': i})
+    assert [publicador.descarregar() for _ in range(4)] == [50, 50, 20, 0]
+    assert [len(lote) for _, lote in envios] == [50, 50, 20]
+    assert [e['i'] for _, lote in envios for e in lote] == list(range(120))   # ordem preservada
+
+
+def test_um_envio_por_intervalo():
+    relogio = Relogio(voltas=5)
+    publicador, envios = publicador_falso(relogio)
+    for i in range(2 * eventos.MAX_POR_LOTE + 1):
+        publicador.publicar({'i': i})
+    with pytest.raises(Parar):
+        publicador.laco(relogio.dormir)
+
+    assert relogio.pausas == [eventos.INTERVALO] * 5
+    assert [t for t, _ in envios] == [0.0, 0.25, 0.5]
+    assert np.all(np.diff([t for t, _ in envios]) >= eventos.INTERVALO)
+    assert [len(lote) for _, lote in envios] == [50, 50, 1]
+
+
+def test_intervalo_configuravel_e_fila_vazia_nao_envia():
+    relogio = Relogio(voltas=3)
+    publicador, envios = publicador_falso(relogio, intervalo=1.5, max_por_lote=2)
+    with pytest.raises(Parar):
+        publicador.laco(relogio.dormir)
+    assert relogio.pausas == [1.5] * 3
+    assert envios == []
+
+
+def test_fila_cheia_descarta_os_mais_antigos():
+    publicador, envios = publicador_falso(max_fila=5)
+    for i in range(8):
+        publicador.publicar({'i': i})
+    publicador.descarregar()
+    assert [e['i'] for e in envios[0][1]] == [3, 4, 5, 6, 7]
+
+
+def test_falha_no_envio_nao_para_o_laco(capsys):
+    relogio = Relogio(voltas=3)
+    recebidos = []
+
+    def enviar(lote):
+        if not recebidos:
+            recebidos.append(None)
+            raise ConnectionError("página fechada")
+        recebidos.append(lote)
+
+    publicador = eventos.PublicadorEventos(enviar, max_por_lote=1)
+    for i in range(3):
+        publicador.publicar({'i': i})
+    with pytest.raises(Parar):
+        publicador.laco(relogio.dormir)
+    assert "página fechada" in capsys.readouterr().out
+    assert recebidos[1:] == [[{'i': 1}], [{'i': 2}]]
+
+
+def test_publicar_de_varias_threads():
+    publicador, envios = publicador_falso()
+    threads = [threading.Thread(target=lambda k=k: [publicador.publicar((k, i)) for i in range(500)])
+               for k in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    while publicador.descarregar():
+        pass
+    recebidos = [e for _, lote in envios for e in lote]
+    assert sorted(recebidos) == sorted((k, i) for k in range(4) for i in range(500))
+    for k in range(4):
+        assert [i for j, i in recebidos if j == k] == list(range(500))
+
+
+@pytest.mark.parametrize('valor, esperado', [(None, None), (np.nan, None), (np.inf, None), (-np.inf, None),
+                                             (np.float32(1.5), 1.5), (2, 2.0)])
+def test_numero(valor, esperado):
+    assert eventos.numero(valor) == esperado
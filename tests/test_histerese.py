@@ -0,0 +1,141 @@
+"""
+Métricas vetorizadas de histerese (histerese.py): ciclo tanh sintético com
+Hc, Mr, Ms e área conhecidos, ciclos de tamanhos diferentes no mesmo lote
+e concordância com o cálculo antigo de remanência/coercitividade do VSM.
+"""
+import numpy as np
+import pytest
+
+import GMAG, histerese, leitura, renderizacao
+
+HC = 200.0
+LARGURA = 100.0
+H_MAX = 2000.0
+
+
+@pytest.fixture(autouse=True)
+def auxiliares_temporarios(tmp_path, monkeypatch):
+    monkeypatch.setattr(leitura, 'DIRETORIO_AUXILIAR', str(tmp_path / 'auxiliares'))
+
+
+def ciclo_tanh(n=2001, Hc=HC, largura=LARGURA, Ms=1.0, H_max=H_MAX):
+    """Ramo de descida tanh((H + Hc)/w) de +H_max a -H_max, depois a subida tanh((H - Hc)/w)"""
+    descida = np.linspace(H_max, -H_max, n)
+    subida = np.linspace(-H_max, H_max, n)
+    H = np.concatenate((descida, subida))
+    M = Ms * np.concatenate((np.tanh((descida + Hc) / largura), np.tanh((subida - Hc) / largura)))
+    return H, M
+
+
+def area_tanh(Hc=HC, largura=LARGURA, Ms=1.0, H_max=H_MAX):
+    """∫ [tanh((H + Hc)/w) - tanh((H - Hc)/w)] dH de -H_max a H_max, vezes Ms"""
+    logcosh = lambda u: np.logaddexp(u, -u) - np.log(2)
+    return 2 * Ms * largura * (logcosh((H_max + Hc) / largura) - logcosh((H_max - Hc) / largura))
+
+
+# Cálculo antigo de GMAG (amostra mais próxima de zero em cada metade do vetor)
+def _mais_proximo_de_zero_antigo(vetor, tolerancia=1e-6):
+    indice_mais_proximo = 0
+    menor_distancia = abs(vetor[0])
+    for i, valor in enumerate(vetor):
+        distancia = abs(valor)
+        if distancia < menor_distancia - tolerancia:
+            indice_mais_proximo = i
+            menor_distancia = distancia
+        elif abs(distancia - menor_distancia) <= tolerancia and valor > 0:
+            indice_mais_proximo = i
+            menor_distancia = distancia
+    return indice_mais_proximo
+
+
+def remanencia_antiga(x, y):
+    p1 = _mais_proximo_de_zero_antigo(list(x[:len(x) // 2]))
+    p2 = _mais_proximo_de_zero_antigo(list(x[len(x) // 2:]))
+    return (abs(y[p1]) + abs(y[p2])) / 2
+
+
+def coercitividade_antiga(x, y):
+    p1 = _mais_proximo_de_zero_antigo(list(y[:len(y) // 2]))
+    p2 = _mais_proximo_de_zero_antigo(list(y[len(y) // 2:]))
+    return (abs(x[p1]) + abs(x[p2])) / 2
+
+
+def test_ciclo_tanh_conhecido():
+    H, M = ciclo_tanh()
+    m = histerese.analisar_ciclo(H, 3.0 * M)
+    assert m['Hc'] == pytest.approx(HC, abs=0.05)
+    assert m['Mr'] == pytest.approx(3.0 * np.tanh(HC / LARGURA), rel=1e-4)
+    assert m['Ms'] == pytest.approx(3.0 * np.tanh((H_MAX - HC) / LARGURA), rel=1e-9)
+    assert m['quadratura'] == pytest.approx(np.tanh(HC / LARGURA), rel=1e-4)
+    assert m['area'] == pytest.approx(area_tanh(Ms=3.0), rel=1e-4)
+    # Ida (descida): M cruza zero em -Hc e H cruza zero com M = +Mr; volta ao contrário
+    np.testing.assert_allclose(m['Hc_ramos'], [-HC, HC], atol=0.05)
+    np.testing.assert_allclose(m['Mr_ramos'], [3.0 * np.tanh(2), -3.0 * np.tanh(2)], rtol=1e-4)
+
+
+def test_normalizado():
+    H, M = ciclo_tanh()
+    m = histerese.analisar_ciclo(H, 1e-3 * M + 5e-4, normalizado=True)
+    assert m['Ms'] == pytest.approx(1.0)
+    assert m['Mr'] == pytest.approx(np.tanh(HC / LARGURA) / np.tanh((H_MAX - HC) / LARGURA), rel=1e-4)
+    np.testing.assert_allclose(histerese.normalizar([[0.0, 1.0, 2.0]]), [[-1.0, 0.0, 1.0]])
+
+
+def test_ciclos_de_tamanhos_diferentes():
+    parametros = [(401, 150.0, 1.0), (2001, 200.0, 2.0), (57, 300.0, 0.5), (1200, 50.0, 1.5)]
+    campos, momentos = [], []
+    for n, Hc, Ms in parametros:
+        H, M = ciclo_tanh(n, Hc=Hc, Ms=Ms)
+        campos.append(H)
+        momentos.append(M)
+
+    lote = histerese.analisar_ciclos(campos, momentos)
+    for i, (H, M) in enumerate(zip(campos, momentos)):
+        sozinho = histerese.analisar_ciclo(H, M)
+        for chave in ('Mr', 'Hc', 'Ms', 'quadratura', 'area'):
+            # O preenchimento com NaN dos ciclos curtos não entra em nenhuma métrica
+            assert lote[chave][i] == pytest.approx(sozinho[chave], rel=1e-12)
+        np.testing.assert_allclose(lote['Hc_ramos'][i], sozinho['Hc_ramos'], rtol=1e-12)
+    np.testing.assert_allclose(lote['Hc'], [p[1] for p in parametros], rtol=0.02)
+    np.testing.assert_allclose(lote['area'], [area_tanh(Hc=Hc, Ms=Ms) for _, Hc, Ms in parametros], rtol=0.02)
+
+
+def test_entradas_invalidas_e_vazias():
+    with pytest.raises(ValueError):
+        histerese.analisar_ciclos([np.arange(5.0)], [np.arange(4.0)])
+    vazio = histerese.analisar_ciclos([], [])
+    assert all(len(v) == 0 for v in vazio.values())
+    # Ciclo que não cruza zero: métricas NaN em vez de exceção
+    m = histerese.analisar_ciclo(np.linspace(1, 10, 20), np.linspace(1, 2, 20))
+    assert np.isnan(m['Hc']) and np.isnan(m['Mr'])
+
+
+def test_concorda_com_calculo_antigo_no_vsm(tmp_path, monkeypatch):
+    origem = tmp_path / 'vsm'
+    origem.mkdir()
+    esperados = []
+    for i, (n, Hc) in enumerate([(301, 120.0), (401, 200.0), (251, 260.0)]):
+        H, M = ciclo_tanh(n, Hc=Hc)
+        momento = 2e-4 * M + 3e-6   # emu, fora de centro como numa medida real
+        linhas = "\n".join(f"{h:.4f}\t{m:.6e}" for h, m in zip(H, momento))
+        (origem / f"amostra_{i:02d}.txt").write_text(f"Amostra {i}\nPasso 1\nField (Oe)\tMoment (emu)\n{linhas}\n")
+        normalizado = histerese.normalizar(momento)
+        esperados.append((remanencia_antiga(H, normalizado), coercitividade_antiga(H, normalizado),
+                          np.abs(np.diff(normalizado)).max(), np.abs(np.diff(H)).max()))
+
+    capturados = {}
+    monkeypatch.setattr(GMAG, '_graficos_angulares_vsm',
+                        lambda Mr, Hc, destino, renderizador: capturados.update(Mr=Mr, Hc=Hc))
+    GMAG.VSM(str(origem), None, str(tmp_path / 'graficos'), renderizador=renderizacao.Renderizador(ativo=False))
+
+    # O antigo pega a amostra mais próxima de zero; o novo interpola entre as duas vizinhas,
+    # então a diferença fica abaixo de um passo de amostragem
+    for k, (Mr, Hc, passo_M, passo_H) in enumerate(esperados):
+        assert abs(capturados['Mr'][k] - Mr) <= passo_M
+        assert abs(capturados['Hc'][k] - Hc) <= passo_H
+
+
+def test_remanencia_coercitividade_delegam():
+    H, M = ciclo_tanh(401)
+    assert GMAG.remanencia(H, M) == pytest.approx(np.tanh(HC / LARGURA), rel=1e-3)
+    assert GMAG.coercitividade(H, M) == pytest.approx(HC, abs=1.0)
@@ -0,0 +1,110 @@
+"""
+Bootstrap dos ajustes finais da impedância (incerteza.py): Kittel e reta
+vetorizados contra parâmetros conhecidos, independência do número de
+processos para uma semente fixa e validação das entradas.
+"""
+import numpy as np
+import pytest
+from scipy.optimize import curve_fit
+
+import incerteza
+
+GAMMA = 0.0028
+HK, MEFF = 50.0, 8000.0
+DHO, ALFA_GAMMA = 10.0, 5.0
+
+
+def medidas(n=12, ruido_Hr=1.0, ruido_dH=0.5, semente=0):
+    """Hr e dH de n espectros entre 2 e 7 GHz, com ruído gaussiano"""
+    rng = np.random.default_rng(semente)
+    f = np.linspace(2.0, 7.0, n)
+    c = (f / GAMMA) ** 2
+    Hr = (np.sqrt(MEFF**2 + 4 * c) - MEFF) / 2 - HK
+    dH = DHO + ALFA_GAMMA * f
+    return Hr + rng.normal(scale=ruido_Hr, size=n), dH + rng.normal(scale=ruido_dH, size=n), f
+
+
+def test_kittel_recupera_parametros_em_lote():
+    Hr, _, f = medidas(ruido_Hr=0.0)
+    verdadeiros = np.array([[HK, MEFF], [0.0, 5000.0], [300.0, 12000.0]])
+    H = np.tile(Hr, (3, 1))
+    F = incerteza.kittel(H, verdadeiros[:, :1], verdadeiros[:, 1:], GAMMA)
+    Hk, Meff = incerteza.ajustar_kittel(H, F, 100.0, 1000.0, GAMMA, iteracoes=1000)
+    np.testing.assert_allclose(Hk, verdadeiros[:, 0], atol=1e-4)
+    np.testing.assert_allclose(Meff, verdadeiros[:, 1], rtol=1e-8)
+
+
+def test_kittel_igual_curve_fit_com_ruido():
+    Hr, _, f = medidas(ruido_Hr=3.0, semente=1)
+    (Hk,), (Meff,) = incerteza.ajustar_kittel(Hr, f, 100.0, 1000.0, GAMMA, iteracoes=1000)
+    with np.errstate(invalid='ignore'):   # curve_fit testa passos sem os limites >= 0
+        referencia, _ = curve_fit(lambda H, Hk, Meff: incerteza.kittel(H, Hk, Meff, GAMMA), Hr, f, p0=[100.0, 1000.0])
+    np.testing.assert_allclose([Hk, Meff], referencia, rtol=1e-6)
+
+
+def test_kittel_serie_invalida_vira_nan():
+    Hr, _, f = medidas(ruido_Hr=0.0)
+    F = np.vstack((f, f))
+    F[1, 3] = np.nan
+    Hk, Meff = incerteza.ajustar_kittel(Hr, F, 100.0, 1000.0, GAMMA, iteracoes=1000)
+    assert np.isfinite([Hk[0], Meff[0]]).all()
+    assert np.isnan([Hk[1], Meff[1]]).all()
+
+
+def test_reta():
+    x = np.linspace(0, 10, 30)
+    a, b = incerteza.ajustar_reta(x, [1.0 + 2.0 * x, -3.0 + 0.5 * x])
+    np.testing.assert_allclose(a, [1.0, -3.0])
+    np.testing.assert_allclose(b, [2.0, 0.5])
+
+
+@pytest.mark.parametrize('metodo', incerteza.METODOS)
+def test_bootstrap_recupera_parametros(metodo):
+    Hr, dH, f = medidas()
+    resultado = incerteza.incerteza_impedancia(Hr, dH, f, GAMMA, n_amostras=1000, metodo=metodo)
+    assert resultado['parametros'] == list(incerteza.PARAMETROS)
+    assert resultado['n_amostras'] + resultado['n_falhas'] == 1000
+    verdadeiros = {'Hk': HK, 'Meff': MEFF, 'dho': DHO, 'alfa_gamma': ALFA_GAMMA, 'alfa': ALFA_GAMMA * GAMMA}
+    for nome, valor in verdadeiros.items():
+        inferior, superior = resultado['intervalo'][nome]
+        assert inferior < resultado['estimativa'][nome] < superior
+        assert abs(resultado['estimativa'][nome] - valor) < 4 * resultado['erro'][nome]
+    correlacao = np.array(resultado['correlacao'], dtype=float)
+    np.testing.assert_allclose(np.diag(correlacao), 1.0)
+    assert correlacao[0, 1] < -0.5   # Hk e Meff são fortemente anticorrelacionados
+    assert 'Hk =' in incerteza.resumo(resultado)
+
+
+def test_independe_do_numero_de_processos():
+    Hr, dH, f = medidas(semente=2)
+    n_amostras = 2 * incerteza.TAMANHO_BLOCO + 37   # três blocos, o último incompleto
+    um = incerteza.incerteza_impedancia(Hr, dH, f, GAMMA, n_amostras=n_amostras, n_processos=1, semente=7)
+    dois = incerteza.incerteza_impedancia(Hr, dH, f, GAMMA, n_amostras=n_amostras, n_processos=2, semente=7)
+    assert um == dois
+
+    outra = incerteza.incerteza_impedancia(Hr, dH, f, GAMMA, n_amostras=n_amostras, n_processos=1, semente=8)
+    assert outra['estimativa'] == um['estimativa']
+    assert outra['erro'] != um['erro']
+
+
+@pytest.mark.parametrize('alteracao, mensagem', [
+    ({'metodo': 'jackknife'}, 'desconhecido'),
+    ({'nivel': 1.0}, 'nivel'),
+    ({'nivel': 0.0}, 'nivel'),
+    ({'n_amostras': 1}, 'n_amostras'),
+])
+def test_argumentos_invalidos(alteracao, mensagem):
+    Hr, dH, f = medidas()
+    with pytest.raises(ValueError, match=mensagem):
+        incerteza.incerteza_impedancia(Hr, dH, f, GAMMA, **dict({'n_amostras': 10}, **alteracao))
+
+
+def test_dados_invalidos():
+    Hr, dH, f = medidas()
+    with pytest.raises(ValueError, match='mesmo tamanho'):
+        incerteza.incerteza_impedancia(Hr, dH[:-1], f, GAMMA, n_amostras=10)
+    with pytest.raises(ValueError, match='3 espectros'):
+        incerteza.incerteza_impedancia(Hr[:2], dH[:2], f[:2], GAMMA, n_amostras=10)
+    Hr[0] = np.nan
+    with pytest.raises(RuntimeError, match='dados originais'):
+        incerteza.incerteza_impedancia(Hr, dH, f, GAMMA, n_amostras=10)
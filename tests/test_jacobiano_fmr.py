@@ -0,0 +1,112 @@
+"""
+Jacobiano analítico do modelo FMR (modelo_fmr.ModeloPicos) contra diferenças
+finitas, a troca analítico/numérico em AjustadorMultiplosAngulos.ajustar_espectro
+e o FMR_automatico de ponta a ponta em dados sintéticos com dois picos.
+"""
+import json
+import numpy as np
+import pytest
+
+import GMAG, leitura, modelo_fmr, renderizacao
+
+CAMPO = np.linspace(750, 1350, 600)
+
+
+def jacobiano_numerico(modelo, p, x, passo=1e-6):
+    """Diferenças centrais, com passo relativo ao valor de cada parâmetro"""
+    jac = np.empty((len(x), len(p)))
+    for j in range(len(p)):
+        h = passo * max(abs(p[j]), 1.0)
+        mais, menos = p.copy(), p.copy()
+        mais[j] += h
+        menos[j] -= h
+        jac[:, j] = (modelo.avaliar(mais, x) - modelo.avaliar(menos, x)) / (2 * h)
+    return jac
+
+
+def verdadeiros(angulo):
+    """Dois picos cujas posições variam com o ângulo; Hr1 dentro dos limites de ajustar_espectro"""
+    cos2 = np.cos(np.radians(2 * angulo))
+    return {'a': 0.0, 'b': 0.0, 'c': -1e6, 'd': -6e5,
+            'Hr1': 925 + 15 * cos2, 'dH1': 40.0, 'Hr2': 1150 + 20 * cos2, 'dH2': 60.0}
+
+
+def espectro(parametros, ruido=0.005, semente=0):
+    y = modelo_fmr.ModeloPicos(2).avaliar(parametros, CAMPO)
+    return y + ruido * np.abs(y).max() * np.random.default_rng(semente).normal(size=len(CAMPO))
+
+
+@pytest.fixture(autouse=True)
+def auxiliares_temporarios(tmp_path, monkeypatch):
+    """Os auxiliares de leitura vão para a pasta do teste, não para ~/.gmag"""
+    monkeypatch.setattr(leitura, 'DIRETORIO_AUXILIAR', str(tmp_path / 'auxiliares'))
+
+
+@pytest.mark.parametrize('forma', modelo_fmr.FORMAS)
+def test_jacobiano_bem_condicionado(forma):
+    modelo = modelo_fmr.ModeloPicos(2, forma)
+    parametros = modelo.completar(dict(verdadeiros(30.0), assim1=0.3, assim2=-0.2))
+    p = modelo.vetor(parametros)
+
+    analitico = modelo.jacobiano_completo(p, CAMPO)
+    numerico = jacobiano_numerico(modelo, p, CAMPO)
+
+    escala = np.abs(numerico).max(axis=0)
+    np.testing.assert_array_less(np.abs(analitico - numerico).max(axis=0), 1e-5 * escala)
+
+
+@pytest.mark.parametrize('dH2', [1e4, 1e8, 1e40, 1e74])
+def test_jacobiano_largura_enorme(dH2):
+    # Um pico que virou linha de base: D³ estoura em float, mas o jacobiano não pode virar NaN
+    modelo = modelo_fmr.ModeloPicos(2)
+    p = modelo.vetor(dict(verdadeiros(0.0), dH2=dH2))
+
+    analitico = modelo.jacobiano_completo(p, CAMPO)
+
+    assert np.all(np.isfinite(analitico))
+    if dH2 <= 1e8:
+        # As colunas do pico largo são ~1/dH⁴, abaixo do arredondamento das
+        # diferenças finitas: compara a variação do modelo para um passo relativo
+        numerico = jacobiano_numerico(modelo, p, CAMPO)
+        passos = 1e-6 * np.maximum(np.abs(p), 1.0)
+        erro = np.abs(analitico - numerico).max(axis=0) * passos
+        assert erro.max() < 1e-6 * np.abs(modelo.avaliar(p, CAMPO)).max()
+
+
+def test_ajuste_analitico_igual_ao_numerico():
+    alvo = verdadeiros(60.0)
+    y = espectro(alvo)
+    iniciais = dict(alvo, Hr1=930.0, dH1=45.0, Hr2=1140.0, dH2=50.0)
+
+    analitico = GMAG.AjustadorMultiplosAngulos.ajustar_espectro(CAMPO, y, iniciais, 'analitico')
+    numerico = GMAG.AjustadorMultiplosAngulos.ajustar_espectro(CAMPO, y, iniciais, 'numerico')
+
+    for nome in ('Hr1', 'dH1', 'Hr2', 'dH2'):
+        assert analitico.params[nome].value == pytest.approx(alvo[nome], abs=0.5)
+        assert analitico.params[nome].value == pytest.approx(numerico.params[nome].value, abs=1e-3)
+    assert analitico.nfev <= numerico.nfev
+
+
+def test_jacobiano_desconhecido():
+    with pytest.raises(ValueError):
+        GMAG.AjustadorMultiplosAngulos.ajustar_espectro(CAMPO, CAMPO, verdadeiros(0.0), 'simbolico')
+
+
+def test_fmr_automatico_dois_picos(tmp_path):
+    angulos = np.arange(0, 180, 15.0)
+    blocos = [np.column_stack((CAMPO, np.full(len(CAMPO), a), espectro(verdadeiros(a), semente=i)))
+              for i, a in enumerate(angulos)]
+    caminho = tmp_path / 'fmr.dat'
+    np.savetxt(caminho, np.vstack(blocos))
+    iniciais = {'a': 0, 'b': 0, 'c': -8e5, 'd': -5e5, 'Hr1': 930, 'dH1': 45, 'Hr2': 1160, 'dH2': 50}
+
+    resultados = GMAG.FMR_automatico(str(caminho), str(tmp_path / 'saida'), iniciais, n_processos=1,
+                                     renderizador=renderizacao.Renderizador(ativo=False))
+
+    np.testing.assert_allclose(resultados['angulos'], angulos)
+    for angulo, parametros in zip(resultados['angulos'], resultados['parametros']):
+        alvo = verdadeiros(angulo)
+        for nome in ('Hr1', 'dH1', 'Hr2', 'dH2'):
+            assert parametros[nome] == pytest.approx(alvo[nome], abs=1.0), (angulo, nome)
+    with open(resultados['relatorio_path']) as f:
+        assert len(json.load(f)['angulos']) == len(angulos)
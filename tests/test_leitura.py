@@ -0,0 +1,165 @@
+"""
+Leitura vetorizada (leitura.py): conversão contra o caminho linha a linha,
+validação dos auxiliares binários, ordenação guardada e poda LRU.
+"""
+import os
+import numpy as np
+import pytest
+
+import leitura
+
+
+@pytest.fixture(autouse=True)
+def auxiliares_temporarios(tmp_path, monkeypatch):
+    monkeypatch.setattr(leitura, 'DIRETORIO_AUXILIAR', str(tmp_path / 'auxiliares'))
+
+
+def linha_a_linha(texto, n_colunas, virgula='.'):
+    """Referência: o caminho lento, sobre o texto já traduzido como em analisar_colunas"""
+    traduzido = texto.encode().translate(leitura._tabela_traducao(virgula)).decode()
+    return leitura._analisar_linha_a_linha(traduzido, n_colunas)
+
+
+def tocar(caminho, segundos=5):
+    info = os.stat(caminho)
+    os.utime(caminho, ns=(info.st_atime_ns, info.st_mtime_ns + int(segundos * 1e9)))
+
+
+TEXTOS = {
+    'cabecalho': "Filename: x.dat\n# campo angulo sinal\n1 2 3\n4 5 6\n\n7 8 9\n",
+    'irregular': "1 2 3 4 5\n6 7\n8 9 10\ntexto solto\n11\t12\t13\r\n-1e3 +2.5E-2 .5\n",
+    'sem_quebra_final': "1 2 3\n4 5 6",
+    'campo_malformado': "1 2 3\n1.2.3 4 5\n6 7 8\n1e 2 3\n",
+    'so_cabecalho': "Filename: vazio\n# nada\n",
+}
+
+
+@pytest.mark.parametrize('nome', sorted(TEXTOS))
+@pytest.mark.parametrize('tamanho_bloco', [8, leitura.TAMANHO_BLOCO])
+def test_vetorizado_igual_linha_a_linha(nome, tamanho_bloco):
+    texto = TEXTOS[nome]
+    esperado = linha_a_linha(texto, 3)
+    obtido = leitura.analisar_colunas(texto, 3, tamanho_bloco=tamanho_bloco)
+    assert obtido.shape == esperado.shape
+    np.testing.assert_array_equal(obtido, esperado)
+
+
+@pytest.mark.parametrize('tamanho_bloco', [16, leitura.TAMANHO_BLOCO])
+def test_virgula_decimal_e_separador(tamanho_bloco):
+    decimal = "campo;sinal\n1,5 2,25\n3,0 -4,5\n5 6 7\n"
+    obtido = leitura.analisar_colunas(decimal, 2, virgula='.', tamanho_bloco=tamanho_bloco)
+    np.testing.assert_array_equal(obtido, [[1.5, 2.25], [3.0, -4.5], [5, 6]])
+    np.testing.assert_array_equal(obtido, linha_a_linha(decimal, 2, '.'))
+
+    separador = "a,b,c,d,e\n1,2,3,4,5\n6,7,8,9,10\n11,12\n"
+    obtido = leitura.analisar_colunas(separador, 5, virgula=' ', tamanho_bloco=tamanho_bloco)
+    np.testing.assert_array_equal(obtido, [[1, 2, 3, 4, 5], [6, 7, 8, 9, 10]])
+    np.testing.assert_array_equal(obtido, linha_a_linha(separador, 5, ' '))
+
+
+def test_aleatorio_igual_linha_a_linha():
+    rng = np.random.default_rng(0)
+    linhas = []
+    for _ in range(500):
+        n = rng.integers(0, 6)
+        campos = [f"{v:.6g}" for v in rng.normal(scale=1e3, size=n)]
+        if rng.random() < 0.1:
+            campos.append('abc')
+        linhas.append((' ' if rng.random() < 0.5 else '\t').join(campos))
+    texto = '\n'.join(linhas) + '\n'
+    for tamanho_bloco in (64, 1000, leitura.TAMANHO_BLOCO):
+        np.testing.assert_array_equal(leitura.analisar_colunas(texto, 3, tamanho_bloco=tamanho_bloco),
+                                      linha_a_linha(texto, 3))
+
+
+def test_auxiliar_nunca_desatualizado(tmp_path):
+    caminho = tmp_path / 'dados.dat'
+    np.savetxt(caminho, [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]])
+    opcoes = ('colunas', 3, '.')
+
+    primeira = leitura.carregar_colunas(str(caminho))
+    assert leitura._ler_auxiliar(str(caminho), opcoes)[0]
+
+    # Tamanho diferente
+    np.savetxt(caminho, [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0], [7.0, 8.0, 9.0]])
+    assert not leitura._ler_auxiliar(str(caminho), opcoes)[0]
+    np.testing.assert_array_equal(leitura.carregar_colunas(str(caminho))[0], [1, 4, 7])
+
+    # Mesmo tamanho, outra data e outro conteúdo: o hash decide
+    np.savetxt(caminho, [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0], [7.0, 8.0, 8.0]])
+    tocar(caminho)
+    assert not leitura._ler_auxiliar(str(caminho), opcoes)[0]
+    np.testing.assert_array_equal(leitura.carregar_colunas(str(caminho))[2], [3, 6, 8])
+
+    # Só a data muda (arquivo tocado): o auxiliar é revalidado e continua valendo
+    tocar(caminho)
+    encontrado, colunas = leitura._ler_auxiliar(str(caminho), opcoes)
+    assert encontrado
+    np.testing.assert_array_equal(colunas[2], [3, 6, 8])
+    assert not colunas[2].flags.writeable  # mapeado do .npy
+    assert len(primeira[0]) == 2
+
+
+def test_marcador_ausente_guardado(tmp_path):
+    caminho = tmp_path / 'vsm.dat'
+    caminho.write_text("cabeçalho sem marcador\n1 2\n")
+    assert leitura.carregar_colunas_apos(str(caminho), "(emu)") is None
+    assert leitura._ler_auxiliar(str(caminho), ('apos', b"(emu)", 2, '.')) == (True, None)
+
+    caminho.write_text("Campo (Oe) Momento (emu)\n1 2\n3 4\n")
+    tocar(caminho)
+    H, M = leitura.carregar_colunas_apos(str(caminho), "(emu)")
+    np.testing.assert_array_equal(M, [2, 4])
+
+
+def test_ordenar_por(tmp_path):
+    caminho = tmp_path / 'fmr.dat'
+    dados = np.array([[3, 20, 0], [1, 10, 1], [2, 20, 2], [4, 10, 3], [5, 0, 4]], dtype=float)
+    np.savetxt(caminho, dados)
+    esperado = dados[np.argsort(dados[:, 1], kind='stable')]
+
+    for _ in range(2):  # conversão e depois leitura do auxiliar
+        colunas = leitura.carregar_colunas(str(caminho), 3, ordenar_por=1)
+        np.testing.assert_array_equal(np.column_stack(colunas), esperado)
+
+    # A ordem faz parte da chave: a leitura sem ordenação continua na ordem do arquivo
+    np.testing.assert_array_equal(np.column_stack(leitura.carregar_colunas(str(caminho), 3)), dados)
+    assert len([n for n in os.listdir(leitura.DIRETORIO_AUXILIAR) if n.endswith('.npy')]) == 2
+
+
+def test_poda_lru(tmp_path, monkeypatch):
+    arquivos = []
+    for i in range(6):
+        caminho = tmp_path / f'a{i}.dat'
+        np.savetxt(caminho, np.random.default_rng(i).random((1000, 3)))
+        arquivos.append(str(caminho))
+
+    leitura.carregar_colunas(arquivos[0])
+    tamanho = sum(os.path.getsize(os.path.join(leitura.DIRETORIO_AUXILIAR, n))
+                  for n in os.listdir(leitura.DIRETORIO_AUXILIAR))
+    monkeypatch.setattr(leitura, 'MAX_BYTES_AUXILIAR', int(2.5 * tamanho))
+
+    def uso(caminho, instante):
+        base = leitura._caminho_auxiliar(caminho, ('colunas', 3, '.'))
+        os.utime(base + '.json', (instante, instante))
+
+    uso(arquivos[0], 1000)
+    for i, caminho in enumerate(arquivos[1:3], start=1):
+        leitura.carregar_colunas(caminho)
+        uso(caminho, 1000 + i)
+    leitura.carregar_colunas(arquivos[0])  # lido de novo: passa a ser o mais recente
+    leitura.carregar_colunas(arquivos[3])
+
+    validos = [leitura._ler_auxiliar(c, ('colunas', 3, '.'))[0] for c in arquivos[:4]]
+    assert validos == [True, False, False, True]
+    total = sum(os.path.getsize(os.path.join(leitura.DIRETORIO_AUXILIAR, n))
+                for n in os.listdir(leitura.DIRETORIO_AUXILIAR))
+    assert total <= leitura.MAX_BYTES_AUXILIAR
+
+
+def test_auxiliar_maior_que_o_limite_fica(tmp_path, monkeypatch):
+    monkeypatch.setattr(leitura, 'MAX_BYTES_AUXILIAR', 10)
+    caminho = tmp_path / 'a.dat'
+    np.savetxt(caminho, np.ones((10, 3)))
+    leitura.carregar_colunas(str(caminho))
+    assert leitura._ler_auxiliar(str(caminho), ('colunas', 3, '.'))[0]
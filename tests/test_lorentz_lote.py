@@ -0,0 +1,104 @@
+"""
+Ajuste em lote da Lorentziana assimétrica (lorentz_lote.py) contra o
+caminho lmfit espectro a espectro, e a reserva lmfit para os que não convergem.
+"""
+import numpy as np
+
+import lorentz_lote
+from lorentz_lote import NOMES
+
+
+def espectros(n=20, semente=0):
+    """Espectros ruidosos com parâmetros conhecidos, na grade típica de impedancia"""
+    rng = np.random.default_rng(semente)
+    x = np.linspace(0, 3000, 301)
+    P = np.column_stack([rng.uniform(0.5, 2.0, n), rng.uniform(-0.3, 0.3, n),
+                         rng.uniform(800, 2200, n), rng.uniform(60, 250, n)])
+    Y = lorentz_lote.lorentz_lote(x, P) + rng.normal(scale=0.01, size=(n, len(x)))
+    return x, Y, P
+
+
+def test_jacobiano_contra_diferencas_finitas():
+    x, _, P = espectros(3)
+    J = lorentz_lote.jacobiano_lote(x, P)
+    for k in range(4):
+        h = 1e-6 * max(abs(P[0, k]), 1.0)
+        mais, menos = P.copy(), P.copy()
+        mais[:, k] += h
+        menos[:, k] -= h
+        numerico = (lorentz_lote.lorentz_lote(x, mais) - lorentz_lote.lorentz_lote(x, menos)) / (2 * h)
+        np.testing.assert_allclose(J[..., k], numerico, rtol=1e-5, atol=1e-9)
+
+
+def test_lote_igual_individual():
+    x, Y, P = espectros()
+    lote = lorentz_lote.ajustar_lorentz_lote(x, Y)
+    individual = lorentz_lote.ajustar_lorentz_individual(x, Y)
+
+    assert lote.sucesso.all() and individual.sucesso.all()
+    assert set(lote.metodo) == {'lote'}
+    np.testing.assert_allclose(lote.valores, individual.valores, rtol=1e-4, atol=1e-6)
+    np.testing.assert_allclose(lote.erros, individual.erros, rtol=1e-3)
+    np.testing.assert_allclose(lote.chisqr, individual.chisqr, rtol=1e-6)
+    np.testing.assert_allclose(lote.redchi, individual.redchi, rtol=1e-6)
+    # E ambos recuperam os parâmetros verdadeiros dentro de alguns erros padrão
+    assert np.all(np.abs(lote.valores - P) < 5 * lote.erros)
+
+
+def test_reserva_lmfit_para_nao_convergidos():
+    x, Y, _ = espectros(4, semente=1)
+    sem_reserva = lorentz_lote.ajustar_lorentz_lote(x, Y, max_iter=1, reserva_lmfit=False)
+    assert not sem_reserva.sucesso.any()
+    assert set(sem_reserva.metodo) == {'lote'}
+
+    com_reserva = lorentz_lote.ajustar_lorentz_lote(x, Y, max_iter=1)
+    individual = lorentz_lote.ajustar_lorentz_individual(x, Y)
+    assert com_reserva.sucesso.all()
+    assert set(com_reserva.metodo) == {'lmfit'}
+    np.testing.assert_array_equal(com_reserva.valores, individual.valores)
+    np.testing.assert_array_equal(com_reserva.nfev, individual.nfev)
+
+
+def test_estagnado_vai_para_reserva(monkeypatch):
+    x, Y, _ = espectros(3, semente=4)
+    modelo = lorentz_lote.lorentz_lote
+    chamadas = []
+
+    def sempre_pior(x, P):
+        # Todo passo tentado piora o qui-quadrado: o amortecimento só cresce
+        chamadas.append(1)
+        return modelo(x, P) + (0.0 if len(chamadas) == 1 else 1.0)
+
+    monkeypatch.setattr(lorentz_lote, 'lorentz_lote', sempre_pior)
+    estagnado = lorentz_lote.ajustar_lorentz_lote(x, Y, reserva_lmfit=False)
+    assert not estagnado.sucesso.any()
+    assert np.all(estagnado.nfev == 1 + 16)   # de 1e-3 até passar de 1e12
+
+    chamadas.clear()
+    com_reserva = lorentz_lote.ajustar_lorentz_lote(x, Y)
+    assert com_reserva.sucesso.all()
+    assert set(com_reserva.metodo) == {'lmfit'}
+
+
+def test_reajuste_lmfit_com_falha_mantem_resultado(capsys):
+    x, Y, _ = espectros(2, semente=2)
+    resultado = lorentz_lote.ajustar_lorentz_lote(x, Y, reserva_lmfit=False)
+    antes = resultado.valores.copy()
+    ruins = Y.copy()
+    ruins[1, 10] = np.nan  # lmfit recusa dados com NaN
+
+    lorentz_lote._reajustar_lmfit(resultado, ruins, [0, 1])
+    assert "espectro 1" in capsys.readouterr().out
+    assert list(resultado.metodo) == ['lmfit', 'lote']
+    np.testing.assert_array_equal(resultado.valores[1], antes[1])
+    np.testing.assert_allclose(resultado.valores[0], antes[0], rtol=1e-4)
+
+
+def test_exportar_importar():
+    x, Y, _ = espectros(3, semente=3)
+    resultado = lorentz_lote.ajustar_lorentz_lote(x, Y)
+    copia = lorentz_lote.ResultadoLote.importar(x, [resultado.exportar(i) for i in range(len(resultado))])
+    for atributo in ('valores', 'erros', 'chisqr', 'redchi', 'nfev', 'sucesso'):
+        np.testing.assert_array_equal(getattr(copia, atributo), getattr(resultado, atributo))
+    assert copia.relatorio(0) == resultado.relatorio(0)
+    assert [copia.parametros(0)[nome][0] for nome in NOMES] == list(resultado.valores[0])
@@ -0,0 +1,80 @@
+"""
+Monitoramento de pasta: agregados incrementais, falhas de arquivos
+modificados e o cancelamento pela fila de tarefas (app.monitorar_pasta).
+"""
+import os
+import numpy as np
+import pytest
+
+import monitoramento, renderizacao, tarefas
+
+
+@pytest.fixture
+def renderizador_inativo(monkeypatch):
+    renderizador = renderizacao.Renderizador(ativo=False)
+    monkeypatch.setattr(renderizacao, '_padrao', renderizador)
+    return renderizador
+
+
+def gravar_curvas(pasta, n):
+    rng = np.random.default_rng(0)
+    for i in range(n):
+        np.savetxt(os.path.join(pasta, f'curva_{i:02d}.txt'), rng.random((20, 2)))
+
+
+def test_atualizacao_limitada_por_intervalo(tmp_path, renderizador_inativo):
+    origem = tmp_path / 'origem'
+    origem.mkdir()
+    analise = monitoramento.EletroimaIncremental(str(tmp_path / 'saida'), renderizador_inativo,
+                                                 intervalo_atualizacao=60)
+    monitor = monitoramento.MonitorPasta(str(origem), analise, intervalo=0, estabilidade=0)
+
+    gravar_curvas(origem, 1)
+    monitor.ciclo()
+    assert not analise.pendente
+    gravar_curvas(origem, 3)
+    monitor.ciclo()
+    assert analise.pendente
+
+    analise.finalizar()
+    assert not analise.pendente
+    assert analise.resumo()['arquivos'] == len(analise.curvas) == 3
+
+
+def test_falha_retira_valor_antigo(tmp_path, renderizador_inativo):
+    analise = monitoramento.ImpedanciaIncremental(str(tmp_path), renderizador_inativo)
+    for i, nome in enumerate(('a', 'b', 'c')):
+        posicao = analise.posicao(nome)
+        analise.valores[posicao] = (900.0 + 10 * i, 10.0 + i)
+        analise._somar(posicao, *analise.valores[posicao], 1)
+
+    analise.falhou(os.path.join(str(tmp_path), 'b'), "O ajuste não convergiu")
+
+    assert sorted(analise.valores) == [0, 2]
+    assert analise.kittel.n == analise.largura.n == 2
+    assert analise.falhas == {'b': "O ajuste não convergiu"}
+
+
+def test_cancelamento_devolve_resumo(tmp_path, renderizador_inativo):
+    app = pytest.importorskip('app')
+    origem, destino = tmp_path / 'origem', tmp_path / 'saida'
+    origem.mkdir()
+    destino.mkdir()
+    gravar_curvas(origem, 4)
+
+    tarefa = tarefas.Tarefa('monitor')
+    informar = tarefa.informar
+
+    def cancelar_durante_varredura(*args, **kwargs):
+        # O cancelamento chega enquanto a varredura relata o andamento
+        tarefa._cancelar.set()
+        return informar(*args, **kwargs)
+
+    tarefa.informar = cancelar_durante_varredura
+    resposta = app.monitorar_pasta('eletroima', str(origem), str(destino), intervalo=0, estabilidade=0,
+                                   tarefa=tarefa)
+
+    assert resposta['success'] is True
+    assert resposta['resumo']['arquivos'] == 4
+    assert len(resposta['resumo']['falhas']) == 0
+    assert os.path.exists(destino / 'monitoramento_eletroima.json')
@@ -0,0 +1,117 @@
+"""
+Sessão FMR (sessao_fmr.SessaoFMR e FMR_incremental): ajustes guardados em
+disco, reaproveitados enquanto a fatia de dados de cada ângulo não muda.
+"""
+import os
+import numpy as np
+import pytest
+
+import leitura, renderizacao, sessao_fmr
+
+PARAMETROS_INICIAIS = {'a': 0, 'b': 0, 'c': -1e6, 'Hr1': 925, 'dH1': 40}
+CAMPO = np.linspace(800, 1050, 300)
+
+
+@pytest.fixture(autouse=True)
+def auxiliares_temporarios(tmp_path, monkeypatch):
+    monkeypatch.setattr(leitura, 'DIRETORIO_AUXILIAR', str(tmp_path / 'auxiliares'))
+
+
+def gravar_varredura(caminho, angulos, deslocamento=0.0, semente=0):
+    """Um pico por ângulo, com Hr variando suavemente; `deslocamento` muda o Hr de todos"""
+    rng = np.random.default_rng(semente)
+    blocos = []
+    for angulo in angulos:
+        Hr = 925 + 15 * np.cos(np.radians(2 * angulo)) + deslocamento
+        sinal = -1e6 * (CAMPO - Hr) / ((CAMPO - Hr) ** 2 + 20.0 ** 2) ** 2
+        sinal += 0.01 * np.abs(sinal).max() * rng.normal(size=len(CAMPO))
+        blocos.append(np.column_stack((CAMPO, np.full(len(CAMPO), angulo), sinal)))
+    np.savetxt(caminho, np.vstack(blocos))
+    return str(caminho)
+
+
+def test_reabrir_ajusta_so_os_faltantes(tmp_path):
+    primeiro = gravar_varredura(tmp_path / 'a.dat', [0, 20, 40, 60, 80])
+    segundo = gravar_varredura(tmp_path / 'b.dat', [100, 120, 140], semente=1)
+    destino = str(tmp_path / 'sessao')
+
+    sessao = sessao_fmr.SessaoFMR(destino, [primeiro])
+    angulos, _ = sessao.ajustar(PARAMETROS_INICIAIS, n_processos=1)
+    assert angulos == [0, 20, 40, 60, 80]
+    tabela = sessao.tabela.copy()
+
+    reaberta = sessao_fmr.SessaoFMR(destino, [segundo])
+    assert sorted(reaberta.resultados) == [0, 20, 40, 60, 80]
+    assert reaberta.faltantes() == [100, 120, 140]
+    np.testing.assert_array_equal(reaberta.tabela[:5], tabela)
+
+    novos, parametros = reaberta.ajustar(n_processos=1)
+    assert novos == [100, 120, 140]
+    assert reaberta.faltantes() == []
+    for angulo, p in zip(novos, parametros):
+        assert p['Hr1'] == pytest.approx(925 + 15 * np.cos(np.radians(2 * angulo)), abs=1.0)
+
+
+def test_dados_alterados_forcam_novo_ajuste(tmp_path):
+    caminho = gravar_varredura(tmp_path / 'a.dat', [0, 20, 40])
+    destino = str(tmp_path / 'sessao')
+    sessao_fmr.SessaoFMR(destino, [caminho]).ajustar(PARAMETROS_INICIAIS, n_processos=1)
+
+    # Mesmo arquivo regravado: só o ângulo 40 muda
+    antigos = np.loadtxt(caminho)
+    alterado = gravar_varredura(tmp_path / 'tmp.dat', [40], deslocamento=5.0, semente=7)
+    dados = np.vstack((antigos[antigos[:, 1] != 40], np.loadtxt(alterado)))
+    np.savetxt(caminho, dados)
+    info = os.stat(caminho)
+    os.utime(caminho, ns=(info.st_atime_ns, info.st_mtime_ns + 10**9))
+
+    reaberta = sessao_fmr.SessaoFMR(destino)
+    assert sorted(reaberta.resultados) == [0, 20]
+    assert reaberta.faltantes() == [40]
+    novos, parametros = reaberta.ajustar(n_processos=1)
+    assert novos == [40]
+    assert parametros[0]['Hr1'] == pytest.approx(925 + 15 * np.cos(np.radians(80)) + 5.0, abs=1.0)
+
+
+def test_outro_modelo_descarta_os_ajustes(tmp_path):
+    caminho = gravar_varredura(tmp_path / 'a.dat', [0, 20, 40])
+    destino = str(tmp_path / 'sessao')
+    sessao = sessao_fmr.SessaoFMR(destino, [caminho])
+    sessao.ajustar(PARAMETROS_INICIAIS, n_processos=1)
+    assert sessao.modelo_picos.forma == 'lorentz'
+
+    reaberta = sessao_fmr.SessaoFMR(destino)
+    assert reaberta.faltantes() == []
+    novos, _ = reaberta.ajustar(dict(PARAMETROS_INICIAIS, assim1=0.0), n_processos=1)
+    assert novos == [0, 20, 40]
+    assert reaberta.modelo_picos.forma == 'dowson'
+    assert 'assim1' in sessao_fmr.SessaoFMR(destino).nomes_parametros
+
+
+def test_sessao_vazia(tmp_path):
+    destino = str(tmp_path / 'sessao')
+    sessao = sessao_fmr.SessaoFMR(destino)
+
+    assert len(sessao.angulos_disponiveis) == 0
+    assert sessao.faltantes() == []
+    assert sessao.resultados == {}
+    with pytest.raises(ValueError):
+        sessao.ajustar(PARAMETROS_INICIAIS)
+    sessao.salvar()
+    assert sessao_fmr.SessaoFMR(destino).resultados == {}
+
+
+def test_fmr_incremental_nao_refaz_ajustes(tmp_path):
+    caminho = gravar_varredura(tmp_path / 'a.dat', [0, 30, 60])
+    destino = str(tmp_path / 'sessao')
+    renderizador = renderizacao.Renderizador(ativo=False)
+
+    primeira = sessao_fmr.FMR_incremental(caminho, destino, PARAMETROS_INICIAIS, n_processos=1,
+                                          renderizador=renderizador)
+    segunda = sessao_fmr.FMR_incremental(None, destino, n_processos=1, renderizador=renderizador)
+
+    assert primeira['novos'] == [0, 30, 60]
+    assert segunda['novos'] == []
+    assert segunda['angulos'] == primeira['angulos']
+    np.testing.assert_allclose([p['Hr1'] for p in segunda['parametros']],
+                               [p['Hr1'] for p in primeira['parametros']])
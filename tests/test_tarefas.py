@@ -0,0 +1,155 @@
+"""
+Fila de tarefas em segundo plano (tarefas.py): submissão, andamento,
+cancelamento cooperativo, erros e consistência do resumo lido de outra thread.
+"""
+import threading
+import pytest
+
+import tarefas
+
+
+@pytest.fixture
+def gerenciador():
+    g = tarefas.GerenciadorTarefas(n_trabalhadores=2)
+    yield g
+    g.encerrar(cancelar=True)
+
+
+def test_submeter_e_concluir(gerenciador):
+    id_tarefa = gerenciador.submeter('soma', lambda a, b, tarefa: a + b, 2, b=3, descricao='dois mais três')
+    resumo = gerenciador.aguardar(id_tarefa, tempo_limite=5)
+    assert resumo['estado'] == tarefas.CONCLUIDA
+    assert resumo['resultado'] == 5
+    assert resumo['progresso'] == 1.0
+    assert resumo['descricao'] == 'dois mais três'
+    assert resumo['criada'] <= resumo['iniciada'] <= resumo['finalizada']
+    assert gerenciador.cancelar(id_tarefa) is False
+
+
+def test_andamento(gerenciador):
+    informado, liberar = threading.Event(), threading.Event()
+
+    def funcao(tarefa):
+        tarefa.informar('primeira', 0.25)
+        tarefa.informar('segunda', 7.0)   # limitado a 1
+        tarefa.informar(progresso=0.5)
+        informado.set()
+        liberar.wait(5)
+        return 'ok'
+
+    id_tarefa = gerenciador.submeter('andamento', funcao)
+    assert informado.wait(5)
+    resumo = gerenciador.estado(id_tarefa)
+    assert resumo['estado'] == tarefas.EXECUTANDO
+    assert resumo['progresso'] == 0.5
+    assert resumo['mensagens'] == ['primeira', 'segunda']
+    assert resumo['resultado'] is None
+    assert gerenciador.estado(id_tarefa, desde=resumo['proxima'])['mensagens'] == []
+    assert gerenciador.estado(id_tarefa, desde=1)['mensagens'] == ['segunda']
+    assert [r['id'] for r in gerenciador.listar()] == [id_tarefa]
+
+    liberar.set()
+    assert gerenciador.aguardar(id_tarefa, tempo_limite=5)['resultado'] == 'ok'
+
+
+def test_cancelamento_cooperativo(gerenciador):
+    iniciou = threading.Event()
+    voltas = []
+
+    def funcao(tarefa):
+        iniciou.set()
+        while True:
+            voltas.append(1)
+            tarefa.informar(progresso=0.1)   # levanta TarefaCancelada quando pedido
+            threading.Event().wait(0.001)
+
+    id_tarefa = gerenciador.submeter('longa', funcao)
+    assert iniciou.wait(5)
+    assert gerenciador.cancelar(id_tarefa) is True
+    resumo = gerenciador.aguardar(id_tarefa, tempo_limite=5)
+    assert resumo['estado'] == tarefas.CANCELADA
+    assert resumo['erro'] is None
+    assert voltas
+    assert gerenciador.cancelar(id_tarefa) is False
+
+
+def test_cancelada_na_fila_nao_executa():
+    gerenciador = tarefas.GerenciadorTarefas(n_trabalhadores=1)
+    liberar = threading.Event()
+    executou = []
+    try:
+        ocupada = gerenciador.submeter('ocupada', lambda tarefa: liberar.wait(5))
+        na_fila = gerenciador.submeter('na fila', lambda tarefa: executou.append(1))
+        assert gerenciador.cancelar(na_fila) is True
+        assert gerenciador.estado(na_fila)['estado'] == tarefas.CANCELADA
+        liberar.set()
+        gerenciador.aguardar(ocupada, tempo_limite=5)
+        assert gerenciador.aguardar(na_fila)['estado'] == tarefas.CANCELADA
+        assert not executou
+    finally:
+        liberar.set()
+        gerenciador.encerrar()
+
+
+def test_resultado_com_cancelamento_pedido_fica_cancelada(gerenciador):
+    def funcao(tarefa):
+        tarefa._cancelar.set()   # pedido depois do último ponto de verificação
+        return 'parcial'
+
+    resumo = gerenciador.aguardar(gerenciador.submeter('tardia', funcao), tempo_limite=5)
+    assert resumo['estado'] == tarefas.CANCELADA
+    assert resumo['resultado'] == 'parcial'
+
+
+def test_excecao_vira_erro(gerenciador):
+    def funcao(tarefa):
+        tarefa.informar('antes da falha')
+        raise RuntimeError("arquivo corrompido")
+
+    resumo = gerenciador.aguardar(gerenciador.submeter('falha', funcao), tempo_limite=5)
+    assert resumo['estado'] == tarefas.ERRO
+    assert resumo['erro'] == "arquivo corrompido"
+    assert resumo['mensagens'][0] == 'antes da falha'
+    assert 'RuntimeError: arquivo corrompido' in resumo['mensagens'][-1]
+    assert resumo['progresso'] == 0.0
+
+
+def test_dicionario_sem_sucesso_vira_erro(gerenciador):
+    resultado = {'success': False, 'message': 'Diretório não encontrado'}
+    resumo = gerenciador.aguardar(gerenciador.submeter('falha', lambda tarefa: resultado), tempo_limite=5)
+    assert resumo['estado'] == tarefas.ERRO
+    assert resumo['erro'] == 'Diretório não encontrado'
+    assert resumo['resultado'] == resultado
+
+
+def test_historico_limitado():
+    gerenciador = tarefas.GerenciadorTarefas(n_trabalhadores=1, max_historico=2)
+    try:
+        ids = [gerenciador.submeter('t', lambda tarefa, i=i: i) for i in range(4)]
+        for i in ids:
+            gerenciador.aguardar(i, tempo_limite=5)
+        ultima = gerenciador.submeter('t', lambda tarefa: None)
+        gerenciador.aguardar(ultima, tempo_limite=5)
+        with pytest.raises(ValueError):
+            gerenciador.obter(ids[0])
+        assert len(gerenciador.listar()) <= 3
+    finally:
+        gerenciador.encerrar()
+
+
+def test_resumo_consistente_durante_a_finalizacao():
+    # Estado final, resultado e horário de fim são publicados juntos
+    gerenciador = tarefas.GerenciadorTarefas(n_trabalhadores=2, max_historico=1000)
+    try:
+        ids = [gerenciador.submeter('rapida', lambda tarefa, i=i: {'valor': i}) for i in range(200)]
+        inconsistentes = []
+        for id_tarefa in ids:
+            while True:
+                resumo = gerenciador.estado(id_tarefa)
+                if resumo['estado'] in tarefas.FINAIS:
+                    if resumo['resultado'] is None or resumo['finalizada'] is None or resumo['progresso'] != 1.0:
+                        inconsistentes.append(resumo)
+                    break
+        assert not inconsistentes
+    finally:
+        gerenciador.encerrar()